@@ -0,0 +1,244 @@
+"""
+Benchmarks of the crawl and extraction functions of ArcGISPyGnu against the local mock ArcGIS REST server.
+
+Every scenario runs `--repeat` times with a cold catalog cache and a fresh client. The median wall time is reported
+together with the requests per second, features per second and the peak memory allocated by Python (measured in a
+separate run, as tracing allocations slows the code down). The results are written as JSON, including the commit they
+were measured on, so the results of two commits can be compared with `--compare`.
+
+Usage:
+    python benchmarks/benchmark.py --output results.json
+    python benchmarks/benchmark.py --features 50000 --latency 0.05 --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+repositoryRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(repositoryRoot, "src"), repositoryRoot]
+
+from ArcGISPyGnu import core  # noqa: E402
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient  # noqa: E402
+from ArcGISPyGnu.export import exportMapLayer  # noqa: E402
+from ArcGISPyGnu.tiling import restGetMapLayerDataTiled  # noqa: E402
+from tests.mockserver import MockArcGISServer  # noqa: E402
+
+try:
+    import asyncio
+    from ArcGISPyGnu import aio
+except ImportError:  # aiohttp is an optional dependency
+    aio = None
+
+try:
+    import pyarrow
+except ImportError:  # pyarrow is an optional dependency
+    pyarrow = None
+
+# The service and layer extracted by the layer scenarios
+_serviceName = "Folder0/Service0"
+_layerId = 0
+
+
+def _countFeatures(features):
+    return sum(1 for _ in features)
+
+
+def _aioAllData(baseUrl, maxConcurrency):
+    async def run():
+        client = aio.AsyncArcGISClient()
+        aio.setDefaultClient(client)
+        try:
+            return await aio.restGetMapLayerAllData(baseUrl, _serviceName, _layerId, maxConcurrency=maxConcurrency)
+        finally:
+            await client.close()
+    return len(asyncio.run(run()))
+
+
+def _export(baseUrl, format):
+    with tempfile.TemporaryDirectory() as directory:
+        return exportMapLayer(baseUrl, _serviceName, _layerId, os.path.join(directory, "layer"), format=format)["rows"]
+
+
+def scenarios():
+    """
+    Returns the benchmark scenarios.
+
+    Returns:
+        dict: The scenario names mapped to functions receiving the base URL of the server and returning the number of
+        features they extracted.
+    """
+    benchmarks = {
+        "restGetTreeStructure.sequential": lambda baseUrl: core.restGetTreeStructure(baseUrl, maxWorkers=1) and 0,
+        "restGetTreeStructure.parallel": lambda baseUrl: core.restGetTreeStructure(baseUrl, maxWorkers=8) and 0,
+        "restGetServices": lambda baseUrl: core.restGetServices(baseUrl) and 0,
+        "restGetMapLayerAllData.sequential": lambda baseUrl: len(
+            core.restGetMapLayerAllData(baseUrl, _serviceName, _layerId)),
+        "restGetMapLayerAllData.parallel": lambda baseUrl: len(
+            core.restGetMapLayerAllData(baseUrl, _serviceName, _layerId, maxWorkers=4)),
+        "iterMapLayerData.streaming": lambda baseUrl: _countFeatures(
+            core.iterMapLayerData(baseUrl, _serviceName, _layerId)),
+        "iterMapLayerData.json": lambda baseUrl: _countFeatures(
+            core.iterMapLayerData(baseUrl, _serviceName, _layerId, queryFormat="json")),
+        "iterMapLayerData.json.streamed": lambda baseUrl: _countFeatures(
+            core.iterMapLayerData(baseUrl, _serviceName, _layerId, stream=True)),
+        "restGetMapLayerTable.parallel": lambda baseUrl: len(
+            core.restGetMapLayerTable(baseUrl, _serviceName, _layerId, maxWorkers=4)),
+        "restGetMapLayerDataTiled.parallel": lambda baseUrl: len(
+            restGetMapLayerDataTiled(baseUrl, _serviceName, _layerId, maxWorkers=4)),
+        "exportMapLayer.geojsonseq": lambda baseUrl: _export(baseUrl, "geojsonseq"),
+    }
+    if pyarrow is not None:
+        benchmarks["exportMapLayer.geoparquet"] = lambda baseUrl: _export(baseUrl, "geoparquet")
+    if aio is not None:
+        benchmarks["aio.restGetMapLayerAllData.concurrent"] = lambda baseUrl: _aioAllData(baseUrl, 4)
+    return benchmarks
+
+
+def runScenario(server, function, repeat):
+    """
+    Runs a scenario and measures it.
+
+    Args:
+        server (MockArcGISServer): The running mock server.
+        function (callable): The scenario.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        dict: The measurements of the scenario.
+    """
+    wallTimes = []
+    requests = []
+    features = 0
+    for run in range(repeat + 1):
+        core.invalidateCatalogCache()
+        client = ArcGISClient(poolMaxSize=16)
+        previousClient = setDefaultClient(client)
+        server.resetStats()
+        try:
+            # The last run traces the memory allocations and is not timed
+            tracing = run == repeat
+            if tracing:
+                tracemalloc.start()
+            started = time.perf_counter()
+            features = function(server.baseUrl)
+            elapsed = time.perf_counter() - started
+            if tracing:
+                peakMemory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                wallTimes.append(elapsed)
+                requests.append(server.stats()["requests"])
+        finally:
+            setDefaultClient(previousClient)
+            client.close()
+
+    wallTime = statistics.median(wallTimes)
+    requestCount = int(statistics.median(requests))
+    return {
+        "wallTime": wallTime,
+        "wallTimes": wallTimes,
+        "requests": requestCount,
+        "requestsPerSecond": requestCount / wallTime if wallTime else None,
+        "features": features,
+        "featuresPerSecond": features / wallTime if wallTime and features else None,
+        "peakMemory": peakMemory,
+    }
+
+
+def _commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repositoryRoot, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repositoryRoot,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(results, baseline):
+    """
+    Prints the wall time of every scenario relative to a baseline.
+
+    Args:
+        results (dict): The results of this run.
+        baseline (dict): The results of an earlier run.
+    """
+    print(f"\nCompared to {baseline.get('commit') or 'the baseline'}:")
+    for name, measurement in results["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            print(f"  {name:45} new")
+            continue
+        ratio = measurement["wallTime"] / previous["wallTime"] if previous["wallTime"] else float("nan")
+        print(f"  {name:45} {previous['wallTime']:8.3f}s -> {measurement['wallTime']:8.3f}s  ({ratio:5.2f}x)")
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmark ArcGISPyGnu against a local mock ArcGIS REST server.")
+    parser.add_argument("--folder-depth", type=int, default=2)
+    parser.add_argument("--folders", type=int, default=4, help="The number of subfolders per folder.")
+    parser.add_argument("--services", type=int, default=3, help="The number of services per folder.")
+    parser.add_argument("--features", type=int, default=20000, help="The number of features of the extracted layer.")
+    parser.add_argument("--max-record-count", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.01, help="The latency of every response in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="The fraction of failing requests.")
+    parser.add_argument("--repeat", type=int, default=3, help="The number of timed runs of every scenario.")
+    parser.add_argument("--scenario", action="append", help="Run only the scenarios starting with this name.")
+    parser.add_argument("--output", help="The path of the JSON file to write the results to.")
+    parser.add_argument("--compare", help="The path of an earlier JSON result file to compare with.")
+    options = parser.parse_args(arguments)
+
+    config = {
+        "folderDepth": options.folder_depth,
+        "foldersPerFolder": options.folders,
+        "servicesPerFolder": options.services,
+        "featuresPerLayer": options.features,
+        "maxRecordCount": options.max_record_count,
+        "latency": options.latency,
+        "errorRate": options.error_rate,
+        "repeat": options.repeat,
+    }
+    commit, dirty = _commit()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": {},
+    }
+
+    with MockArcGISServer(folderDepth=options.folder_depth, foldersPerFolder=options.folders,
+                          servicesPerFolder=options.services, featuresPerLayer=options.features,
+                          maxRecordCount=options.max_record_count, latency=options.latency,
+                          errorRate=options.error_rate, retryAfter=0 if options.error_rate else None) as server:
+        for name, function in scenarios().items():
+            if options.scenario and not any(name.startswith(prefix) for prefix in options.scenario):
+                continue
+            measurement = runScenario(server, function, options.repeat)
+            results["results"][name] = measurement
+            print(f"{name:45} {measurement['wallTime']:8.3f}s {measurement['requestsPerSecond'] or 0:9.1f} req/s "
+                  f"{measurement['featuresPerSecond'] or 0:11.1f} features/s "
+                  f"{measurement['peakMemory'] / 1048576:8.1f} MiB peak")
+
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+    if options.compare:
+        with open(options.compare, encoding="utf-8") as baselineFile:
+            compare(results, json.load(baselineFile))
+    return results
+
+
+if __name__ == "__main__":
+    main()
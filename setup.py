@@ -15,6 +15,13 @@ setup(
     install_requires=[
         "requests",
     ],
+    extras_require={
+        "columnar": ["numpy"],
+        "pandas": ["numpy", "pandas"],
+        "arrow": ["numpy", "pyarrow"],
+        "aio": ["aiohttp"],
+        "fast": ["orjson"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: GNU General Public License v3 or later (GPLv3+)",
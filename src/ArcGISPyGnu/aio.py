@@ -0,0 +1,776 @@
+import asyncio
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is an optional dependency
+    aiohttp = None
+
+from .cache import catalogCache, layerDetailsCache
+from .core import (_buildCatalog, _buildQueryParams, _checkServerError, _extractLayers, _hasMoreRecords,
+                   _layerQueryInfo, _layerUrl, _mapServerUrl, _newTreeNode, _objectIdRanges, _objectIdRangeWhere,
+                   _queryUrl, _resolvePageSize, _servicesUrl, _subfolderPaths, _versionUrl)
+from .decoding import loads
+from .httpcache import HttpCache
+from .instrumentation import RequestEvent, defaultInstrumentation
+from .query import dequantizeResponse, outFieldsParameter, validateOutFields
+from .scheduler import AdaptiveLimiter, RetryPolicy, bodyStatus, congestionStatuses, requestEndpoint
+from .singleflight import AsyncSingleFlight
+from .utils import checkBaseUrl, printError
+
+
+class AsyncArcGISClient:
+    """
+    A reusable asyncio HTTP client for ArcGIS REST API endpoints, the asyncio counterpart of `ArcGISClient`.
+
+    The client owns a single `aiohttp.ClientSession` with a pooled connector, created on first use inside the running
+    event loop. All coroutines in this module issue their requests through the default client returned by
+    `getDefaultClient`.
+
+    Like `ArcGISClient`, the client retries transient failures according to its `RetryPolicy` and adapts the number of
+    concurrent requests per host with an `AdaptiveLimiter`, and coalesces identical concurrent requests with an
+    `AsyncSingleFlight`.
+
+    Args:
+        limit (int): The maximum number of open connections.
+        limitPerHost (int): The maximum number of open connections per host, and the upper bound of the adaptive
+        concurrency limit of a host.
+        timeout (float): The total timeout of a request in seconds.
+        headers (dict, optional): Additional headers sent with every request.
+        retryPolicy (RetryPolicy, optional): The retry policy. Defaults to `RetryPolicy()`.
+        instrumentation (Instrumentation, optional): The instrumentation receiving the events of the requests.
+        Defaults to the shared `defaultInstrumentation`.
+        coalesce (bool): Share one request between the coroutines requesting the same URL and parameters
+        concurrently.
+
+    Raises:
+        ImportError: If aiohttp is not installed.
+    """
+
+    def __init__(self, limit=100, limitPerHost=10, timeout=60, headers=None, retryPolicy=None, instrumentation=None,
+                 coalesce=True):
+        if aiohttp is None:
+            raise ImportError("ArcGISPyGnu.aio requires aiohttp, install it with 'pip install aiohttp'.")
+        self.limit = limit
+        self.limitPerHost = limitPerHost
+        self.timeout = timeout
+        self.headers = {"Accept-Encoding": "gzip, deflate"}
+        if headers:
+            self.headers.update(headers)
+        self.retryPolicy = retryPolicy or RetryPolicy()
+        self.instrumentation = instrumentation or defaultInstrumentation
+        self.singleFlight = AsyncSingleFlight() if coalesce else None
+        self.retries = 0
+        self._limiters = {}
+        self._session = None
+        self._sessionLoop = None
+
+    def _getSession(self):
+        loop = asyncio.get_running_loop()
+        # A session is bound to the event loop it was created in, so a new loop needs a new session
+        if self._session is None or self._session.closed or self._sessionLoop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limitPerHost)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._sessionLoop = loop
+            # The conditions waiting for the limiters are bound to the event loop as well
+            self._limiters = {host: (limiter, asyncio.Condition()) for host, (limiter, _) in self._limiters.items()}
+        return self._session
+
+    def limiter(self, url):
+        """
+        Returns the adaptive limiter of the host of a URL, creating it on first use.
+
+        Args:
+            url (str): The URL that is about to be requested.
+
+        Returns:
+            AdaptiveLimiter: The limiter of the host.
+        """
+        return self._hostLimiter(url)[0]
+
+    def _hostLimiter(self, url):
+        host = urlsplit(url).netloc.lower()
+        if host not in self._limiters:
+            self._limiters[host] = (AdaptiveLimiter(maxLimit=self.limitPerHost), asyncio.Condition())
+        return self._limiters[host]
+
+    async def getJson(self, url, params=None):
+        """
+        Performs a GET request and decodes the JSON response.
+
+        Args:
+            url (str): The URL to request.
+            params (dict, optional): The query string parameters.
+
+        Returns:
+            dict: The decoded JSON response.
+
+        Raises:
+            aiohttp.ClientError: If the request fails or the server responds with an error status, after all retries
+            were used.
+        """
+        if params:
+            params = {key: str(value) for key, value in params.items()}
+        if self.singleFlight is None:
+            return (await self._instrumentedGetJson(url, params))[1]
+
+        (body, data), shared = await self.singleFlight.do(HttpCache.makeKey(url, params),
+                                                          lambda: self._instrumentedGetJson(url, params))
+        # The body was downloaded once, but every coroutine decodes its own document, which it may modify
+        return loads(body) if shared else data
+
+    async def _instrumentedGetJson(self, url, params):
+        """
+        Performs a GET request, measuring it when the instrumentation of the client has listeners, and returns the
+        body and the decoded JSON response.
+        """
+        instrumentation = self.instrumentation
+        if not instrumentation.listeners:
+            return await self._getJson(url, params, None)
+
+        event = RequestEvent(url, params, instrumentation)
+        instrumentation.requestStarted(event)
+        started = time.perf_counter()
+        try:
+            return await self._getJson(url, params, event)
+        except Exception as e:
+            event.error = e
+            raise
+        finally:
+            event.totalTime = time.perf_counter() - started
+            instrumentation.requestFinished(event)
+
+    async def _getJson(self, url, params, event):
+        session = self._getSession()
+        limiter, condition = self._hostLimiter(url)
+        requested = time.monotonic()
+        attempt = 0
+        while True:
+            async with condition:
+                await condition.wait_for(limiter.tryAcquire)
+            started = time.monotonic()
+            retryAfter = None
+            status = failure = None
+            try:
+                async with session.get(url, params=params) as response:
+                    firstByte = time.monotonic()
+                    body = await response.read() if response.status == 200 else None
+                    retryAfter = RetryPolicy.parseRetryAfter(response.headers.get("Retry-After"))
+                finished = time.monotonic()
+                # ArcGIS Server reports throttling as an error document with a 200 status as well
+                status = bodyStatus(response.status, body) if body is not None else response.status
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                failure = e
+            finally:
+                # The slot is returned whatever the outcome, a cancelled or otherwise failed request would leak it and
+                # stall the host
+                if status is not None:
+                    await self._release(limiter, condition, finished - started, status in congestionStatuses,
+                                        requestEndpoint(url, params))
+                else:
+                    await self._release(limiter, condition, congested=isinstance(failure, asyncio.TimeoutError))
+
+            if failure is not None:
+                if attempt >= self.retryPolicy.maxRetries:
+                    if event is not None:
+                        event.retries = attempt
+                        event.waitTime = started - requested
+                    raise failure
+            elif not self.retryPolicy.isRetryable(status) or attempt >= self.retryPolicy.maxRetries:
+                parsed = time.monotonic()
+                data = loads(body) if body is not None else None
+                if event is not None:
+                    event.retries = attempt
+                    event.status = response.status
+                    event.bytes = len(body) if body is not None else None
+                    event.waitTime = started - requested
+                    event.firstByteTime = firstByte - started
+                    event.downloadTime = finished - firstByte
+                    event.parseTime = time.monotonic() - parsed
+                    self.instrumentation.responseParsed(event)
+                response.raise_for_status()
+                return body, data
+
+            self.retries += 1
+            await asyncio.sleep(self.retryPolicy.delay(attempt, retryAfter))
+            attempt += 1
+
+    @staticmethod
+    async def _release(limiter, condition, latency=None, congested=False, endpoint=None):
+        # The slot is returned before waiting for the condition, so it is not lost if the task is cancelled again
+        limiter.release(latency, congested, endpoint)
+        async with condition:
+            condition.notify_all()
+
+    async def close(self):
+        """
+        Closes the session and all pooled connections.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, excType, excValue, traceback):
+        await self.close()
+
+
+_defaultClient = None
+
+
+def getDefaultClient():
+    """
+    Returns the client used by the coroutines of this module, creating it on first use.
+
+    Returns:
+        AsyncArcGISClient: The default client.
+    """
+    global _defaultClient
+    if _defaultClient is None:
+        _defaultClient = AsyncArcGISClient()
+    return _defaultClient
+
+
+def setDefaultClient(client):
+    """
+    Replaces the client used by the coroutines of this module.
+
+    Args:
+        client (AsyncArcGISClient): The client to use from now on. Passing None resets to a fresh default client on
+        next use.
+
+    Returns:
+        AsyncArcGISClient: The previously configured default client, or None if none was created yet.
+    """
+    global _defaultClient
+    previousClient = _defaultClient
+    _defaultClient = client
+    return previousClient
+
+
+async def _fetchJson(url, params=None):
+    """
+    Sends a request through the default client, raising the same errors as the functions in core.py.
+
+    Args:
+        url (str): The URL to request.
+        params (dict, optional): The query string parameters.
+
+    Returns:
+        dict: The decoded JSON response.
+
+    Raises:
+        ArcGISHttpError: If the server responds with an HTTP error status.
+        ArcGISServerError: If the server responds with an ArcGIS error document.
+        ArcGISError: If the server can not be reached.
+    """
+    try:
+        data = await getDefaultClient().getJson(url, params)
+    except aiohttp.ClientResponseError as e:
+        printError(f"httpError{e.status}", url)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        printError("requestException", f"{e} ({url})")
+    return _checkServerError(data, url)
+
+
+async def restGetVersion(baseUrl):
+    """
+    Fetches the version information from an ArcGIS REST API endpoint.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+
+    Returns:
+        str: The version information.
+    """
+    validatedUrl = checkBaseUrl(baseUrl)
+
+    try:
+        data = await getDefaultClient().getJson(_versionUrl(validatedUrl))
+        return data.get("currentVersion", "Version information not available.")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return f"An error occurred: {e}"
+
+
+# Synonym function for restGetVersion
+async def getVersion(baseUrl):
+    """
+    synonym for restGetVersion
+    """
+    return await restGetVersion(baseUrl)
+
+
+async def restGetFolderContent(baseUrl, folderName):
+    """
+    Fetches the content of a specified folder from an ArcGIS REST API endpoint.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        folderName (str): The name of the folder to fetch the content from.
+
+    Returns:
+        dict: A dictionary containing the folder's services and subfolders.
+    """
+    validatedUrl = checkBaseUrl(baseUrl)
+
+    try:
+        return await getDefaultClient().getJson(_servicesUrl(validatedUrl, folderName))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"An error occurred while fetching folder content for {folderName}: {e}")
+        return None
+
+
+# Synonym function for restGetFolderContent
+async def getFolderContent(baseUrl, folderName):
+    """
+    synonym for restGetFolderContent
+    """
+    return await restGetFolderContent(baseUrl, folderName)
+
+
+async def restGetTreeStructure(baseUrl, maxConcurrency=8):
+    """
+    Creates a tree structure of the ArcGIS REST API folders and services.
+
+    Sibling folders are fetched concurrently, one level of the tree at a time, with at most `maxConcurrency` requests
+    in flight. The resulting tree has the same shape and ordering as `core.restGetTreeStructure`.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        maxConcurrency (int): The maximum number of folders fetched at the same time.
+
+    Returns:
+        dict: A JSON-like dictionary representing the tree structure of the folders and services.
+
+    Raises:
+        ArcGISHttpError: If the root folder can not be fetched.
+        ArcGISError: If the server can not be reached.
+    """
+    validatedUrl = checkBaseUrl(baseUrl)
+
+    rootData = await _fetchJson(_servicesUrl(validatedUrl))
+
+    semaphore = asyncio.Semaphore(max(1, maxConcurrency))
+
+    async def fetchFolder(subfolderPath):
+        async with semaphore:
+            return await restGetFolderContent(validatedUrl, subfolderPath)
+
+    treeStructure = _newTreeNode(rootData, "/")
+    currentLevel = [(treeStructure, rootData, "/")]
+    while currentLevel:
+        tasks = [(node, subfolderPath) for node, folderData, currentPath in currentLevel
+                 for subfolderPath in _subfolderPaths(folderData, currentPath)]
+        # gather returns the results in task order, which keeps the ordering of the sequential crawl
+        results = await asyncio.gather(*(fetchFolder(subfolderPath) for node, subfolderPath in tasks))
+
+        nextLevel = []
+        for (parentNode, subfolderPath), subfolderData in zip(tasks, results):
+            if subfolderData:
+                childNode = _newTreeNode(subfolderData, f"/{subfolderPath}")
+                parentNode["folders"].append(childNode)
+                nextLevel.append((childNode, subfolderData, f"/{subfolderPath}"))
+        currentLevel = nextLevel
+
+    return treeStructure
+
+
+# Synonym function for restGetTreeStructure
+async def getTreeStructure(baseUrl, maxConcurrency=8):
+    """
+    synonym for restGetTreeStructure
+    """
+    return await restGetTreeStructure(baseUrl, maxConcurrency)
+
+
+async def _getCatalog(validatedUrl):
+    """
+    Returns the catalog of a server from the shared catalog cache, crawling the server on a cache miss. Concurrent
+    misses for the same server share a single crawl.
+    """
+    catalog = catalogCache.get(validatedUrl)
+    if catalog is None:
+        catalog, _ = await _catalogLoads.do(validatedUrl, lambda: _loadCatalog(validatedUrl))
+    return catalog
+
+
+async def _loadCatalog(validatedUrl):
+    catalog = _buildCatalog(await restGetTreeStructure(validatedUrl))
+    catalogCache.set(validatedUrl, catalog)
+    return catalog
+
+
+# The crawls of catalogs in flight, shared by the coroutines missing the same catalog
+_catalogLoads = AsyncSingleFlight()
+
+
+async def restGetFolders(baseUrl):
+    """
+    Fetches the list of folders from an ArcGIS REST API endpoint, using the shared catalog cache.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+
+    Returns:
+        list: A list of folder names, or a message indicating the folders are not available.
+    """
+    folders = list((await _getCatalog(checkBaseUrl(baseUrl)))["folders"])
+    return folders if folders else "Folders information not available."
+
+
+# Synonym function for restGetFolders
+async def getFolders(baseUrl):
+    """
+    synonym for restGetFolders
+    """
+    return await restGetFolders(baseUrl)
+
+
+async def restGetServices(baseUrl):
+    """
+    Fetches the list of services from an ArcGIS REST API endpoint, using the shared catalog cache.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+
+    Returns:
+        list: A list of service dictionaries, or a message indicating the services are not available.
+    """
+    services = list((await _getCatalog(checkBaseUrl(baseUrl)))["services"])
+    return services if services else "Services information not available."
+
+
+# Synonym function for restGetServices
+async def getServices(baseUrl):
+    """
+    synonym for restGetServices
+    """
+    return await restGetServices(baseUrl)
+
+
+async def restGetServiceTypes(baseUrl):
+    """
+    Fetches a distinct list of all service types from an ArcGIS REST API endpoint.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+
+    Returns:
+        list: A distinct list of service types.
+    """
+    services = (await _getCatalog(checkBaseUrl(baseUrl)))["services"]
+    return list({service.get("type") for service in services if isinstance(service, dict) and "type" in service})
+
+
+# Synonym function for restGetServiceTypes
+async def getServiceTypes(baseUrl):
+    """
+    synonym for restGetServiceTypes
+    """
+    return await restGetServiceTypes(baseUrl)
+
+
+async def restGetServiceByType(baseUrl, serviceType):
+    """
+    Fetches a list of service names from an ArcGIS REST API endpoint filtered by the specified service type.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceType (str): The type of services to filter by (e.g., "MapServer", "FeatureServer").
+
+    Returns:
+        list: A list of service names that match the specified service type.
+    """
+    if not isinstance(serviceType, str):
+        raise TypeError("The serviceType argument must be a string.")
+    services = (await _getCatalog(checkBaseUrl(baseUrl)))["services"]
+    return [service.get("name") for service in services
+            if isinstance(service, dict) and service.get("type") == serviceType]
+
+
+# Synonym function for restGetServiceByType
+async def getServiceByType(baseUrl, serviceType):
+    """
+    synonym for restGetServiceByType
+    """
+    return await restGetServiceByType(baseUrl, serviceType)
+
+
+async def restGetServiceType(baseUrl, serviceName):
+    """
+    Fetches the service type for a specific service name from an ArcGIS REST API, using the shared catalog cache.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service to retrieve the type for.
+
+    Returns:
+        str: The service type (e.g., MapServer, FeatureServer) if found, or a message indicating the service was not
+        found.
+    """
+    serviceTypes = (await _getCatalog(checkBaseUrl(baseUrl)))["serviceTypes"]
+    if serviceName in serviceTypes:
+        return serviceTypes[serviceName] or "Service type not available."
+    return f"Service '{serviceName}' not found."
+
+
+# Synonym function for restGetServiceType
+async def getServiceType(baseUrl, serviceName):
+    """
+    synonym for restGetServiceType
+    """
+    return await restGetServiceType(baseUrl, serviceName)
+
+
+async def restGetMapServerDetails(baseUrl, serviceName):
+    """
+    Fetches the details of a MapServer service from an ArcGIS REST API endpoint.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the MapServer service.
+
+    Returns:
+        dict: The JSON details of the MapServer service.
+    """
+    validatedUrl = checkBaseUrl(baseUrl)
+    return await _fetchJson(_mapServerUrl(validatedUrl, serviceName), {"f": "json"})
+
+
+# Synonym function for restGetMapServerDetails
+async def getMapServerDetails(baseUrl, serviceName):
+    """
+    synonym for restGetMapServerDetails
+    """
+    return await restGetMapServerDetails(baseUrl, serviceName)
+
+
+async def restGetMapLayers(baseUrl, serviceName):
+    """
+    Fetches the list of layers from a MapServer service and returns their names, IDs, and types.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the MapServer service.
+
+    Returns:
+        list: A list of dictionaries containing layer names, IDs, and types.
+    """
+    return _extractLayers(await restGetMapServerDetails(baseUrl, serviceName) or {})
+
+
+# Synonym function for restGetMapLayers
+async def getMapLayers(baseUrl, serviceName):
+    """
+    synonym for restGetMapLayers
+    """
+    return await restGetMapLayers(baseUrl, serviceName)
+
+
+async def restGetMapLayerDetails(baseUrl, serviceName, layerId):
+    """
+    Fetches details of a specific layer from a MapServer in an ArcGIS REST API.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service to query.
+        layerId (int): The ID of the layer to query.
+
+    Returns:
+        dict: JSON response from the MapServer containing the layer details.
+
+    Raises:
+        ArcGISHttpError: If the server responds with an HTTP error status.
+        ArcGISServerError: If the server responds with an ArcGIS error document.
+        ArcGISError: If the server can not be reached.
+    """
+    validatedUrl = checkBaseUrl(baseUrl)
+    return await _fetchJson(_layerUrl(validatedUrl, serviceName, layerId), {"f": "json"})
+
+
+# Synonym function for restGetMapLayerDetails
+async def getMapLayerDetails(baseUrl, serviceName, layerId):
+    """
+    synonym for restGetMapLayerDetails
+    """
+    return await restGetMapLayerDetails(baseUrl, serviceName, layerId)
+
+
+async def _getLayerDetails(validatedUrl, serviceName, layerId):
+    """
+    Returns the details of a layer from the shared layer details cache, fetching them on a cache miss.
+    """
+    key = (validatedUrl, serviceName, str(layerId))
+    layerDetails = layerDetailsCache.get(key)
+    if layerDetails is None:
+        layerDetails = await restGetMapLayerDetails(validatedUrl, serviceName, layerId) or {}
+        layerDetailsCache.set(key, layerDetails)
+    return layerDetails
+
+
+async def iterMapLayerData(baseUrl, serviceName, layerId, where="1=1", outFields="*", pages=False, maxConcurrency=1,
+                           pageSize=None, queryOptions=None):
+    """
+    Iterates asynchronously over the data of a specified map layer, page by page.
+
+    This is the asyncio counterpart of `core.iterMapLayerData`: the page size and paging method are taken from the
+    (cached) layer details, and with `maxConcurrency` greater than 1 object ID ranges are fetched concurrently while
+    pages are still yielded in ascending object ID order.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer to query.
+        where (str): The SQL where clause to filter the data.
+        outFields (str or list): The fields to return, as a comma separated string, "*" or a list of names.
+        pages (bool): Yield one list of features per page instead of individual features.
+        maxConcurrency (int): The number of pages fetched at the same time.
+        pageSize (int, optional): The number of features requested per page. Defaults to the `maxRecordCount` of the
+        layer.
+        queryOptions (QueryOptions, optional): The geometry options of the query.
+
+    Yields:
+        dict or list: Features, or lists of features when `pages` is True.
+    """
+    validatedUrl = checkBaseUrl(baseUrl)
+    queryUrl = _queryUrl(validatedUrl, serviceName, layerId)
+    outFields = outFieldsParameter(outFields)
+
+    serviceType = await restGetServiceType(baseUrl, serviceName)
+    if serviceType != "MapServer":
+        raise ValueError(f"The service {serviceName} is of type {serviceType}, not a MapServer.")
+
+    layerDetails = await _getLayerDetails(validatedUrl, serviceName, layerId)
+    validateOutFields(outFields, layerDetails)
+    if queryOptions is not None:
+        queryOptions.validate(layerDetails)
+    queryInfo = _layerQueryInfo(layerDetails)
+    params = _buildQueryParams(where, outFields, _resolvePageSize(pageSize, queryInfo), queryOptions=queryOptions)
+
+    if maxConcurrency > 1 or not queryInfo['supportsPagination']:
+        pageIterator = _iterObjectIdPages(queryUrl, params, max(1, maxConcurrency))
+    else:
+        pageIterator = _iterQueryPages(queryUrl, params)
+
+    async for page in pageIterator:
+        if pages:
+            yield page
+        else:
+            for feature in page:
+                yield feature
+
+
+async def _iterQueryPages(queryUrl, params):
+    """
+    Runs the offset based pagination loop of a layer query, yielding the features of every page.
+    """
+    params = dict(params)
+    while True:
+        data = dequantizeResponse(await _fetchJson(queryUrl, params))
+        pageFeatures = data.get('features', [])
+        if pageFeatures:
+            yield pageFeatures
+        if not pageFeatures or not _hasMoreRecords(data, len(pageFeatures), params['resultRecordCount']):
+            return
+        params['resultOffset'] += len(pageFeatures)
+
+
+async def _iterObjectIdPages(queryUrl, params, maxConcurrency):
+    """
+    Extracts a layer by object ID ranges of one page each, fetching up to `maxConcurrency` ranges at the same time.
+    """
+    idsData = await _fetchJson(queryUrl, {'where': params['where'], 'returnIdsOnly': 'true', 'f': 'json'})
+    if not idsData:
+        return
+    objectIdField = idsData.get('objectIdFieldName', 'OBJECTID')
+    objectIds = sorted(idsData.get('objectIds') or [])
+    rangeParams = {key: value for key, value in params.items() if key not in ('resultOffset', 'resultRecordCount')}
+
+    async def fetchRange(rangeIds):
+        rangeWhere = _objectIdRangeWhere(params['where'], objectIdField, rangeIds)
+        data = dequantizeResponse(await _fetchJson(queryUrl, dict(rangeParams, where=rangeWhere)))
+        if data.get('exceededTransferLimit') and len(rangeIds) > 1:
+            middle = len(rangeIds) // 2
+            return await fetchRange(rangeIds[:middle]) + await fetchRange(rangeIds[middle:])
+        return data.get('features', [])
+
+    pending = deque()
+    try:
+        for rangeIds in _objectIdRanges(objectIds, params['resultRecordCount']):
+            pending.append(asyncio.ensure_future(fetchRange(rangeIds)))
+            if len(pending) >= maxConcurrency:
+                pageFeatures = await pending.popleft()
+                if pageFeatures:
+                    yield pageFeatures
+        while pending:
+            pageFeatures = await pending.popleft()
+            if pageFeatures:
+                yield pageFeatures
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def restGetMapLayerData(baseUrl, serviceName, layerId, where, outFields, maxConcurrency=1, pageSize=None,
+                              queryOptions=None):
+    """
+    Fetches data from a specified map layer in an ArcGIS REST API service based on specific query parameters.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer to query.
+        where (str): The SQL where clause to filter the data.
+        outFields (str or list): The fields to return.
+        maxConcurrency (int): The number of pages fetched at the same time.
+        pageSize (int, optional): The number of features requested per page.
+        queryOptions (QueryOptions, optional): The geometry options of the query.
+
+    Returns:
+        list: A list of features (dictionaries) containing the data from the layer.
+    """
+    return [feature async for feature in iterMapLayerData(baseUrl, serviceName, layerId, where, outFields,
+                                                          maxConcurrency=maxConcurrency, pageSize=pageSize,
+                                                          queryOptions=queryOptions)]
+
+
+# Synonym function for restGetMapLayerData
+async def getMapLayerData(baseUrl, serviceName, layerId, where, outFields, maxConcurrency=1, pageSize=None,
+                          queryOptions=None):
+    """
+    synonym for restGetMapLayerData
+    """
+    return await restGetMapLayerData(baseUrl, serviceName, layerId, where, outFields, maxConcurrency, pageSize,
+                                     queryOptions)
+
+
+async def restGetMapLayerAllData(baseUrl, serviceName, layerId, maxConcurrency=1, pageSize=None, queryOptions=None):
+    """
+    Fetches all data from a specified map layer in an ArcGIS REST API service.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer to query.
+        maxConcurrency (int): The number of pages fetched at the same time.
+        pageSize (int, optional): The number of features requested per page.
+        queryOptions (QueryOptions, optional): The geometry options of the query.
+
+    Returns:
+        list: A list of features (dictionaries) containing all the data from the layer.
+    """
+    return await restGetMapLayerData(baseUrl, serviceName, layerId, "1=1", "*", maxConcurrency, pageSize,
+                                     queryOptions)
+
+
+# Synonym function for restGetMapLayerAllData
+async def getMapLayerAllData(baseUrl, serviceName, layerId, maxConcurrency=1, pageSize=None, queryOptions=None):
+    """
+    synonym for restGetMapLayerAllData
+    """
+    return await restGetMapLayerAllData(baseUrl, serviceName, layerId, maxConcurrency, pageSize, queryOptions)
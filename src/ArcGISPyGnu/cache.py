@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CatalogCache:
+    """
+    A thread-safe in-process cache with a time-to-live and least-recently-used eviction.
+
+    The cache is used to keep the result of a full folder crawl (the catalog of a server) in memory, so functions such
+    as `restGetServiceType` and `restGetServiceByType` do not have to re-crawl the whole server on every call.
+
+    Args:
+        maxEntries (int): The maximum number of entries kept before the least recently used entry is evicted.
+        ttl (float): The number of seconds an entry stays valid. Use None to keep entries until they are evicted or
+        invalidated.
+    """
+
+    def __init__(self, maxEntries=32, ttl=300):
+        self.maxEntries = maxEntries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._loadLocks = {}
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for a key.
+
+        Args:
+            key (hashable): The key to look up.
+            default (any): The value returned when the key is not cached or has expired.
+
+        Returns:
+            any: The cached value, or `default`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._isExpired(entry):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """
+        Stores a value in the cache, evicting the least recently used entries when the cache is full.
+
+        Args:
+            key (hashable): The key to store the value under.
+            value (any): The value to store.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxEntries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def getOrLoad(self, key, loader):
+        """
+        Returns the cached value for a key, calling `loader` to create and store it on a miss.
+
+        Concurrent misses for the same key are serialized, so the loader runs only once.
+
+        Args:
+            key (hashable): The key to look up.
+            loader (callable): A function without arguments returning the value to cache.
+
+        Returns:
+            any: The cached or freshly loaded value.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        with self._lock:
+            lock = self._loadLocks.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                # Another thread may have loaded the value while this one was waiting
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and not self._isExpired(entry):
+                        self._entries.move_to_end(key)
+                        return entry[1]
+                value = loader()
+                self.set(key, value)
+        finally:
+            # The load lock is released also when the loader raises, so failed keys do not accumulate
+            with self._lock:
+                if self._loadLocks.get(key) is lock:
+                    del self._loadLocks[key]
+        return value
+
+    def invalidate(self, key=None):
+        """
+        Removes a single entry, or every entry when no key is given.
+
+        Args:
+            key (hashable, optional): The key to remove.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def invalidateWhere(self, predicate):
+        """
+        Removes every entry whose key matches a predicate.
+
+        Args:
+            predicate (callable): A function receiving a key and returning True when the entry must be removed.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def stats(self):
+        """
+        Returns the hit and miss counters of the cache.
+
+        Returns:
+            dict: The number of hits, misses, evictions and currently cached entries.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _isExpired(self, entry):
+        return self.ttl is not None and time.monotonic() - entry[0] > self.ttl
+
+
+# Shared catalog cache used by the rest* functions in core.py
+catalogCache = CatalogCache()
+
+# Shared cache of layer details (maxRecordCount, capabilities, fields, ...), keyed by base URL, service and layer ID
+layerDetailsCache = CatalogCache(maxEntries=1024)
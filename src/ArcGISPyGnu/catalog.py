@@ -0,0 +1,365 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import catalogCache, layerDetailsCache
+from .core import _getCatalog, restGetMapServerDetails, restGetMapServerLayerDetails, restGetVersion
+from .exceptions import ArcGISError
+from .utils import checkBaseUrl
+
+_schema = """
+CREATE TABLE IF NOT EXISTS servers (
+    baseUrl TEXT PRIMARY KEY,
+    version REAL,
+    refreshed REAL
+);
+CREATE TABLE IF NOT EXISTS services (
+    id INTEGER PRIMARY KEY,
+    baseUrl TEXT NOT NULL REFERENCES servers(baseUrl) ON DELETE CASCADE,
+    name TEXT NOT NULL COLLATE NOCASE,
+    type TEXT,
+    description TEXT,
+    error TEXT,
+    refreshed REAL,
+    UNIQUE (baseUrl, name, type)
+);
+CREATE INDEX IF NOT EXISTS servicesType ON services (type);
+CREATE INDEX IF NOT EXISTS servicesName ON services (name);
+CREATE TABLE IF NOT EXISTS layers (
+    id INTEGER PRIMARY KEY,
+    serviceId INTEGER NOT NULL REFERENCES services(id) ON DELETE CASCADE,
+    layerId INTEGER NOT NULL,
+    name TEXT COLLATE NOCASE,
+    type TEXT,
+    geometryType TEXT,
+    description TEXT,
+    UNIQUE (serviceId, layerId)
+);
+CREATE INDEX IF NOT EXISTS layersGeometryType ON layers (geometryType);
+CREATE INDEX IF NOT EXISTS layersName ON layers (name);
+CREATE TABLE IF NOT EXISTS fields (
+    layerRowId INTEGER NOT NULL REFERENCES layers(id) ON DELETE CASCADE,
+    name TEXT NOT NULL COLLATE NOCASE,
+    type TEXT,
+    alias TEXT
+);
+CREATE INDEX IF NOT EXISTS fieldsName ON fields (name, type);
+CREATE INDEX IF NOT EXISTS fieldsType ON fields (type);
+CREATE INDEX IF NOT EXISTS fieldsLayer ON fields (layerRowId);
+"""
+
+# The full-text index of the names and descriptions. Its rowid is derived from the rowid of the service or layer, so
+# entries are replaced and removed without scanning the index.
+_searchSchema = "CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5(name, description)"
+
+_layerColumns = """
+    SELECT s.baseUrl, s.name AS serviceName, s.type AS serviceType, l.layerId, l.name, l.type, l.geometryType,
+           l.description
+    FROM layers l JOIN services s ON s.id = l.serviceId
+"""
+
+
+class CatalogStore:
+    """
+    A local, indexed catalog of the services, layers and fields of one or more ArcGIS servers, stored in SQLite.
+
+    The store is filled by `refresh`, from the catalog crawl and the layer details of every MapServer, which are
+    fetched with a single request per service where the server supports it (see restGetMapServerLayerDetails). After
+    that, finding services by type, layers by geometry type or by field, and full-text searches over the names and
+    descriptions are answered from indexes, without any request to the servers, in microseconds instead of the
+    seconds a crawl takes. A store backed by a file keeps the catalog between sessions, and later refreshes only
+    fetch the layers of services that are new or older than `maxAge`.
+
+    Full-text search uses the FTS5 extension of SQLite when it is available, and a substring match otherwise.
+
+    Args:
+        path (str): The path of the SQLite database. Defaults to an in-memory database.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode = WAL")
+        with self._connection:
+            self._connection.executescript(_schema)
+            try:
+                self._connection.execute(_searchSchema)
+                self.fullTextSearch = True
+            except sqlite3.OperationalError:  # SQLite was built without FTS5
+                self.fullTextSearch = False
+
+    def refresh(self, baseUrl, maxAge=None, maxWorkers=8):
+        """
+        Crawls a server and updates its services, layers and fields in the store.
+
+        The folders and services are crawled again on every refresh, and services that no longer exist are removed.
+        The layers of a service that is already in the store are only fetched again when its metadata is older than
+        `maxAge`, so repeated refreshes of a large server only fetch what changed. A service whose details can not be
+        fetched is stored with its `error` and without layers, and is retried on the next refresh.
+
+        Args:
+            baseUrl (str): The base URL of the ArcGIS REST API.
+            maxAge (float, optional): The age in seconds after which the layers of a known service are fetched again.
+            Defaults to never, 0 fetches all layers again.
+            maxWorkers (int): The number of services whose layers are fetched in parallel.
+
+        Returns:
+            dict: The number of `services` on the server, of services `updated`, `removed` and of services with an
+            `error`.
+
+        Raises:
+            ArcGISError: If the server can not be crawled.
+        """
+        validatedUrl = checkBaseUrl(baseUrl)
+        # A refresh must see the current services, not a catalog crawled earlier
+        catalogCache.invalidate(validatedUrl)
+        services = [service for service in _getCatalog(validatedUrl)["services"]
+                    if isinstance(service, dict) and "name" in service]
+        version = restGetVersion(validatedUrl)
+        now = time.time()
+
+        with self._lock:
+            known = {(row["name"], row["type"]): row for row in self._connection.execute(
+                "SELECT id, name, type, error, refreshed FROM services WHERE baseUrl = ?", (validatedUrl,))}
+        current = {(service["name"], service.get("type")) for service in services}
+        stale = [service for service in services if _isStale(known.get((service["name"], service.get("type"))),
+                                                              maxAge, now)]
+
+        def fetchService(service):
+            if service.get("type") != "MapServer":
+                return service, {}, [], None
+            try:
+                layerDetailsCache.invalidateWhere(lambda key: key[0] == validatedUrl and key[1] == service["name"])
+                details = restGetMapServerDetails(validatedUrl, service["name"]) or {}
+                layerDetails = restGetMapServerLayerDetails(validatedUrl, service["name"], maxWorkers=4)
+                return service, details, layerDetails["layers"] + layerDetails["tables"], None
+            except ArcGISError as e:
+                return service, {}, [], str(e)
+
+        with ThreadPoolExecutor(max_workers=max(1, maxWorkers)) as executor:
+            results = list(executor.map(fetchService, stale))
+
+        removed = [row for key, row in known.items() if key not in current]
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO servers (baseUrl, version, refreshed) VALUES (?, ?, ?) ON CONFLICT (baseUrl) "
+                "DO UPDATE SET version = excluded.version, refreshed = excluded.refreshed",
+                (validatedUrl, version if isinstance(version, (int, float)) else None, now))
+            for row in removed:
+                self._deleteService(row["id"])
+            for service, details, layers, error in results:
+                self._storeService(validatedUrl, service, details, layers, error, now)
+
+        return {"services": len(services), "updated": len(results), "removed": len(removed),
+                "errors": sum(1 for result in results if result[3] is not None)}
+
+    def _storeService(self, validatedUrl, service, details, layers, error, refreshed):
+        """
+        Replaces a service and its layers and fields, within the transaction of refresh.
+        """
+        connection = self._connection
+        row = connection.execute("SELECT id FROM services WHERE baseUrl = ? AND name = ? AND type IS ?",
+                                 (validatedUrl, service["name"], service.get("type"))).fetchone()
+        if row is not None:
+            self._deleteService(row["id"])
+        description = details.get("serviceDescription") or details.get("description") or None
+        serviceRowId = connection.execute(
+            "INSERT INTO services (baseUrl, name, type, description, error, refreshed) VALUES (?, ?, ?, ?, ?, ?)",
+            (validatedUrl, service["name"], service.get("type"), description, error, refreshed)).lastrowid
+        self._index(2 * serviceRowId, service["name"], description)
+
+        for layer in layers:
+            if "id" not in layer:
+                continue
+            layerRowId = connection.execute(
+                "INSERT INTO layers (serviceId, layerId, name, type, geometryType, description) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (serviceRowId, layer["id"], layer.get("name"), layer.get("type"), layer.get("geometryType"),
+                 layer.get("description") or None)).lastrowid
+            connection.executemany("INSERT INTO fields (layerRowId, name, type, alias) VALUES (?, ?, ?, ?)",
+                                   [(layerRowId, field["name"], field.get("type"), field.get("alias"))
+                                    for field in layer.get("fields") or [] if field.get("name")])
+            self._index(2 * layerRowId + 1, layer.get("name"), layer.get("description"))
+
+    def _deleteService(self, serviceRowId):
+        """
+        Removes a service, its layers and fields and their full-text entries.
+        """
+        if self.fullTextSearch:
+            self._connection.execute("DELETE FROM search WHERE rowid IN (SELECT 2 * id + 1 FROM layers "
+                                     "WHERE serviceId = ?) OR rowid = ?", (serviceRowId, 2 * serviceRowId))
+        self._connection.execute("DELETE FROM services WHERE id = ?", (serviceRowId,))
+
+    def _index(self, rowId, name, description):
+        if self.fullTextSearch:
+            self._connection.execute("INSERT INTO search (rowid, name, description) VALUES (?, ?, ?)",
+                                     (rowId, name or "", description or ""))
+
+    def removeServer(self, baseUrl):
+        """
+        Removes a server and all its services, layers and fields from the store.
+
+        Args:
+            baseUrl (str): The base URL of the ArcGIS REST API.
+        """
+        validatedUrl = checkBaseUrl(baseUrl)
+        with self._lock, self._connection:
+            for row in self._connection.execute("SELECT id FROM services WHERE baseUrl = ?", (validatedUrl,)).fetchall():
+                self._deleteService(row["id"])
+            self._connection.execute("DELETE FROM servers WHERE baseUrl = ?", (validatedUrl,))
+
+    def servers(self):
+        """
+        Returns the servers in the store.
+
+        Returns:
+            list: The `baseUrl`, `version` and time of the last refresh (`refreshed`, epoch seconds) of every server.
+        """
+        return self._query("SELECT baseUrl, version, refreshed FROM servers ORDER BY baseUrl", ())
+
+    def findServices(self, serviceType=None, name=None, baseUrl=None):
+        """
+        Finds services by type and name.
+
+        Args:
+            serviceType (str, optional): The type of the services, e.g. "MapServer".
+            name (str, optional): The name of the services, including their folder, case insensitive.
+            baseUrl (str, optional): The base URL of the server.
+
+        Returns:
+            list: The `baseUrl`, `name`, `type`, `description` and `error` of the matching services.
+        """
+        conditions, params = _conditions(("type", serviceType), ("name", name), ("baseUrl", baseUrl))
+        return self._query(f"SELECT baseUrl, name, type, description, error FROM services {conditions} "
+                           "ORDER BY baseUrl, name", params)
+
+    def findLayers(self, geometryType=None, name=None, serviceName=None, baseUrl=None):
+        """
+        Finds layers and tables by geometry type and name.
+
+        Args:
+            geometryType (str, optional): The geometry type of the layers, e.g. "esriGeometryPolygon".
+            name (str, optional): The name of the layers, case insensitive.
+            serviceName (str, optional): The name of the service of the layers.
+            baseUrl (str, optional): The base URL of the server.
+
+        Returns:
+            list: The `baseUrl`, `serviceName`, `serviceType`, `layerId`, `name`, `type`, `geometryType` and
+            `description` of the matching layers.
+        """
+        conditions, params = _conditions(("l.geometryType", geometryType), ("l.name", name),
+                                         ("s.name", serviceName), ("s.baseUrl", baseUrl))
+        return self._query(f"{_layerColumns} {conditions} ORDER BY s.baseUrl, s.name, l.layerId", params)
+
+    def findLayersByField(self, fieldName, fieldType=None, baseUrl=None):
+        """
+        Finds the layers and tables having a field.
+
+        Args:
+            fieldName (str): The name of the field, case insensitive.
+            fieldType (str, optional): The type of the field, e.g. "esriFieldTypeString".
+            baseUrl (str, optional): The base URL of the server.
+
+        Returns:
+            list: The layers as returned by findLayers, with the `fieldName` and `fieldType` of the matching field.
+        """
+        conditions, params = _conditions(("f.name", fieldName), ("f.type", fieldType), ("s.baseUrl", baseUrl))
+        return self._query(
+            f"{_layerColumns.replace('SELECT', 'SELECT f.name AS fieldName, f.type AS fieldType,', 1)} "
+            f"JOIN fields f ON f.layerRowId = l.id {conditions} ORDER BY s.baseUrl, s.name, l.layerId", params)
+
+    def search(self, text, limit=50):
+        """
+        Searches the names and descriptions of the services and layers.
+
+        Every word of the text has to occur in the name or description, words match the start of words, so "parc"
+        finds "Parcels". Results are ordered by relevance when FTS5 is available.
+
+        Args:
+            text (str): The words to search for.
+            limit (int): The maximum number of results.
+
+        Returns:
+            list: The matching services and layers, as returned by findServices and findLayers, with a `kind` of
+            "service" or "layer".
+        """
+        words = text.split()
+        if not words:
+            return []
+        with self._lock:
+            if self.fullTextSearch:
+                expression = " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+                rowIds = [row[0] for row in self._connection.execute(
+                    "SELECT rowid FROM search WHERE search MATCH ? ORDER BY rank LIMIT ?", (expression, limit))]
+            else:
+                conditions = " AND ".join("(name LIKE ? OR description LIKE ?)" for _ in words)
+                params = [pattern for word in words for pattern in (f"%{word}%", f"%{word}%")]
+                rowIds = [2 * row[0] for row in self._connection.execute(
+                    f"SELECT id FROM services WHERE {conditions}", params)]
+                rowIds += [2 * row[0] + 1 for row in self._connection.execute(
+                    f"SELECT id FROM layers WHERE {conditions}", params)]
+                rowIds = rowIds[:limit]
+
+            layerIds = [rowId // 2 for rowId in rowIds if rowId % 2]
+            serviceIds = [rowId // 2 for rowId in rowIds if not rowId % 2]
+            rows = {2 * row["id"] + 1: dict(row, kind="layer") for row in self._connection.execute(
+                f"{_layerColumns.replace('SELECT', 'SELECT l.id,', 1)} WHERE l.id IN "
+                f"({','.join('?' * len(layerIds))})", layerIds)}
+            rows.update((2 * row["id"], dict(row, kind="service")) for row in self._connection.execute(
+                "SELECT id, baseUrl, name, type, description, error FROM services WHERE id IN "
+                f"({','.join('?' * len(serviceIds))})", serviceIds))
+            results = []
+            for rowId in rowIds:
+                if rowId in rows:
+                    row = rows[rowId]
+                    del row["id"]
+                    results.append(row)
+            return results
+
+    def _query(self, sql, params):
+        with self._lock:
+            return [dict(row) for row in self._connection.execute(sql, params)]
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+def _isStale(row, maxAge, now):
+    """
+    Determines whether the layers of a service have to be fetched: when the service is new, failed on the last
+    refresh, or its metadata is older than `maxAge`.
+    """
+    if row is None or row["error"] is not None:
+        return True
+    return maxAge is not None and now - row["refreshed"] >= maxAge
+
+
+def _conditions(*filters):
+    """
+    Builds the where clause of the filters that have a value.
+
+    Args:
+        *filters (tuple): The column and value of every filter.
+
+    Returns:
+        tuple: The where clause and its parameters.
+    """
+    filters = [(column, checkBaseUrl(value) if column.endswith("baseUrl") else value)
+               for column, value in filters if value is not None]
+    if not filters:
+        return "", ()
+    return "WHERE " + " AND ".join(f"{column} = ?" for column, _ in filters), tuple(value for _, value in filters)
@@ -0,0 +1,200 @@
+import copy
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .httpcache import HttpCache
+from .instrumentation import RequestEvent, defaultInstrumentation
+from .scheduler import RequestScheduler
+from .singleflight import SingleFlight
+from .utils import checkBaseUrl
+
+
+class ArcGISClient:
+    """
+    A reusable HTTP client for ArcGIS REST API endpoints.
+
+    The client owns a single `requests.Session` whose connection pool is shared by every request made through it,
+    so repeated calls against the same server reuse open TCP/TLS connections (keep-alive) instead of performing a
+    new handshake for every request. All `rest*` functions in `core.py` issue their requests through the default
+    client returned by `getDefaultClient`.
+
+    Requests are sent through a `RequestScheduler`, which retries transient failures (connection errors, timeouts and
+    429, 502, 503 and 504 responses) with jittered exponential backoff and adapts the number of concurrent requests
+    per host to the signals of the server.
+
+    Identical requests made at the same moment by different threads, such as the same service details requested by
+    every worker of a web backend, are coalesced: one request is sent and its response is shared by all of them. The
+    `singleFlight` of the client counts the calls that were deduplicated.
+
+    Args:
+        baseUrl (str, optional): The base URL of the ArcGIS REST API this client is primarily used for.
+        poolConnections (int): The number of host connection pools to keep.
+        poolMaxSize (int): The maximum number of connections kept open per host.
+        timeout (float or tuple): The timeout in seconds (or a (connect, read) tuple) applied to every request.
+        headers (dict, optional): Additional headers sent with every request.
+        maxConnectionsPerHost (int, optional): The maximum number of requests in flight to a single host at any
+        moment, regardless of how many threads use the client. The scheduler lowers the actual limit when the host
+        shows signs of overload. Defaults to `poolMaxSize`.
+        cache (HttpCache, optional): A persistent response cache consulted before requests are sent to the server.
+        retryPolicy (RetryPolicy, optional): The retry policy of the default scheduler.
+        scheduler (RequestScheduler, optional): The scheduler of the requests. Defaults to a `RequestScheduler` with
+        `retryPolicy` and `maxConnectionsPerHost`.
+        instrumentation (Instrumentation, optional): The instrumentation receiving the events of the requests.
+        Defaults to the shared `defaultInstrumentation`.
+        coalesce (bool): Share one request between the threads requesting the same URL and parameters concurrently.
+    """
+
+    def __init__(self, baseUrl=None, poolConnections=10, poolMaxSize=10, timeout=60, headers=None,
+                 maxConnectionsPerHost=None, cache=None, retryPolicy=None, scheduler=None, instrumentation=None,
+                 coalesce=True):
+        self.baseUrl = checkBaseUrl(baseUrl) if baseUrl else None
+        self.timeout = timeout
+        self.cache = cache
+        self.maxConnectionsPerHost = maxConnectionsPerHost or poolMaxSize
+        self.scheduler = scheduler or RequestScheduler(retryPolicy, maxConcurrency=self.maxConnectionsPerHost)
+        self.instrumentation = instrumentation or defaultInstrumentation
+        self.singleFlight = SingleFlight() if coalesce else None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=poolConnections, pool_maxsize=poolMaxSize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+        if headers:
+            self.session.headers.update(headers)
+
+    def get(self, url, params=None, **kwargs):
+        """
+        Performs a GET request using the pooled session.
+
+        When the client has a response cache, the request is served from the cache when possible. When the
+        instrumentation of the client has listeners, the request is measured and the response gets a `requestEvent`
+        attribute holding its `RequestEvent`.
+
+        Args:
+            url (str): The URL to request.
+            params (dict, optional): The query string parameters.
+            **kwargs: Additional keyword arguments passed on to `requests.Session.get`.
+
+        Returns:
+            requests.Response: The response of the request.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        # Streamed responses can not be shared, and other arguments may change the request
+        if self.singleFlight is None or set(kwargs) != {"timeout"}:
+            return self._instrumentedGet(url, params, kwargs)
+
+        response, shared = self.singleFlight.do(HttpCache.makeKey(url, params),
+                                                lambda: self._instrumentedGet(url, params, kwargs))
+        if not shared:
+            return response
+        # Every thread gets its own response object, sharing the body that was downloaded once. The listeners already
+        # received the events of the request, so the events of the other threads are only kept on their responses.
+        sharedResponse = copy.copy(response)
+        sharedResponse.fromCache = getattr(response, "fromCache", False)
+        event = getattr(response, "requestEvent", None)
+        sharedResponse.requestEvent = event.coalescedCopy() if isinstance(event, RequestEvent) else None
+        return sharedResponse
+
+    def _instrumentedGet(self, url, params, kwargs):
+        """
+        Performs a GET request, measuring it when the instrumentation of the client has listeners.
+        """
+        instrumentation = self.instrumentation
+        if not instrumentation.listeners:
+            return self._get(url, params, None, kwargs)
+
+        event = RequestEvent(url, params, instrumentation)
+        instrumentation.requestStarted(event)
+        started = time.perf_counter()
+        try:
+            response = self._get(url, params, event, kwargs)
+        except Exception as e:
+            event.error = e
+            event.totalTime = time.perf_counter() - started
+            instrumentation.requestFinished(event)
+            raise
+
+        event.totalTime = time.perf_counter() - started
+        event.status = response.status_code
+        event.fromCache = getattr(response, "fromCache", False)
+        if not kwargs.get("stream"):
+            event.bytes = len(response.content)
+        response.requestEvent = event
+        instrumentation.requestFinished(event)
+        return response
+
+    def _get(self, url, params, event, kwargs):
+        """
+        Serves a GET request from the response cache or sends it to the server.
+        """
+        if self.cache is None or kwargs.get("stream"):
+            return self._send(url, params, event, **kwargs)
+
+        def sendRequest(validators):
+            headers = dict(kwargs.pop("headers", None) or {}, **validators)
+            return self._send(url, params, event, headers=headers, **kwargs)
+
+        return self.cache.send(url, params, sendRequest)
+
+    def _send(self, url, params=None, event=None, **kwargs):
+        """
+        Sends a GET request to the server through the scheduler, within the adaptive concurrency limit of its host.
+        """
+        return self.scheduler.send(url, lambda: self.session.get(url, params=params, **kwargs),
+                                   inspectBody=not kwargs.get("stream"), event=event, params=params)
+
+    def close(self):
+        """
+        Closes the session and all pooled connections.
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+_defaultClient = None
+_defaultClientLock = threading.Lock()
+
+
+def getDefaultClient():
+    """
+    Returns the client used by the `rest*` functions, creating it on first use.
+
+    Returns:
+        ArcGISClient: The default client.
+    """
+    global _defaultClient
+    if _defaultClient is None:
+        with _defaultClientLock:
+            if _defaultClient is None:
+                _defaultClient = ArcGISClient()
+    return _defaultClient
+
+
+def setDefaultClient(client):
+    """
+    Replaces the client used by the `rest*` functions, for example to change pool sizes or timeouts.
+
+    Args:
+        client (ArcGISClient): The client to use from now on. Passing None resets to a fresh default client on
+        next use.
+
+    Returns:
+        ArcGISClient: The previously configured default client, or None if none was created yet.
+    """
+    global _defaultClient
+    with _defaultClientLock:
+        previousClient = _defaultClient
+        _defaultClient = client
+    return previousClient
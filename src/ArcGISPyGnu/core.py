@@ -1,4 +1,16 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from .cache import catalogCache, layerDetailsCache
+from .client import getDefaultClient
+from .decoding import FeatureStreamParser, decodeResponse
+from .exceptions import ArcGISError, ArcGISHttpError, ArcGISServerError, PbfDecodeError
+from .featuretable import FeatureTable
+from .instrumentation import RequestEvent
+from .pbf import decodeQueryResponse
+from .query import QueryOptions, dequantizeResponse, outFieldsParameter, validateOutFields
 from .utils import checkBaseUrl, printError
 
 
@@ -16,9 +28,9 @@ def restGetVersion(baseUrl):
     validatedUrl = checkBaseUrl(baseUrl)
 
     try:
-        response = requests.get(f"{validatedUrl}?f=json")
+        response = getDefaultClient().get(_versionUrl(validatedUrl))
         response.raise_for_status()
-        data = response.json()
+        data = _decodeJson(response)
         return data.get("currentVersion", "Version information not available.")
     except requests.RequestException as e:
         return f"An error occurred: {e}"
@@ -36,6 +48,9 @@ def restGetFolders(baseUrl):
     """
     Fetches the list of folders from an ArcGIS REST API endpoint.
 
+    The folder list is taken from the shared catalog cache, so only the first call for a base URL (or the first call
+    after the cache entry expired or was invalidated) crawls the server.
+
     Args:
         baseUrl (str): The base URL of the ArcGIS REST API.
 
@@ -47,25 +62,7 @@ def restGetFolders(baseUrl):
     validatedUrl = checkBaseUrl(baseUrl)
 
     try:
-        # Get the complete tree structure
-        treeStructure = restGetTreeStructure(validatedUrl)
-
-        # Extract folder names from the tree structure
-        folders = []
-
-        def extractFolders(folderData):
-            """
-            Recursively extract folder names from the tree structure.
-
-            Args:
-                folderData (dict): The JSON data of the current folder.
-
-            """
-            for folder in folderData.get("folders", []):
-                folders.append(folder["name"])
-                extractFolders(folder)  # Recurse into subfolders
-
-        extractFolders(treeStructure)
+        folders = list(_getCatalog(validatedUrl)["folders"])
 
         return folders if folders else "Folders information not available."
     except Exception as e:
@@ -84,6 +81,9 @@ def restGetServices(baseUrl):
     """
     Fetches the list of services from an ArcGIS REST API endpoint.
 
+    The service list is taken from the shared catalog cache, so only the first call for a base URL (or the first call
+    after the cache entry expired or was invalidated) crawls the server.
+
     Args:
         baseUrl (str): The base URL of the ArcGIS REST API.
 
@@ -95,24 +95,7 @@ def restGetServices(baseUrl):
     validatedUrl = checkBaseUrl(baseUrl)
 
     try:
-        # Get the complete tree structure
-        treeStructure = restGetTreeStructure(validatedUrl)
-
-        # Extract services from the tree structure
-        services = []
-
-        def extractServices(folderData):
-            """
-            Recursively extract service information from the tree structure.
-
-            Args:
-                folderData (dict): The JSON data of the current folder.
-            """
-            services.extend(folderData.get("services", []))
-            for folder in folderData.get("folders", []):
-                extractServices(folder)  # Recurse into subfolders
-
-        extractServices(treeStructure)
+        services = list(_getCatalog(validatedUrl)["services"])
 
         return services if services else "Services information not available."
     except Exception as e:
@@ -171,14 +154,16 @@ def restGetServiceByType(baseUrl: str, serviceType: str) -> list:
     Returns:
         list: A list of service names that match the specified service type. If no services match, an empty list is
         returned.
+
+    Raises:
+        TypeError: If serviceType is not a string.
     """
     # Validate the base URL using the checkBaseUrl function from utils
     validatedUrl = checkBaseUrl(baseUrl)
 
     # Check if serviceType is a string
     if not isinstance(serviceType, str):
-        print("Error: The serviceType argument must be a string.")
-        sys.exit(1)
+        raise TypeError("The serviceType argument must be a string.")
 
     services = restGetServices(validatedUrl)
 
@@ -201,6 +186,115 @@ def getServiceByType(baseUrl, serviceType):
     return restGetServiceByType(baseUrl, serviceType)
 
 
+def invalidateCatalogCache(baseUrl=None):
+    """
+    Removes the cached catalog and layer details of a server, or of all servers when no base URL is given.
+
+    The next call to a catalog function (restGetFolders, restGetServices, restGetServiceType, ...) will crawl the
+    server again.
+
+    Args:
+        baseUrl (str, optional): The base URL of the ArcGIS REST API.
+    """
+    if baseUrl:
+        validatedUrl = checkBaseUrl(baseUrl)
+        catalogCache.invalidate(validatedUrl)
+        layerDetailsCache.invalidateWhere(lambda key: key[0] == validatedUrl)
+    else:
+        catalogCache.invalidate()
+        layerDetailsCache.invalidate()
+
+
+def getCatalogCacheStats():
+    """
+    Returns the hit and miss counters of the shared catalog cache.
+
+    Returns:
+        dict: The number of hits, misses, evictions and currently cached entries.
+    """
+    return catalogCache.stats()
+
+
+def _getCatalog(validatedUrl):
+    """
+    Returns the catalog of a server from the shared catalog cache, crawling the server on a cache miss.
+
+    Args:
+        validatedUrl (str): The validated base URL of the ArcGIS REST API.
+
+    Returns:
+        dict: The tree structure, the flattened folder and service lists and a service name to type index.
+    """
+
+    return catalogCache.getOrLoad(validatedUrl, lambda: _buildCatalog(restGetTreeStructure(validatedUrl)))
+
+
+def _buildCatalog(treeStructure):
+    """
+    Builds the catalog of a server from its tree structure.
+
+    Args:
+        treeStructure (dict): The tree structure as returned by restGetTreeStructure.
+
+    Returns:
+        dict: The tree structure, the flattened folder and service lists and a service name to type index.
+    """
+    services = _extractServices(treeStructure)
+    serviceTypes = {}
+    for service in services:
+        if isinstance(service, dict) and "name" in service:
+            # Keep the first type when a service is published with several types, like a sequential scan would
+            serviceTypes.setdefault(service["name"], service.get("type"))
+    return {
+        "tree": treeStructure,
+        "folders": _extractFolders(treeStructure),
+        "services": services,
+        "serviceTypes": serviceTypes,
+    }
+
+
+def _extractFolders(treeStructure):
+    """
+    Extracts the folder names from a tree structure, in depth-first order.
+
+    Args:
+        treeStructure (dict): The tree structure as returned by restGetTreeStructure.
+
+    Returns:
+        list: The folder names.
+    """
+    folders = []
+
+    def extractFolders(folderData):
+        for folder in folderData.get("folders", []):
+            folders.append(folder["name"])
+            extractFolders(folder)  # Recurse into subfolders
+
+    extractFolders(treeStructure)
+    return folders
+
+
+def _extractServices(treeStructure):
+    """
+    Extracts the services from a tree structure, in depth-first order.
+
+    Args:
+        treeStructure (dict): The tree structure as returned by restGetTreeStructure.
+
+    Returns:
+        list: The service dictionaries.
+    """
+    services = []
+
+    def extractServices(folderData):
+        services.extend(folderData.get("services", []))
+        for folder in folderData.get("folders", []):
+            extractServices(folder)  # Recurse into subfolders
+
+    extractServices(treeStructure)
+    return services
+
+
 def restGetFolderContent(baseUrl, folderName):
     """
     Fetches the content of a specified folder from an ArcGIS REST API endpoint.
@@ -216,12 +310,9 @@ def restGetFolderContent(baseUrl, folderName):
         # Validate the base URL
         validatedUrl = checkBaseUrl(baseUrl)
 
-        # Ensure the folderName does not start with a slash
-        cleanedFolderName = folderName.lstrip('/')
-        folderUrl = f"{validatedUrl}/services/{cleanedFolderName}?f=json"
-        response = requests.get(folderUrl)
+        response = getDefaultClient().get(_servicesUrl(validatedUrl, folderName))
         response.raise_for_status()
-        return response.json()
+        return _decodeJson(response)
     except requests.RequestException as e:
         print(f"An error occurred while fetching folder content for {folderName}: {e}")
         return None
@@ -234,62 +325,106 @@ def getFolderContent(baseUrl, folderName):
     return restGetFolderContent(baseUrl, folderName)
 
 
-def restGetTreeStructure(baseUrl):
+def restGetTreeStructure(baseUrl, maxWorkers=8):
     """
     Creates a tree structure of the ArcGIS REST API folders and services.
 
+    Sibling folders are fetched concurrently, one level of the tree at a time. The resulting tree has exactly the
+    same shape and ordering as a sequential depth-first crawl. The number of requests sent to a single host at the
+    same time is additionally capped by the `maxConnectionsPerHost` setting of the default `ArcGISClient`.
+
     Args:
         baseUrl (str): The base URL of the ArcGIS REST API.
+        maxWorkers (int): The maximum number of folders fetched in parallel. Use 1 for a sequential crawl.
 
     Returns:
         dict: A JSON-like dictionary representing the tree structure of the folders and services.
+
+    Raises:
+        ArcGISHttpError: If the root folder can not be fetched.
+        ArcGISError: If the server can not be reached.
     """
     validatedUrl = checkBaseUrl(baseUrl)
 
     try:
-        response = requests.get(f"{validatedUrl}/services?f=json")
+        response = getDefaultClient().get(_servicesUrl(validatedUrl))
         response.raise_for_status()
-        rootData = response.json()
+        rootData = _decodeJson(response)
+    except requests.exceptions.HTTPError as e:
+        printError(f"httpError{e.response.status_code}", _servicesUrl(validatedUrl))
     except requests.RequestException as e:
-        print(f"An error occurred while fetching the base URL content: {e}")
-        sys.exit(1)
+        printError("requestException", f"An error occurred while fetching the base URL content: {e}")
 
-    def buildTree(folderData, currentPath):
+    def fetchFolder(task):
         """
-        Recursively builds the tree structure for each folder.
+        Fetches the content of a single subfolder.
 
         Args:
-            folderData (dict): The JSON data of the current folder.
-            currentPath (str): The current folder path in the API.
+            task (tuple): The parent node and the path of the subfolder.
 
         Returns:
-            dict: A dictionary representing the folder and its contents.
+            dict: The JSON data of the subfolder, or None if it could not be fetched.
         """
-        result = {
-            "name": currentPath,
-            "services": folderData.get("services", []),
-            "folders": []
-        }
-
-        for subfolder in folderData.get("folders", []):
-            subfolderPath = f"{currentPath}/{subfolder}".lstrip('/')
-            subfolderData = restGetFolderContent(validatedUrl, subfolderPath)
-            if subfolderData:
-                result["folders"].append(buildTree(subfolderData, f"/{subfolderPath}"))
-
-        return result
+        return restGetFolderContent(validatedUrl, task[1])
 
     # Start building the tree structure from the root data with the root name as "/"
-    treeStructure = buildTree(rootData, "/")
+    treeStructure = _newTreeNode(rootData, "/")
+    currentLevel = [(treeStructure, rootData, "/")]
+
+    with ThreadPoolExecutor(max_workers=max(1, maxWorkers)) as executor:
+        while currentLevel:
+            tasks = [(node, subfolderPath) for node, folderData, currentPath in currentLevel
+                     for subfolderPath in _subfolderPaths(folderData, currentPath)]
+
+            # executor.map returns the results in task order, which keeps the ordering of the sequential crawl
+            nextLevel = []
+            for (parentNode, subfolderPath), subfolderData in zip(tasks, executor.map(fetchFolder, tasks)):
+                if subfolderData:
+                    childNode = _newTreeNode(subfolderData, f"/{subfolderPath}")
+                    parentNode["folders"].append(childNode)
+                    nextLevel.append((childNode, subfolderData, f"/{subfolderPath}"))
+            currentLevel = nextLevel
 
     return treeStructure
 
 
-def getTreeStructure(baseUrl):
+def _newTreeNode(folderData, currentPath):
+    """
+    Builds the tree node for a folder, without its subfolders.
+
+    Args:
+        folderData (dict): The JSON data of the current folder.
+        currentPath (str): The current folder path in the API.
+
+    Returns:
+        dict: A dictionary representing the folder and its contents.
+    """
+    return {
+        "name": currentPath,
+        "services": folderData.get("services", []),
+        "folders": []
+    }
+
+
+def _subfolderPaths(folderData, currentPath):
+    """
+    Returns the paths of the subfolders of a folder, relative to the services root.
+
+    Args:
+        folderData (dict): The JSON data of the current folder.
+        currentPath (str): The current folder path in the API.
+
+    Returns:
+        list: The subfolder paths, without a leading slash.
+    """
+    return [f"{currentPath}/{subfolder}".lstrip('/') for subfolder in folderData.get("folders", [])]
+
+
+def getTreeStructure(baseUrl, maxWorkers=8):
     """
     synonym for restGetTreeStructure
     """
-    return restGetTreeStructure(baseUrl)
+    return restGetTreeStructure(baseUrl, maxWorkers)
 
 
 def restGetMapServerDetails(baseUrl, serviceName):
@@ -301,28 +436,29 @@ def restGetMapServerDetails(baseUrl, serviceName):
         serviceName (str): The name of the MapServer service.
 
     Returns:
-        dict: The JSON details of the MapServer service, or an error message if the request fails.
+        dict: The JSON details of the MapServer service.
+
+    Raises:
+        ArcGISHttpError: If the server responds with an HTTP error status.
+        ArcGISServerError: If the server responds with an ArcGIS error document.
+        ArcGISError: If the server can not be reached.
     """
     try:
         # Validate the base URL
         validatedUrl = checkBaseUrl(baseUrl)
 
         # Construct the service URL
-        serviceUrl = f"{validatedUrl}/services/{serviceName}/MapServer?f=pjson"
+        serviceUrl = f"{_mapServerUrl(validatedUrl, serviceName)}?f=json"
 
         # Make the request to fetch the service details
-        response = requests.get(serviceUrl)
+        response = getDefaultClient().get(serviceUrl)
 
-        # Handle specific HTTP errors
-        if response.status_code in {400, 401, 402, 403, 404, 405, 406, 407, 408, 409, 410, 411, 412, 413, 414, 415, 416,
-                                    417, 500, 501, 502, 503, 504, 505}:
+        # Handle HTTP errors, including throttled requests whose retries were used up
+        if response.status_code >= 400:
             printError(f"httpError{response.status_code}", serviceUrl)
-        else:
-            # Raise an HTTPError for other status codes
-            response.raise_for_status()
 
         # If no errors, return the JSON response
-        return response.json()
+        return _checkServerError(_decodeJson(response), serviceUrl)
 
     except requests.RequestException as e:
         error_message = f"An error occurred while fetching the MapServer details for {serviceName}: {e}"
@@ -351,20 +487,29 @@ def restGetMapLayers(baseUrl, serviceName):
         # Get the MapServer details using restGetMapServerDetails
         mapServerDetails = restGetMapServerDetails(baseUrl, serviceName)
 
-        # Extract layers information
-        layers = mapServerDetails.get('layers', [])
-
-        # Prepare the list of layers with their IDs, names, and types
-        layerList = [{'id': layer['id'], 'name': layer['name'], 'type': layer.get('type', 'Unknown')} for layer in
-                     layers]
-
-        return layerList
+        return _extractLayers(mapServerDetails)
 
+    except ArcGISError:
+        raise
     except Exception as e:
         # Handle any exception that might occur
         printError("customError", f"Failed to fetch map layers: {e}")
 
 
+def _extractLayers(mapServerDetails):
+    """
+    Extracts the IDs, names, and types of the layers from the details of a MapServer.
+
+    Args:
+        mapServerDetails (dict): The JSON details of the MapServer service.
+
+    Returns:
+        list: A list of dictionaries containing layer names, IDs, and types.
+    """
+    layers = mapServerDetails.get('layers', [])
+    return [{'id': layer['id'], 'name': layer['name'], 'type': layer.get('type', 'Unknown')} for layer in layers]
+
+
 def getMapLayers(baseUrl, serviceName):
     """
     synonym for restGetMapServerDetails
@@ -372,67 +517,504 @@ def getMapLayers(baseUrl, serviceName):
     return restGetMapLayers(baseUrl, serviceName)
 
 
-def restGetMapLayerData(baseUrl, serviceName, layerId, where, outFields):
+def iterMapLayerData(baseUrl, serviceName, layerId, where="1=1", outFields="*", pages=False, maxWorkers=1,
+                     pageSize=None, queryFormat=None, stream=False, queryOptions=None):
     """
-    Fetches data from a specified map layer in an ArcGIS REST API service based on specific query parameters.
+    Iterates over the data of a specified map layer in an ArcGIS REST API service, page by page.
+
+    Features are yielded as soon as the page containing them has been received, and no page is kept after it has
+    been consumed, so memory use stays constant regardless of the size of the layer. The service is verified to be
+    a MapServer when this function is called, before iteration starts.
+
+    The page size and paging method are taken from the layer details (`maxRecordCount` and
+    `advancedQueryCapabilities.supportsPagination`), which are cached after the first query of a layer. Layers that
+    support pagination are read with `resultOffset` paging; layers that do not are read by object ID ranges, so
+    their data is not silently truncated.
+
+    With `maxWorkers` greater than 1 the layer is extracted in parallel: the object IDs matching the where clause are
+    fetched first (`returnIdsOnly=true`), split into object ID ranges of one page each, and the ranges are fetched
+    concurrently. Pages are still yielded in a deterministic order, sorted by object ID, and only a small window of
+    pages is held in memory at a time.
+
+    Layers listing PBF in their `supportedQueryFormats` are queried with `f=pbf`, a protocol buffer format with
+    quantized geometries that is several times smaller than JSON. The responses are decoded into the same features
+    as JSON responses. When a PBF query fails, it is repeated with `f=json`.
+
+    With `stream` the JSON pages of a sequential extraction are parsed while they are downloading: features are
+    yielded as soon as they have been received, and neither the body nor the features of a whole page are held in
+    memory. The lists yielded with `pages` are then parts of pages.
+
+    The fields and `queryOptions` are checked against the layer details before the first page is requested.
 
     Args:
         baseUrl (str): The base URL of the ArcGIS REST API.
         serviceName (str): The name of the service containing the layer.
         layerId (int): The ID of the layer to query.
         where (str): The SQL where clause to filter the data.
-        outFields (str): The fields to return.
+        outFields (str or list): The fields to return, as a comma separated string, "*" or a list of names.
+        pages (bool): Yield one list of features per page instead of individual features.
+        maxWorkers (int): The number of pages fetched in parallel. Defaults to 1, a sequential extraction.
+        pageSize (int, optional): The number of features requested per page. Defaults to the `maxRecordCount` of the
+        layer, and is capped at that value.
+        queryFormat (str, optional): The format of the queries, "pbf" or "json". Defaults to "pbf" when the layer
+        supports it and "json" otherwise.
+        stream (bool): Parse the pages while they are downloading. Requires JSON queries, and applies to sequential
+        extractions of layers that support pagination.
+        queryOptions (QueryOptions, optional): The geometry options of the query. Defaults to geometries in WGS 84
+        (`outSR=4326`) at full precision.
 
     Returns:
-        list: A list of features (dictionaries) containing the data from the layer.
+        generator: A generator yielding features (dictionaries), or lists of features when `pages` is True.
+
+    Raises:
+        ValueError: If the layer does not have the requested fields or does not support the query options.
+    """
+    return _iterMapLayerData(baseUrl, serviceName, layerId, where, outFields, pages, maxWorkers, pageSize, queryFormat,
+                             stream, queryOptions)
+
+
+def _iterMapLayerData(baseUrl, serviceName, layerId, where="1=1", outFields="*", pages=False, maxWorkers=1,
+                      pageSize=None, queryFormat=None, stream=False, queryOptions=None, checkServiceType=True):
+    """
+    Implements iterMapLayerData. Callers that already know the service is a MapServer pass `checkServiceType=False`
+    to skip the service type lookup, which crawls the whole server when its catalog is not cached.
     """
     # Validate the base URL
     validatedUrl = checkBaseUrl(baseUrl)
-    queryUrl = f"{validatedUrl}/services/{serviceName}/MapServer/{layerId}/query"
+    queryUrl = _queryUrl(validatedUrl, serviceName, layerId)
+    if queryFormat not in (None, 'pbf', 'json'):
+        raise ValueError(f"The queryFormat must be 'pbf' or 'json', got {queryFormat!r}.")
+    if stream and queryFormat == 'pbf':
+        raise ValueError("Only JSON queries can be streamed.")
+    if stream and queryOptions is not None and queryOptions.quantizationParameters is not None:
+        raise ValueError("Queries with quantizationParameters can not be streamed.")
+    outFields = outFieldsParameter(outFields)
 
     # Verify if the service is of type MapServer
-    serviceType = restGetServiceType(baseUrl, serviceName)
-    if serviceType != "MapServer":
-        raise ValueError(f"The service {serviceName} is of type {serviceType}, not a MapServer.")
+    if checkServiceType:
+        serviceType = restGetServiceType(baseUrl, serviceName)
+        if serviceType != "MapServer":
+            raise ValueError(f"The service {serviceName} is of type {serviceType}, not a MapServer.")
+
+    layerDetails = _getLayerDetails(validatedUrl, serviceName, layerId)
+    validateOutFields(outFields, layerDetails)
+    if queryOptions is not None:
+        queryOptions.validate(layerDetails)
+    queryInfo = _layerQueryInfo(layerDetails)
+    if queryFormat is None:
+        queryFormat = 'pbf' if queryInfo['supportsPbf'] and not stream else 'json'
+    params = _buildQueryParams(where, outFields, _resolvePageSize(pageSize, queryInfo), queryFormat, queryOptions)
+
+    if maxWorkers > 1 or not queryInfo['supportsPagination']:
+        pageIterator = _iterObjectIdPages(queryUrl, params, max(1, maxWorkers))
+    elif stream:
+        pageIterator = _iterStreamedQueryPages(queryUrl, params)
+    else:
+        pageIterator = _iterQueryPages(queryUrl, params)
+    if pages:
+        return pageIterator
+    return (feature for page in pageIterator for feature in page)
+
+
+def _getLayerDetails(validatedUrl, serviceName, layerId):
+    """
+    Returns the details of a layer from the shared layer details cache, fetching them on a cache miss.
+
+    Args:
+        validatedUrl (str): The validated base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer.
+
+    Returns:
+        dict: The layer details as returned by restGetMapLayerDetails.
+    """
+    key = (validatedUrl, serviceName, str(layerId))
+    return layerDetailsCache.getOrLoad(key, lambda: restGetMapLayerDetails(validatedUrl, serviceName, layerId) or {})
+
+
+def _getLayerQueryInfo(validatedUrl, serviceName, layerId):
+    """
+    Derives the query limits of a layer from its (cached) details.
+
+    Args:
+        validatedUrl (str): The validated base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer.
+
+    Returns:
+        dict: The query limits and formats of the layer, see _layerQueryInfo.
+    """
+    return _layerQueryInfo(_getLayerDetails(validatedUrl, serviceName, layerId))
 
-    # Parameters for the query
+
+def _layerQueryInfo(layerDetails):
+    """
+    Derives the query limits of a layer from its details.
+
+    Args:
+        layerDetails (dict): The layer details as returned by restGetMapLayerDetails.
+
+    Returns:
+        dict: The `maxRecordCount` of the layer, whether it supports `resultOffset` pagination and whether it supports
+        the PBF query format.
+    """
+    advancedQueryCapabilities = layerDetails.get('advancedQueryCapabilities') or {}
+    queryFormats = (layerDetails.get('supportedQueryFormats') or '').lower().replace(' ', '').split(',')
+    return {
+        # Servers that do not advertise a limit use 1000, the ArcGIS Server default
+        'maxRecordCount': layerDetails.get('maxRecordCount') or 1000,
+        'supportsPagination': bool(advancedQueryCapabilities.get('supportsPagination', False)),
+        'supportsPbf': 'pbf' in queryFormats,
+    }
+
+
+def _resolvePageSize(pageSize, queryInfo):
+    """
+    Determines the page size of a query: the requested size, capped at the `maxRecordCount` of the layer.
+
+    Args:
+        pageSize (int): The page size requested by the caller, or None for the largest page size of the layer.
+        queryInfo (dict): The query limits of the layer, see _layerQueryInfo.
+
+    Returns:
+        int: The page size.
+    """
+    if pageSize is None:
+        return queryInfo['maxRecordCount']
+    if pageSize < 1:
+        raise ValueError(f"The pageSize must be a positive number, got {pageSize}.")
+    return min(pageSize, queryInfo['maxRecordCount'])
+
+
+def _buildQueryParams(where, outFields, pageSize, queryFormat='json', queryOptions=None):
+    """
+    Builds the parameters of a layer query.
+
+    Args:
+        where (str): The SQL where clause to filter the data.
+        outFields (str): The fields to return.
+        pageSize (int): The number of records requested per page.
+        queryFormat (str): The format of the response, "json" or "pbf".
+        queryOptions (QueryOptions, optional): The geometry options of the query.
+
+    Returns:
+        dict: The query parameters, starting at the first page.
+    """
     params = {
         'where': where,
         'outFields': outFields,
-        'f': 'json',
-        'returnGeometry': 'true',
-        'outSR': '4326',
-        'resultOffset': 0,
-        'resultRecordCount': 1000  # Adjust as needed based on the max record count
+        'f': queryFormat,
     }
+    params.update((queryOptions or QueryOptions()).toParams())
+    params['resultOffset'] = 0
+    params['resultRecordCount'] = pageSize
+    return params
+
+
+def _objectIdRanges(objectIds, pageSize):
+    """
+    Splits sorted object IDs into ranges of one page each.
+
+    Args:
+        objectIds (list): The sorted object IDs.
+        pageSize (int): The number of object IDs per range.
+
+    Returns:
+        list: The object ID lists of the ranges.
+    """
+    return [objectIds[start:start + pageSize] for start in range(0, len(objectIds), pageSize)]
+
+
+def _objectIdRangeWhere(where, objectIdField, rangeIds):
+    """
+    Restricts a where clause to the object ID range spanned by a list of sorted object IDs.
+
+    Args:
+        where (str): The SQL where clause of the query.
+        objectIdField (str): The name of the object ID field.
+        rangeIds (list): The sorted object IDs of the range.
+
+    Returns:
+        str: The where clause of the range.
+    """
+    return f"({where}) AND {objectIdField} >= {rangeIds[0]} AND {objectIdField} <= {rangeIds[-1]}"
+
 
-    features = []
+def _selectFields(fields, outFields):
+    """
+    Selects the definitions of the fields a query returns.
+
+    Args:
+        fields (list): The field definitions of the layer.
+        outFields (str): The fields of the query, as a comma separated string or "*" for all fields.
+
+    Returns:
+        list: The definitions of the requested fields, in layer order.
+    """
+    if outFields.strip() == "*":
+        return list(fields)
+    requestedFields = {name.strip().lower() for name in outFields.split(",")}
+    return [field for field in fields if field.get('name', '').lower() in requestedFields]
+
+
+def _getQueryJson(queryUrl, params):
+    """
+    Sends a single request to the query endpoint of a layer.
+
+    Responses of queries with `f=pbf` are decoded into the document of the equivalent `f=json` query. A PBF query
+    that the server rejects is repeated with `f=json`, for servers that advertise PBF support for layers that do not
+    support it.
+
+    Args:
+        queryUrl (str): The URL of the query endpoint of the layer.
+        params (dict): The query parameters.
+
+    Returns:
+        dict: The JSON response.
+
+    Raises:
+        ArcGISHttpError: If the server responds with an HTTP error status.
+        ArcGISServerError: If the server responds with an ArcGIS error document.
+        ArcGISError: If the server can not be reached.
+    """
+    if params.get('f') != 'pbf':
+        return _sendQuery(queryUrl, params)
+    try:
+        return _sendQuery(queryUrl, params)
+    except (ArcGISServerError, PbfDecodeError):
+        pass
+    except ArcGISHttpError as e:
+        if e.statusCode not in (400, 415, 500):
+            raise
+    return _sendQuery(queryUrl, dict(params, f='json'))
+
+
+def _sendQuery(queryUrl, params):
+    """
+    Sends a query request and decodes its response, see _getQueryJson.
+    """
+    try:
+        response = getDefaultClient().get(queryUrl, params=params)
+        response.raise_for_status()
+        data = _decodeJson(response, decodeQueryResponse if params.get('f') == 'pbf' else None)
+    except requests.exceptions.HTTPError as e:
+        printError(f"httpError{e.response.status_code}", queryUrl)
+    except requests.exceptions.RequestException as e:
+        printError("requestException", f"{e} ({queryUrl})")
+    return dequantizeResponse(_checkServerError(data, queryUrl))
+
+
+def _decodeJson(response, decode=None):
+    """
+    Decodes the JSON body of a response with the decoder of the decoding module, or its body in another format with
+    `decode`, timing the decoding when the request was instrumented.
+    """
+    event = getattr(response, "requestEvent", None)
+    if not isinstance(event, RequestEvent):
+        return decode(response.content) if decode else decodeResponse(response)
+    started = time.perf_counter()
+    data = decode(response.content) if decode else decodeResponse(response)
+    event.parseTime = time.perf_counter() - started
+    if not event.coalesced:
+        event.instrumentation.responseParsed(event)
+    return data
+
+
+def _checkServerError(data, url):
+    """
+    Raises the error reported by an ArcGIS JSON error document, which the server sends with a `200 OK` status.
+
+    Args:
+        data (dict): The decoded JSON response.
+        url (str): The URL of the request.
+
+    Returns:
+        dict: The response, when it is not an error document.
+
+    Raises:
+        ArcGISServerError: If the response is an error document.
+    """
+    if isinstance(data, dict) and isinstance(data.get('error'), dict):
+        error = data['error']
+        raise ArcGISServerError(error.get('message', 'Unknown error'), error.get('code'), error.get('details'), url)
+    return data
+
+
+def _hasMoreRecords(data, featureCount, requestedCount):
+    """
+    Determines whether a query response was truncated by the server.
+
+    Args:
+        data (dict): The JSON response of the query.
+        featureCount (int): The number of features of the response.
+        requestedCount (int): The number of records that was requested.
+
+    Returns:
+        bool: True if more records match the query.
+    """
+    if 'exceededTransferLimit' in data:
+        return bool(data['exceededTransferLimit'])
+    return featureCount >= requestedCount
+
+
+def _iterQueryPages(queryUrl, params):
+    """
+    Runs the offset based pagination loop of a layer query, yielding the features of every page.
+
+    Args:
+        queryUrl (str): The URL of the query endpoint of the layer.
+        params (dict): The query parameters, including `resultOffset` and `resultRecordCount`.
+
+    Yields:
+        list: The features of each non-empty page.
+    """
+    params = dict(params)
+    while True:
+        data = _getQueryJson(queryUrl, params)
+        pageFeatures = data.get('features', [])
+        if pageFeatures:
+            yield pageFeatures
+        if not pageFeatures or not _hasMoreRecords(data, len(pageFeatures), params['resultRecordCount']):
+            return
+        # Advance by the number of records received, the server may return fewer records than requested
+        params['resultOffset'] += len(pageFeatures)
+
+
+def _iterStreamedQueryPages(queryUrl, params):
+    """
+    Runs the offset based pagination loop of a layer query like _iterQueryPages, parsing every page while it is
+    downloading.
+
+    Args:
+        queryUrl (str): The URL of the query endpoint of the layer.
+        params (dict): The query parameters, including `resultOffset` and `resultRecordCount`.
+
+    Yields:
+        list: The features of each received part of a page.
+    """
+    params = dict(params)
     while True:
-        try:
-            response = requests.get(queryUrl, params=params)
-            response.raise_for_status()
-            data = response.json()
-            features.extend(data.get('features', []))
-            if len(data.get('features', [])) < params['resultRecordCount']:
-                break
-            params['resultOffset'] += params['resultRecordCount']
-        except requests.exceptions.HTTPError as e:
-            printError("httpError", e.response.status_code, queryUrl)
-            break
-        except requests.exceptions.RequestException as e:
-            printError("RequestException", str(e), queryUrl)
-            break
-
-    return features
-
-
-def getMapLayerData(baseUrl, serviceName, layerId, where, outFields):
+        parser = FeatureStreamParser()
+        yield from _streamQuery(queryUrl, params, parser)
+        data = _checkServerError(parser.close(), queryUrl)
+        if not parser.featureCount or not _hasMoreRecords(data, parser.featureCount, params['resultRecordCount']):
+            return
+        params['resultOffset'] += parser.featureCount
+
+
+def _streamQuery(queryUrl, params, parser, chunkSize=65536):
+    """
+    Sends a query request and feeds its body to a FeatureStreamParser as it arrives.
+
+    Streamed responses bypass the response cache, and error documents sent with a `200 OK` status are only detected
+    once the body has been parsed, so they are raised instead of retried.
+
+    Yields:
+        list: The features completed by every chunk of the body.
+    """
+    response = None
+    try:
+        response = getDefaultClient().get(queryUrl, params=params, stream=True)
+        response.raise_for_status()
+        for chunk in response.iter_content(chunkSize):
+            features = parser.feed(chunk)
+            if features:
+                yield features
+    except requests.exceptions.HTTPError as e:
+        printError(f"httpError{e.response.status_code}", queryUrl)
+    except requests.exceptions.RequestException as e:
+        printError("requestException", f"{e} ({queryUrl})")
+    finally:
+        if response is not None:
+            response.close()
+
+
+def _iterObjectIdPages(queryUrl, params, maxWorkers):
+    """
+    Extracts a layer by splitting its object IDs into ranges of one page each.
+
+    This works for layers that do not support `resultOffset` pagination, and allows the ranges to be fetched in
+    parallel.
+
+    Args:
+        queryUrl (str): The URL of the query endpoint of the layer.
+        params (dict): The query parameters, including `where` and `resultRecordCount`.
+        maxWorkers (int): The number of ranges fetched in parallel.
+
+    Yields:
+        list: The features of each non-empty object ID range, in ascending object ID order.
+    """
+    idsData = _getQueryJson(queryUrl, {'where': params['where'], 'returnIdsOnly': 'true', 'f': 'json'})
+    if not idsData:
+        return
+    objectIdField = idsData.get('objectIdFieldName', 'OBJECTID')
+    objectIds = sorted(idsData.get('objectIds') or [])
+    pageSize = params['resultRecordCount']
+    rangeParams = {key: value for key, value in params.items() if key not in ('resultOffset', 'resultRecordCount')}
+
+    def fetchRange(rangeIds):
+        rangeWhere = _objectIdRangeWhere(params['where'], objectIdField, rangeIds)
+        data = _getQueryJson(queryUrl, dict(rangeParams, where=rangeWhere))
+        pageFeatures = data.get('features', [])
+        if data.get('exceededTransferLimit') and len(rangeIds) > 1:
+            # The server returns fewer records per request than advertised, split the range and try again
+            middle = len(rangeIds) // 2
+            return fetchRange(rangeIds[:middle]) + fetchRange(rangeIds[middle:])
+        return pageFeatures
+
+    ranges = _objectIdRanges(objectIds, pageSize)
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=maxWorkers)
+    try:
+        for rangeIds in ranges:
+            pending.append(executor.submit(fetchRange, rangeIds))
+            # Keep a bounded window of ranges in flight so memory use does not grow with the layer size
+            if len(pending) >= maxWorkers * 2:
+                pageFeatures = pending.popleft().result()
+                if pageFeatures:
+                    yield pageFeatures
+        while pending:
+            pageFeatures = pending.popleft().result()
+            if pageFeatures:
+                yield pageFeatures
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def restGetMapLayerData(baseUrl, serviceName, layerId, where, outFields, maxWorkers=1, pageSize=None,
+                        queryOptions=None):
+    """
+    Fetches data from a specified map layer in an ArcGIS REST API service based on specific query parameters.
+
+    This collects all features yielded by `iterMapLayerData` into a single list.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer to query.
+        where (str): The SQL where clause to filter the data.
+        outFields (str or list): The fields to return, as a comma separated string, "*" or a list of names.
+        maxWorkers (int): The number of pages fetched in parallel. Defaults to 1, a sequential extraction.
+        pageSize (int, optional): The number of features requested per page. Defaults to the `maxRecordCount` of the
+        layer.
+        queryOptions (QueryOptions, optional): The geometry options of the query.
+
+    Returns:
+        list: A list of features (dictionaries) containing the data from the layer.
+    """
+    return list(iterMapLayerData(baseUrl, serviceName, layerId, where, outFields, maxWorkers=maxWorkers,
+                                 pageSize=pageSize, queryOptions=queryOptions))
+
+
+def getMapLayerData(baseUrl, serviceName, layerId, where, outFields, maxWorkers=1, pageSize=None, queryOptions=None):
     """
     synonym for restGetMapLayerData
     """
-    return restGetMapLayerData(baseUrl, serviceName, layerId, where, outFields)
+    return restGetMapLayerData(baseUrl, serviceName, layerId, where, outFields, maxWorkers, pageSize, queryOptions)
 
-def restGetMapLayerAllData(baseUrl, serviceName, layerId):
+def restGetMapLayerAllData(baseUrl, serviceName, layerId, maxWorkers=1, pageSize=None, queryOptions=None):
     """
     Fetches all data from a specified map layer in an ArcGIS REST API service.
 
@@ -440,23 +1022,108 @@ def restGetMapLayerAllData(baseUrl, serviceName, layerId):
         baseUrl (str): The base URL of the ArcGIS REST API.
         serviceName (str): The name of the service containing the layer.
         layerId (int): The ID of the layer to query.
+        maxWorkers (int): The number of pages fetched in parallel. Defaults to 1, a sequential extraction.
+        pageSize (int, optional): The number of features requested per page. Defaults to the `maxRecordCount` of the
+        layer.
+        queryOptions (QueryOptions, optional): The geometry options of the query.
 
     Returns:
         list: A list of features (dictionaries) containing all the data from the layer.
     """
-    return restGetMapLayerData(baseUrl, serviceName, layerId, where="1=1", outFields="*")
+    return restGetMapLayerData(baseUrl, serviceName, layerId, where="1=1", outFields="*", maxWorkers=maxWorkers,
+                               pageSize=pageSize, queryOptions=queryOptions)
 
 
-def getMapLayerAllData(baseUrl, serviceName, layerId):
+def getMapLayerAllData(baseUrl, serviceName, layerId, maxWorkers=1, pageSize=None, queryOptions=None):
     """
     synonym for getMapLayerAllData
     """
-    return restGetMapLayerAllData(baseUrl, serviceName, layerId)
+    return restGetMapLayerAllData(baseUrl, serviceName, layerId, maxWorkers, pageSize, queryOptions)
+
+def restGetMapLayerTable(baseUrl, serviceName, layerId, where="1=1", outFields="*", maxWorkers=1, pageSize=None,
+                         queryOptions=None):
+    """
+    Fetches data from a specified map layer into a columnar FeatureTable.
+
+    Every page is appended to the table as soon as it arrives, so the per-feature dictionaries of a page are released
+    before the next page is requested. Column types are taken from the `fields` of the layer details. Requires numpy.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer to query.
+        where (str): The SQL where clause to filter the data.
+        outFields (str or list): The fields to return, as a comma separated string, "*" for all fields or a list of
+        names.
+        maxWorkers (int): The number of pages fetched in parallel. Defaults to 1, a sequential extraction.
+        pageSize (int, optional): The number of features requested per page. Defaults to the `maxRecordCount` of the
+        layer.
+        queryOptions (QueryOptions, optional): The geometry options of the query. Without geometries
+        (`returnGeometry=False`) the table has no geometry buffers.
+
+    Returns:
+        FeatureTable: The columnar data of the layer.
+    """
+    validatedUrl = checkBaseUrl(baseUrl)
+    layerDetails = _getLayerDetails(validatedUrl, serviceName, layerId)
+
+    outFields = outFieldsParameter(outFields)
+    fields = _selectFields(layerDetails.get('fields') or [], outFields)
+    returnGeometry = queryOptions is None or queryOptions.returnGeometry
+    table = FeatureTable(fields, layerDetails.get('geometryType') if returnGeometry else None)
+    for page in iterMapLayerData(baseUrl, serviceName, layerId, where, outFields, pages=True, maxWorkers=maxWorkers,
+                                 pageSize=pageSize, queryOptions=queryOptions):
+        table.appendFeatures(page)
+    return table
+
+
+def getMapLayerTable(baseUrl, serviceName, layerId, where="1=1", outFields="*", maxWorkers=1, pageSize=None,
+                     queryOptions=None):
+    """
+    synonym for restGetMapLayerTable
+    """
+    return restGetMapLayerTable(baseUrl, serviceName, layerId, where, outFields, maxWorkers, pageSize, queryOptions)
+
+
+def restGetMapLayerObjectIds(baseUrl, serviceName, layerId, where="1=1"):
+    """
+    Fetches the object IDs of the features of a map layer that match a where clause.
+
+    The IDs are requested with `returnIdsOnly=true`, which is not limited by the `maxRecordCount` of the layer.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer to query.
+        where (str): The SQL where clause to filter the data.
+
+    Returns:
+        dict: The `objectIdFieldName` of the layer and the sorted list of matching `objectIds`.
+    """
+    validatedUrl = checkBaseUrl(baseUrl)
+    queryUrl = _queryUrl(validatedUrl, serviceName, layerId)
+
+    data = _getQueryJson(queryUrl, {'where': where, 'returnIdsOnly': 'true', 'f': 'json'}) or {}
+    return {
+        'objectIdFieldName': data.get('objectIdFieldName', 'OBJECTID'),
+        'objectIds': sorted(data.get('objectIds') or []),
+    }
+
+
+def getMapLayerObjectIds(baseUrl, serviceName, layerId, where="1=1"):
+    """
+    synonym for restGetMapLayerObjectIds
+    """
+    return restGetMapLayerObjectIds(baseUrl, serviceName, layerId, where)
+
 
 def restGetServiceType(baseUrl, serviceName):
     """
     Fetches the service type for a specific service name from an ArcGIS REST API.
 
+    The type is looked up in the service index of the shared catalog cache, so after the first crawl of a server
+    this is a dictionary lookup rather than a new crawl.
+
     Args:
         baseUrl (str): The base URL of the ArcGIS REST API.
         serviceName (str): The name of the service to retrieve the type for.
@@ -465,13 +1132,11 @@ def restGetServiceType(baseUrl, serviceName):
         str: The service type (e.g., MapServer, FeatureServer) if found, or a message indicating the service was not
         found.
     """
-    # Fetch all services using the restGetServices function
-    services = restGetServices(baseUrl)
+    validatedUrl = checkBaseUrl(baseUrl)
 
-    # Iterate over the services to find the matching serviceName
-    for service in services:
-        if service.get('name') == serviceName:
-            return service.get('type', "Service type not available.")
+    serviceTypes = _getCatalog(validatedUrl)["serviceTypes"]
+    if serviceName in serviceTypes:
+        return serviceTypes[serviceName] or "Service type not available."
 
     return f"Service '{serviceName}' not found."
 
@@ -491,27 +1156,142 @@ def restGetMapLayerDetails(baseUrl, serviceName, layerId):
         layerId (int): The ID of the layer to query.
 
     Returns:
-        dict: JSON response from the MapServer containing the layer details, or None if an error occurred.
+        dict: JSON response from the MapServer containing the layer details.
+
+    Raises:
+        ArcGISHttpError: If the server responds with an HTTP error status.
+        ArcGISServerError: If the server responds with an ArcGIS error document.
+        ArcGISError: If the server can not be reached.
     """
     validatedUrl = checkBaseUrl(baseUrl)
-    serviceUrl = f"{validatedUrl}/services/{serviceName}/MapServer/{layerId}?f=pjson"
+    serviceUrl = f"{_layerUrl(validatedUrl, serviceName, layerId)}?f=json"
 
     try:
-        response = requests.get(serviceUrl)
+        response = getDefaultClient().get(serviceUrl)
         response.raise_for_status()
-        return response.json()
+        layerDetails = _decodeJson(response)
 
     except requests.exceptions.HTTPError as http_err:
-        printError("HTTPError", http_err.response.status_code, additionalInfo=serviceUrl)
+        printError(f"httpError{http_err.response.status_code}", additionalInfo=serviceUrl)
     except requests.exceptions.RequestException as req_err:
-        printError("RequestException", additionalInfo=str(req_err))
+        printError("requestException", additionalInfo=str(req_err))
     except Exception as e:
         printError("Exception", additionalInfo=str(e))
 
-    return None
+    return _checkServerError(layerDetails, serviceUrl)
 
 def getMapLayerDetails(baseUrl, serviceName, layerId):
     """
     synonym for restGetMapLayerDetails
     """
-    return restGetMapLayerDetails(baseUrl, serviceName, layerId)
\ No newline at end of file
+    return restGetMapLayerDetails(baseUrl, serviceName, layerId)
+
+
+def restGetMapServerLayerDetails(baseUrl, serviceName, maxWorkers=8):
+    """
+    Fetches the details of all layers and tables of a MapServer at once.
+
+    The definitions (fields, extent, capabilities, maxRecordCount, ...) are taken from the `layers` resource of the
+    service (`MapServer/layers`), which returns all of them in a single request. Servers that do not support that
+    resource are asked for the list of layers and tables, whose details are then fetched concurrently. The details
+    are stored in the shared layer details cache, so the queries of the layers do not fetch them again.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the MapServer service.
+        maxWorkers (int): The number of layers fetched in parallel when the `layers` resource is not supported.
+
+    Returns:
+        dict: The details of the `layers` and of the `tables` of the service, as returned by restGetMapLayerDetails.
+
+    Raises:
+        ArcGISHttpError: If the server responds with an HTTP error status.
+        ArcGISServerError: If the server responds with an ArcGIS error document.
+        ArcGISError: If the server can not be reached.
+    """
+    validatedUrl = checkBaseUrl(baseUrl)
+    layersUrl = f"{_mapServerUrl(validatedUrl, serviceName)}/layers?f=json"
+
+    try:
+        data = _fetchLayersResource(layersUrl)
+    except ArcGISServerError:
+        data = None
+    except ArcGISHttpError as e:
+        if e.statusCode not in (400, 404, 500, 501):
+            raise
+        data = None
+
+    if data is None:
+        # Fall back to the details of the individual layers
+        mapServerDetails = restGetMapServerDetails(validatedUrl, serviceName) or {}
+        groups = {group: [item['id'] for item in mapServerDetails.get(group) or []] for group in ('layers', 'tables')}
+        with ThreadPoolExecutor(max_workers=max(1, maxWorkers)) as executor:
+            return {group: list(executor.map(lambda layerId: _getLayerDetails(validatedUrl, serviceName, layerId),
+                                             layerIds)) for group, layerIds in groups.items()}
+
+    result = {group: data.get(group) or [] for group in ('layers', 'tables')}
+    for details in result['layers'] + result['tables']:
+        if 'id' in details:
+            layerDetailsCache.set((validatedUrl, serviceName, str(details['id'])), details)
+    return result
+
+
+def _fetchLayersResource(layersUrl):
+    """
+    Fetches the `layers` resource of a MapServer, see restGetMapServerLayerDetails.
+    """
+    try:
+        response = getDefaultClient().get(layersUrl)
+        response.raise_for_status()
+        data = _decodeJson(response)
+    except requests.exceptions.HTTPError as e:
+        printError(f"httpError{e.response.status_code}", layersUrl)
+    except requests.exceptions.RequestException as e:
+        printError("requestException", f"{e} ({layersUrl})")
+    return _checkServerError(data, layersUrl)
+
+
+def getMapServerLayerDetails(baseUrl, serviceName, maxWorkers=8):
+    """
+    synonym for restGetMapServerLayerDetails
+    """
+    return restGetMapServerLayerDetails(baseUrl, serviceName, maxWorkers)
+
+
+def _versionUrl(validatedUrl):
+    """
+    Returns the URL of the version information of a server.
+    """
+    return f"{validatedUrl}?f=json"
+
+
+def _servicesUrl(validatedUrl, folderName=""):
+    """
+    Returns the URL of the root services directory of a server, or of one of its folders.
+    """
+    # Ensure the folderName does not start with a slash
+    cleanedFolderName = folderName.lstrip('/')
+    if cleanedFolderName:
+        return f"{validatedUrl}/services/{cleanedFolderName}?f=json"
+    return f"{validatedUrl}/services?f=json"
+
+
+def _mapServerUrl(validatedUrl, serviceName):
+    """
+    Returns the URL of a MapServer service.
+    """
+    return f"{validatedUrl}/services/{serviceName}/MapServer"
+
+
+def _layerUrl(validatedUrl, serviceName, layerId):
+    """
+    Returns the URL of a layer of a MapServer service.
+    """
+    return f"{_mapServerUrl(validatedUrl, serviceName)}/{layerId}"
+
+
+def _queryUrl(validatedUrl, serviceName, layerId):
+    """
+    Returns the URL of the query endpoint of a layer of a MapServer service.
+    """
+    return f"{_layerUrl(validatedUrl, serviceName, layerId)}/query"
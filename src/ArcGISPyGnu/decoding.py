@@ -0,0 +1,234 @@
+import json
+import re
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional dependency
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:  # pysimdjson is an optional dependency
+    simdjson = None
+
+
+def _defaultDecoder():
+    """
+    Returns the fastest available JSON decoder: orjson, pysimdjson or the json module of the standard library.
+    """
+    if orjson is not None:
+        return orjson.loads
+    if simdjson is not None:
+        return simdjson.loads
+    return json.loads
+
+
+_decoder = _defaultDecoder()
+
+
+def getJsonDecoder():
+    """
+    Returns the function decoding JSON response bodies.
+
+    Returns:
+        callable: A function decoding bytes or a string into Python objects.
+    """
+    return _decoder
+
+
+def setJsonDecoder(decoder):
+    """
+    Replaces the function decoding JSON response bodies.
+
+    Args:
+        decoder (callable): A function decoding bytes or a string into Python objects, like `json.loads`. Passing None
+        resets to the fastest available decoder.
+
+    Returns:
+        callable: The previously configured decoder.
+    """
+    global _decoder
+    previousDecoder = _decoder
+    _decoder = decoder or _defaultDecoder()
+    return previousDecoder
+
+
+def loads(data):
+    """
+    Decodes a JSON document with the configured decoder.
+
+    Documents the decoder rejects are decoded again with the json module, which also accepts the NaN and Infinity
+    values and the integers beyond 64 bits that some servers send.
+
+    Args:
+        data (bytes): The JSON document.
+
+    Returns:
+        The decoded document.
+    """
+    decoder = _decoder
+    try:
+        return decoder(data)
+    except ValueError:
+        if decoder is json.loads:
+            raise
+        return json.loads(data)
+
+
+def decodeResponse(response):
+    """
+    Decodes the JSON body of a response with the configured decoder.
+
+    Args:
+        response (requests.Response): The response.
+
+    Returns:
+        The decoded body.
+    """
+    content = response.content
+    if not isinstance(content, (bytes, bytearray)):
+        return response.json()
+    return loads(content)
+
+
+# The characters that change the nesting or string state of a JSON document
+_structurePattern = re.compile(rb'[{}\[\]"]')
+# The characters that end a string or escape the next character
+_stringPattern = re.compile(rb'["\\]')
+# The key preceding the features array of a query response
+_featuresKeyPattern = re.compile(rb'"features"\s*:\s*$')
+
+
+class FeatureStreamParser:
+    """
+    An incremental parser of the JSON response of a layer query, decoding the elements of its `features` array while
+    the body is still downloading.
+
+    The body is fed in chunks as they arrive. Every call to `feed` returns the features completed by the chunk, so
+    only the features of a single chunk and the unfinished feature are held at a time instead of the whole body and
+    all its features. `close` decodes the rest of the document, with an empty `features` array.
+
+    Args:
+        decoder (callable, optional): The function decoding the features. Defaults to `loads`.
+    """
+
+    def __init__(self, decoder=None):
+        self.decoder = decoder or loads
+        self.featureCount = 0
+        # The bytes received and not yet scanned or decoded
+        self._buffer = bytearray()
+        # The document without the features, up to the features array
+        self._document = bytearray()
+        self._position = 0
+        self._depth = 0
+        self._inString = False
+        self._inFeatures = False
+        # The start of the feature being received, and the span of the complete features that were not decoded yet
+        self._featureStart = None
+        self._batchStart = None
+        self._batchEnd = None
+
+    def feed(self, chunk):
+        """
+        Adds a chunk of the body.
+
+        Args:
+            chunk (bytes): The next chunk of the body.
+
+        Returns:
+            list: The features completed by the chunk, in document order.
+        """
+        buffer = self._buffer
+        buffer += chunk
+        features = []
+        position = self._position
+        depth = self._depth
+        while True:
+            if self._inString:
+                match = _stringPattern.search(buffer, position)
+                if match is None:
+                    position = len(buffer)
+                    break
+                position = match.end()
+                if buffer[match.start()] == 0x5C:
+                    if position >= len(buffer):
+                        # The escaped character is in the next chunk
+                        position = match.start()
+                        break
+                    position += 1
+                else:
+                    self._inString = False
+                continue
+
+            match = _structurePattern.search(buffer, position)
+            if match is None:
+                position = len(buffer)
+                break
+            index = match.start()
+            character = buffer[index]
+            position = index + 1
+            if character == 0x22:
+                self._inString = True
+            elif character == 0x7B or character == 0x5B:
+                depth += 1
+                if self._inFeatures:
+                    if depth == 3:
+                        self._featureStart = index
+                elif depth == 2 and character == 0x5B and _featuresKeyPattern.search(buffer, max(0, index - 256),
+                                                                                     index):
+                    self._document += buffer[:position]
+                    del buffer[:position]
+                    position = 0
+                    self._inFeatures = True
+            else:
+                depth -= 1
+                if self._inFeatures:
+                    if depth == 2 and self._featureStart is not None:
+                        if self._batchStart is None:
+                            self._batchStart = self._featureStart
+                        self._batchEnd = position
+                        self._featureStart = None
+                    elif depth == 1:
+                        features.extend(self._decodeBatch())
+                        # Keep the closing bracket of the array, the rest of the document follows it
+                        del buffer[:index]
+                        position = 1
+                        self._inFeatures = False
+
+        self._depth = depth
+        if self._inFeatures:
+            features.extend(self._decodeBatch())
+            # Only the unfinished feature is kept
+            start = self._featureStart if self._featureStart is not None else position
+            del buffer[:start]
+            position -= start
+            if self._featureStart is not None:
+                self._featureStart = 0
+        self._position = position
+        self.featureCount += len(features)
+        return features
+
+    def _decodeBatch(self):
+        """
+        Decodes the complete features in the buffer with a single call of the decoder.
+        """
+        if self._batchEnd is None:
+            return []
+        features = self.decoder(b"[" + bytes(self._buffer[self._batchStart:self._batchEnd]) + b"]")
+        self._batchStart = None
+        self._batchEnd = None
+        return features
+
+    def close(self):
+        """
+        Decodes the document without its features, once the whole body has been fed.
+
+        Returns:
+            The decoded document, with an empty `features` array.
+
+        Raises:
+            ValueError: If the body is not a complete JSON document.
+        """
+        if self._inFeatures or self._inString or self._depth:
+            raise ValueError("The JSON document is incomplete.")
+        return self.decoder(bytes(self._document + self._buffer))
@@ -0,0 +1,51 @@
+class ArcGISError(Exception):
+    """
+    Base class of the errors raised by ArcGISPyGnu.
+    """
+
+
+class InvalidUrlError(ArcGISError, ValueError):
+    """
+    Raised when a base URL is not a valid ArcGIS REST API URL.
+    """
+
+
+class ArcGISHttpError(ArcGISError):
+    """
+    Raised when the server answers a request with an HTTP error status, after all retries were used.
+
+    Args:
+        message (str): The description of the error.
+        statusCode (int): The HTTP status code of the response.
+        url (str, optional): The URL of the request.
+    """
+
+    def __init__(self, message, statusCode, url=None):
+        super().__init__(message)
+        self.statusCode = statusCode
+        self.url = url
+
+
+class ArcGISServerError(ArcGISError):
+    """
+    Raised when the server answers a request with an ArcGIS JSON error document, which is usually sent with a
+    `200 OK` status.
+
+    Args:
+        message (str): The message of the error document.
+        code (int): The error code of the error document.
+        details (list, optional): The details of the error document.
+        url (str, optional): The URL of the request.
+    """
+
+    def __init__(self, message, code, details=None, url=None):
+        super().__init__(f"{code}: {message}" if code is not None else message)
+        self.code = code
+        self.details = details or []
+        self.url = url
+
+
+class PbfDecodeError(ArcGISError, ValueError):
+    """
+    Raised when the body of a query made with `f=pbf` is not a valid ArcGIS PBF query response.
+    """
@@ -0,0 +1,268 @@
+import bz2
+import gzip
+import json
+import lzma
+import os
+
+from .core import _getLayerDetails, _selectFields, iterMapLayerData
+from .featuretable import FeatureTable
+from .geometry import esriGeometryTypes, esriToGeoJson, geoJsonToWkb
+from .query import outFieldsParameter, validateOutFields
+from .utils import checkBaseUrl
+
+# Supported export formats, with their aliases
+exportFormats = {
+    "geoparquet": "geoparquet",
+    "parquet": "geoparquet",
+    "arrow": "arrow",
+    "ipc": "arrow",
+    "feather": "arrow",
+    "geojsonseq": "geojsonseq",
+    "ndjson": "geojsonseq",
+}
+
+# Compression codecs of the newline-delimited GeoJSON writer
+_textCompressors = {
+    None: open,
+    "gzip": gzip.open,
+    "bz2": bz2.open,
+    "xz": lzma.open,
+}
+
+
+def exportMapLayer(baseUrl, serviceName, layerId, path, format="geoparquet", where="1=1", outFields="*",
+                   compression=None, maxWorkers=1, pageSize=None, rowGroupSize=65536, queryOptions=None):
+    """
+    Streams the data of a map layer straight into a GeoParquet, Arrow IPC or newline-delimited GeoJSON file.
+
+    Pages are written as they arrive from the query loop (`iterMapLayerData`), so only one page, or one Parquet row
+    group, is held in memory at a time and layers larger than the available memory can be exported.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer to export.
+        path (str): The path of the file to write.
+        format (str): The output format: "geoparquet" (or "parquet"), "arrow" (or "ipc", "feather") or "geojsonseq"
+        (or "ndjson").
+        where (str): The SQL where clause to filter the data.
+        outFields (str or list): The fields to export, as a comma separated string, "*" for all fields, or a list of
+        field names.
+        compression (str, optional): The compression codec. For GeoParquet any codec supported by pyarrow
+        ("snappy", the default, "zstd", "gzip", ...), for Arrow IPC "lz4" or "zstd", and for GeoJSONSeq "gzip", "bz2"
+        or "xz".
+        maxWorkers (int): The number of pages fetched in parallel. Defaults to 1, a sequential extraction.
+        pageSize (int, optional): The number of features requested per page. Defaults to the `maxRecordCount` of the
+        layer.
+        rowGroupSize (int): The number of rows collected per Parquet row group.
+        queryOptions (QueryOptions, optional): The geometry options of the queries. Without geometries
+        (`returnGeometry=False`) the file has no geometry column, and an `outSR` other than 4326 is recorded as the
+        CRS of the GeoParquet geometry column.
+
+    Returns:
+        dict: The `path`, `format`, number of `rows` and number of `bytes` written.
+
+    Raises:
+        ValueError: If the format or compression codec is not supported, or the layer does not have the requested
+        fields or does not support the query options.
+        ImportError: If pyarrow is required for the format but not installed.
+    """
+    exportFormat = exportFormats.get(str(format).lower())
+    if exportFormat is None:
+        raise ValueError(f"Unsupported export format '{format}', use one of: {', '.join(sorted(exportFormats))}.")
+
+    validatedUrl = checkBaseUrl(baseUrl)
+    layerDetails = _getLayerDetails(validatedUrl, serviceName, layerId)
+    outFields = outFieldsParameter(outFields)
+    validateOutFields(outFields, layerDetails)
+    fields = [field for field in _selectFields(layerDetails.get('fields') or [], outFields)
+              if field.get('type') != 'esriFieldTypeGeometry']
+    geometryType = layerDetails.get('geometryType')
+    outSR = 4326
+    if queryOptions is not None:
+        outSR = queryOptions.outSR
+        if not queryOptions.returnGeometry:
+            geometryType = None
+
+    pages = iterMapLayerData(baseUrl, serviceName, layerId, where, outFields, pages=True, maxWorkers=maxWorkers,
+                             pageSize=pageSize, queryOptions=queryOptions)
+    if exportFormat == "geojsonseq":
+        rows = _writeGeoJsonSeq(pages, path, compression)
+    else:
+        rows = _writeArrow(pages, path, exportFormat, fields, geometryType, outSR, compression, rowGroupSize)
+
+    return {"path": path, "format": exportFormat, "rows": rows, "bytes": os.path.getsize(path)}
+
+
+def _writeGeoJsonSeq(pages, path, compression):
+    """
+    Writes pages of features as newline-delimited GeoJSON features.
+
+    Returns:
+        int: The number of features written.
+    """
+    if compression not in _textCompressors:
+        raise ValueError(f"Unsupported compression '{compression}' for GeoJSONSeq, use gzip, bz2 or xz.")
+
+    rows = 0
+    with _textCompressors[compression](path, "wt", encoding="utf-8") as output:
+        for page in pages:
+            lines = []
+            for feature in page:
+                lines.append(json.dumps({
+                    "type": "Feature",
+                    "properties": feature.get("attributes", {}),
+                    "geometry": esriToGeoJson(feature.get("geometry")),
+                }, separators=(",", ":")))
+            lines.append("")
+            output.write("\n".join(lines))
+            rows += len(page)
+    return rows
+
+
+def _writeArrow(pages, path, exportFormat, fields, geometryType, outSR, compression, rowGroupSize):
+    """
+    Writes pages of features as record batches to a GeoParquet or Arrow IPC file.
+
+    The columns are typed after the layer fields. A page holding values a column type can not, which FeatureTable
+    stores in a wider column, widens the column to that type (see _widenSchema) and the batches written so far are
+    rewritten with the widened schema.
+
+    Returns:
+        int: The number of features written.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(f"Exporting to {exportFormat} requires pyarrow, install it with 'pip install pyarrow'.")
+
+    schema = _arrowSchema(pa, fields, geometryType, outSR)
+    writer = _openArrowWriter(pa, pq, path, exportFormat, schema, compression)
+
+    rows = 0
+    pendingBatches = []
+    pendingRows = 0
+    try:
+        for page in pages:
+            table = FeatureTable(fields)
+            table.appendFeatures(page)
+            arrays = table.toArrow().columns
+            if geometryType:
+                wkb = [geoJsonToWkb(esriToGeoJson(feature.get("geometry"))) for feature in page]
+                arrays.append(pa.array(wkb, type=pa.binary()))
+            widenedSchema = _widenSchema(pa, schema, arrays)
+            if widenedSchema is not schema:
+                schema = widenedSchema
+                writer = _rewriteArrow(pa, pq, path, exportFormat, writer, schema, compression)
+                pendingBatches = [pendingBatch.cast(schema) for pendingBatch in pendingBatches]
+            batch = pa.Table.from_arrays(arrays, names=schema.names).cast(schema)
+            rows += len(page)
+
+            if exportFormat != "geoparquet":
+                writer.write_table(batch)
+                continue
+            # Parquet row groups are collected from several pages to keep the file efficient to read
+            pendingBatches.append(batch)
+            pendingRows += len(page)
+            if pendingRows >= rowGroupSize:
+                writer.write_table(pa.concat_tables(pendingBatches), row_group_size=pendingRows)
+                pendingBatches = []
+                pendingRows = 0
+        if pendingBatches:
+            writer.write_table(pa.concat_tables(pendingBatches), row_group_size=pendingRows)
+        elif rows == 0 and exportFormat == "geoparquet":
+            writer.write_table(schema.empty_table())
+    finally:
+        writer.close()
+    return rows
+
+
+def _openArrowWriter(pa, pq, path, exportFormat, schema, compression):
+    """
+    Opens the GeoParquet or Arrow IPC writer of an export.
+    """
+    if exportFormat == "geoparquet":
+        return pq.ParquetWriter(path, schema, compression=compression or "snappy")
+    return pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+
+
+def _widenSchema(pa, schema, arrays):
+    """
+    Widens the columns of a schema that can not hold the values of a page to the type of the page's column, the
+    larger integer, float or string type FeatureTable chose for them.
+
+    Returns:
+        pyarrow.Schema: The widened schema, or `schema` itself when every column fits.
+    """
+    widened = schema
+    for index, array in enumerate(arrays):
+        field = schema.field(index)
+        if array.type == field.type:
+            continue
+        try:
+            array.cast(field.type)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            widened = widened.set(index, field.with_type(array.type))
+    return widened
+
+
+def _rewriteArrow(pa, pq, path, exportFormat, writer, schema, compression):
+    """
+    Rewrites the batches written so far with a widened schema, one row group or record batch at a time.
+
+    Returns:
+        The writer of the rewritten file, positioned after the rewritten batches.
+    """
+    writer.close()
+    previousPath = f"{path}.previous"
+    os.replace(path, previousPath)
+    writer = _openArrowWriter(pa, pq, path, exportFormat, schema, compression)
+    try:
+        if exportFormat == "geoparquet":
+            with open(previousPath, "rb") as source:
+                parquetFile = pq.ParquetFile(source)
+                for index in range(parquetFile.num_row_groups):
+                    rowGroup = parquetFile.read_row_group(index)
+                    writer.write_table(rowGroup.cast(schema), row_group_size=rowGroup.num_rows)
+        else:
+            with pa.ipc.open_file(previousPath) as reader:
+                for index in range(reader.num_record_batches):
+                    writer.write_table(pa.Table.from_batches([reader.get_batch(index)]).cast(schema))
+    except BaseException:
+        writer.close()
+        raise
+    finally:
+        os.remove(previousPath)
+    return writer
+
+
+def _arrowSchema(pa, fields, geometryType, outSR=4326):
+    """
+    Builds the Arrow schema of an export from the field definitions of the layer, including GeoParquet metadata.
+    """
+    arrowTypes = {
+        "esriFieldTypeOID": pa.int64(),
+        "esriFieldTypeSmallInteger": pa.int16(),
+        "esriFieldTypeInteger": pa.int32(),
+        "esriFieldTypeBigInteger": pa.int64(),
+        "esriFieldTypeSingle": pa.float32(),
+        "esriFieldTypeDouble": pa.float64(),
+        "esriFieldTypeDate": pa.timestamp("ms"),
+    }
+    schemaFields = [pa.field(field["name"], arrowTypes.get(field["type"], pa.string())) for field in fields]
+    metadata = None
+    if geometryType:
+        schemaFields.append(pa.field("geometry", pa.binary()))
+        column = {"encoding": "WKB", "geometry_types": esriGeometryTypes.get(geometryType, [])}
+        # Layer data is queried in WGS 84 (outSR=4326) by default, with x as longitude, which is the GeoParquet
+        # default CRS. Other spatial references are recorded by their identifier.
+        wkid = outSR.get("latestWkid", outSR.get("wkid")) if isinstance(outSR, dict) else outSR
+        if wkid != 4326:
+            column["crs"] = {"id": {"authority": "EPSG", "code": wkid}} if wkid is not None else None
+        metadata = {b"geo": json.dumps({
+            "version": "1.0.0",
+            "primary_column": "geometry",
+            "columns": {"geometry": column},
+        }).encode("utf-8")}
+    return pa.schema(schemaFields, metadata=metadata)
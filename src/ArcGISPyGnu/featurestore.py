@@ -0,0 +1,467 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+
+from .core import _getLayerDetails, iterMapLayerData
+from .decoding import loads
+from .utils import checkBaseUrl
+
+# An entry of the object ID index: the object ID, and the offset and length of its record in the data file. A length of
+# 0 marks a deleted feature.
+_indexEntry = struct.Struct("<qQI")
+
+# The encoder of the values of the records, shared as building an encoder for every value dominates the write time
+_encodeValue = json.JSONEncoder(separators=(",", ":")).encode
+
+# The number of object IDs put in a single IN clause when missing features are fetched by ID
+_objectIdBatchSize = 500
+
+
+class FeatureStore:
+    """
+    A local, disk backed store of the features of a layer, with random access by object ID.
+
+    Features are appended to a data file that is read through a memory map, so the store can hold more features than
+    fit in memory and reading a feature costs no more than decoding it. An index file maps every object ID to the
+    position of its record, and is loaded into a dictionary when the store is opened, for constant time lookups.
+    Writing a feature that is already stored appends the new version and points the index to it; `compact` removes the
+    versions that are no longer referenced.
+
+    Each record keeps the geometry and every attribute as a separate JSON value, so reading a few fields
+    (`outFields`) or no geometry only decodes those values.
+
+    A store bound to a layer (`baseUrl`, `serviceName` and `layerId`) can be filled with `extract`, and serves as a
+    read-through cache with `fetch`: features that are not stored are queried from the layer and stored.
+
+    Args:
+        path (str): The path of the data file. The index and metadata are kept next to it, in `<path>.oid` and
+        `<path>.json`. The files are created when they do not exist.
+        baseUrl (str, optional): The base URL of the ArcGIS REST API of the layer kept in the store.
+        serviceName (str, optional): The name of the service containing the layer.
+        layerId (int, optional): The ID of the layer.
+
+    Raises:
+        ValueError: If the store at `path` belongs to a different layer.
+    """
+
+    def __init__(self, path, baseUrl=None, serviceName=None, layerId=None):
+        self.path = path
+        self._indexPath = f"{path}.oid"
+        self._metadataPath = f"{path}.json"
+        self._lock = threading.RLock()
+        self._metadata = {"layer": None, "objectIdField": None, "fields": []}
+        if os.path.exists(self._metadataPath):
+            with open(self._metadataPath, encoding="utf-8") as metadataFile:
+                self._metadata = json.load(metadataFile)
+
+        self._layer = None
+        if baseUrl is not None:
+            self._layer = {"baseUrl": checkBaseUrl(baseUrl), "serviceName": serviceName, "layerId": str(layerId)}
+            if self._metadata["layer"] is None:
+                self._metadata["layer"] = self._layer
+                self._saveMetadata()
+            elif self._metadata["layer"] != self._layer:
+                raise ValueError(f"The feature store {path} belongs to {self._metadata['layer']}, "
+                                 f"not to {self._layer}.")
+        self._fieldSlots = {name.lower(): slot for slot, name in enumerate(self._metadata["fields"], 1)}
+        self._absentIds = set()
+        self._open()
+
+    def _open(self):
+        """
+        Opens the data and index files and loads the index. Index entries pointing past the end of the data file, left
+        behind by an interrupted write, are dropped.
+        """
+        self._dataFile = open(self.path, "ab")
+        dataSize = self._dataFile.tell()
+        self._map = None
+        self._index = {}
+        self._sortedIds = None
+        self._liveBytes = 0
+
+        validSize = 0
+        if os.path.exists(self._indexPath):
+            with open(self._indexPath, "rb") as indexFile:
+                entries = indexFile.read()
+            entries = entries[:len(entries) - len(entries) % _indexEntry.size]
+            for objectId, offset, length in _indexEntry.iter_unpack(entries):
+                if offset + length > dataSize:
+                    break
+                validSize += _indexEntry.size
+                self._forget(objectId)
+                if length:
+                    self._index[objectId] = (offset, length)
+                    self._liveBytes += length
+        self._indexFile = open(self._indexPath, "ab")
+        if self._indexFile.tell() != validSize:
+            self._indexFile.truncate(validSize)
+            self._indexFile.seek(validSize)
+
+    def _forget(self, objectId):
+        position = self._index.pop(objectId, None)
+        if position is not None:
+            self._liveBytes -= position[1]
+
+    def _saveMetadata(self):
+        temporaryPath = f"{self._metadataPath}.tmp"
+        with open(temporaryPath, "w", encoding="utf-8") as metadataFile:
+            json.dump(self._metadata, metadataFile, separators=(",", ":"))
+        os.replace(temporaryPath, self._metadataPath)
+
+    @property
+    def objectIdField(self):
+        """
+        str: The name of the object ID field, None until the first features are written.
+        """
+        return self._metadata["objectIdField"]
+
+    @property
+    def fields(self):
+        """
+        list: The names of the attributes of the stored features, in the order they were first written.
+        """
+        return list(self._metadata["fields"])
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, objectId):
+        return objectId in self._index
+
+    def objectIds(self):
+        """
+        Returns the object IDs of the stored features.
+
+        Returns:
+            list: The object IDs, sorted.
+        """
+        with self._lock:
+            return list(self._sorted())
+
+    def write(self, features, objectIdField=None):
+        """
+        Appends features to the store, replacing the stored features with the same object IDs.
+
+        Args:
+            features (list): The features, as returned by the query functions.
+            objectIdField (str, optional): The name of the object ID field. Defaults to the object ID field of the
+            layer the store is bound to, or "OBJECTID".
+
+        Returns:
+            int: The number of features written.
+
+        Raises:
+            ValueError: If a feature has no object ID.
+        """
+        with self._lock:
+            if self._metadata["objectIdField"] is None:
+                self._metadata["objectIdField"] = objectIdField or self._layerObjectIdField() or "OBJECTID"
+                self._saveMetadata()
+            objectIdField = self._metadata["objectIdField"]
+
+            records = []
+            fieldCount = len(self._metadata["fields"])
+            for feature in features:
+                attributes = feature.get("attributes") or {}
+                objectId = attributes.get(objectIdField)
+                if objectId is None:
+                    raise ValueError(f"The feature has no {objectIdField}: {attributes}.")
+                for name in attributes:
+                    if name.lower() not in self._fieldSlots:
+                        self._metadata["fields"].append(name)
+                        self._fieldSlots[name.lower()] = len(self._metadata["fields"])
+                records.append((int(objectId), self._encode(feature)))
+            if not records:
+                return 0
+            # The fields are saved first, so the records never refer to a field the metadata does not know
+            if len(self._metadata["fields"]) != fieldCount:
+                self._saveMetadata()
+
+            offset = self._dataFile.tell()
+            entries = []
+            for objectId, record in records:
+                entries.append(_indexEntry.pack(objectId, offset, len(record)))
+                self._forget(objectId)
+                self._index[objectId] = (offset, len(record))
+                self._liveBytes += len(record)
+                self._absentIds.discard(objectId)
+                offset += len(record)
+            self._dataFile.write(b"".join(record for _, record in records))
+            self._dataFile.flush()
+            self._indexFile.write(b"".join(entries))
+            self._indexFile.flush()
+            self._sortedIds = None
+            return len(records)
+
+    def delete(self, objectIds):
+        """
+        Removes features from the store.
+
+        Args:
+            objectIds (list): The object IDs of the features to remove.
+
+        Returns:
+            int: The number of features removed.
+        """
+        with self._lock:
+            deletedIds = [objectId for objectId in objectIds if objectId in self._index]
+            for objectId in deletedIds:
+                self._forget(objectId)
+            self._indexFile.write(b"".join(_indexEntry.pack(objectId, 0, 0) for objectId in deletedIds))
+            self._indexFile.flush()
+            if deletedIds:
+                self._sortedIds = None
+            return len(deletedIds)
+
+    def get(self, objectId, outFields=None, returnGeometry=True):
+        """
+        Reads a stored feature.
+
+        Args:
+            objectId (int): The object ID of the feature.
+            outFields (str or list, optional): The attributes to read, as a comma separated string or a list of names.
+            Defaults to all attributes.
+            returnGeometry (bool): Read the geometry.
+
+        Returns:
+            dict: The feature, or None when it is not stored.
+
+        Raises:
+            ValueError: If a field of `outFields` is not stored.
+        """
+        slots = self._slots(outFields, returnGeometry)
+        position = self._index.get(objectId)
+        if position is None:
+            return None
+        return self._decode(self._read(*position), slots)
+
+    def scan(self, minObjectId=None, maxObjectId=None, outFields=None, returnGeometry=True):
+        """
+        Iterates over the stored features in object ID order, optionally within a range of object IDs.
+
+        Args:
+            minObjectId (int, optional): The smallest object ID to return.
+            maxObjectId (int, optional): The largest object ID to return.
+            outFields (str or list, optional): The attributes to read. Defaults to all attributes.
+            returnGeometry (bool): Read the geometries.
+
+        Returns:
+            generator: A generator yielding features (dictionaries).
+
+        Raises:
+            ValueError: If a field of `outFields` is not stored.
+        """
+        slots = self._slots(outFields, returnGeometry)
+        with self._lock:
+            sortedIds = self._sorted()
+        start = 0 if minObjectId is None else bisect.bisect_left(sortedIds, minObjectId)
+        stop = len(sortedIds) if maxObjectId is None else bisect.bisect_right(sortedIds, maxObjectId)
+        return self._iterFeatures(sortedIds[start:stop], slots)
+
+    def _iterFeatures(self, objectIds, slots):
+        for objectId in objectIds:
+            position = self._index.get(objectId)
+            if position is not None:
+                yield self._decode(self._read(*position), slots)
+
+    def extract(self, where="1=1", maxWorkers=1, pageSize=None, queryOptions=None):
+        """
+        Fills the store with the features of its layer, page by page, so the layer does not have to fit in memory.
+
+        Args:
+            where (str): The SQL where clause to filter the data.
+            maxWorkers (int): The number of pages fetched in parallel.
+            pageSize (int, optional): The number of features requested per page. Defaults to the `maxRecordCount` of
+            the layer.
+            queryOptions (QueryOptions, optional): The geometry options of the query.
+
+        Returns:
+            int: The number of features written.
+
+        Raises:
+            ValueError: If the store is not bound to a layer.
+        """
+        layer = self._boundLayer()
+        written = 0
+        for page in iterMapLayerData(layer["baseUrl"], layer["serviceName"], layer["layerId"], where, "*", pages=True,
+                                     maxWorkers=maxWorkers, pageSize=pageSize, queryOptions=queryOptions):
+            written += self.write(page)
+        return written
+
+    def fetch(self, objectIds, outFields=None, returnGeometry=True):
+        """
+        Reads features by object ID, querying the features that are not stored from the layer and storing them.
+
+        Object IDs the layer does not have are remembered until the store is closed, so they are not queried again.
+
+        Args:
+            objectIds (list): The object IDs of the features.
+            outFields (str or list, optional): The attributes to read. Defaults to all attributes.
+            returnGeometry (bool): Read the geometries.
+
+        Returns:
+            list: The features, in the order of `objectIds`, without the object IDs the layer does not have.
+
+        Raises:
+            ValueError: If the store is not bound to a layer, or a field of `outFields` does not exist.
+        """
+        layer = self._boundLayer()
+        missingIds = sorted({objectId for objectId in objectIds
+                             if objectId not in self._index and objectId not in self._absentIds})
+        objectIdField = self._metadata["objectIdField"] or self._layerObjectIdField()
+        for start in range(0, len(missingIds), _objectIdBatchSize):
+            batchIds = missingIds[start:start + _objectIdBatchSize]
+            where = f"{objectIdField} IN ({','.join(str(objectId) for objectId in batchIds)})"
+            self.write(list(iterMapLayerData(layer["baseUrl"], layer["serviceName"], layer["layerId"], where, "*")))
+            self._absentIds.update(objectId for objectId in batchIds if objectId not in self._index)
+
+        slots = self._slots(outFields, returnGeometry)
+        features = []
+        for objectId in objectIds:
+            position = self._index.get(objectId)
+            if position is not None:
+                features.append(self._decode(self._read(*position), slots))
+        return features
+
+    def compact(self):
+        """
+        Rewrites the data file with only the current version of every feature, in object ID order.
+
+        Returns:
+            int: The number of bytes reclaimed.
+        """
+        with self._lock:
+            previousSize = self._dataFile.tell()
+            temporaryPath = f"{self.path}.tmp"
+            temporaryIndexPath = f"{self._indexPath}.tmp"
+            offset = 0
+            with open(temporaryPath, "wb") as dataFile, open(temporaryIndexPath, "wb") as indexFile:
+                for objectId in self._sorted():
+                    record = self._read(*self._index[objectId])
+                    dataFile.write(record)
+                    indexFile.write(_indexEntry.pack(objectId, offset, len(record)))
+                    offset += len(record)
+            self._closeFiles()
+            os.replace(temporaryPath, self.path)
+            os.replace(temporaryIndexPath, self._indexPath)
+            self._open()
+            return previousSize - offset
+
+    def stats(self):
+        """
+        Returns the size of the store.
+
+        Returns:
+            dict: The number of `features`, the size of the data file in `bytes` and the `garbageBytes` taken by
+            replaced and deleted features, which `compact` reclaims.
+        """
+        with self._lock:
+            dataSize = self._dataFile.tell()
+            return {"features": len(self._index), "bytes": dataSize, "garbageBytes": dataSize - self._liveBytes}
+
+    def close(self):
+        """
+        Closes the files of the store.
+        """
+        with self._lock:
+            self._closeFiles()
+
+    def _closeFiles(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._dataFile.close()
+        self._indexFile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def _boundLayer(self):
+        if self._layer is None:
+            raise ValueError("The feature store is not bound to a layer, pass baseUrl, serviceName and layerId.")
+        return self._layer
+
+    def _layerObjectIdField(self):
+        if self._layer is None:
+            return None
+        layerDetails = _getLayerDetails(self._layer["baseUrl"], self._layer["serviceName"], self._layer["layerId"])
+        return layerDetails.get("objectIdField") or "OBJECTID"
+
+    def _sorted(self):
+        if self._sortedIds is None:
+            self._sortedIds = sorted(self._index)
+        return self._sortedIds
+
+    def _read(self, offset, length):
+        """
+        Returns a record, remapping the data file when the record was written after it was mapped.
+        """
+        fileMap = self._map
+        if fileMap is None or offset + length > len(fileMap):
+            with self._lock:
+                # The previous map is not closed, other threads may still be reading from it
+                if self._map is None or offset + length > len(self._map):
+                    with open(self.path, "rb") as dataFile:
+                        self._map = mmap.mmap(dataFile.fileno(), 0, access=mmap.ACCESS_READ)
+                fileMap = self._map
+        return fileMap[offset:offset + length]
+
+    def _slots(self, outFields, returnGeometry):
+        """
+        Resolves the attributes to read to their slots in the records. Slot 0 holds the geometry.
+        """
+        slots = [0] if returnGeometry else []
+        if outFields is None or outFields == "*":
+            return slots + list(range(1, len(self._metadata["fields"]) + 1))
+        names = outFields.split(",") if isinstance(outFields, str) else outFields
+        for name in names:
+            slot = self._fieldSlots.get(name.strip().lower())
+            if slot is None:
+                raise ValueError(f"The field {name.strip()} is not stored, use one of: "
+                                 f"{', '.join(self._metadata['fields'])}.")
+            slots.append(slot)
+        return slots
+
+    def _encode(self, feature):
+        """
+        Encodes a feature as a record: the number of slots, their end offsets and the JSON value of every slot. Empty
+        slots are attributes the feature does not have.
+        """
+        attributes = feature.get("attributes") or {}
+        values = [b""] * (len(self._metadata["fields"]) + 1)
+        if feature.get("geometry") is not None:
+            values[0] = _encodeValue(feature["geometry"]).encode()
+        for name, value in attributes.items():
+            values[self._fieldSlots[name.lower()]] = _encodeValue(value).encode()
+        ends = []
+        end = 0
+        for value in values:
+            end += len(value)
+            ends.append(end)
+        return struct.pack(f"<H{len(values)}I", len(values), *ends) + b"".join(values)
+
+    def _decode(self, record, slots):
+        slotCount = struct.unpack_from("<H", record)[0]
+        ends = struct.unpack_from(f"<{slotCount}I", record, 2)
+        base = 2 + 4 * slotCount
+        fields = self._metadata["fields"]
+        feature = {"attributes": {}}
+        for slot in slots:
+            if slot >= slotCount:
+                continue
+            start = base + (ends[slot - 1] if slot else 0)
+            end = base + ends[slot]
+            if start == end:
+                continue
+            value = loads(record[start:end])
+            if slot:
+                feature["attributes"][fields[slot - 1]] = value
+            else:
+                feature["geometry"] = value
+        return feature
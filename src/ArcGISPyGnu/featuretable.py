@@ -0,0 +1,334 @@
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency
+    np = None
+
+
+# Storage of ArcGIS field types: the array typecode used while appending and the numpy dtype of the final column.
+# Field types that are not listed (strings, GUIDs, XML, ...) are stored as numpy object arrays.
+fieldTypeStorage = {
+    "esriFieldTypeOID": ("q", "int64"),
+    "esriFieldTypeSmallInteger": ("h", "int16"),
+    "esriFieldTypeInteger": ("i", "int32"),
+    "esriFieldTypeBigInteger": ("q", "int64"),
+    "esriFieldTypeSingle": ("f", "float32"),
+    "esriFieldTypeDouble": ("d", "float64"),
+    "esriFieldTypeDate": ("q", "datetime64[ms]"),
+}
+
+# The value stored for a missing date, which numpy reads as NaT (not a time)
+_natValue = -2 ** 63
+
+# The largest finite float32, beyond which array("f") stores infinity instead of raising OverflowError
+_float32Max = 3.4028234663852886e38
+
+# The wider array typecodes tried, in order, when a value does not fit the storage of its field. A column holding
+# values that fit none of them becomes an object column.
+_widerTypecodes = {
+    "h": ("i", "q", "d"),
+    "i": ("q", "d"),
+    "q": ("d",),
+    "f": ("d",),
+}
+
+
+class FeatureTable:
+    """
+    A columnar, NumPy backed container for the features of a layer.
+
+    Instead of one dictionary per feature, every attribute field is stored as a single typed array whose type is taken
+    from the `fields` metadata of the layer, and all geometries share one packed coordinate buffer with offset
+    arrays. Pages of features are appended incrementally, so the per-feature dictionaries of a page can be discarded as
+    soon as the page has been added.
+
+    Geometries are stored in the layout used by GeoArrow: `coordinates` holds the interleaved x/y values,
+    `partOffsets[i]:partOffsets[i + 1]` are the coordinates of part i (a path, ring or point) and
+    `geometryOffsets[j]:geometryOffsets[j + 1]` are the parts of feature j. A feature without geometry has no parts.
+
+    Args:
+        fields (list): The field definitions of the layer (dictionaries with at least `name` and `type`).
+        geometryType (str, optional): The geometry type of the layer (e.g., esriGeometryPoint), or None for tables.
+
+    Raises:
+        ImportError: If numpy is not installed.
+    """
+
+    def __init__(self, fields, geometryType=None):
+        if np is None:
+            raise ImportError("FeatureTable requires numpy, install it with 'pip install numpy'.")
+
+        self.fields = [field for field in fields if field.get("type") != "esriFieldTypeGeometry"]
+        self.geometryType = geometryType
+        self._length = 0
+        self._values = {}
+        self._validity = {}
+        for field in self.fields:
+            storage = fieldTypeStorage.get(field["type"])
+            self._values[field["name"]] = array(storage[0]) if storage else []
+            self._validity[field["name"]] = array("b")
+
+        self._coordinates = array("d")
+        self._partOffsets = array("q", [0])
+        self._geometryOffsets = array("q", [0])
+        self._columns = None
+
+    def __len__(self):
+        return self._length
+
+    def appendFeatures(self, features):
+        """
+        Appends a page of features to the table.
+
+        A value that does not fit the storage of its field, such as a fraction in an integer field or a number out of
+        the range of a SmallInteger, widens the column to a larger integer or float type, or to an object column when
+        no numeric type can hold it.
+
+        Args:
+            features (list): The features of a query response (dictionaries with `attributes` and `geometry`).
+        """
+        for field in self.fields:
+            name = field["name"]
+            values = self._values[name]
+            validity = self._validity[name]
+            if isinstance(values, list):
+                for feature in features:
+                    value = feature.get("attributes", {}).get(name)
+                    values.append(value)
+                    validity.append(value is not None)
+                continue
+
+            missing = _natValue if field["type"] == "esriFieldTypeDate" else 0
+            for feature in features:
+                value = feature.get("attributes", {}).get(name)
+                validity.append(value is not None)
+                if isinstance(values, list):
+                    values.append(value)
+                elif value is None:
+                    values.append(missing)
+                else:
+                    try:
+                        values.append(value)
+                    except (TypeError, OverflowError):
+                        values = self._widen(field, value)
+                    else:
+                        if values.typecode == "f" and abs(value) > _float32Max:
+                            values.pop()
+                            values = self._widen(field, value)
+
+        if self.geometryType:
+            for feature in features:
+                self._appendGeometry(feature.get("geometry"))
+
+        self._length += len(features)
+        self._columns = None
+
+    def _widen(self, field, value):
+        """
+        Moves the values of a field to the narrowest wider storage that holds a new value, and appends it.
+
+        Args:
+            field (dict): The field definition.
+            value: The value that does not fit the current storage of the field.
+
+        Returns:
+            The new storage of the field, a typed array or a list.
+        """
+        name = field["name"]
+        values = self._values[name]
+        # Dates keep their millisecond integers, as a float would not convert to datetime64
+        candidates = () if field["type"] == "esriFieldTypeDate" else _widerTypecodes.get(values.typecode, ())
+        for typecode in candidates:
+            # Integers beyond 2 ** 53 would lose precision as floats
+            if typecode == "d" and isinstance(value, int) and abs(value) > 2 ** 53:
+                break
+            try:
+                widened = array(typecode, values)
+                widened.append(value)
+            except (TypeError, OverflowError):
+                continue
+            self._values[name] = widened
+            return widened
+
+        widened = [stored if valid else None for stored, valid in zip(values, self._validity[name])]
+        widened.append(value)
+        self._values[name] = widened
+        return widened
+
+    def _appendGeometry(self, geometry):
+        """
+        Packs a single Esri JSON geometry into the coordinate and offset buffers.
+
+        Args:
+            geometry (dict): The geometry of a feature, or None.
+        """
+        if geometry:
+            if "x" in geometry:
+                parts = [[(geometry["x"], geometry["y"])]] if geometry["x"] is not None else []
+            elif "points" in geometry:
+                parts = [[point] for point in geometry["points"]]
+            else:
+                parts = geometry.get("paths") or geometry.get("rings") or []
+
+            for part in parts:
+                for point in part:
+                    self._coordinates.append(point[0])
+                    self._coordinates.append(point[1])
+                self._partOffsets.append(len(self._coordinates) // 2)
+        self._geometryOffsets.append(len(self._partOffsets) - 1)
+
+    @property
+    def columns(self):
+        """
+        dict: One numpy array per attribute field, keyed by field name. Missing values are stored as 0 (or NaT for
+        dates) in numeric columns, use `validity` to tell them apart. Columns widened by `appendFeatures` have the
+        wider type, or are object arrays with None for missing values. The arrays are built once, when first accessed
+        after features were appended.
+        """
+        if self._columns is None:
+            columns = {}
+            for field in self.fields:
+                name = field["name"]
+                storage = fieldTypeStorage.get(field["type"])
+                values = self._values[name]
+                if not isinstance(values, list):
+                    dtype = storage[1] if values.typecode == storage[0] else values.typecode
+                    column = np.frombuffer(values, dtype=np.dtype(values.typecode)).view(dtype).copy()
+                else:
+                    column = np.empty(len(self._values[name]), dtype=object)
+                    column[:] = self._values[name]
+                columns[name] = column
+            self._columns = columns
+        return self._columns
+
+    def validity(self, name):
+        """
+        Returns the validity mask of a column.
+
+        Args:
+            name (str): The name of the field.
+
+        Returns:
+            numpy.ndarray: A boolean array that is False where the value of the field is missing.
+        """
+        return np.array(self._validity[name], dtype=np.bool_)
+
+    @property
+    def coordinates(self):
+        """
+        numpy.ndarray: The coordinates of all geometries as an (n, 2) array of x/y values.
+        """
+        return np.array(self._coordinates, dtype=np.float64).reshape(-1, 2)
+
+    @property
+    def partOffsets(self):
+        """
+        numpy.ndarray: The offsets of the parts into `coordinates`.
+        """
+        return np.array(self._partOffsets, dtype=np.int64)
+
+    @property
+    def geometryOffsets(self):
+        """
+        numpy.ndarray: The offsets of the geometries into `partOffsets`.
+        """
+        return np.array(self._geometryOffsets, dtype=np.int64)
+
+    def toPandas(self):
+        """
+        Converts the attribute columns to a pandas DataFrame.
+
+        Numeric columns with missing values become pandas nullable (masked) columns that share the table's buffers.
+
+        Returns:
+            pandas.DataFrame: A DataFrame with one column per attribute field.
+
+        Raises:
+            ImportError: If pandas is not installed.
+        """
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("toPandas requires pandas, install it with 'pip install pandas'.")
+
+        data = {}
+        for name, column in self.columns.items():
+            valid = self.validity(name)
+            if column.dtype.kind in "iuf" and not valid.all():
+                arrayType = pd.arrays.IntegerArray if column.dtype.kind in "iu" else pd.arrays.FloatingArray
+                data[name] = arrayType(column, ~valid)
+            else:
+                data[name] = column
+        return pd.DataFrame(data, copy=False)
+
+    def toArrow(self):
+        """
+        Converts the table to a pyarrow Table.
+
+        Numeric and date columns and the geometry buffers are wrapped without copying. The geometry column uses the
+        GeoArrow native encoding (nested lists of x/y coordinate pairs).
+
+        Returns:
+            pyarrow.Table: A table with one column per attribute field and a `geometry` column for layers with
+            geometries.
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("toArrow requires pyarrow, install it with 'pip install pyarrow'.")
+
+        arrays = []
+        names = []
+        for name, column in self.columns.items():
+            valid = self.validity(name)
+            mask = None if valid.all() else ~valid
+            if column.dtype == object:
+                try:
+                    arrays.append(pa.array(column, mask=mask, from_pandas=True))
+                except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                    # A column widened to hold values of mixed types, or integers beyond int64, becomes a string column
+                    strings = [None if value is None else str(value) for value in column]
+                    arrays.append(pa.array(strings, type=pa.string(), mask=mask))
+            else:
+                arrays.append(pa.array(column, mask=mask))
+            names.append(name)
+
+        if self.geometryType:
+            arrays.append(self.geometryToArrow())
+            names.append("geometry")
+        return pa.Table.from_arrays(arrays, names=names)
+
+    def geometryToArrow(self):
+        """
+        Converts the geometries to a GeoArrow encoded pyarrow array that wraps the numpy coordinate array.
+
+        Points become `fixed_size_list<double>[2]` (null for features without geometry), multipoints become lists of
+        points, and polylines and polygons become lists of paths or rings. Features without geometry become empty
+        lists for the list based types.
+
+        Returns:
+            pyarrow.Array: The geometry column.
+        """
+        import pyarrow as pa
+
+        coordinates = self.coordinates
+        if self.geometryType == "esriGeometryPoint":
+            hasGeometry = np.diff(self.geometryOffsets) > 0
+            if hasGeometry.all():
+                return pa.FixedSizeListArray.from_arrays(pa.array(coordinates.reshape(-1)), 2)
+            # Spread the coordinates over all features, leaving NaN for features without geometry
+            allCoordinates = np.full((self._length, 2), np.nan)
+            allCoordinates[hasGeometry] = coordinates
+            return pa.FixedSizeListArray.from_arrays(pa.array(allCoordinates.reshape(-1)), 2,
+                                                     mask=pa.array(~hasGeometry))
+
+        points = pa.FixedSizeListArray.from_arrays(pa.array(coordinates.reshape(-1)), 2)
+        if self.geometryType == "esriGeometryMultipoint":
+            # Every part of a multipoint is a single coordinate, so the geometry offsets index the points directly
+            return pa.ListArray.from_arrays(pa.array(self.geometryOffsets.astype(np.int32)), points)
+        parts = pa.ListArray.from_arrays(pa.array(self.partOffsets.astype(np.int32)), points)
+        return pa.ListArray.from_arrays(pa.array(self.geometryOffsets.astype(np.int32)), parts)
@@ -0,0 +1,258 @@
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from .cache import catalogCache
+from .client import getDefaultClient
+from .core import (_buildCatalog, _checkServerError, _decodeJson, _extractFolders, _extractLayers, _extractServices,
+                   _mapServerUrl, _newTreeNode, _servicesUrl, _subfolderPaths, _versionUrl)
+from .exceptions import ArcGISError
+from .utils import checkBaseUrl, printError
+
+
+def iterFleetCatalog(baseUrls, maxWorkers=16, maxWorkersPerHost=4, hostTimeout=None, requestTimeout=30,
+                     includeLayers=True, client=None):
+    """
+    Crawls the catalogs of several ArcGIS servers concurrently, yielding the catalog of every server as soon as its
+    crawl has finished.
+
+    All servers share a single pool of `maxWorkers` threads. The folders, services and layers of every server are
+    fetched as separate requests, which are handed out round-robin over the servers, with at most
+    `maxWorkersPerHost` requests in flight to a single host. A slow server therefore only holds its own share of
+    the workers, and the other servers finish at their own pace. A server that fails, or does not finish within
+    `hostTimeout`, is reported with an error and the crawl of the other servers continues.
+
+    The catalogs of the servers that were crawled successfully are stored in the shared catalog cache, so later
+    calls to restGetFolders, restGetServices or restGetServiceType for these servers do not crawl them again.
+
+    Args:
+        baseUrls (iterable): The base URLs of the ArcGIS REST APIs.
+        maxWorkers (int): The maximum number of requests in flight over all servers.
+        maxWorkersPerHost (int): The maximum number of requests in flight to a single host.
+        hostTimeout (float, optional): The maximum time in seconds a server may take from its first request until
+        its crawl is complete. Defaults to no limit.
+        requestTimeout (float or tuple): The timeout in seconds of a single request, or a (connect, read) tuple.
+        includeLayers (bool): Fetch the layers of every MapServer service.
+        client (ArcGISClient, optional): The client sending the requests. Defaults to the default client. Use a
+        client with `poolConnections` of at least the number of hosts to keep a connection pool per host.
+
+    Yields:
+        dict: The catalog of a server: its `baseUrl`, `version`, `tree` (as returned by restGetTreeStructure),
+        `folders`, `services` (with the `layers` of every MapServer when `includeLayers` is set), the `error` that
+        stopped the crawl or None, and the `elapsed` time in seconds.
+
+    Raises:
+        InvalidUrlError: If a base URL is not valid.
+    """
+    if maxWorkers < 1 or maxWorkersPerHost < 1:
+        raise ValueError("The maxWorkers and maxWorkersPerHost must be positive numbers.")
+    client = client or getDefaultClient()
+    crawls = deque()
+    for baseUrl in dict.fromkeys(checkBaseUrl(baseUrl) for baseUrl in baseUrls):
+        crawls.append(_HostCrawl(baseUrl, includeLayers))
+    inFlight = {}
+    hostRequests = {}
+
+    def fetch(url):
+        return _fetchJson(client, url, requestTimeout)
+
+    executor = ThreadPoolExecutor(max_workers=maxWorkers)
+    try:
+        while crawls or inFlight:
+            # Hand out the queued requests round-robin, one per server per pass, within both budgets
+            dispatched = True
+            while dispatched and len(inFlight) < maxWorkers:
+                dispatched = False
+                for crawl in list(crawls):
+                    if len(inFlight) >= maxWorkers:
+                        break
+                    if not crawl.queue or hostRequests.get(crawl.host, 0) >= maxWorkersPerHost:
+                        continue
+                    task = crawl.queue.popleft()
+                    crawl.start()
+                    inFlight[executor.submit(fetch, task[1])] = (crawl, task)
+                    hostRequests[crawl.host] = hostRequests.get(crawl.host, 0) + 1
+                    dispatched = True
+
+            deadlines = [crawl.deadline(hostTimeout) for crawl in crawls if crawl.started is not None]
+            deadlines = [deadline for deadline in deadlines if deadline is not None]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            done = wait(list(inFlight), timeout=timeout, return_when=FIRST_COMPLETED)[0] if inFlight else ()
+
+            for future in done:
+                crawl, task = inFlight.pop(future)
+                hostRequests[crawl.host] -= 1
+                if crawl.finished:
+                    # The server already failed or timed out, the response is no longer needed
+                    continue
+                try:
+                    crawl.handle(task, future.result())
+                except Exception as e:
+                    crawl.fail(e)
+
+            for crawl in list(crawls):
+                if not crawl.finished and crawl.deadline(hostTimeout) is not None and \
+                        time.monotonic() >= crawl.deadline(hostTimeout):
+                    crawl.fail(ArcGISError(f"The crawl of {crawl.baseUrl} did not finish within {hostTimeout}s."))
+                if not crawl.finished and not crawl.queue and not crawl.pending(inFlight):
+                    crawl.complete()
+                if crawl.finished:
+                    crawls.remove(crawl)
+                    yield crawl.result()
+    finally:
+        for future in inFlight:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _fetchJson(client, url, timeout):
+    """
+    Fetches a JSON document, raising the errors of the request.
+
+    Args:
+        client (ArcGISClient): The client sending the request.
+        url (str): The URL of the document, including its format.
+        timeout (float or tuple): The timeout of the request.
+
+    Returns:
+        dict: The decoded document.
+
+    Raises:
+        ArcGISHttpError: If the server responds with an HTTP error status.
+        ArcGISServerError: If the server responds with an ArcGIS error document.
+        ArcGISError: If the server can not be reached.
+    """
+    try:
+        response = client.get(url, timeout=timeout)
+        response.raise_for_status()
+        return _checkServerError(_decodeJson(response), url)
+    except requests.exceptions.HTTPError as e:
+        printError(f"httpError{e.response.status_code}", url)
+    except requests.exceptions.RequestException as e:
+        printError("requestException", f"{e} ({url})")
+
+
+class _HostCrawl:
+    """
+    The state of the crawl of a single server in iterFleetCatalog. Its methods are only called from the thread
+    running the crawl, the workers only send the requests.
+
+    Args:
+        baseUrl (str): The validated base URL of the server.
+        includeLayers (bool): Fetch the layers of every MapServer service.
+    """
+
+    def __init__(self, baseUrl, includeLayers):
+        self.baseUrl = baseUrl
+        self.host = urlsplit(baseUrl).netloc.lower()
+        self.includeLayers = includeLayers
+        self.tree = None
+        self.version = None
+        self.layers = {}
+        self.error = None
+        self.started = None
+        self.finished = False
+        self._elapsed = None
+        # The requests that were not sent yet: (kind, url, target)
+        self.queue = deque([("version", _versionUrl(baseUrl), None), ("folder", _servicesUrl(baseUrl), "/")])
+
+    def start(self):
+        if self.started is None:
+            self.started = time.monotonic()
+
+    def deadline(self, hostTimeout):
+        if hostTimeout is None or self.started is None:
+            return None
+        return self.started + hostTimeout
+
+    def pending(self, inFlight):
+        return any(crawl is self for crawl, _ in inFlight.values())
+
+    def handle(self, task, data):
+        """
+        Processes the response of a request, queueing the requests for the subfolders and services it lists.
+        """
+        kind, _, target = task
+        if kind == "version":
+            self.version = data.get("currentVersion")
+        elif kind == "folder":
+            if target == "/":
+                node = self.tree = _newTreeNode(data, "/")
+            else:
+                node = target
+                node["services"] = data.get("services", [])
+            currentPath = node["name"]
+            # The child nodes are created in listing order, so the tree has the order of a sequential crawl
+            for subfolderPath in _subfolderPaths(data, currentPath):
+                childNode = _newTreeNode({}, f"/{subfolderPath}")
+                node["folders"].append(childNode)
+                self.queue.append(("folder", _servicesUrl(self.baseUrl, subfolderPath), childNode))
+            if self.includeLayers:
+                for service in node["services"]:
+                    if isinstance(service, dict) and service.get("type") == "MapServer":
+                        self.queue.append(("layers", f"{_mapServerUrl(self.baseUrl, service['name'])}?f=json",
+                                           service["name"]))
+        else:
+            self.layers[target] = _extractLayers(data)
+
+    def fail(self, error):
+        self.error = error
+        self.queue.clear()
+        self._finish()
+
+    def complete(self):
+        catalogCache.set(self.baseUrl, _buildCatalog(self.tree))
+        self._finish()
+
+    def _finish(self):
+        self.finished = True
+        self._elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+
+    def result(self):
+        """
+        Returns the catalog of the server, see iterFleetCatalog.
+        """
+        if self.error is not None:
+            return {"baseUrl": self.baseUrl, "version": self.version, "tree": None, "folders": None,
+                    "services": None, "error": str(self.error), "elapsed": self._elapsed}
+        services = [dict(service, layers=self.layers[service["name"]])
+                    if isinstance(service, dict) and service.get("name") in self.layers else service
+                    for service in _extractServices(self.tree)]
+        return {"baseUrl": self.baseUrl, "version": self.version, "tree": self.tree,
+                "folders": _extractFolders(self.tree), "services": services, "error": None,
+                "elapsed": self._elapsed}
+
+
+def restGetFleetCatalog(baseUrls, maxWorkers=16, maxWorkersPerHost=4, hostTimeout=None, requestTimeout=30,
+                        includeLayers=True, client=None):
+    """
+    Crawls the catalogs of several ArcGIS servers concurrently, see iterFleetCatalog.
+
+    Args:
+        baseUrls (iterable): The base URLs of the ArcGIS REST APIs.
+        maxWorkers (int): The maximum number of requests in flight over all servers.
+        maxWorkersPerHost (int): The maximum number of requests in flight to a single host.
+        hostTimeout (float, optional): The maximum time in seconds the crawl of a single server may take.
+        requestTimeout (float or tuple): The timeout in seconds of a single request.
+        includeLayers (bool): Fetch the layers of every MapServer service.
+        client (ArcGISClient, optional): The client sending the requests.
+
+    Returns:
+        dict: The catalogs of the servers, by validated base URL, in the order of `baseUrls`.
+    """
+    baseUrls = [checkBaseUrl(baseUrl) for baseUrl in baseUrls]
+    catalogs = {catalog["baseUrl"]: catalog for catalog in iterFleetCatalog(
+        baseUrls, maxWorkers, maxWorkersPerHost, hostTimeout, requestTimeout, includeLayers, client)}
+    return {baseUrl: catalogs[baseUrl] for baseUrl in baseUrls}
+
+
+# Synonym function for restGetFleetCatalog
+def getFleetCatalog(baseUrls, maxWorkers=16, maxWorkersPerHost=4, hostTimeout=None, requestTimeout=30,
+                    includeLayers=True, client=None):
+    """
+    synonym for restGetFleetCatalog
+    """
+    return restGetFleetCatalog(baseUrls, maxWorkers, maxWorkersPerHost, hostTimeout, requestTimeout, includeLayers,
+                               client)
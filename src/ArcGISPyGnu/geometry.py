@@ -0,0 +1,131 @@
+import struct
+
+
+def esriToGeoJson(geometry):
+    """
+    Converts an Esri JSON geometry to a GeoJSON geometry.
+
+    Polygon rings are grouped into polygons by their orientation: in Esri JSON outer rings are clockwise and holes are
+    counterclockwise, and every hole belongs to the outer ring preceding it. The rings are reversed to follow the
+    right-hand rule of RFC 7946.
+
+    Args:
+        geometry (dict): The Esri JSON geometry of a feature (point, multipoint, polyline or polygon), or None.
+
+    Returns:
+        dict: The GeoJSON geometry, or None for a missing or empty geometry.
+    """
+    if not geometry:
+        return None
+
+    if "x" in geometry:
+        if geometry["x"] is None:
+            return None
+        coordinates = [geometry["x"], geometry["y"]]
+        if geometry.get("z") is not None:
+            coordinates.append(geometry["z"])
+        return {"type": "Point", "coordinates": coordinates}
+
+    if "points" in geometry:
+        if not geometry["points"]:
+            return None
+        return {"type": "MultiPoint", "coordinates": geometry["points"]}
+
+    if "paths" in geometry:
+        paths = geometry["paths"]
+        if not paths:
+            return None
+        if len(paths) == 1:
+            return {"type": "LineString", "coordinates": paths[0]}
+        return {"type": "MultiLineString", "coordinates": paths}
+
+    if "rings" in geometry:
+        polygons = []
+        for ring in geometry["rings"]:
+            if _isClockwise(ring) or not polygons:
+                polygons.append([list(reversed(ring))])
+            else:
+                polygons[-1].append(list(reversed(ring)))
+        if not polygons:
+            return None
+        if len(polygons) == 1:
+            return {"type": "Polygon", "coordinates": polygons[0]}
+        return {"type": "MultiPolygon", "coordinates": polygons}
+
+    return None
+
+
+def _isClockwise(ring):
+    """
+    Determines the orientation of a ring with the shoelace formula.
+
+    Args:
+        ring (list): The coordinates of the ring.
+
+    Returns:
+        bool: True if the ring is clockwise.
+    """
+    area = 0.0
+    for index in range(len(ring) - 1):
+        area += (ring[index + 1][0] - ring[index][0]) * (ring[index + 1][1] + ring[index][1])
+    return area > 0
+
+
+# WKB geometry type codes
+_wkbTypes = {
+    "Point": 1,
+    "LineString": 2,
+    "Polygon": 3,
+    "MultiPoint": 4,
+    "MultiLineString": 5,
+    "MultiPolygon": 6,
+}
+
+
+def geoJsonToWkb(geometry):
+    """
+    Encodes a GeoJSON geometry as little-endian two-dimensional Well-Known Binary.
+
+    Args:
+        geometry (dict): The GeoJSON geometry, or None.
+
+    Returns:
+        bytes: The WKB encoded geometry, or None for a missing geometry.
+    """
+    if geometry is None:
+        return None
+    parts = []
+    _writeWkb(parts, geometry["type"], geometry["coordinates"])
+    return b"".join(parts)
+
+
+def _writeWkb(parts, geometryType, coordinates):
+    parts.append(struct.pack("<BI", 1, _wkbTypes[geometryType]))
+    if geometryType == "Point":
+        parts.append(struct.pack("<2d", coordinates[0], coordinates[1]))
+    elif geometryType == "LineString":
+        _writePoints(parts, coordinates)
+    elif geometryType == "Polygon":
+        parts.append(struct.pack("<I", len(coordinates)))
+        for ring in coordinates:
+            _writePoints(parts, ring)
+    else:
+        memberType = geometryType[len("Multi"):]
+        parts.append(struct.pack("<I", len(coordinates)))
+        for member in coordinates:
+            _writeWkb(parts, memberType, member)
+
+
+def _writePoints(parts, points):
+    parts.append(struct.pack("<I", len(points)))
+    for point in points:
+        parts.append(struct.pack("<2d", point[0], point[1]))
+
+
+# GeoJSON geometry types that can occur for each Esri geometry type
+esriGeometryTypes = {
+    "esriGeometryPoint": ["Point"],
+    "esriGeometryMultipoint": ["MultiPoint"],
+    "esriGeometryPolyline": ["LineString", "MultiLineString"],
+    "esriGeometryPolygon": ["Polygon", "MultiPolygon"],
+}
@@ -0,0 +1,284 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .scheduler import _errorDocumentPattern
+
+# The last path segments of the operations whose responses are data rather than catalog or metadata documents. They
+# are not cached unless the cache is created with cacheQueries=True.
+queryOperations = frozenset({"query", "queryRelatedRecords", "queryAttachments", "queryTopFeatures", "identify", "find",
+                             "export", "exportTiles"})
+
+
+class CacheMissError(requests.ConnectionError):
+    """
+    Raised in offline (replay only) mode when a request is not available in the cache.
+    """
+
+
+class HttpCache:
+    """
+    A persistent, SQLite backed cache of HTTP responses, shared between processes.
+
+    Responses are keyed by their normalized URL and query parameters. A cached response is served without contacting
+    the server while it is younger than `ttl` seconds. After that it is revalidated with the `ETag` and
+    `Last-Modified` validators the server sent, when present, so an unchanged document costs a `304 Not Modified`
+    instead of a full download. The cache is bounded to `maxBytes` of response bodies, evicting the least recently
+    used responses first.
+
+    Only catalog and metadata documents (the services directory, folders, services and layer details) are cached by
+    default. The responses of query operations such as `/query` hold data that changes with the features of a layer,
+    and bulk pages of features would fill the cache, so they are sent to the server unless `cacheQueries` is True.
+
+    Args:
+        path (str): The path of the SQLite database file. It is created when it does not exist.
+        ttl (float): The number of seconds a cached response is served without revalidation.
+        maxBytes (int): The maximum total size of the cached response bodies.
+        offline (bool): Replay only mode: never contact the server, serve cached responses regardless of their age and
+        raise CacheMissError for requests that are not cached.
+        cacheQueries (bool): Cache the responses of query operations as well (see `queryOperations`).
+    """
+
+    def __init__(self, path, ttl=3600, maxBytes=256 * 1024 * 1024, offline=False, cacheQueries=False):
+        self.path = path
+        self.ttl = ttl
+        self.maxBytes = maxBytes
+        self.offline = offline
+        self.cacheQueries = cacheQueries
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT, body BLOB, size INTEGER, "
+                "storedAt REAL, accessedAt REAL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responsesAccessedAt ON responses (accessedAt)")
+
+    @staticmethod
+    def makeKey(url, params=None):
+        """
+        Builds the normalized cache key of a request.
+
+        The scheme and host are lowercased, repeated slashes in the path are collapsed and the query parameters of the
+        URL and `params` are merged and sorted, so equivalent requests share one cache entry.
+
+        Args:
+            url (str): The URL of the request.
+            params (dict, optional): The query string parameters of the request.
+
+        Returns:
+            str: The cache key.
+        """
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        if params:
+            query.extend((str(key), str(value)) for key, value in params.items() if value is not None)
+        path = re.sub(r"/{2,}", "/", parts.path)
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ""))
+
+    def isCacheable(self, url):
+        """
+        Determines whether the responses of a URL are cached.
+
+        Args:
+            url (str): The URL of the request.
+
+        Returns:
+            bool: False for query operations (see `queryOperations`), unless the cache was created with
+            `cacheQueries=True`.
+        """
+        if self.cacheQueries:
+            return True
+        return urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1] not in queryOperations
+
+    def get(self, key):
+        """
+        Returns a cached response entry.
+
+        Args:
+            key (str): The cache key, see makeKey.
+
+        Returns:
+            dict: The entry with `url`, `status`, `headers`, `body` and `storedAt`, or None when not cached.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT url, status, headers, body, storedAt FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            with self._connection:
+                self._connection.execute("UPDATE responses SET accessedAt = ? WHERE key = ?", (time.time(), key))
+        return {"url": row[0], "status": row[1], "headers": json.loads(row[2]), "body": row[3], "storedAt": row[4]}
+
+    def isFresh(self, entry):
+        """
+        Determines whether a cached entry can be served without revalidation.
+
+        Args:
+            entry (dict): The entry as returned by get.
+
+        Returns:
+            bool: True if the entry is younger than the time-to-live.
+        """
+        return self.ttl is None or time.time() - entry["storedAt"] <= self.ttl
+
+    def store(self, key, response):
+        """
+        Stores a successful response, evicting the least recently used responses when the cache is full.
+
+        Args:
+            key (str): The cache key, see makeKey.
+            response (requests.Response): The response to store.
+        """
+        body = response.content
+        # ArcGIS reports errors as JSON documents with a 200 status, those must not be replayed
+        if _errorDocumentPattern.match(body[:64]):
+            return
+        headers = {name: response.headers[name] for name in ("Content-Type", "ETag", "Last-Modified")
+                   if name in response.headers}
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, url, status, headers, body, size, storedAt, accessedAt) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, response.url, response.status_code, json.dumps(headers), body, len(body), now, now),
+            )
+            self._evict()
+
+    def refresh(self, key):
+        """
+        Marks a cached response as fresh again, after the server confirmed it did not change.
+
+        Args:
+            key (str): The cache key, see makeKey.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE responses SET storedAt = ?, accessedAt = ? WHERE key = ?",
+                                     (now, now, key))
+
+    def _evict(self):
+        totalSize = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if totalSize <= self.maxBytes:
+            return
+        for key, size in self._connection.execute("SELECT key, size FROM responses ORDER BY accessedAt").fetchall():
+            self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            totalSize -= size
+            if totalSize <= self.maxBytes:
+                break
+
+    def clear(self):
+        """
+        Removes all cached responses.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+    def stats(self):
+        """
+        Returns the counters and size of the cache.
+
+        Returns:
+            dict: The number of hits, misses, revalidations, cached entries and cached bytes.
+        """
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "entries": entries,
+                "bytes": size,
+            }
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self._connection.close()
+
+    def toResponse(self, entry):
+        """
+        Rebuilds a requests Response from a cached entry.
+
+        Args:
+            entry (dict): The entry as returned by get.
+
+        Returns:
+            requests.Response: The response, with an additional `fromCache` attribute set to True.
+        """
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = "OK"
+        response.url = entry["url"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = entry["body"]
+        response.fromCache = True
+        return response
+
+    def send(self, url, params, sendRequest):
+        """
+        Serves a GET request from the cache, revalidating or fetching it through `sendRequest` when needed.
+
+        Args:
+            url (str): The URL of the request.
+            params (dict): The query string parameters of the request.
+            sendRequest (callable): A function receiving a dictionary of extra request headers and returning the
+            requests.Response of the server.
+
+        Returns:
+            requests.Response: The cached or fresh response.
+
+        Raises:
+            CacheMissError: In offline mode, when the request is not cached or not cacheable.
+        """
+        if not self.isCacheable(url):
+            if self.offline:
+                raise CacheMissError(f"Responses of {url} are not cached, create the cache with cacheQueries=True.")
+            return sendRequest({})
+
+        key = self.makeKey(url, params)
+        entry = self.get(key)
+        if entry is not None and (self.offline or self.isFresh(entry)):
+            with self._lock:
+                self.hits += 1
+            return self.toResponse(entry)
+        if self.offline:
+            with self._lock:
+                self.misses += 1
+            raise CacheMissError(f"No cached response for {key} in offline mode.")
+
+        validators = {}
+        if entry is not None:
+            if "ETag" in entry["headers"]:
+                validators["If-None-Match"] = entry["headers"]["ETag"]
+            if "Last-Modified" in entry["headers"]:
+                validators["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+
+        response = sendRequest(validators)
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                self.revalidations += 1
+            self.refresh(key)
+            return self.toResponse(entry)
+
+        with self._lock:
+            self.misses += 1
+        if response.status_code == 200:
+            self.store(key, response)
+        return response
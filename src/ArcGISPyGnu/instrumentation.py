@@ -0,0 +1,444 @@
+import bisect
+import re
+import threading
+import time
+import warnings
+from urllib.parse import urlsplit
+
+# The path segments that end the service name in an ArcGIS REST URL
+_serviceTypePattern = re.compile(
+    r"/(MapServer|FeatureServer|ImageServer|GPServer|GeocodeServer|GeometryServer|NAServer|SceneServer|"
+    r"VectorTileServer|StreamServer|GlobeServer|MobileServer|SchematicsServer|UtilityNetworkServer)(?=/|$)"
+)
+
+# The upper bounds of the latency histogram buckets, in seconds
+defaultBuckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def urlTemplate(url):
+    """
+    Reduces the URL of a request to its template, replacing folder, service and layer names with placeholders, so
+    requests to the same kind of endpoint can be grouped.
+
+    Args:
+        url (str): The URL of the request.
+
+    Returns:
+        tuple: The endpoint kind ("catalog", "details", "query" or "other") and the URL template, for example
+        ("query", "/arcgis/rest/services/{service}/MapServer/{layerId}/query").
+    """
+    path = re.sub(r"/{2,}", "/", urlsplit(url).path).rstrip("/")
+    prefix, separator, rest = path.partition("/services")
+    if not separator or (rest and not rest.startswith("/")):
+        return "other", path or "/"
+
+    match = _serviceTypePattern.search(rest)
+    if match is None:
+        return "catalog", f"{prefix}/services" + ("/{folder}" if rest else "")
+
+    operation = re.sub(r"/\d+(?=/|$)", "/{layerId}", rest[match.end():])
+    kind = "query" if operation.endswith("/query") else "details"
+    return kind, f"{prefix}/services/{{service}}/{match.group(1)}{operation}"
+
+
+class RequestEvent:
+    """
+    The measurements of a single request, handed to the listeners of an `Instrumentation`.
+
+    The latency of a request is broken down in `waitTime`, the time spent waiting for a slot of the concurrency limiter
+    of the host and for retries, `firstByteTime`, the time from sending the final attempt until its response headers
+    arrived (including DNS resolution, connecting and the TLS handshake when no pooled connection was available, and
+    the processing time of the server), `downloadTime`, the time to download the body, and `parseTime`, the time to
+    decode the JSON body. Times are in seconds and None when they do not apply, for example for responses served from
+    a response cache.
+
+    Attributes:
+        url (str): The URL of the request.
+        params (dict): The query string parameters of the request.
+        endpointKind (str): "catalog", "details" (service and layer details), "query" (layer queries) or "other".
+        urlTemplate (str): The path of the URL with folder, service and layer names replaced by placeholders.
+        startTime (float): The wall clock time the request started, in seconds since the epoch.
+        status (int): The HTTP status of the response.
+        bytes (int): The size of the decompressed response body.
+        retries (int): The number of retries of the request.
+        fromCache (bool): Whether the response was served from a response cache.
+        error (Exception): The exception raised by the request, if it failed.
+        totalTime (float): The duration of the request, excluding JSON decoding.
+        coalesced (bool): Whether the event is the copy handed to a caller that shared the request of another caller
+        (see `ArcGISClient`). Listeners receive the events of the request itself only.
+        context (dict): Storage for listeners that need to keep state between the callbacks of one request.
+    """
+
+    __slots__ = ("url", "params", "endpointKind", "urlTemplate", "startTime", "status", "bytes", "retries",
+                 "fromCache", "error", "waitTime", "firstByteTime", "downloadTime", "parseTime", "totalTime",
+                 "coalesced", "context", "instrumentation")
+
+    def __init__(self, url, params, instrumentation):
+        self.url = url
+        self.params = params
+        self.endpointKind, self.urlTemplate = urlTemplate(url)
+        self.startTime = time.time()
+        self.status = None
+        self.bytes = None
+        self.retries = 0
+        self.fromCache = False
+        self.error = None
+        self.waitTime = 0.0
+        self.firstByteTime = None
+        self.downloadTime = None
+        self.parseTime = None
+        self.totalTime = None
+        self.coalesced = False
+        self.context = {}
+        self.instrumentation = instrumentation
+
+    def coalescedCopy(self):
+        """
+        Returns a copy of the event for a caller that shared the request, so its decoding is measured on its own copy
+        and not reported to the listeners a second time.
+
+        Returns:
+            RequestEvent: The copy, with `coalesced` set.
+        """
+        event = RequestEvent.__new__(RequestEvent)
+        for name in self.__slots__:
+            setattr(event, name, getattr(self, name))
+        event.coalesced = True
+        event.context = {}
+        return event
+
+    def toDict(self):
+        """
+        Returns the measurements as a dictionary.
+
+        Returns:
+            dict: The attributes of the event, without the listener context.
+        """
+        return {name: getattr(self, name) for name in self.__slots__ if name not in ("context", "instrumentation")}
+
+
+class RequestListener:
+    """
+    Base class of instrumentation listeners. Subclasses override the callbacks they need; all callbacks may be called
+    from several threads at the same time.
+    """
+
+    def onRequestStart(self, event):
+        """
+        Called before a request is sent.
+
+        Args:
+            event (RequestEvent): The event of the request, with its URL and parameters.
+        """
+
+    def onRequestEnd(self, event):
+        """
+        Called when a request completed or failed, after the response body was downloaded.
+
+        Args:
+            event (RequestEvent): The event of the request, with its status, size and latency breakdown.
+        """
+
+    def onResponseParsed(self, event):
+        """
+        Called when the library decoded the JSON body of a response, with `parseTime` set.
+
+        Args:
+            event (RequestEvent): The event of the request.
+        """
+
+
+class Instrumentation:
+    """
+    Dispatches the events of the requests of a client to the registered listeners.
+
+    Without listeners the clients skip all measurements, so disabled instrumentation costs a single attribute check
+    per request. A listener that raises an exception is reported with a warning and does not affect the request.
+    """
+
+    def __init__(self):
+        # Replaced, never modified, so requests can iterate over it without a lock
+        self.listeners = ()
+        self._lock = threading.Lock()
+
+    def addListener(self, listener):
+        """
+        Registers a listener.
+
+        Args:
+            listener (RequestListener): The listener.
+
+        Returns:
+            RequestListener: The listener, so it can be created and registered in one statement.
+        """
+        with self._lock:
+            self.listeners = self.listeners + (listener,)
+        return listener
+
+    def removeListener(self, listener):
+        """
+        Unregisters a listener.
+
+        Args:
+            listener (RequestListener): The listener.
+        """
+        with self._lock:
+            self.listeners = tuple(registered for registered in self.listeners if registered is not listener)
+
+    def requestStarted(self, event):
+        """
+        Calls the `onRequestStart` callback of every listener.
+        """
+        self._dispatch("onRequestStart", event)
+
+    def requestFinished(self, event):
+        """
+        Calls the `onRequestEnd` callback of every listener.
+        """
+        self._dispatch("onRequestEnd", event)
+
+    def responseParsed(self, event):
+        """
+        Calls the `onResponseParsed` callback of every listener.
+        """
+        self._dispatch("onResponseParsed", event)
+
+    def _dispatch(self, callback, event):
+        for listener in self.listeners:
+            try:
+                getattr(listener, callback)(event)
+            except Exception as e:
+                warnings.warn(f"Instrumentation listener {listener!r} failed in {callback}: {e}", RuntimeWarning)
+
+
+# The instrumentation used by clients that were not given their own
+defaultInstrumentation = Instrumentation()
+
+
+def addListener(listener):
+    """
+    Registers a listener with the default instrumentation, used by all clients that were not given their own.
+
+    Args:
+        listener (RequestListener): The listener.
+
+    Returns:
+        RequestListener: The listener.
+    """
+    return defaultInstrumentation.addListener(listener)
+
+
+def removeListener(listener):
+    """
+    Unregisters a listener from the default instrumentation.
+
+    Args:
+        listener (RequestListener): The listener.
+    """
+    defaultInstrumentation.removeListener(listener)
+
+
+class Histogram:
+    """
+    A histogram of durations with fixed buckets.
+
+    Args:
+        buckets (tuple): The upper bounds of the buckets, in seconds. Larger values are counted in an overflow bucket.
+    """
+
+    def __init__(self, buckets=defaultBuckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        """
+        Adds a value to the histogram.
+
+        Args:
+            value (float): The value.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Estimates a quantile as the upper bound of the bucket it falls in.
+
+        Args:
+            q (float): The quantile, between 0 and 1.
+
+        Returns:
+            float: The estimate, or None for an empty histogram.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank and count:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self):
+        """
+        Returns the state of the histogram.
+
+        Returns:
+            dict: The `count`, `sum`, `min`, `max`, `mean`, estimated `p50`, `p90` and `p99`, and the `buckets` as
+            (upper bound, count) pairs, with None as the bound of the overflow bucket.
+        """
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": list(zip(self.buckets + (None,), self.counts)),
+        }
+
+
+class MetricsCollector(RequestListener):
+    """
+    A listener that keeps counters and latency histograms per endpoint kind ("catalog", "details", "query" and
+    "other").
+
+    Args:
+        buckets (tuple): The upper bounds of the histogram buckets, in seconds.
+    """
+
+    # The latency components with a histogram, and the event attributes they are taken from
+    _components = {"latency": "totalTime", "wait": "waitTime", "firstByte": "firstByteTime",
+                   "download": "downloadTime"}
+
+    def __init__(self, buckets=defaultBuckets):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _kindMetrics(self, kind):
+        metrics = self._metrics.get(kind)
+        if metrics is None:
+            metrics = self._metrics[kind] = {
+                "requests": 0, "errors": 0, "retries": 0, "bytes": 0, "cacheHits": 0, "statuses": {},
+                "histograms": {name: Histogram(self.buckets) for name in list(self._components) + ["parse"]},
+            }
+        return metrics
+
+    def onRequestEnd(self, event):
+        with self._lock:
+            metrics = self._kindMetrics(event.endpointKind)
+            metrics["requests"] += 1
+            metrics["retries"] += event.retries
+            metrics["bytes"] += event.bytes or 0
+            if event.fromCache:
+                metrics["cacheHits"] += 1
+            if event.error is not None or (event.status or 0) >= 400:
+                metrics["errors"] += 1
+            if event.status is not None:
+                metrics["statuses"][event.status] = metrics["statuses"].get(event.status, 0) + 1
+            for name, attribute in self._components.items():
+                value = getattr(event, attribute)
+                if value is not None:
+                    metrics["histograms"][name].observe(value)
+
+    def onResponseParsed(self, event):
+        with self._lock:
+            self._kindMetrics(event.endpointKind)["histograms"]["parse"].observe(event.parseTime)
+
+    def snapshot(self):
+        """
+        Returns the collected metrics.
+
+        Returns:
+            dict: The endpoint kinds mapped to their `requests`, `errors`, `retries`, `bytes`, `cacheHits`, counts per
+            HTTP status (`statuses`) and histogram snapshots of the `latency`, `wait`, `firstByte`, `download` and
+            `parse` times.
+        """
+        with self._lock:
+            snapshot = {}
+            for kind, metrics in self._metrics.items():
+                snapshot[kind] = {name: (dict(value) if name == "statuses" else value)
+                                  for name, value in metrics.items() if name != "histograms"}
+                for name, histogram in metrics["histograms"].items():
+                    snapshot[kind][name] = histogram.snapshot()
+            return snapshot
+
+    def reset(self):
+        """
+        Discards the collected metrics.
+        """
+        with self._lock:
+            self._metrics = {}
+
+
+class OpenTelemetryListener(RequestListener):
+    """
+    A listener that records every request as an OpenTelemetry client span, following the HTTP semantic conventions.
+
+    Args:
+        tracer (opentelemetry.trace.Tracer, optional): The tracer creating the spans. Defaults to the tracer named
+        "ArcGISPyGnu" of the global tracer provider.
+
+    Raises:
+        ImportError: If no tracer is given and opentelemetry-api is not installed.
+    """
+
+    def __init__(self, tracer=None):
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            if tracer is None:
+                raise ImportError("OpenTelemetryListener requires opentelemetry-api, install it with "
+                                  "'pip install opentelemetry-api'.")
+            trace = None
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer("ArcGISPyGnu")
+
+    def onRequestStart(self, event):
+        parts = urlsplit(event.url)
+        attributes = {
+            "http.request.method": "GET",
+            "url.full": event.url,
+            "url.template": event.urlTemplate,
+            "server.address": parts.hostname,
+            "arcgis.endpoint.kind": event.endpointKind,
+        }
+        if parts.port:
+            attributes["server.port"] = parts.port
+        spanOptions = {"attributes": attributes}
+        if self._trace is not None:
+            spanOptions["kind"] = self._trace.SpanKind.CLIENT
+        event.context[self] = self.tracer.start_span(f"GET {event.urlTemplate}", **spanOptions)
+
+    def onRequestEnd(self, event):
+        span = event.context.get(self)
+        if span is None:
+            return
+        if event.status is not None:
+            span.set_attribute("http.response.status_code", event.status)
+        if event.bytes is not None:
+            span.set_attribute("http.response.body.size", event.bytes)
+        if event.retries:
+            span.set_attribute("http.request.resend_count", event.retries)
+        if event.fromCache:
+            span.set_attribute("arcgis.from_cache", True)
+        if event.error is not None:
+            span.record_exception(event.error)
+            span.set_attribute("error.type", type(event.error).__name__)
+        elif event.status is not None and event.status >= 400:
+            span.set_attribute("error.type", str(event.status))
+        if self._trace is not None and (event.error is not None or (event.status or 0) >= 400):
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+        # The span covers sending the request and downloading the response, decoding the JSON body happens later
+        span.end()
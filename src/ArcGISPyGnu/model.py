@@ -0,0 +1,395 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .client import getDefaultClient
+from .core import (_checkServerError, _decodeJson, _getLayerDetails, _iterMapLayerData, _servicesUrl,
+                   restGetMapServerDetails, restGetMapServerLayerDetails)
+from .utils import checkBaseUrl, printError
+
+
+class _Node:
+    """
+    The base class of the nodes of the object model. A node fetches its JSON document on first access and keeps it.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self._json = None
+        self._lock = threading.Lock()
+
+    @property
+    def json(self):
+        """
+        dict: The JSON document of the node, fetched on first access.
+        """
+        if self._json is None:
+            with self._lock:
+                if self._json is None:
+                    self._json = self._fetch()
+        return self._json
+
+    @property
+    def loaded(self):
+        """
+        bool: True when the JSON document of the node has been fetched.
+        """
+        return self._json is not None
+
+    def refresh(self):
+        """
+        Forgets the JSON document of the node, so it is fetched again on the next access.
+
+        Returns:
+            The node itself.
+        """
+        with self._lock:
+            self._json = None
+        return self
+
+    def prefetch(self, depth=1, maxWorkers=8):
+        """
+        Fetches the JSON documents of the node and of its descendants, level by level, in parallel.
+
+        The levels below a server or folder are its folders and services, and below a service its layers and tables.
+        The layers of a MapServer are fetched with a single request (see restGetMapServerLayerDetails).
+
+        Args:
+            depth (int, optional): The number of levels below the node to fetch. Use 0 to fetch the node only and
+            None to fetch every level.
+            maxWorkers (int): The number of documents fetched in parallel.
+
+        Returns:
+            The node itself.
+
+        Raises:
+            ArcGISHttpError: If the server responds with an HTTP error status.
+            ArcGISServerError: If the server responds with an ArcGIS error document.
+            ArcGISError: If the server can not be reached.
+        """
+        nodes = [self]
+        level = 0
+        with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            while nodes:
+                list(executor.map(lambda node: node.json, nodes))
+                if depth is not None and level >= depth:
+                    break
+                list(executor.map(lambda node: node._prefetchChildren(), nodes))
+                nodes = [child for node in nodes for child in node._children()]
+                level += 1
+        return self
+
+    def _fetch(self):
+        return _fetchJson(f"{self.url}?f=json")
+
+    def _children(self):
+        return []
+
+    def _prefetchChildren(self):
+        """
+        Fetches the documents of the children in bulk, for nodes that can do better than one request per child.
+        """
+
+
+class Server(_Node):
+    """
+    The services directory of an ArcGIS server, the root of a lazy object model of its folders, services and layers.
+
+    Nothing is fetched when a node is created: `Server(url).folder("Utilities").service("Water").layer(3)` does not
+    send a request, and the layer details are fetched when they are first used. Every node fetches its JSON document
+    on first access and keeps it, so a targeted lookup costs a few requests instead of a crawl of the whole server.
+    Nodes are created once per server, so documents fetched through one path are reused through any other path.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+
+    Raises:
+        InvalidUrlError: If the base URL is invalid.
+    """
+
+    def __init__(self, baseUrl):
+        self.baseUrl = checkBaseUrl(baseUrl)
+        super().__init__(f"{self.baseUrl}/services")
+        self._folders = {}
+        self._services = {}
+        self._nodesLock = threading.Lock()
+
+    def __repr__(self):
+        return f"Server({self.baseUrl!r})"
+
+    @property
+    def version(self):
+        """
+        float: The version of the server.
+        """
+        return self.json.get("currentVersion")
+
+    @property
+    def folders(self):
+        """
+        list: The folders of the root directory.
+        """
+        return [self.folder(name) for name in self.json.get("folders", [])]
+
+    @property
+    def services(self):
+        """
+        list: The services of the root directory.
+        """
+        return [self.service(service["name"], service.get("type")) for service in self.json.get("services", [])]
+
+    def folder(self, path):
+        """
+        Returns a folder, without fetching it.
+
+        Args:
+            path (str): The path of the folder, such as "Utilities" or "Utilities/Water".
+
+        Returns:
+            Folder: The folder.
+        """
+        path = path.strip("/")
+        with self._nodesLock:
+            if path not in self._folders:
+                self._folders[path] = Folder(self, path)
+            return self._folders[path]
+
+    def service(self, name, serviceType="MapServer"):
+        """
+        Returns a service, without fetching it.
+
+        Args:
+            name (str): The full name of the service, including its folder, such as "Utilities/Water".
+            serviceType (str): The type of the service. Defaults to "MapServer".
+
+        Returns:
+            Service: The service.
+        """
+        key = (name.strip("/"), serviceType)
+        with self._nodesLock:
+            if key not in self._services:
+                self._services[key] = Service(self, *key)
+            return self._services[key]
+
+    def _fetch(self):
+        return _fetchJson(_servicesUrl(self.baseUrl))
+
+    def _children(self):
+        return self.folders + self.services
+
+
+class Folder(_Node):
+    """
+    A folder of the services directory of a server. Folders are created with `Server.folder` or `Folder.folder`.
+
+    Args:
+        server (Server): The server of the folder.
+        path (str): The path of the folder.
+    """
+
+    def __init__(self, server, path):
+        super().__init__(f"{server.baseUrl}/services/{path}")
+        self.server = server
+        self.path = path
+        self.name = path.rsplit("/", 1)[-1]
+
+    def __repr__(self):
+        return f"Folder({self.server.baseUrl!r}, {self.path!r})"
+
+    @property
+    def folders(self):
+        """
+        list: The subfolders of the folder.
+        """
+        return [self.folder(name) for name in self.json.get("folders", [])]
+
+    @property
+    def services(self):
+        """
+        list: The services of the folder.
+        """
+        return [self.server.service(service["name"], service.get("type")) for service in self.json.get("services", [])]
+
+    def folder(self, name):
+        """
+        Returns a subfolder, without fetching it.
+
+        Args:
+            name (str): The name of the subfolder, relative to this folder.
+
+        Returns:
+            Folder: The subfolder.
+        """
+        return self.server.folder(f"{self.path}/{name.strip('/')}")
+
+    def service(self, name, serviceType="MapServer"):
+        """
+        Returns a service of the folder, without fetching it.
+
+        Args:
+            name (str): The name of the service, with or without the path of the folder.
+            serviceType (str): The type of the service. Defaults to "MapServer".
+
+        Returns:
+            Service: The service.
+        """
+        name = name.strip("/")
+        if not name.startswith(f"{self.path}/"):
+            name = f"{self.path}/{name}"
+        return self.server.service(name, serviceType)
+
+    def _fetch(self):
+        return _fetchJson(_servicesUrl(self.server.baseUrl, self.path))
+
+    def _children(self):
+        return self.folders + self.services
+
+
+class Service(_Node):
+    """
+    A service of a server. Services are created with `Server.service` or `Folder.service`.
+
+    Args:
+        server (Server): The server of the service.
+        name (str): The full name of the service, including its folder.
+        serviceType (str): The type of the service, such as "MapServer".
+    """
+
+    def __init__(self, server, name, serviceType):
+        super().__init__(f"{server.baseUrl}/services/{name}/{serviceType}")
+        self.server = server
+        self.name = name
+        self.type = serviceType
+        self._layers = {}
+        self._layersLock = threading.Lock()
+
+    def __repr__(self):
+        return f"Service({self.server.baseUrl!r}, {self.name!r}, {self.type!r})"
+
+    @property
+    def layers(self):
+        """
+        list: The layers of the service.
+        """
+        return [self.layer(layer["id"]) for layer in self.json.get("layers") or []]
+
+    @property
+    def tables(self):
+        """
+        list: The tables of the service.
+        """
+        return [self.layer(table["id"]) for table in self.json.get("tables") or []]
+
+    def layer(self, layerId):
+        """
+        Returns a layer or table of the service, without fetching it.
+
+        Args:
+            layerId (int): The ID of the layer.
+
+        Returns:
+            Layer: The layer.
+        """
+        layerId = int(layerId)
+        with self._layersLock:
+            if layerId not in self._layers:
+                self._layers[layerId] = Layer(self, layerId)
+            return self._layers[layerId]
+
+    def _fetch(self):
+        if self.type == "MapServer":
+            return restGetMapServerDetails(self.server.baseUrl, self.name)
+        return super()._fetch()
+
+    def _children(self):
+        return self.layers + self.tables
+
+    def _prefetchChildren(self):
+        if self.type != "MapServer":
+            return
+        details = restGetMapServerLayerDetails(self.server.baseUrl, self.name)
+        for layerDetails in details["layers"] + details["tables"]:
+            layer = self.layer(layerDetails["id"])
+            with layer._lock:
+                if layer._json is None:
+                    layer._json = layerDetails
+
+
+class Layer(_Node):
+    """
+    A layer or table of a service. Layers are created with `Service.layer`.
+
+    The details of the layers of a MapServer are kept in the layer details cache shared with the other functions of
+    the package, so querying a layer does not fetch them again.
+
+    Args:
+        service (Service): The service of the layer.
+        layerId (int): The ID of the layer.
+    """
+
+    def __init__(self, service, layerId):
+        super().__init__(f"{service.url}/{layerId}")
+        self.service = service
+        self.id = layerId
+
+    def __repr__(self):
+        return f"Layer({self.service.server.baseUrl!r}, {self.service.name!r}, {self.id!r})"
+
+    @property
+    def name(self):
+        """
+        str: The name of the layer.
+        """
+        return self.json.get("name")
+
+    @property
+    def fields(self):
+        """
+        list: The fields of the layer, as listed in its details.
+        """
+        return self.json.get("fields") or []
+
+    def query(self, where="1=1", outFields="*", pages=False, maxWorkers=1, pageSize=None, queryFormat=None,
+              stream=False, queryOptions=None):
+        """
+        Iterates over the features of the layer, see iterMapLayerData for the arguments.
+
+        The service is known to be a MapServer, so unlike iterMapLayerData the catalog of the server is not crawled
+        to verify its type.
+
+        Returns:
+            generator: A generator yielding features (dictionaries), or lists of features when `pages` is True.
+
+        Raises:
+            ValueError: If the service is not a MapServer, or the layer does not have the requested fields or does not
+            support the query options.
+        """
+        if self.service.type != "MapServer":
+            raise ValueError(f"The service {self.service.name} is of type {self.service.type}, not a MapServer.")
+        return _iterMapLayerData(self.service.server.baseUrl, self.service.name, self.id, where, outFields, pages,
+                                 maxWorkers, pageSize, queryFormat, stream, queryOptions, checkServiceType=False)
+
+    def _fetch(self):
+        if self.service.type == "MapServer":
+            return _getLayerDetails(self.service.server.baseUrl, self.service.name, self.id)
+        return super()._fetch()
+
+
+def _fetchJson(url):
+    """
+    Fetches a JSON document of the services directory.
+
+    Raises:
+        ArcGISHttpError: If the server responds with an HTTP error status.
+        ArcGISServerError: If the server responds with an ArcGIS error document.
+        ArcGISError: If the server can not be reached.
+    """
+    try:
+        response = getDefaultClient().get(url)
+        response.raise_for_status()
+    except requests.exceptions.HTTPError as e:
+        printError(f"httpError{e.response.status_code}", url)
+    except requests.exceptions.RequestException as e:
+        printError("requestException", f"{e} ({url})")
+    return _checkServerError(_decodeJson(response), url)
@@ -0,0 +1,383 @@
+import struct
+
+from .decoding import loads
+from .exceptions import PbfDecodeError
+
+# The ArcGIS PBF query format is the protocol buffer message esriPBuffer.FeatureCollectionPBuffer. This module decodes
+# it without a protobuf runtime: the numbers below are the field numbers of the messages it consists of.
+
+# The geometry types of FeatureResult.geometryType
+geometryTypes = {
+    0: "esriGeometryPoint",
+    1: "esriGeometryMultipoint",
+    2: "esriGeometryPolyline",
+    3: "esriGeometryPolygon",
+    4: "esriGeometryMultiPatch",
+}
+
+# The field types of Field.fieldType
+fieldTypes = {
+    0: "esriFieldTypeSmallInteger",
+    1: "esriFieldTypeInteger",
+    2: "esriFieldTypeSingle",
+    3: "esriFieldTypeDouble",
+    4: "esriFieldTypeString",
+    5: "esriFieldTypeDate",
+    6: "esriFieldTypeOID",
+    7: "esriFieldTypeGeometry",
+    8: "esriFieldTypeBlob",
+    9: "esriFieldTypeRaster",
+    10: "esriFieldTypeGUID",
+    11: "esriFieldTypeGlobalID",
+    12: "esriFieldTypeXML",
+    13: "esriFieldTypeBigInteger",
+}
+
+_float = struct.Struct("<f")
+_double = struct.Struct("<d")
+
+# Transform.quantizeOriginPostion of quantized coordinates counted downwards from the top of the extent
+_upperLeft = 0
+
+
+def decodeQueryResponse(data):
+    """
+    Decodes the body of a layer query made with `f=pbf` into the document an `f=json` query returns.
+
+    Feature results become a dictionary with `objectIdFieldName`, `geometryType`, `spatialReference`, `fields`,
+    `exceededTransferLimit` and `features` holding Esri JSON `attributes` and `geometry`, with the quantized
+    coordinates converted back to map coordinates. Count and object ID results become `{"count": ...}` and
+    `{"objectIdFieldName": ..., "objectIds": [...]}`. Servers answer errors with a JSON error document even when PBF
+    was requested, so a JSON body is decoded as JSON.
+
+    Args:
+        data (bytes): The response body.
+
+    Returns:
+        dict: The decoded query response.
+
+    Raises:
+        PbfDecodeError: If the body is neither a PBF query response nor JSON.
+    """
+    if data.lstrip()[:1] == b"{":
+        return loads(data)
+    try:
+        queryResult = None
+        for field, _, value in _iterFields(data, 0, len(data)):
+            if field == 2:
+                queryResult = value
+        if queryResult is None:
+            return {}
+        data, start, end = queryResult
+        for field, _, value in _iterFields(data, start, end):
+            if field == 1:
+                return _decodeFeatureResult(*value)
+            if field == 2:
+                return {"count": _messageFields(*value).get(1, 0)}
+            if field == 3:
+                return _decodeObjectIdsResult(*value)
+        return {}
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise PbfDecodeError(f"Invalid PBF query response: {e}") from e
+
+
+def _readVarint(data, pos):
+    value = data[pos]
+    pos += 1
+    if value < 0x80:
+        return value, pos
+    value &= 0x7F
+    shift = 7
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _iterFields(data, pos, end):
+    """
+    Iterates over the fields of a message, yielding the field number, the wire type and the value: an integer for
+    varint fields, the raw bytes for fixed size fields and a (data, start, end) tuple for length delimited fields.
+    """
+    while pos < end:
+        key, pos = _readVarint(data, pos)
+        wireType = key & 7
+        if wireType == 0:
+            value, pos = _readVarint(data, pos)
+        elif wireType == 2:
+            length, pos = _readVarint(data, pos)
+            value = (data, pos, pos + length)
+            pos += length
+        elif wireType == 1:
+            value = data[pos:pos + 8]
+            pos += 8
+        elif wireType == 5:
+            value = data[pos:pos + 4]
+            pos += 4
+        else:
+            raise PbfDecodeError(f"Unsupported wire type {wireType}")
+        if pos > end:
+            raise PbfDecodeError("Truncated message")
+        yield key >> 3, wireType, value
+
+
+def _messageFields(data, start, end):
+    """
+    Collects the fields of a message that has no repeated fields, keyed by field number.
+    """
+    return {field: value for field, _, value in _iterFields(data, start, end)}
+
+
+def _string(value):
+    data, start, end = value
+    return bytes(data[start:end]).decode("utf-8")
+
+
+def _packedVarints(value):
+    data, pos, end = value
+    values = []
+    append = values.append
+    while pos < end:
+        byte = data[pos]
+        if byte < 0x80:
+            append(byte)
+            pos += 1
+        else:
+            number, pos = _readVarint(data, pos)
+            append(number)
+    return values
+
+
+def _zigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _signed64(value):
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _decodeValue(data, pos, end):
+    """
+    Decodes a Value message, a oneof of string, float, double and integer types. An empty message is a null value.
+    """
+    if pos >= end:
+        return None
+    key = data[pos]
+    pos += 1
+    field = key >> 3
+    if field == 1:
+        length, pos = _readVarint(data, pos)
+        return bytes(data[pos:pos + length]).decode("utf-8")
+    if field == 3:
+        return _double.unpack_from(data, pos)[0]
+    if field == 2:
+        return _float.unpack_from(data, pos)[0]
+    value, _ = _readVarint(data, pos)
+    if field in (4, 8):
+        return _zigzag(value)
+    if field == 6:
+        return _signed64(value)
+    if field == 9:
+        return bool(value)
+    return value
+
+
+def _decodeObjectIdsResult(data, start, end):
+    result = {"objectIdFieldName": "OBJECTID", "objectIds": []}
+    for field, wireType, value in _iterFields(data, start, end):
+        if field == 1:
+            result["objectIdFieldName"] = _string(value)
+        elif field == 3:
+            if wireType == 2:
+                result["objectIds"].extend(_packedVarints(value))
+            else:
+                result["objectIds"].append(value)
+    return result
+
+
+def _decodeTransform(value):
+    """
+    Decodes a Transform message into the scale and translation of x, y, z and m, and whether y is flipped.
+    """
+    transform = _messageFields(*value)
+    scales = _messageFields(*transform[2]) if 2 in transform else {}
+    translations = _messageFields(*transform[3]) if 3 in transform else {}
+    scale = [(_double.unpack(scales[index])[0] if index in scales else 0.0) or 1.0 for index in (1, 2, 4, 3)]
+    translate = [_double.unpack(translations[index])[0] if index in translations else 0.0 for index in (1, 2, 4, 3)]
+    return scale, translate, transform.get(1, _upperLeft) == _upperLeft
+
+
+def _decodeFeatureResult(data, start, end):
+    result = {}
+    fields = []
+    features = []
+    spatialReference = {}
+    # Enumerations default to their first value, the point geometry type and the small integer field type
+    geometryType = 0
+    hasZ = hasM = False
+    transform = ([1.0, 1.0, 1.0, 1.0], [0.0, 0.0, 0.0, 0.0], False)
+    for field, _, value in _iterFields(data, start, end):
+        if field == 15:
+            features.append(value)
+        elif field == 13:
+            definition = _messageFields(*value)
+            fields.append({"name": _string(definition[1]) if 1 in definition else "",
+                           "type": fieldTypes.get(definition.get(2, 0), "esriFieldTypeString"),
+                           "alias": _string(definition[3]) if 3 in definition else ""})
+        elif field == 1:
+            result["objectIdFieldName"] = _string(value)
+        elif field == 3:
+            result["globalIdFieldName"] = _string(value)
+        elif field == 7:
+            geometryType = value
+        elif field == 8:
+            reference = _messageFields(*value)
+            if 1 in reference:
+                spatialReference["wkid"] = reference[1]
+            if 2 in reference:
+                spatialReference["latestWkid"] = reference[2]
+            if 5 in reference:
+                spatialReference["wkt"] = _string(reference[5])
+        elif field == 9:
+            result["exceededTransferLimit"] = bool(value)
+        elif field == 10:
+            hasZ = bool(value)
+        elif field == 11:
+            hasM = bool(value)
+        elif field == 12:
+            transform = _decodeTransform(value)
+
+    if geometryType in geometryTypes:
+        result["geometryType"] = geometryTypes[geometryType]
+    if spatialReference:
+        result["spatialReference"] = spatialReference
+    if hasZ:
+        result["hasZ"] = True
+    if hasM:
+        result["hasM"] = True
+    result["fields"] = fields
+    result.setdefault("exceededTransferLimit", False)
+
+    names = [definition["name"] for definition in fields]
+    makeGeometry = _geometryBuilder(geometryType, hasZ, hasM, transform)
+    result["features"] = [_decodeFeature(data, pos, featureEnd, names, makeGeometry)
+                          for data, pos, featureEnd in features]
+    return result
+
+
+def _decodeFeature(data, pos, end, names, makeGeometry):
+    attributes = {}
+    feature = {"attributes": attributes}
+    index = 0
+    fieldCount = len(names)
+    while pos < end:
+        key = data[pos]
+        length = data[pos + 1]
+        pos += 2
+        if length >= 0x80:
+            length, pos = _readVarint(data, pos - 1)
+        if key == 0x0A:
+            # Attribute values are stored in the order of the fields, inline the most common value types
+            if index < fieldCount:
+                valueKey = data[pos] if length else 0
+                if valueKey == 0x0A and data[pos + 1] < 0x80:
+                    value = data[pos + 2:pos + length].decode("utf-8")
+                elif valueKey == 0x19:
+                    value = _double.unpack_from(data, pos + 1)[0]
+                elif valueKey == 0x38:
+                    value = data[pos + 1] if length == 2 else _readVarint(data, pos + 1)[0]
+                else:
+                    value = _decodeValue(data, pos, pos + length)
+                attributes[names[index]] = value
+            index += 1
+        elif key == 0x12 and makeGeometry is not None:
+            feature["geometry"] = makeGeometry(data, pos, pos + length)
+        pos += length
+    return feature
+
+
+def _geometryArrays(data, pos, end):
+    """
+    Reads the `lengths` and `coords` of a Geometry message, which are packed repeated fields.
+    """
+    lengths = coordinates = ()
+    for field, wireType, value in _iterFields(data, pos, end):
+        if field == 3:
+            coordinates = _packedVarints(value) if wireType == 2 else list(coordinates) + [value]
+        elif field == 2:
+            lengths = _packedVarints(value) if wireType == 2 else list(lengths) + [value]
+    return lengths, coordinates
+
+
+def _geometryBuilder(geometryType, hasZ, hasM, transform):
+    """
+    Returns a function converting a Geometry message into an Esri JSON geometry of the given type.
+
+    The coordinates of a Geometry message are zigzag encoded quantized integers, delta encoded from the previous
+    coordinate across all its parts, with `lengths` holding the number of points of every part.
+    """
+    if geometryType not in geometryTypes:
+        return None
+    (xScale, yScale, zScale, mScale), (xTranslate, yTranslate, zTranslate, mTranslate), flipY = transform
+    if flipY:
+        yScale = -yScale
+    dimensions = 2 + hasZ + hasM
+
+    def points(data, start, end):
+        lengths, coordinates = _geometryArrays(data, start, end)
+        decoded = []
+        append = decoded.append
+        x = y = z = m = 0
+        for index in range(0, len(coordinates) - dimensions + 1, dimensions):
+            value = coordinates[index]
+            x += (value >> 1) ^ -(value & 1)
+            value = coordinates[index + 1]
+            y += (value >> 1) ^ -(value & 1)
+            if dimensions == 2:
+                append([xTranslate + x * xScale, yTranslate + y * yScale])
+                continue
+            point = [xTranslate + x * xScale, yTranslate + y * yScale]
+            if hasZ:
+                z += _zigzag(coordinates[index + 2])
+                point.append(zTranslate + z * zScale)
+            if hasM:
+                m += _zigzag(coordinates[index + dimensions - 1])
+                point.append(mTranslate + m * mScale)
+            append(point)
+        return decoded, lengths or [len(decoded)]
+
+    def parts(data, start, end):
+        decoded, lengths = points(data, start, end)
+        result = []
+        offset = 0
+        for length in lengths:
+            result.append(decoded[offset:offset + length])
+            offset += length
+        return result
+
+    if geometryType == 0:
+        def makeGeometry(data, start, end):
+            coordinates = _geometryArrays(data, start, end)[1]
+            if len(coordinates) < dimensions:
+                return {"x": None, "y": None}
+            x, y = coordinates[0], coordinates[1]
+            geometry = {"x": xTranslate + ((x >> 1) ^ -(x & 1)) * xScale,
+                        "y": yTranslate + ((y >> 1) ^ -(y & 1)) * yScale}
+            if hasZ:
+                geometry["z"] = zTranslate + _zigzag(coordinates[2]) * zScale
+            if hasM:
+                geometry["m"] = mTranslate + _zigzag(coordinates[dimensions - 1]) * mScale
+            return geometry
+    elif geometryType == 1:
+        def makeGeometry(data, start, end):
+            return {"points": points(data, start, end)[0]}
+    elif geometryType == 2:
+        def makeGeometry(data, start, end):
+            return {"paths": parts(data, start, end)}
+    else:
+        def makeGeometry(data, start, end):
+            return {"rings": parts(data, start, end)}
+    return makeGeometry
@@ -0,0 +1,212 @@
+import json
+
+# The geometry types whose shapes are generalized by maxAllowableOffset
+_generalizedGeometryTypes = ("esriGeometryPolyline", "esriGeometryPolygon")
+
+
+class QueryOptions:
+    """
+    The geometry options of a layer query, which let the server reduce the geometries before sending them.
+
+    Leaving out geometries (`returnGeometry=False`), generalizing them (`maxAllowableOffset`), rounding their
+    coordinates (`geometryPrecision`) or quantizing them to integers (`quantizationParameters`) can cut the size of a
+    response, and the time to decode it, by an order of magnitude when the geometries are only displayed at a small
+    scale or are not needed at all. Quantized coordinates are converted back to map coordinates by the library.
+
+    The values are checked when the options are created, and against the capabilities of the layer by `validate`
+    before the first query is sent.
+
+    Args:
+        returnGeometry (bool): Return the geometries of the features. Defaults to True.
+        outSR (int or dict): The spatial reference of the returned geometries, as a WKID or a spatial reference
+        object. Defaults to 4326 (WGS 84).
+        maxAllowableOffset (float, optional): The maximum deviation of generalized polylines and polygons from the
+        original shapes, in units of `outSR`.
+        geometryPrecision (int, optional): The number of decimals of the returned coordinates.
+        quantizationParameters (dict, optional): The quantization of the coordinates, with a `mode` of "view" or
+        "edit", a `tolerance` in units of `outSR`, an `originPosition` of "upperLeft" or "lowerLeft" and an `extent`.
+
+    Raises:
+        ValueError: If an option has an invalid value.
+    """
+
+    def __init__(self, returnGeometry=True, outSR=4326, maxAllowableOffset=None, geometryPrecision=None,
+                 quantizationParameters=None):
+        if not isinstance(outSR, (int, dict)) or isinstance(outSR, bool):
+            raise ValueError(f"The outSR must be a WKID or a spatial reference object, got {outSR!r}.")
+        if maxAllowableOffset is not None and not maxAllowableOffset > 0:
+            raise ValueError(f"The maxAllowableOffset must be a positive number, got {maxAllowableOffset}.")
+        if geometryPrecision is not None and (not isinstance(geometryPrecision, int) or geometryPrecision < 0):
+            raise ValueError(f"The geometryPrecision must be a non-negative integer, got {geometryPrecision!r}.")
+        if quantizationParameters is not None:
+            _checkQuantizationParameters(quantizationParameters)
+        if not returnGeometry and (maxAllowableOffset is not None or geometryPrecision is not None or
+                                   quantizationParameters is not None):
+            raise ValueError("Geometry options require returnGeometry=True.")
+
+        self.returnGeometry = returnGeometry
+        self.outSR = outSR
+        self.maxAllowableOffset = maxAllowableOffset
+        self.geometryPrecision = geometryPrecision
+        self.quantizationParameters = quantizationParameters
+
+    def validate(self, layerDetails):
+        """
+        Checks the options against the capabilities of a layer.
+
+        Args:
+            layerDetails (dict): The layer details as returned by restGetMapLayerDetails.
+
+        Raises:
+            ValueError: If the layer does not support an option.
+        """
+        geometryType = layerDetails.get('geometryType')
+        name = layerDetails.get('name', 'The layer')
+        if not self.returnGeometry:
+            return
+        if self.maxAllowableOffset is not None and geometryType not in _generalizedGeometryTypes:
+            raise ValueError(f"{name} has {geometryType or 'no'} geometries, maxAllowableOffset only applies to "
+                             "polylines and polygons.")
+        if geometryType is None and (self.geometryPrecision is not None or self.quantizationParameters is not None):
+            raise ValueError(f"{name} has no geometries, geometry options do not apply.")
+        if self.quantizationParameters is not None and not layerDetails.get('supportsCoordinatesQuantization'):
+            raise ValueError(f"{name} does not support quantizationParameters.")
+
+    def toParams(self):
+        """
+        Converts the options to query parameters.
+
+        Returns:
+            dict: The query parameters of the options.
+        """
+        params = {'returnGeometry': 'true' if self.returnGeometry else 'false'}
+        if not self.returnGeometry:
+            return params
+        params['outSR'] = json.dumps(self.outSR) if isinstance(self.outSR, dict) else str(self.outSR)
+        if self.maxAllowableOffset is not None:
+            params['maxAllowableOffset'] = self.maxAllowableOffset
+        if self.geometryPrecision is not None:
+            params['geometryPrecision'] = self.geometryPrecision
+        if self.quantizationParameters is not None:
+            params['quantizationParameters'] = json.dumps(self.quantizationParameters)
+        return params
+
+    def __repr__(self):
+        options = ", ".join(f"{name}={value!r}" for name, value in vars(self).items() if value is not None)
+        return f"QueryOptions({options})"
+
+
+def _checkQuantizationParameters(quantizationParameters):
+    if not isinstance(quantizationParameters, dict):
+        raise ValueError("The quantizationParameters must be a dictionary.")
+    if quantizationParameters.get('mode', 'view') not in ('view', 'edit'):
+        raise ValueError(f"The quantization mode must be 'view' or 'edit', got {quantizationParameters['mode']!r}.")
+    if quantizationParameters.get('originPosition', 'upperLeft') not in ('upperLeft', 'lowerLeft'):
+        raise ValueError("The quantization originPosition must be 'upperLeft' or 'lowerLeft', got "
+                         f"{quantizationParameters['originPosition']!r}.")
+    tolerance = quantizationParameters.get('tolerance')
+    if tolerance is not None and not tolerance > 0:
+        raise ValueError(f"The quantization tolerance must be a positive number, got {tolerance}.")
+
+
+def outFieldsParameter(outFields):
+    """
+    Converts the fields of a query to the `outFields` parameter.
+
+    Args:
+        outFields (str or list): The fields, as a comma separated string, "*" for all fields, or a list of names.
+
+    Returns:
+        str: The comma separated field names.
+    """
+    if isinstance(outFields, str):
+        return outFields
+    outFields = [name.strip() for name in outFields]
+    if not outFields:
+        raise ValueError("The outFields must name at least one field.")
+    return ",".join(outFields)
+
+
+def validateOutFields(outFields, layerDetails):
+    """
+    Checks that the fields of a query exist in a layer.
+
+    Layers whose details do not list their fields are not checked.
+
+    Args:
+        outFields (str): The comma separated field names, or "*".
+        layerDetails (dict): The layer details as returned by restGetMapLayerDetails.
+
+    Raises:
+        ValueError: If a field does not exist in the layer.
+    """
+    fields = layerDetails.get('fields')
+    if not fields or outFields.strip() == "*":
+        return
+    names = {field.get('name', '').lower() for field in fields}
+    unknown = [name.strip() for name in outFields.split(",") if name.strip().lower() not in names]
+    if unknown:
+        raise ValueError(f"{layerDetails.get('name', 'The layer')} has no field(s) {', '.join(unknown)}.")
+
+
+def dequantizeGeometry(geometry, transform):
+    """
+    Converts a geometry with quantized coordinates back to map coordinates.
+
+    Quantized points hold integer coordinates. The points of quantized multipoints, paths and rings are delta encoded:
+    the first point of every part is an integer coordinate and every following point is the offset from its
+    predecessor.
+
+    Args:
+        geometry (dict): The Esri JSON geometry with quantized coordinates, or None.
+        transform (dict): The `transform` of the query response, with the `originPosition`, `scale` and `translate`
+        of the quantization.
+
+    Returns:
+        dict: The geometry in map coordinates.
+    """
+    if not geometry:
+        return geometry
+    xScale, yScale = transform['scale'][:2]
+    xTranslate, yTranslate = transform['translate'][:2]
+    if transform.get('originPosition', 'upperLeft') == 'upperLeft':
+        yScale = -yScale
+
+    if 'x' in geometry:
+        if geometry['x'] is None:
+            return geometry
+        return dict(geometry, x=xTranslate + geometry['x'] * xScale, y=yTranslate + geometry['y'] * yScale)
+
+    def dequantizePart(part):
+        points = []
+        x = y = 0
+        for point in part:
+            x += point[0]
+            y += point[1]
+            points.append([xTranslate + x * xScale, yTranslate + y * yScale] + list(point[2:]))
+        return points
+
+    for key in ('paths', 'rings'):
+        if key in geometry:
+            return dict(geometry, **{key: [dequantizePart(part) for part in geometry[key]]})
+    if 'points' in geometry:
+        return dict(geometry, points=dequantizePart(geometry['points']))
+    return geometry
+
+
+def dequantizeResponse(data):
+    """
+    Converts the quantized geometries of a query response back to map coordinates, in place.
+
+    Args:
+        data (dict): The query response. Responses without a `transform` are left unchanged.
+
+    Returns:
+        dict: The response, without its `transform`.
+    """
+    transform = data.pop('transform', None) if isinstance(data, dict) else None
+    if transform:
+        for feature in data.get('features', []):
+            if feature.get('geometry'):
+                feature['geometry'] = dequantizeGeometry(feature['geometry'], transform)
+    return data
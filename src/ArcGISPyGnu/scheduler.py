@@ -0,0 +1,402 @@
+import json
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+# The start of an ArcGIS JSON error document, in compact (f=json) or pretty printed (f=pjson) form
+_errorDocumentPattern = re.compile(rb'\s*\{\s*"error"\s*:')
+
+# Statuses that signal an overloaded or throttling server, which make the limiter of the host back off
+congestionStatuses = frozenset({429, 503, 504})
+
+# The number of endpoints of which a limiter keeps latency statistics
+_maxTrackedEndpoints = 256
+
+# The query parameters that change the amount of work a request costs the server, and thereby its latency
+_shapeParameters = ("f", "returnIdsOnly", "returnCountOnly", "returnExtentOnly", "returnDistinctValues",
+                    "returnGeometry", "resultRecordCount")
+
+
+class RetryPolicy:
+    """
+    Decides which failed requests are retried and how long to wait before the next attempt.
+
+    The wait grows exponentially with every attempt and is drawn uniformly between zero and that bound ("full
+    jitter"), so many clients that failed at the same moment do not retry at the same moment. A `Retry-After` header
+    sent by the server takes precedence over the computed wait.
+
+    Args:
+        maxRetries (int): The maximum number of retries of a single request.
+        backoffFactor (float): The bound of the wait before the first retry, in seconds. It doubles with every retry.
+        maxBackoff (float): The maximum bound of the computed wait, in seconds.
+        retryStatuses (iterable): The HTTP statuses, or error codes of ArcGIS JSON error documents, that are retried.
+        maxRetryAfter (float): The maximum wait honored from a `Retry-After` header, in seconds.
+    """
+
+    def __init__(self, maxRetries=5, backoffFactor=0.5, maxBackoff=30.0, retryStatuses=(429, 502, 503, 504),
+                 maxRetryAfter=120.0):
+        self.maxRetries = maxRetries
+        self.backoffFactor = backoffFactor
+        self.maxBackoff = maxBackoff
+        self.retryStatuses = frozenset(retryStatuses)
+        self.maxRetryAfter = maxRetryAfter
+
+    def isRetryable(self, status):
+        """
+        Determines whether a response status is worth retrying.
+
+        Args:
+            status (int): The HTTP status, or the code of an ArcGIS JSON error document.
+
+        Returns:
+            bool: True if the request should be retried.
+        """
+        return status in self.retryStatuses
+
+    def delay(self, attempt, retryAfter=None):
+        """
+        Computes the wait before a retry.
+
+        Args:
+            attempt (int): The number of the failed attempt, starting at 0.
+            retryAfter (float, optional): The wait requested by the server in a `Retry-After` header, in seconds.
+
+        Returns:
+            float: The number of seconds to wait.
+        """
+        if retryAfter is not None:
+            return min(max(0.0, retryAfter), self.maxRetryAfter)
+        return random.uniform(0, min(self.maxBackoff, self.backoffFactor * 2 ** attempt))
+
+    @staticmethod
+    def parseRetryAfter(value):
+        """
+        Parses the value of a `Retry-After` header.
+
+        Args:
+            value (str): A number of seconds or an HTTP date, or None.
+
+        Returns:
+            float: The number of seconds to wait, or None if the value is missing or not understood.
+        """
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError, IndexError):
+            return None
+
+
+class AdaptiveLimiter:
+    """
+    Limits the number of concurrent requests to one host with an additive increase, multiplicative decrease (AIMD)
+    algorithm, the congestion control of TCP.
+
+    Every request that completes without a congestion signal raises the limit by `increase / limit`, so the limit
+    grows by about `increase` for every round of requests. A congestion signal (a 429, 503 or 504 status, a timeout,
+    or a smoothed latency above `latencyTolerance` times the lowest latency seen for the same endpoint) multiplies the
+    limit by `decrease`, at most once per round trip. The limit thereby settles just below the point where the server
+    starts throttling.
+
+    Args:
+        maxLimit (int): The upper bound of the limit, and its initial value unless `initialLimit` is given.
+        minLimit (int): The lower bound of the limit.
+        initialLimit (float, optional): The initial limit.
+        increase (float): The additive increase per round of successful requests.
+        decrease (float): The multiplicative decrease on congestion.
+        latencyTolerance (float): The factor by which the smoothed latency may exceed the lowest latency seen before it
+        counts as congestion. Use None to ignore latency.
+    """
+
+    def __init__(self, maxLimit=10, minLimit=1, initialLimit=None, increase=1.0, decrease=0.5, latencyTolerance=3.0):
+        self.maxLimit = maxLimit
+        self.minLimit = minLimit
+        self.limit = float(initialLimit or maxLimit)
+        self.increase = increase
+        self.decrease = decrease
+        self.latencyTolerance = latencyTolerance
+        self.inFlight = 0
+        self.decreases = 0
+        self._latencies = {}
+        self._lastDecrease = 0.0
+        self._condition = threading.Condition()
+
+    def tryAcquire(self):
+        """
+        Takes a request slot if one is available, without waiting.
+
+        Returns:
+            bool: True if a slot was taken, in which case release must be called when the request completes.
+        """
+        with self._condition:
+            if self.inFlight < max(self.minLimit, int(self.limit)):
+                self.inFlight += 1
+                return True
+            return False
+
+    def acquire(self):
+        """
+        Takes a request slot, waiting until one is available.
+        """
+        with self._condition:
+            self._condition.wait_for(self.tryAcquire)
+
+    def release(self, latency=None, congested=False, endpoint=None):
+        """
+        Returns a request slot and adapts the limit to the outcome of the request.
+
+        Args:
+            latency (float, optional): The duration of the request in seconds, or None if it did not complete.
+            congested (bool): Whether the request failed with a congestion signal.
+            endpoint (str, optional): The endpoint of the request, see requestEndpoint. Latencies are compared per
+            endpoint, as a metadata request and a query of a thousand features take very different times.
+        """
+        with self._condition:
+            self.inFlight -= 1
+            roundTrip = 0.0
+            if latency is not None:
+                latencyCongested, roundTrip = self._observeLatency(endpoint, latency)
+                congested = congested or latencyCongested
+
+            now = time.monotonic()
+            if congested:
+                # One decrease per round trip, so a burst of failures of the same round does not collapse the limit
+                if now - self._lastDecrease >= roundTrip:
+                    self.limit = max(float(self.minLimit), self.limit * self.decrease)
+                    self._lastDecrease = now
+                    self.decreases += 1
+            else:
+                self.limit = min(float(self.maxLimit), self.limit + self.increase / self.limit)
+            self._condition.notify_all()
+
+    def _observeLatency(self, endpoint, latency):
+        """
+        Updates the latency statistics of an endpoint.
+
+        Returns:
+            tuple: Whether the smoothed latency signals congestion, and the smoothed latency.
+        """
+        statistics = self._latencies.get(endpoint)
+        if statistics is None:
+            if len(self._latencies) >= _maxTrackedEndpoints:
+                del self._latencies[next(iter(self._latencies))]
+            statistics = self._latencies[endpoint] = [latency, latency]
+        baseLatency, smoothedLatency = statistics
+        if latency < baseLatency:
+            baseLatency = latency
+        else:
+            # The baseline drifts up slowly, so it follows an endpoint that became slower for good
+            baseLatency += (latency - baseLatency) * 0.01
+        smoothedLatency += (latency - smoothedLatency) * 0.2
+        statistics[:] = [baseLatency, smoothedLatency]
+        congested = (self.latencyTolerance is not None and baseLatency > 0
+                     and smoothedLatency > self.latencyTolerance * baseLatency)
+        return congested, smoothedLatency
+
+    def stats(self):
+        """
+        Returns the state of the limiter.
+
+        Returns:
+            dict: The current `limit`, the requests `inFlight`, the number of `decreases` and the `latencies`, mapping
+            endpoints to their lowest and smoothed latency in seconds.
+        """
+        with self._condition:
+            return {
+                "limit": self.limit,
+                "inFlight": self.inFlight,
+                "decreases": self.decreases,
+                "latencies": {endpoint: {"base": base, "smoothed": smoothed}
+                              for endpoint, (base, smoothed) in self._latencies.items()},
+            }
+
+
+class RequestScheduler:
+    """
+    Schedules the requests of a client: every request waits for a slot of the adaptive limiter of its host and failed
+    requests are retried according to the retry policy.
+
+    Args:
+        retryPolicy (RetryPolicy, optional): The retry policy. Defaults to `RetryPolicy()`.
+        maxConcurrency (int): The maximum number of concurrent requests per host.
+        minConcurrency (int): The minimum number of concurrent requests per host.
+        latencyTolerance (float): See `AdaptiveLimiter`.
+        sleep (callable): The function used to wait between retries.
+    """
+
+    def __init__(self, retryPolicy=None, maxConcurrency=10, minConcurrency=1, latencyTolerance=3.0, sleep=time.sleep):
+        self.retryPolicy = retryPolicy or RetryPolicy()
+        self.maxConcurrency = maxConcurrency
+        self.minConcurrency = minConcurrency
+        self.latencyTolerance = latencyTolerance
+        self.retries = 0
+        self._sleep = sleep
+        self._limiters = {}
+        self._limitersLock = threading.Lock()
+
+    def limiter(self, url):
+        """
+        Returns the adaptive limiter of the host of a URL, creating it on first use.
+
+        Args:
+            url (str): The URL that is about to be requested.
+
+        Returns:
+            AdaptiveLimiter: The limiter of the host.
+        """
+        host = urlsplit(url).netloc.lower()
+        with self._limitersLock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = AdaptiveLimiter(maxLimit=self.maxConcurrency, minLimit=self.minConcurrency,
+                                          latencyTolerance=self.latencyTolerance)
+                self._limiters[host] = limiter
+        return limiter
+
+    def send(self, url, sendRequest, inspectBody=True, event=None, params=None):
+        """
+        Sends a request within the limit of its host, retrying it when it fails with a retryable status or a
+        connection error.
+
+        Args:
+            url (str): The URL of the request.
+            sendRequest (callable): A function without arguments sending the request and returning its
+            requests.Response.
+            inspectBody (bool): Look for ArcGIS JSON error documents in the body of successful responses. Must be False
+            for streamed responses.
+            event (RequestEvent, optional): The instrumentation event of the request, which receives the number of
+            retries and the wait, first byte and download times.
+            params (dict, optional): The query string parameters of the request, which tell the latency statistics of
+            cheap probes and pages of features apart (see requestEndpoint).
+
+        Returns:
+            requests.Response: The response of the last attempt. Responses with error statuses are returned once the
+            retries are used up, it is up to the caller to handle them.
+
+        Raises:
+            requests.ConnectionError, requests.Timeout: If the last attempt failed to connect or timed out.
+        """
+        limiter = self.limiter(url)
+        endpoint = requestEndpoint(url, params)
+        attempt = 0
+        requested = time.monotonic()
+        while True:
+            limiter.acquire()
+            started = time.monotonic()
+            status = failure = None
+            try:
+                response = sendRequest()
+                duration = time.monotonic() - started
+                status = responseStatus(response, inspectBody)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                failure = e
+            finally:
+                # The slot is returned whatever the outcome, any other error would leak it and stall the host
+                if status is not None:
+                    limiter.release(duration, status in congestionStatuses, endpoint)
+                else:
+                    limiter.release(congested=isinstance(failure, requests.Timeout))
+
+            if failure is not None:
+                if attempt >= self.retryPolicy.maxRetries:
+                    if event is not None:
+                        event.retries = attempt
+                        event.waitTime = started - requested
+                    raise failure
+                retryAfter = None
+            else:
+                if not self.retryPolicy.isRetryable(status) or attempt >= self.retryPolicy.maxRetries:
+                    if event is not None:
+                        event.retries = attempt
+                        event.waitTime = started - requested
+                        # requests measures the time until the response headers were parsed
+                        event.firstByteTime = min(response.elapsed.total_seconds(), duration)
+                        event.downloadTime = duration - event.firstByteTime
+                    return response
+                retryAfter = RetryPolicy.parseRetryAfter(response.headers.get("Retry-After"))
+                response.close()
+
+            self.retries += 1
+            self._sleep(self.retryPolicy.delay(attempt, retryAfter))
+            attempt += 1
+
+    def stats(self):
+        """
+        Returns the number of retries and the state of the limiter of every host.
+
+        Returns:
+            dict: The number of `retries` and the `hosts`, mapping host names to the stats of their limiter.
+        """
+        with self._limitersLock:
+            limiters = dict(self._limiters)
+        return {"retries": self.retries, "hosts": {host: limiter.stats() for host, limiter in limiters.items()}}
+
+
+def requestEndpoint(url, params=None):
+    """
+    Returns the endpoint a request is counted under by the latency statistics of an `AdaptiveLimiter`: the path of its
+    URL and the parameters that shape its response. An object ID or count probe of a layer then does not set the
+    baseline latency of the pages of features fetched from the same `query` path.
+
+    Args:
+        url (str): The URL of the request.
+        params (dict, optional): The query string parameters of the request.
+
+    Returns:
+        str: The endpoint.
+    """
+    parts = urlsplit(url)
+    parameters = dict(parse_qsl(parts.query))
+    if params:
+        parameters.update((str(key), str(value)) for key, value in params.items() if value is not None)
+    shape = [f"{name}={parameters[name].lower()}" for name in _shapeParameters if name in parameters]
+    if "outStatistics" in parameters:
+        shape.append("outStatistics")
+    return f"{parts.path}?{'&'.join(shape)}" if shape else parts.path
+
+
+def responseStatus(response, inspectBody=True):
+    """
+    Returns the effective status of a response. ArcGIS Server reports many errors, including throttling, as a JSON
+    error document with a `200 OK` status, in which case the code of the error document is returned.
+
+    Args:
+        response (requests.Response): The response.
+        inspectBody (bool): Look for an error document in the body of a successful response.
+
+    Returns:
+        int: The HTTP status, or the code of the error document.
+    """
+    if response.status_code != 200 or not inspectBody:
+        return response.status_code
+    return bodyStatus(response.status_code, response.content)
+
+
+def bodyStatus(status, body):
+    """
+    Returns the effective status of a successful response from its body, the code of its ArcGIS error document if it
+    is one. The body is only decoded when it starts like an error document.
+
+    Args:
+        status (int): The HTTP status of the response.
+        body (bytes): The body of the response.
+
+    Returns:
+        int: The HTTP status, or the code of the error document.
+    """
+    if not isinstance(body, bytes) or not _errorDocumentPattern.match(body[:64]):
+        return status
+    try:
+        code = json.loads(body)["error"].get("code")
+    except (ValueError, KeyError, AttributeError):
+        return status
+    return code if isinstance(code, int) else status
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+
+
+class _Call:
+    """
+    A call in flight, and its outcome once it has finished.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into a single call, shared by threads.
+
+    The first thread calling `do` with a key runs the function. Threads calling `do` with the same key while it runs
+    wait for it, and receive its result or exception instead of running the function again. Once the call has
+    finished, the next call with the key runs the function again: nothing is cached.
+
+    A function must not call `do` with its own key, as it would wait for itself.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.deduplicated = 0
+        self._inFlight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        """
+        Runs a function, or waits for the call with the same key that is already running.
+
+        Args:
+            key (hashable): The key identifying identical calls.
+            function (callable): A function without arguments.
+
+        Returns:
+            tuple: The result, and True when it was shared by a call of another thread.
+
+        Raises:
+            Exception: The exception raised by the function, also in the threads that waited for it.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._inFlight.get(key)
+            shared = call is not None
+            if shared:
+                self.deduplicated += 1
+            else:
+                call = self._inFlight[key] = _Call()
+        if shared:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inFlight[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        """
+        Returns the counters of the coalesced calls.
+
+        Returns:
+            dict: The number of `calls`, the number of calls that were `deduplicated` (served by another call) and the
+            number of calls currently in flight.
+        """
+        with self._lock:
+            return {"calls": self.calls, "deduplicated": self.deduplicated, "inFlight": len(self._inFlight)}
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent calls with the same key into a single call, shared by the coroutines of an event loop, the
+    asyncio counterpart of `SingleFlight`.
+
+    The shared call runs as a task, so cancelling one of the coroutines waiting for it does not cancel it for the
+    others.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.deduplicated = 0
+        self._inFlight = {}
+
+    async def do(self, key, function):
+        """
+        Runs a coroutine function, or waits for the call with the same key that is already running.
+
+        Args:
+            key (hashable): The key identifying identical calls.
+            function (callable): A function without arguments returning an awaitable.
+
+        Returns:
+            tuple: The result, and True when it was shared by another call.
+
+        Raises:
+            Exception: The exception raised by the function, also in the coroutines that waited for it.
+        """
+        self.calls += 1
+        task = self._inFlight.get(key)
+        # A task of another event loop can not be awaited, it is left to that loop
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            self.deduplicated += 1
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(function())
+        self._inFlight[key] = task
+        task.add_done_callback(lambda finished: self._finished(key, finished))
+        return await asyncio.shield(task), False
+
+    def _finished(self, key, task):
+        if self._inFlight.get(key) is task:
+            del self._inFlight[key]
+        # The outcome is retrieved, so a failed call whose callers were all cancelled is not reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        """
+        Returns the counters of the coalesced calls.
+
+        Returns:
+            dict: The number of `calls`, the number of calls that were `deduplicated` (served by another call) and the
+            number of calls currently in flight.
+        """
+        return {"calls": self.calls, "deduplicated": self.deduplicated, "inFlight": len(self._inFlight)}
@@ -0,0 +1,462 @@
+import json
+import math
+from datetime import datetime, timezone
+
+from .core import _getLayerDetails, _getQueryJson, _queryUrl, iterMapLayerData, restGetServiceType
+from .exceptions import ArcGISHttpError, ArcGISServerError
+from .query import QueryOptions, validateOutFields
+from .utils import checkBaseUrl
+
+# The statistics of outStatistics, and the ones that require `supportsPercentileStatistics`
+statisticTypes = ("count", "sum", "min", "max", "avg", "stddev", "var", "percentile_cont", "percentile_disc")
+_percentileTypes = ("percentile_cont", "percentile_disc")
+
+# The conversion of the values of typed rows, by field type
+_integerFieldTypes = ("esriFieldTypeOID", "esriFieldTypeSmallInteger", "esriFieldTypeInteger",
+                      "esriFieldTypeBigInteger")
+_floatFieldTypes = ("esriFieldTypeSingle", "esriFieldTypeDouble")
+
+
+def restGetMapLayerCount(baseUrl, serviceName, layerId, where="1=1"):
+    """
+    Counts the features of a map layer matching a where clause, without downloading them.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer.
+        where (str): The SQL where clause to filter the data.
+
+    Returns:
+        int: The number of matching features.
+    """
+    queryUrl, _ = _prepareLayer(baseUrl, serviceName, layerId)
+    return int(_getQueryJson(queryUrl, {'where': where, 'returnCountOnly': 'true', 'f': 'json'}).get('count', 0))
+
+
+# Synonym function for restGetMapLayerCount
+def getMapLayerCount(baseUrl, serviceName, layerId, where="1=1"):
+    """
+    synonym for restGetMapLayerCount
+    """
+    return restGetMapLayerCount(baseUrl, serviceName, layerId, where)
+
+
+def restGetMapLayerExtent(baseUrl, serviceName, layerId, where="1=1", outSR=4326):
+    """
+    Computes the extent and count of the features of a map layer matching a where clause.
+
+    Layers advertising `supportsReturningQueryExtent` compute the extent on the server (`returnExtentOnly`). For
+    other layers the geometries are streamed and the extent is computed while they arrive.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer.
+        where (str): The SQL where clause to filter the data.
+        outSR (int or dict): The spatial reference of the extent. Defaults to 4326 (WGS 84).
+
+    Returns:
+        dict: The `extent` (with `xmin`, `ymin`, `xmax`, `ymax` and `spatialReference`), None when no feature
+        matches, and the `count` of matching features.
+    """
+    queryUrl, layerDetails = _prepareLayer(baseUrl, serviceName, layerId)
+    if not layerDetails.get('geometryType'):
+        raise ValueError(f"{layerDetails.get('name', 'The layer')} has no geometries.")
+    queryOptions = QueryOptions(outSR=outSR)
+
+    if _capability(layerDetails, 'supportsReturningQueryExtent'):
+        params = {'where': where, 'returnExtentOnly': 'true', 'returnCountOnly': 'true',
+                  'outSR': queryOptions.toParams()['outSR'], 'f': 'json'}
+        try:
+            data = _getQueryJson(queryUrl, params)
+            extent = data.get('extent')
+            if extent is not None and not _isEmptyExtent(extent):
+                return {'extent': extent, 'count': data.get('count')}
+            if 'count' in data:
+                return {'extent': None, 'count': data['count']}
+        except (ArcGISServerError, ArcGISHttpError) as e:
+            if isinstance(e, ArcGISHttpError) and e.statusCode not in (400, 500):
+                raise
+
+    bounds = [math.inf, math.inf, -math.inf, -math.inf]
+    count = 0
+    objectIdField = layerDetails.get('objectIdField') or 'OBJECTID'
+    for feature in iterMapLayerData(baseUrl, serviceName, layerId, where, objectIdField, queryOptions=queryOptions):
+        count += 1
+        _extendBounds(bounds, feature.get('geometry'))
+    if bounds[0] > bounds[2]:
+        return {'extent': None, 'count': count}
+    spatialReference = outSR if isinstance(outSR, dict) else {'wkid': outSR}
+    return {'extent': dict(zip(('xmin', 'ymin', 'xmax', 'ymax'), bounds), spatialReference=spatialReference),
+            'count': count}
+
+
+# Synonym function for restGetMapLayerExtent
+def getMapLayerExtent(baseUrl, serviceName, layerId, where="1=1", outSR=4326):
+    """
+    synonym for restGetMapLayerExtent
+    """
+    return restGetMapLayerExtent(baseUrl, serviceName, layerId, where, outSR)
+
+
+def restGetMapLayerDistinctValues(baseUrl, serviceName, layerId, fields, where="1=1"):
+    """
+    Returns the distinct combinations of values of fields of a map layer.
+
+    Layers advertising `supportsDistinct` compute the values on the server (`returnDistinctValues`). For other layers
+    the values are streamed, without geometries, and deduplicated while they arrive.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer.
+        fields (str or list): The fields, as a comma separated string or a list of names.
+        where (str): The SQL where clause to filter the data.
+
+    Returns:
+        list: The distinct combinations as typed rows (dictionaries by field name), sorted by their values.
+    """
+    fields = _fieldList(fields)
+    queryUrl, layerDetails = _prepareLayer(baseUrl, serviceName, layerId)
+    validateOutFields(",".join(fields), layerDetails)
+    fieldTypes = _fieldTypes(layerDetails)
+
+    rows = None
+    if _capability(layerDetails, 'supportsDistinct'):
+        params = {'where': where, 'outFields': ",".join(fields), 'returnDistinctValues': 'true',
+                  'returnGeometry': 'false', 'orderByFields': ",".join(fields), 'f': 'json'}
+        rows = _queryRows(queryUrl, params, fields)
+    if rows is None:
+        values = set()
+        for feature in iterMapLayerData(baseUrl, serviceName, layerId, where, fields,
+                                        queryOptions=QueryOptions(returnGeometry=False)):
+            attributes = _matchNames(feature.get('attributes') or {}, fields)
+            values.add(tuple(attributes.get(field) for field in fields))
+        rows = [dict(zip(fields, value)) for value in values]
+    rows.sort(key=lambda row: _sortKey(row, fields))
+    return [_typedRow(row, fieldTypes) for row in rows]
+
+
+# Synonym function for restGetMapLayerDistinctValues
+def getMapLayerDistinctValues(baseUrl, serviceName, layerId, fields, where="1=1"):
+    """
+    synonym for restGetMapLayerDistinctValues
+    """
+    return restGetMapLayerDistinctValues(baseUrl, serviceName, layerId, fields, where)
+
+
+def restGetMapLayerStatistics(baseUrl, serviceName, layerId, statistics, groupBy=None, where="1=1"):
+    """
+    Computes statistics of the features of a map layer, optionally grouped by fields, without downloading them.
+
+    The statistics are computed on the server (`outStatistics` and `groupByFieldsForStatistics`) when the layer
+    advertises `supportsStatistics`, and `supportsPercentileStatistics` for percentiles. Otherwise, or when the server
+    rejects the query, the values of the statistic and group fields are streamed without geometries and aggregated
+    while they arrive, so only the groups are held in memory (and the values of the groups for percentiles).
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer.
+        statistics (list): The statistics, in the `outStatistics` format: dictionaries with a `statisticType` (one of
+        `statisticTypes`), an `onStatisticField`, an optional `outStatisticFieldName` (defaults to
+        "<statisticType>_<onStatisticField>") and, for percentiles, `statisticParameters` with a `value` between 0
+        and 1.
+        groupBy (str or list, optional): The fields to group by.
+        where (str): The SQL where clause to filter the data.
+
+    Returns:
+        list: One typed row (dictionary) per group, with the group fields and the statistics, sorted by the group
+        fields.
+
+    Raises:
+        ValueError: If a statistic is invalid or a field does not exist in the layer.
+    """
+    statistics = _normalizeStatistics(statistics)
+    groupBy = _fieldList(groupBy) if groupBy else []
+    queryUrl, layerDetails = _prepareLayer(baseUrl, serviceName, layerId)
+    validateOutFields(",".join(groupBy + [statistic['onStatisticField'] for statistic in statistics]), layerDetails)
+    fieldTypes = _fieldTypes(layerDetails)
+    statisticNames = [statistic['outStatisticFieldName'] for statistic in statistics]
+
+    rows = None
+    if _supportsStatistics(layerDetails, statistics):
+        params = {'where': where, 'outStatistics': json.dumps(statistics), 'f': 'json'}
+        if groupBy:
+            params['groupByFieldsForStatistics'] = ",".join(groupBy)
+            params['orderByFields'] = ",".join(groupBy)
+        rows = _queryRows(queryUrl, params, groupBy + statisticNames)
+    if rows is None:
+        rows = _aggregate(iterMapLayerData(
+            baseUrl, serviceName, layerId, where,
+            list(dict.fromkeys(groupBy + [statistic['onStatisticField'] for statistic in statistics])),
+            queryOptions=QueryOptions(returnGeometry=False)), statistics, groupBy)
+    rows.sort(key=lambda row: _sortKey(row, groupBy))
+
+    # The statistics are typed by their statistic, counts are integers and the others keep the type of the field
+    # for min and max, or are floats
+    for statistic in statistics:
+        if statistic['statisticType'] == 'count':
+            fieldTypes[statistic['outStatisticFieldName'].lower()] = 'esriFieldTypeBigInteger'
+        elif statistic['statisticType'] in ('min', 'max', 'percentile_disc'):
+            fieldTypes[statistic['outStatisticFieldName'].lower()] = fieldTypes.get(
+                statistic['onStatisticField'].lower())
+        else:
+            fieldTypes[statistic['outStatisticFieldName'].lower()] = 'esriFieldTypeDouble'
+    return [_typedRow(row, fieldTypes) for row in rows]
+
+
+# Synonym function for restGetMapLayerStatistics
+def getMapLayerStatistics(baseUrl, serviceName, layerId, statistics, groupBy=None, where="1=1"):
+    """
+    synonym for restGetMapLayerStatistics
+    """
+    return restGetMapLayerStatistics(baseUrl, serviceName, layerId, statistics, groupBy, where)
+
+
+def _prepareLayer(baseUrl, serviceName, layerId):
+    """
+    Verifies that a service is a MapServer and returns the query URL and the (cached) details of one of its layers.
+    """
+    validatedUrl = checkBaseUrl(baseUrl)
+    serviceType = restGetServiceType(baseUrl, serviceName)
+    if serviceType != "MapServer":
+        raise ValueError(f"The service {serviceName} is of type {serviceType}, not a MapServer.")
+    return _queryUrl(validatedUrl, serviceName, layerId), _getLayerDetails(validatedUrl, serviceName, layerId)
+
+
+def _capability(layerDetails, name):
+    """
+    Reads a query capability of a layer from its `advancedQueryCapabilities`, or from the layer details themselves
+    for servers that advertise it there.
+    """
+    advancedQueryCapabilities = layerDetails.get('advancedQueryCapabilities') or {}
+    return bool(advancedQueryCapabilities.get(name, layerDetails.get(name, False)))
+
+
+def _supportsStatistics(layerDetails, statistics):
+    if not _capability(layerDetails, 'supportsStatistics'):
+        return False
+    if any(statistic['statisticType'] in _percentileTypes for statistic in statistics):
+        return _capability(layerDetails, 'supportsPercentileStatistics')
+    return True
+
+
+def _queryRows(queryUrl, params, names):
+    """
+    Runs a statistics or distinct values query on the server.
+
+    Returns:
+        list: The attributes of the result features with the requested names, or None when the server rejected the
+        query.
+    """
+    try:
+        data = _getQueryJson(queryUrl, params)
+    except ArcGISServerError:
+        return None
+    except ArcGISHttpError as e:
+        if e.statusCode not in (400, 500):
+            raise
+        return None
+    if data.get('exceededTransferLimit'):
+        # The server truncated the groups, only a client side aggregation returns all of them
+        return None
+    return [_matchNames(feature.get('attributes') or {}, names) for feature in data.get('features', [])]
+
+
+def _matchNames(attributes, names):
+    """
+    Renames attributes to the requested names, servers may change the case of field and statistic names.
+    """
+    byLowerName = {name.lower(): value for name, value in attributes.items()}
+    return {name: attributes[name] if name in attributes else byLowerName.get(name.lower()) for name in names}
+
+
+def _fieldList(fields):
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    fields = [name.strip() for name in fields if name.strip()]
+    if not fields:
+        raise ValueError("At least one field is required.")
+    return fields
+
+
+def _fieldTypes(layerDetails):
+    return {field['name'].lower(): field.get('type') for field in layerDetails.get('fields') or [] if 'name' in field}
+
+
+def _normalizeStatistics(statistics):
+    """
+    Validates statistics in the `outStatistics` format and fills in their output names.
+    """
+    if not statistics:
+        raise ValueError("At least one statistic is required.")
+    normalized = []
+    for statistic in statistics:
+        statisticType = str(statistic.get('statisticType', '')).lower()
+        if statisticType not in statisticTypes:
+            raise ValueError(f"Unsupported statisticType {statistic.get('statisticType')!r}, use one of: "
+                             f"{', '.join(statisticTypes)}.")
+        field = statistic.get('onStatisticField')
+        if not field:
+            raise ValueError(f"The {statisticType} statistic has no onStatisticField.")
+        result = {'statisticType': statisticType, 'onStatisticField': field,
+                  'outStatisticFieldName': statistic.get('outStatisticFieldName') or f"{statisticType}_{field}"}
+        if statisticType in _percentileTypes:
+            value = (statistic.get('statisticParameters') or {}).get('value')
+            if value is None or not 0 <= value <= 1:
+                raise ValueError(f"The {statisticType} statistic needs statisticParameters with a value between 0 "
+                                 "and 1.")
+            result['statisticParameters'] = {'value': value}
+        normalized.append(result)
+    return normalized
+
+
+def _aggregate(features, statistics, groupBy):
+    """
+    Computes statistics of streamed features per group, like the server does for outStatistics.
+
+    Returns:
+        list: One row per group, with the group fields and the statistics.
+    """
+    groups = {}
+    names = groupBy + [statistic['onStatisticField'] for statistic in statistics]
+    for feature in features:
+        attributes = feature.get('attributes') or {}
+        if any(name not in attributes for name in names):
+            attributes = _matchNames(attributes, names)
+        key = tuple(attributes.get(field) for field in groupBy)
+        accumulators = groups.get(key)
+        if accumulators is None:
+            accumulators = groups[key] = [_Accumulator(statistic) for statistic in statistics]
+        for accumulator in accumulators:
+            accumulator.add(attributes.get(accumulator.field))
+    if not groups and not groupBy:
+        # Statistics over no features, like the server returns them
+        groups[()] = [_Accumulator(statistic) for statistic in statistics]
+    return [dict(zip(groupBy, key), **{accumulator.name: accumulator.result() for accumulator in accumulators})
+            for key, accumulators in groups.items()]
+
+
+class _Accumulator:
+    """
+    Computes a statistic of the values of a field in a single pass, ignoring missing values like SQL does. The
+    variance uses Welford's algorithm, and is the sample variance like the one of the server.
+    """
+
+    def __init__(self, statistic):
+        self.type = statistic['statisticType']
+        self.field = statistic['onStatisticField']
+        self.name = statistic['outStatisticFieldName']
+        self.percentile = (statistic.get('statisticParameters') or {}).get('value')
+        self.count = 0
+        self.sum = 0
+        self.minimum = None
+        self.maximum = None
+        self.mean = 0.0
+        self.squares = 0.0
+        self.values = [] if self.type in _percentileTypes else None
+
+    def add(self, value):
+        if value is None:
+            return
+        self.count += 1
+        if self.type == 'count':
+            return
+        if self.values is not None:
+            self.values.append(value)
+            return
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        if self.type in ('sum', 'avg', 'stddev', 'var'):
+            self.sum += value
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.squares += delta * (value - self.mean)
+
+    def result(self):
+        if self.type == 'count':
+            return self.count
+        if self.count == 0:
+            return None
+        if self.type == 'sum':
+            return self.sum
+        if self.type == 'min':
+            return self.minimum
+        if self.type == 'max':
+            return self.maximum
+        if self.type == 'avg':
+            return self.sum / self.count
+        if self.type in ('var', 'stddev'):
+            if self.count < 2:
+                return None
+            variance = self.squares / (self.count - 1)
+            return variance if self.type == 'var' else math.sqrt(variance)
+
+        values = sorted(self.values)
+        if self.type == 'percentile_disc':
+            # The first value whose cumulative distribution reaches the percentile
+            return values[max(0, math.ceil(self.percentile * len(values)) - 1)]
+        position = self.percentile * (len(values) - 1)
+        lower = math.floor(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _typedRow(row, fieldTypes):
+    """
+    Converts the values of a row to the Python types of their fields: integers, floats and timezone aware datetimes
+    for dates, which the server sends as epoch milliseconds.
+    """
+    typed = {}
+    for name, value in row.items():
+        fieldType = fieldTypes.get(name.lower())
+        if value is not None:
+            if fieldType in _integerFieldTypes:
+                value = int(value)
+            elif fieldType in _floatFieldTypes:
+                value = float(value)
+            elif fieldType == 'esriFieldTypeDate' and isinstance(value, (int, float)):
+                value = datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+        typed[name] = value
+    return typed
+
+
+def _sortKey(row, fields):
+    # Missing values sort first, like the nulls of an ascending ORDER BY
+    return tuple((row.get(field) is not None, row.get(field)) for field in fields)
+
+
+def _isEmptyExtent(extent):
+    try:
+        return any(math.isnan(float(extent[key])) for key in ('xmin', 'ymin', 'xmax', 'ymax'))
+    except (KeyError, TypeError, ValueError):
+        return True
+
+
+def _extendBounds(bounds, geometry):
+    """
+    Extends `[xmin, ymin, xmax, ymax]` with the coordinates of an Esri JSON geometry.
+    """
+    if not geometry:
+        return
+    if 'x' in geometry:
+        points = [(geometry['x'], geometry['y'])] if geometry['x'] is not None else []
+    elif 'xmin' in geometry:
+        points = [(geometry['xmin'], geometry['ymin']), (geometry['xmax'], geometry['ymax'])]
+    else:
+        parts = geometry.get('paths') or geometry.get('rings') or [geometry.get('points') or []]
+        points = [point for part in parts for point in part]
+    for point in points:
+        x, y = point[0], point[1]
+        if x < bounds[0]:
+            bounds[0] = x
+        if y < bounds[1]:
+            bounds[1] = y
+        if x > bounds[2]:
+            bounds[2] = x
+        if y > bounds[3]:
+            bounds[3] = y
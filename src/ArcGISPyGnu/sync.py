@@ -0,0 +1,176 @@
+import json
+import os
+from datetime import datetime, timezone
+
+from .core import _getLayerDetails, iterMapLayerData, restGetMapLayerObjectIds
+from .query import outFieldsParameter
+from .utils import checkBaseUrl
+
+# The number of object IDs put in a single IN clause when features are fetched by ID
+_objectIdBatchSize = 500
+
+
+def loadSyncState(statePath):
+    """
+    Loads the state of an earlier incremental sync.
+
+    Args:
+        statePath (str): The path of the JSON state file.
+
+    Returns:
+        dict: The state with the `layer` it belongs to, the edit date `watermark` (epoch milliseconds) and the
+        `objectIds` seen, or None when the file does not exist.
+    """
+    if not os.path.exists(statePath):
+        return None
+    with open(statePath, encoding="utf-8") as stateFile:
+        return json.load(stateFile)
+
+
+def saveSyncState(statePath, state):
+    """
+    Saves the state of an incremental sync. The file is replaced atomically, so an interrupted save never leaves a
+    corrupt state behind.
+
+    Args:
+        statePath (str): The path of the JSON state file.
+        state (dict): The state, as returned by loadSyncState.
+    """
+    temporaryPath = f"{statePath}.tmp"
+    with open(temporaryPath, "w", encoding="utf-8") as stateFile:
+        json.dump(state, stateFile, separators=(",", ":"))
+    os.replace(temporaryPath, statePath)
+
+
+def syncMapLayer(baseUrl, serviceName, layerId, statePath, where="1=1", outFields="*", editDateField=None,
+                 maxWorkers=1, commit=True):
+    """
+    Fetches the changes of a map layer since the previous sync, as a changeset of inserts, updates and deletes.
+
+    The edit date field is read from the `editFieldsInfo` of the layer details (or given explicitly), and only
+    features edited at or after the watermark of the previous sync are downloaded. Deleted features are detected by
+    comparing the current object IDs (`returnIdsOnly`) with the object IDs seen by the previous sync. The first sync of
+    a layer returns every feature as an insert. Layers without an edit date field are downloaded completely, but the
+    changeset still tells inserts from updates and deletes.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer to sync.
+        statePath (str): The path of the JSON file holding the sync state of the layer.
+        where (str): The SQL where clause selecting the features to keep in sync.
+        outFields (str or list): The fields to return, as a comma separated string, "*" or a list of names. The object
+        ID and edit date fields are always returned.
+        editDateField (str, optional): The date field holding the last edit date. Defaults to the `editDateField` of
+        the `editFieldsInfo` of the layer.
+        maxWorkers (int): The number of pages fetched in parallel.
+        commit (bool): Save the new state after the changeset was computed. Use False to save it yourself with
+        saveSyncState(statePath, changeset["state"]) once the changeset has been applied.
+
+    Returns:
+        dict: The changeset with the `inserts` and `updates` (lists of features), the `deletes` (list of object IDs),
+        the `objectIdFieldName` and the new `state`.
+
+    Raises:
+        ValueError: If the state file belongs to a different layer or query, or the edit date field is not a date field
+        of the layer.
+    """
+    validatedUrl = checkBaseUrl(baseUrl)
+    layerKey = {"baseUrl": validatedUrl, "serviceName": serviceName, "layerId": str(layerId), "where": where}
+
+    state = loadSyncState(statePath)
+    if state is not None and state.get("layer") != layerKey:
+        raise ValueError(f"The sync state in {statePath} belongs to {state.get('layer')}, not to {layerKey}.")
+    previousIds = set(state["objectIds"]) if state else set()
+    watermark = state.get("watermark") if state else None
+
+    layerDetails = _getLayerDetails(validatedUrl, serviceName, layerId)
+    editDateField = editDateField or (layerDetails.get("editFieldsInfo") or {}).get("editDateField")
+    if editDateField:
+        dateFields = [field["name"] for field in layerDetails.get("fields") or []
+                      if field.get("type") == "esriFieldTypeDate"]
+        if dateFields and editDateField not in dateFields:
+            raise ValueError(f"The field {editDateField} is not a date field of layer {layerId}, "
+                             f"use one of: {', '.join(dateFields)}.")
+
+    idsResult = restGetMapLayerObjectIds(baseUrl, serviceName, layerId, where)
+    objectIdField = idsResult["objectIdFieldName"]
+    currentIds = set(idsResult["objectIds"])
+
+    changedWhere = where
+    if editDateField and watermark is not None:
+        # Edits within the second of the watermark are fetched again, which is harmless as they become updates
+        changedWhere = f"({where}) AND {editDateField} >= TIMESTAMP '{_formatTimestamp(watermark)}'"
+    # The object ID tells inserts from updates, and the edit date advances the watermark, so both are always fetched
+    outFields = outFieldsParameter(outFields)
+    if outFields.strip() != "*":
+        fieldNames = [name.strip() for name in outFields.split(",")]
+        for requiredField in (objectIdField, editDateField):
+            if requiredField and requiredField.lower() not in {name.lower() for name in fieldNames}:
+                fieldNames.append(requiredField)
+        outFields = ",".join(fieldNames)
+
+    inserts = []
+    updates = []
+    fetchedIds = set()
+    newWatermark = watermark
+
+    def collect(feature):
+        objectId = feature["attributes"][objectIdField]
+        if objectId in fetchedIds:
+            return
+        fetchedIds.add(objectId)
+        (updates if objectId in previousIds else inserts).append(feature)
+
+    for feature in iterMapLayerData(baseUrl, serviceName, layerId, changedWhere, outFields, maxWorkers=maxWorkers):
+        collect(feature)
+        editDate = feature["attributes"].get(editDateField) if editDateField else None
+        if editDate is not None and (newWatermark is None or editDate > newWatermark):
+            newWatermark = editDate
+
+    # New features without an edit date are not matched by the watermark query, fetch them by ID
+    missingIds = sorted(currentIds - previousIds - fetchedIds)
+    for start in range(0, len(missingIds), _objectIdBatchSize):
+        batchIds = missingIds[start:start + _objectIdBatchSize]
+        batchWhere = f"({where}) AND {objectIdField} IN ({','.join(str(objectId) for objectId in batchIds)})"
+        for feature in iterMapLayerData(baseUrl, serviceName, layerId, batchWhere, outFields):
+            collect(feature)
+
+    newState = {"layer": layerKey, "watermark": newWatermark, "objectIds": sorted(currentIds)}
+    if commit:
+        saveSyncState(statePath, newState)
+
+    return {
+        "objectIdFieldName": objectIdField,
+        "inserts": inserts,
+        "updates": updates,
+        "deletes": sorted(previousIds - currentIds),
+        "state": newState,
+    }
+
+
+def applyChangeset(features, changeset):
+    """
+    Applies a changeset to a local copy of a layer.
+
+    Args:
+        features (dict): The local copy, mapping object IDs to features. It is updated in place.
+        changeset (dict): The changeset as returned by syncMapLayer.
+
+    Returns:
+        dict: The updated local copy.
+    """
+    objectIdField = changeset["objectIdFieldName"]
+    for feature in changeset["inserts"] + changeset["updates"]:
+        features[feature["attributes"][objectIdField]] = feature
+    for objectId in changeset["deletes"]:
+        features.pop(objectId, None)
+    return features
+
+
+def _formatTimestamp(epochMilliseconds):
+    """
+    Formats an ArcGIS date value (milliseconds since the epoch, UTC) as a standardized SQL timestamp literal.
+    """
+    moment = datetime.fromtimestamp(epochMilliseconds / 1000, tz=timezone.utc)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,234 @@
+import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .core import (_getLayerDetails, _getQueryJson, _hasMoreRecords, _layerQueryInfo, _objectIdRanges,
+                   _objectIdRangeWhere, _queryUrl, restGetServiceType)
+from .query import QueryOptions, outFieldsParameter, validateOutFields
+from .utils import checkBaseUrl
+
+
+def iterMapLayerTiles(baseUrl, serviceName, layerId, where="1=1", outFields="*", pages=False, maxWorkers=4,
+                      maxDepth=16, extent=None, queryFormat=None, queryOptions=None):
+    """
+    Iterates over the data of a map layer by querying a quadtree of envelopes over its extent.
+
+    This extracts layers that defeat the paging of iterMapLayerData, such as layers without `resultOffset` pagination
+    or with a very small `maxRecordCount`. The extent of the layer is queried as a single tile first. Every tile whose
+    response reaches the record limit of the layer (`exceededTransferLimit`) is split into four quadrants, which are
+    queried in turn, so the tiles adapt to the density of the data: sparse areas are covered by a few large tiles and
+    dense areas by many small ones. All pending tiles are fetched in parallel, so the parallelism grows with the
+    amount of data.
+
+    Features intersecting several tiles, such as features on a tile boundary, are yielded once, by object ID. A tile
+    that is still truncated at `maxDepth`, for example because many features share a location, is read by object ID
+    ranges instead.
+
+    Tiles are yielded in the order they complete, not in object ID order.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer to query.
+        where (str): The SQL where clause to filter the data.
+        outFields (str or list): The fields to return, as a comma separated string, "*" or a list of names.
+        pages (bool): Yield one list of features per tile instead of individual features.
+        maxWorkers (int): The number of tiles fetched in parallel.
+        maxDepth (int): The number of times a tile is split before it is read by object ID ranges.
+        extent (dict, optional): The envelope to extract, with `xmin`, `ymin`, `xmax`, `ymax` and a
+        `spatialReference`. Defaults to the extent of the layer.
+        queryFormat (str, optional): The format of the queries, "pbf" or "json". Defaults to "pbf" when the layer
+        supports it and "json" otherwise.
+        queryOptions (QueryOptions, optional): The geometry options of the query.
+
+    Returns:
+        generator: A generator yielding features (dictionaries), or lists of features when `pages` is True.
+
+    Raises:
+        ValueError: If the layer has no geometries or extent, does not have the requested fields or does not support
+        the query options.
+    """
+    validatedUrl = checkBaseUrl(baseUrl)
+    queryUrl = _queryUrl(validatedUrl, serviceName, layerId)
+    if queryFormat not in (None, 'pbf', 'json'):
+        raise ValueError(f"The queryFormat must be 'pbf' or 'json', got {queryFormat!r}.")
+    if maxWorkers < 1:
+        raise ValueError(f"The maxWorkers must be a positive number, got {maxWorkers}.")
+    outFields = outFieldsParameter(outFields)
+
+    serviceType = restGetServiceType(baseUrl, serviceName)
+    if serviceType != "MapServer":
+        raise ValueError(f"The service {serviceName} is of type {serviceType}, not a MapServer.")
+
+    layerDetails = _getLayerDetails(validatedUrl, serviceName, layerId)
+    validateOutFields(outFields, layerDetails)
+    if queryOptions is not None:
+        queryOptions.validate(layerDetails)
+    if not layerDetails.get('geometryType'):
+        raise ValueError(f"{layerDetails.get('name', 'The layer')} has no geometries and can not be tiled.")
+    extent = extent or layerDetails.get('extent')
+    if not _isValidExtent(extent):
+        raise ValueError(f"{layerDetails.get('name', 'The layer')} has no valid extent, pass one with `extent`.")
+    queryInfo = _layerQueryInfo(layerDetails)
+    if queryFormat is None:
+        queryFormat = 'pbf' if queryInfo['supportsPbf'] else 'json'
+
+    # The object IDs are needed to remove duplicates, they are dropped again when they were not requested
+    objectIdField = layerDetails.get('objectIdField') or 'OBJECTID'
+    dropObjectId = outFields.strip() != "*" and objectIdField.lower() not in [
+        name.strip().lower() for name in outFields.split(",")]
+    params = {
+        'where': where,
+        'outFields': f"{outFields},{objectIdField}" if dropObjectId else outFields,
+        'f': queryFormat,
+        'geometryType': 'esriGeometryEnvelope',
+        'spatialRel': 'esriSpatialRelIntersects',
+        'inSR': json.dumps(extent.get('spatialReference') or {'wkid': 4326}),
+    }
+    params.update((queryOptions or QueryOptions()).toParams())
+
+    pageIterator = _iterTilePages(queryUrl, params, _envelope(extent), objectIdField, dropObjectId,
+                                  queryInfo['maxRecordCount'], maxWorkers, maxDepth)
+    if pages:
+        return pageIterator
+    return (feature for page in pageIterator for feature in page)
+
+
+def _isValidExtent(extent):
+    """
+    Checks that an extent is a non-empty envelope, layers without features report an extent of NaN values or null.
+    """
+    if not isinstance(extent, dict):
+        return False
+    try:
+        xmin, ymin, xmax, ymax = (float(extent[key]) for key in ('xmin', 'ymin', 'xmax', 'ymax'))
+    except (KeyError, TypeError, ValueError):
+        return False
+    return xmin <= xmax and ymin <= ymax
+
+
+def _envelope(extent):
+    """
+    Returns the coordinates of an extent as an `(xmin, ymin, xmax, ymax)` tuple.
+    """
+    return tuple(float(extent[key]) for key in ('xmin', 'ymin', 'xmax', 'ymax'))
+
+
+def _quadrants(envelope):
+    """
+    Splits an envelope into its four quadrants, which share their edges.
+    """
+    xmin, ymin, xmax, ymax = envelope
+    xmid = (xmin + xmax) / 2
+    ymid = (ymin + ymax) / 2
+    return [(xmin, ymin, xmid, ymid), (xmid, ymin, xmax, ymid), (xmin, ymid, xmid, ymax), (xmid, ymid, xmax, ymax)]
+
+
+def _tileParams(params, envelope):
+    """
+    Restricts the parameters of a layer query to an envelope.
+    """
+    return dict(params, geometry=",".join(repr(value) for value in envelope))
+
+
+def _iterTilePages(queryUrl, params, envelope, objectIdField, dropObjectId, maxRecordCount, maxWorkers, maxDepth):
+    """
+    Runs the quadtree extraction of iterMapLayerTiles.
+
+    Yields:
+        list: The features of each tile that were not yielded before.
+    """
+    seenIds = set()
+
+    def fetchTile(tileEnvelope, depth):
+        tileParams = _tileParams(params, tileEnvelope)
+        if depth >= maxDepth:
+            return _fetchTileByObjectIds(queryUrl, tileParams, objectIdField, maxRecordCount), []
+        data = _getQueryJson(queryUrl, tileParams)
+        features = data.get('features', [])
+        if _hasMoreRecords(data, len(features), maxRecordCount):
+            # Discard the truncated response and query the quadrants instead
+            return [], [(quadrant, depth + 1) for quadrant in _quadrants(tileEnvelope)]
+        return features, []
+
+    executor = ThreadPoolExecutor(max_workers=maxWorkers)
+    pending = {executor.submit(fetchTile, envelope, 0)}
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                features, subtiles = future.result()
+                pending.update(executor.submit(fetchTile, *subtile) for subtile in subtiles)
+                pageFeatures = []
+                for feature in features:
+                    attributes = feature.get('attributes') or {}
+                    objectId = attributes.get(objectIdField)
+                    if objectId is not None:
+                        if objectId in seenIds:
+                            continue
+                        seenIds.add(objectId)
+                        if dropObjectId:
+                            del attributes[objectIdField]
+                    pageFeatures.append(feature)
+                if pageFeatures:
+                    yield pageFeatures
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def _fetchTileByObjectIds(queryUrl, tileParams, objectIdField, pageSize):
+    """
+    Reads a tile that can not be split any further by object ID ranges, see _iterObjectIdPages of the core module.
+
+    Returns:
+        list: The features of the tile.
+    """
+    idsData = _getQueryJson(queryUrl, dict(tileParams, returnIdsOnly='true', f='json'))
+    objectIdField = idsData.get('objectIdFieldName', objectIdField)
+    features = []
+
+    def fetchRange(rangeIds):
+        rangeWhere = _objectIdRangeWhere(tileParams['where'], objectIdField, rangeIds)
+        data = _getQueryJson(queryUrl, dict(tileParams, where=rangeWhere))
+        if data.get('exceededTransferLimit') and len(rangeIds) > 1:
+            middle = len(rangeIds) // 2
+            return fetchRange(rangeIds[:middle]) + fetchRange(rangeIds[middle:])
+        return data.get('features', [])
+
+    for rangeIds in _objectIdRanges(sorted(idsData.get('objectIds') or []), pageSize):
+        features.extend(fetchRange(rangeIds))
+    return features
+
+
+def restGetMapLayerDataTiled(baseUrl, serviceName, layerId, where="1=1", outFields="*", maxWorkers=4, maxDepth=16,
+                             extent=None, queryOptions=None):
+    """
+    Retrieves the data of a map layer with a quadtree of envelope queries, see iterMapLayerTiles.
+
+    Args:
+        baseUrl (str): The base URL of the ArcGIS REST API.
+        serviceName (str): The name of the service containing the layer.
+        layerId (int): The ID of the layer to query.
+        where (str): The SQL where clause to filter the data.
+        outFields (str or list): The fields to return.
+        maxWorkers (int): The number of tiles fetched in parallel.
+        maxDepth (int): The number of times a tile is split before it is read by object ID ranges.
+        extent (dict, optional): The envelope to extract. Defaults to the extent of the layer.
+        queryOptions (QueryOptions, optional): The geometry options of the query.
+
+    Returns:
+        list: A list of features (dictionaries), each feature once.
+    """
+    return list(iterMapLayerTiles(baseUrl, serviceName, layerId, where, outFields, maxWorkers=maxWorkers,
+                                  maxDepth=maxDepth, extent=extent, queryOptions=queryOptions))
+
+
+# Synonym function for restGetMapLayerDataTiled
+def getMapLayerDataTiled(baseUrl, serviceName, layerId, where="1=1", outFields="*", maxWorkers=4, maxDepth=16,
+                         extent=None, queryOptions=None):
+    """
+    synonym for restGetMapLayerDataTiled
+    """
+    return restGetMapLayerDataTiled(baseUrl, serviceName, layerId, where, outFields, maxWorkers, maxDepth, extent,
+                                    queryOptions)
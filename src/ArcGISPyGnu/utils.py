@@ -1,5 +1,7 @@
 import re
-import sys
+
+from .exceptions import ArcGISError, ArcGISHttpError, InvalidUrlError
+
 
 def checkBaseUrl(url):
     """
@@ -12,8 +14,8 @@ def checkBaseUrl(url):
     Returns:
         str: The validated URL, guaranteed to end with a slash.
 
-    Exits:
-        Exits the program with status 1 if the URL is not valid or contains a path/query string.
+    Raises:
+        InvalidUrlError: If the URL is not valid or contains a query string or fragment.
     """
     # Regular expression to validate a base URL without path or query string
     urlPattern = re.compile(
@@ -35,13 +37,11 @@ def checkBaseUrl(url):
     # Match the URL against the pattern
     match = re.match(urlPattern, url)
     if not match:
-        print("Invalid URL format.", file=sys.stdout)
-        sys.exit(1)
+        raise InvalidUrlError(f"Invalid URL format: {url}")
 
     # Ensure no path or query string is present
     if '?' in url or '#' in url:
-        print("URL must not contain a query string or fragment.", file=sys.stdout)
-        sys.exit(1)
+        raise InvalidUrlError(f"URL must not contain a query string or fragment: {url}")
 
     # Ensure the URL ends with a slash
     if not url.endswith('/'):
@@ -52,11 +52,15 @@ def checkBaseUrl(url):
 
 def printError(errorCode, additionalInfo=None):
     """
-    Prints an error message to stderr and exits the program based on the provided error code.
+    Raises the error matching the provided error code, so callers can handle it instead of the program exiting.
 
     Args:
         errorCode (str): The error code indicating the type of error.
         additionalInfo (str, optional): Additional information related to the error.
+
+    Raises:
+        ArcGISHttpError: For the `httpError<status>` error codes.
+        ArcGISError: For all other error codes.
     """
     errorMessages = {
         "httpError400": "400 Bad Request: The server could not understand the request.",
@@ -77,12 +81,14 @@ def printError(errorCode, additionalInfo=None):
         "httpError415": "415 Unsupported Media Type: The media type is unsupported.",
         "httpError416": "416 Requested Range Not Satisfiable: The requested range is not satisfiable.",
         "httpError417": "417 Expectation Failed: Expectation failed for the request.",
+        "httpError429": "429 Too Many Requests: The server is throttling the requests.",
         "httpError500": "500 Internal Server Error: The server encountered an error processing the request.",
         "httpError501": "501 Not Implemented: The server does not support the functionality required.",
         "httpError502": "502 Bad Gateway: The server received an invalid response.",
         "httpError503": "503 Service Unavailable: The server is currently unable to handle the request.",
         "httpError504": "504 Gateway Time-out: The gateway timed out while processing the request.",
         "httpError505": "505 HTTP Version Not Supported: The server does not support the HTTP version used in the request.",
+        "requestException": "Request failed: The server could not be reached or did not respond in time.",
         # Add more custom error messages here as needed
     }
 
@@ -90,5 +96,6 @@ def printError(errorCode, additionalInfo=None):
     if additionalInfo:
         errorMessage += f" Additional info: {additionalInfo}"
 
-    print(errorMessage, file=sys.stderr)
-    sys.exit(1)
+    if errorCode.startswith("httpError") and errorCode[len("httpError"):].isdigit():
+        raise ArcGISHttpError(errorMessage, int(errorCode[len("httpError"):]), additionalInfo)
+    raise ArcGISError(errorMessage)
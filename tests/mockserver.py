@@ -0,0 +1,604 @@
+"""
+A local stand-in for an ArcGIS REST API server, used by the integration tests and the benchmarks.
+
+The server generates a synthetic catalog (a tree of folders holding MapServer services with point layers) and answers
+the catalog, layer details and layer query requests the library sends, including `resultOffset` pagination, object ID
+range queries and `returnIdsOnly` queries, in JSON or in the PBF format. Features are computed from their object ID, so layers of millions of
+features cost no memory. Latency and errors can be injected to measure the behavior of the client under load.
+"""
+import json
+import random
+import re
+import statistics
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+# Epoch milliseconds of the edit date of the first feature
+_baseEditDate = 1704067200000
+
+_fields = [
+    {"name": "OBJECTID", "type": "esriFieldTypeOID", "alias": "OBJECTID"},
+    {"name": "NAME", "type": "esriFieldTypeString", "alias": "Name", "length": 64},
+    {"name": "CATEGORY", "type": "esriFieldTypeSmallInteger", "alias": "Category"},
+    {"name": "VALUE", "type": "esriFieldTypeDouble", "alias": "Value"},
+    {"name": "EDITED", "type": "esriFieldTypeDate", "alias": "Edited", "length": 8},
+]
+
+# The PBF field types and geometry type of the fields and point geometries of the synthetic layers
+_pbfFieldTypes = {"esriFieldTypeSmallInteger": 0, "esriFieldTypeInteger": 1, "esriFieldTypeDouble": 3,
+                  "esriFieldTypeString": 4, "esriFieldTypeDate": 5, "esriFieldTypeOID": 6}
+_pbfPointType = 0
+# Quantization of the PBF coordinates: the scale and the upper left corner of the extent
+_pbfScale = 1e-8
+_pbfOrigin = (-180.0, 90.0)
+
+_lowerBoundPattern = re.compile(r"OBJECTID\s*>=\s*(\d+)")
+_upperBoundPattern = re.compile(r"OBJECTID\s*<=\s*(\d+)")
+_inPattern = re.compile(r"OBJECTID\s+IN\s*\(([\d,\s]+)\)", re.IGNORECASE)
+
+
+class MockArcGISServer:
+    """
+    A threaded HTTP server imitating an ArcGIS REST API server with a synthetic catalog.
+
+    The catalog has `foldersPerFolder` folders at every level up to `folderDepth` levels deep, and every folder
+    (including the root) holds `servicesPerFolder` services with `layersPerService` layers of `featuresPerLayer`
+    point features each.
+
+    Args:
+        folderDepth (int): The number of folder levels below the root.
+        foldersPerFolder (int): The number of subfolders of every folder above the deepest level.
+        servicesPerFolder (int): The number of services in every folder.
+        layersPerService (int): The number of layers of every service.
+        featuresPerLayer (int): The number of features of every layer.
+        maxRecordCount (int): The maximum number of features returned by a single query.
+        supportsPagination (bool): Whether the layers support `resultOffset` pagination.
+        latency (float): The delay added to every response, in seconds.
+        latencyJitter (float): A random delay of up to this many seconds added on top of `latency`.
+        errorRate (float): The fraction of requests answered with an error.
+        errorStatus (int): The status of injected errors.
+        errorDocument (bool): Send injected errors as an ArcGIS JSON error document with a 200 status instead of an
+        HTTP error status.
+        retryAfter (int, optional): The value of the `Retry-After` header of injected errors.
+        supportsPbf (bool): Whether the layers support the PBF query format (`f=pbf`).
+        supportsLayersResource (bool): Whether the services answer the `MapServer/layers` resource, which returns the
+        details of all layers at once.
+        supportsStatistics (bool): Whether the layers compute statistics, distinct values and extents on the server.
+        seed (int): The seed of the random generator deciding on injected latency and errors.
+    """
+
+    def __init__(self, folderDepth=2, foldersPerFolder=3, servicesPerFolder=2, layersPerService=2,
+                 featuresPerLayer=1000, maxRecordCount=1000, supportsPagination=True, latency=0.0, latencyJitter=0.0,
+                 errorRate=0.0, errorStatus=503, errorDocument=False, retryAfter=None, supportsPbf=True, supportsLayersResource=True,
+                 supportsStatistics=True, seed=0):
+        self.folderDepth = folderDepth
+        self.foldersPerFolder = foldersPerFolder
+        self.servicesPerFolder = servicesPerFolder
+        self.layersPerService = layersPerService
+        self.featuresPerLayer = featuresPerLayer
+        self.maxRecordCount = maxRecordCount
+        self.supportsPagination = supportsPagination
+        self.latency = latency
+        self.latencyJitter = latencyJitter
+        self.errorRate = errorRate
+        self.errorStatus = errorStatus
+        self.errorDocument = errorDocument
+        self.retryAfter = retryAfter
+        self.supportsPbf = supportsPbf
+        self.supportsLayersResource = supportsLayersResource
+        self.supportsStatistics = supportsStatistics
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.resetStats()
+
+    @property
+    def baseUrl(self):
+        """
+        The base URL of the REST API of the running server, to be passed to the `rest*` functions.
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/arcgis/rest"
+
+    def start(self):
+        """
+        Starts serving on a free port of the loopback interface, in a background thread.
+
+        Returns:
+            MockArcGISServer: The server itself.
+        """
+        mockServer = self
+
+        class Handler(_RequestHandler):
+            server_version = "MockArcGISServer/1.0"
+            owner = mockServer
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05},
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+
+    def resetStats(self):
+        """
+        Resets the request counters.
+        """
+        with self._lock:
+            self._stats = {"requests": 0, "catalog": 0, "details": 0, "query": 0, "errors": 0, "bytes": 0, "pbf": 0}
+
+    def stats(self):
+        """
+        Returns the request counters.
+
+        Returns:
+            dict: The number of `requests`, split in `catalog`, `details` and `query` requests, the number of injected
+            `errors`, the number of response body `bytes` sent and the number of `pbf` responses.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def folderPaths(self):
+        """
+        Returns the paths of all folders of the catalog, without the root.
+
+        Returns:
+            list: The folder paths, in the order of a depth-first crawl.
+        """
+        paths = []
+
+        def collect(path):
+            for name in self._subfolders(path):
+                childPath = f"{path}/{name}" if path else name
+                paths.append(childPath)
+                collect(childPath)
+
+        collect("")
+        return paths
+
+    def serviceNames(self):
+        """
+        Returns the names of all services of the catalog.
+
+        Returns:
+            list: The service names, including their folder path.
+        """
+        return [name for path in [""] + self.folderPaths() for name in self._serviceNames(path)]
+
+    def feature(self, objectId, outFields="*", returnGeometry=True):
+        """
+        Computes the feature with the given object ID, which is the same for every layer.
+
+        Args:
+            objectId (int): The object ID, from 1 to `featuresPerLayer`.
+            outFields (str): The fields to return, as a comma separated string or "*".
+            returnGeometry (bool): Include the point geometry.
+
+        Returns:
+            dict: The feature as Esri JSON.
+        """
+        attributes = {
+            "OBJECTID": objectId,
+            "NAME": f"Feature {objectId}",
+            "CATEGORY": objectId % 7 if objectId % 11 else None,
+            "VALUE": objectId * 0.5,
+            "EDITED": _baseEditDate + objectId * 1000,
+        }
+        if outFields.strip() != "*":
+            requested = {name.strip().upper() for name in outFields.split(",")}
+            attributes = {name: value for name, value in attributes.items() if name in requested}
+        feature = {"attributes": attributes}
+        if returnGeometry:
+            feature["geometry"] = {"x": round(-180 + (objectId * 0.0137) % 360, 6),
+                                   "y": round(-85 + (objectId * 0.0071) % 170, 6)}
+        return feature
+
+    def _subfolders(self, path):
+        depth = len(path.split("/")) if path else 0
+        if depth >= self.folderDepth:
+            return []
+        return [f"Folder{index}" for index in range(self.foldersPerFolder)]
+
+    def _serviceNames(self, path):
+        prefix = f"{path}/" if path else ""
+        return [f"{prefix}Service{index}" for index in range(self.servicesPerFolder)]
+
+    def _isFolder(self, path):
+        if not path:
+            return True
+        parent, _, name = path.rpartition("/")
+        return self._isFolder(parent) and name in self._subfolders(parent)
+
+    def _isService(self, serviceName):
+        path = serviceName.rpartition("/")[0]
+        return self._isFolder(path) and serviceName in self._serviceNames(path)
+
+    def _record(self, kind, size, error=False, pbf=False):
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats[kind] += 1
+            self._stats["bytes"] += size
+            if error:
+                self._stats["errors"] += 1
+            if pbf:
+                self._stats["pbf"] += 1
+
+    def _delayAndFail(self):
+        """
+        Decides on the injected latency and error of a request.
+
+        Returns:
+            tuple: The delay in seconds and whether the request fails.
+        """
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.latencyJitter) if self.latencyJitter else 0.0)
+            fail = self.errorRate > 0 and self._random.random() < self.errorRate
+        return delay, fail
+
+    def handle(self, path, params):
+        """
+        Answers a request.
+
+        Args:
+            path (str): The path of the request, with repeated slashes collapsed.
+            params (dict): The query string parameters.
+
+        Returns:
+            tuple: The kind of request, the status and the document of the response: a dictionary sent as JSON, or the
+            bytes of a PBF response.
+        """
+        if not path.startswith("/arcgis/rest"):
+            return "catalog", 404, _errorDocument(404, "Not found")
+        path = path[len("/arcgis/rest"):].strip("/")
+
+        if path in ("", "info"):
+            return "catalog", 200, {"currentVersion": 11.1, "fullVersion": "11.1.0"}
+        if path == "services" or path.startswith("services/"):
+            return self._handleServices(path[len("services"):].strip("/"), params)
+        return "catalog", 404, _errorDocument(404, "Not found")
+
+    def _handleServices(self, path, params):
+        if "/MapServer" not in f"/{path}":
+            if not self._isFolder(path):
+                return "catalog", 404, _errorDocument(404, f"Folder not found: {path}")
+            return "catalog", 200, {
+                "currentVersion": 11.1,
+                "folders": self._subfolders(path),
+                "services": [{"name": name, "type": "MapServer"} for name in self._serviceNames(path)],
+            }
+
+        serviceName, _, rest = path.partition("/MapServer")
+        rest = rest.strip("/")
+        if not self._isService(serviceName):
+            return "details", 404, _errorDocument(404, f"Service not found: {serviceName}")
+        if not rest:
+            return "details", 200, self._mapServerDetails(serviceName)
+
+        layerPart, _, operation = rest.partition("/")
+        if layerPart == "layers" and not operation and self.supportsLayersResource:
+            return "details", 200, {"layers": [self._layerDetails(layerId) for layerId in
+                                               range(self.layersPerService)], "tables": []}
+        if not layerPart.isdigit() or int(layerPart) >= self.layersPerService:
+            return "details", 404, _errorDocument(404, f"Layer not found: {layerPart}")
+        if not operation:
+            return "details", 200, self._layerDetails(int(layerPart))
+        if operation == "query":
+            return self._query(params)
+        return "details", 404, _errorDocument(404, f"Operation not supported: {operation}")
+
+    def _mapServerDetails(self, serviceName):
+        return {
+            "currentVersion": 11.1,
+            "serviceDescription": f"Synthetic service {serviceName}",
+            "mapName": serviceName.rpartition("/")[2],
+            "layers": [{"id": layerId, "name": f"Layer{layerId}", "type": "Feature Layer",
+                        "geometryType": "esriGeometryPoint", "parentLayerId": -1, "subLayerIds": None}
+                       for layerId in range(self.layersPerService)],
+            "tables": [],
+            "maxRecordCount": self.maxRecordCount,
+        }
+
+    def _layerDetails(self, layerId):
+        return {
+            "currentVersion": 11.1,
+            "id": layerId,
+            "name": f"Layer{layerId}",
+            "type": "Feature Layer",
+            "geometryType": "esriGeometryPoint",
+            "objectIdField": "OBJECTID",
+            "fields": _fields,
+            "maxRecordCount": self.maxRecordCount,
+            "supportedQueryFormats": "JSON, geoJSON, PBF" if self.supportsPbf else "JSON, geoJSON",
+            "supportsCoordinatesQuantization": True,
+            "advancedQueryCapabilities": {"supportsPagination": self.supportsPagination,
+                                          "supportsReturningQueryExtent": self.supportsStatistics,
+                                          "supportsStatistics": self.supportsStatistics,
+                                          "supportsDistinct": self.supportsStatistics,
+                                          "supportsPercentileStatistics": False},
+            "editFieldsInfo": {"editDateField": "EDITED"},
+            "extent": {"xmin": -180, "ymin": -85, "xmax": 180, "ymax": 85, "spatialReference": {"wkid": 4326}},
+        }
+
+    def _matchingIds(self, where):
+        lowerBound = 1
+        upperBound = self.featuresPerLayer
+        lowerMatch = _lowerBoundPattern.search(where)
+        upperMatch = _upperBoundPattern.search(where)
+        if lowerMatch:
+            lowerBound = max(lowerBound, int(lowerMatch.group(1)))
+        if upperMatch:
+            upperBound = min(upperBound, int(upperMatch.group(1)))
+        inMatch = _inPattern.search(where)
+        if inMatch:
+            objectIds = {int(value) for value in inMatch.group(1).split(",") if value.strip()}
+            return sorted(objectId for objectId in objectIds if lowerBound <= objectId <= upperBound)
+        return range(lowerBound, upperBound + 1)
+
+    def _intersectingIds(self, objectIds, geometry):
+        if geometry.lstrip().startswith("{"):
+            envelope = json.loads(geometry)
+            xmin, ymin, xmax, ymax = envelope["xmin"], envelope["ymin"], envelope["xmax"], envelope["ymax"]
+        else:
+            xmin, ymin, xmax, ymax = (float(value) for value in geometry.split(","))
+        intersecting = []
+        for objectId in objectIds:
+            point = self.feature(objectId, "OBJECTID")["geometry"]
+            if xmin <= point["x"] <= xmax and ymin <= point["y"] <= ymax:
+                intersecting.append(objectId)
+        return intersecting
+
+    def _statistics(self, objectIds, params):
+        if params.get("returnExtentOnly") == "true":
+            points = [self.feature(objectId, "OBJECTID")["geometry"] for objectId in objectIds]
+            extent = {"xmin": "NaN", "ymin": "NaN", "xmax": "NaN", "ymax": "NaN"}
+            if points:
+                extent = {"xmin": min(point["x"] for point in points), "ymin": min(point["y"] for point in points),
+                          "xmax": max(point["x"] for point in points), "ymax": max(point["y"] for point in points)}
+            extent["spatialReference"] = {"wkid": 4326}
+            return {"count": len(objectIds), "extent": extent}
+
+        features = [self.feature(objectId, returnGeometry=False)["attributes"] for objectId in objectIds]
+        if params.get("returnDistinctValues") == "true":
+            names = [name.strip() for name in params["outFields"].split(",")]
+            values = sorted({tuple(attributes[name] for name in names) for attributes in features},
+                            key=lambda value: [(item is not None, item) for item in value])
+            return {"features": [{"attributes": dict(zip(names, value))} for value in values]}
+
+        groupBy = [name for name in params.get("groupByFieldsForStatistics", "").split(",") if name]
+        groups = {}
+        for attributes in features:
+            groups.setdefault(tuple(attributes[name] for name in groupBy), []).append(attributes)
+        rows = []
+        for key in sorted(groups, key=lambda value: [(item is not None, item) for item in value]):
+            row = dict(zip(groupBy, key))
+            for statistic in json.loads(params["outStatistics"]):
+                values = [attributes[statistic["onStatisticField"]] for attributes in groups[key]]
+                values = [value for value in values if value is not None]
+                # Servers do not keep the case of the statistic names
+                row[statistic["outStatisticFieldName"].upper()] = _statistic(statistic["statisticType"], values)
+            rows.append({"attributes": row})
+        return {"features": rows}
+
+    def _query(self, params):
+        pbf = params.get("f") == "pbf"
+        if pbf and not self.supportsPbf:
+            return "query", 200, _errorDocument(400, "Invalid or missing input parameters.")
+        objectIds = self._matchingIds(params.get("where", "1=1"))
+        if "geometry" in params:
+            objectIds = self._intersectingIds(objectIds, params["geometry"])
+        if any(name in params for name in ("returnExtentOnly", "returnDistinctValues", "outStatistics")):
+            if not self.supportsStatistics:
+                return "query", 200, _errorDocument(400, "Statistics are not supported.")
+            return "query", 200, self._statistics(objectIds, params)
+
+        if params.get("returnIdsOnly") == "true":
+            if pbf:
+                return "query", 200, _encodeQueryResult(3, _field(1, b"OBJECTID") + _field(3, b"".join(
+                    _varint(objectId) for objectId in objectIds)))
+            return "query", 200, {"objectIdFieldName": "OBJECTID", "objectIds": list(objectIds)}
+        if params.get("returnCountOnly") == "true":
+            if pbf:
+                return "query", 200, _encodeQueryResult(2, _varintField(1, len(objectIds)))
+            return "query", 200, {"count": len(objectIds)}
+
+        if "resultOffset" in params and not self.supportsPagination:
+            return "query", 200, _errorDocument(400, "Pagination is not supported.")
+        offset = int(params.get("resultOffset", 0))
+        count = min(int(params.get("resultRecordCount", self.maxRecordCount)), self.maxRecordCount)
+        pageIds = objectIds[offset:offset + count]
+        returnGeometry = params.get("returnGeometry", "true") != "false"
+        outFields = params.get("outFields", "*")
+        document = {
+            "objectIdFieldName": "OBJECTID",
+            "geometryType": "esriGeometryPoint",
+            "spatialReference": {"wkid": 4326, "latestWkid": 4326},
+            "fields": _fields,
+            "features": [self.feature(objectId, outFields, returnGeometry) for objectId in pageIds],
+        }
+        if offset + count < len(objectIds):
+            document["exceededTransferLimit"] = True
+        if pbf:
+            return "query", 200, _encodeFeatureResult(document, outFields)
+        if returnGeometry and "geometryPrecision" in params:
+            precision = int(params["geometryPrecision"])
+            for feature in document["features"]:
+                feature["geometry"] = {key: round(value, precision) for key, value in feature["geometry"].items()}
+        if returnGeometry and "quantizationParameters" in params:
+            document["transform"] = _quantizeFeatures(document["features"], json.loads(params["quantizationParameters"]))
+        return "query", 200, document
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, without TCP_NODELAY every keep-alive response would wait for a delayed
+    # acknowledgement of the client
+    disable_nagle_algorithm = True
+    owner = None
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        path = re.sub(r"/{2,}", "/", parts.path)
+        params = dict(parse_qsl(parts.query, keep_blank_values=True))
+
+        delay, fail = self.owner._delayAndFail()
+        if delay:
+            time.sleep(delay)
+
+        headers = {}
+        if fail:
+            kind = "query" if path.endswith("/query") else "catalog"
+            document = _errorDocument(self.owner.errorStatus, "Injected error")
+            status = 200 if self.owner.errorDocument else self.owner.errorStatus
+            if self.owner.retryAfter is not None:
+                headers["Retry-After"] = str(self.owner.retryAfter)
+        else:
+            kind, status, document = self.owner.handle(path, params)
+
+        pbf = isinstance(document, bytes)
+        body = document if pbf else json.dumps(document, separators=(",", ":")).encode("utf-8")
+        self.owner._record(kind, len(body), fail, pbf)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-protobuf" if pbf else "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _errorDocument(code, message):
+    return {"error": {"code": code, "message": message, "details": []}}
+
+
+def _statistic(statisticType, values):
+    if statisticType == "count":
+        return len(values)
+    if not values:
+        return None
+    if statisticType in ("var", "stddev"):
+        if len(values) < 2:
+            return None
+        return statistics.variance(values) if statisticType == "var" else statistics.stdev(values)
+    return {"sum": sum, "min": min, "max": max, "avg": statistics.mean}[statisticType](values)
+
+
+def _quantizeFeatures(features, quantizationParameters):
+    """
+    Replaces the point geometries of the features by integer coordinates, like a server honouring the
+    quantizationParameters of a query, and returns the transform converting them back.
+    """
+    extent = quantizationParameters.get("extent") or {"xmin": -180, "ymin": -85, "xmax": 180, "ymax": 85}
+    tolerance = quantizationParameters.get("tolerance", 1e-8)
+    originPosition = quantizationParameters.get("originPosition", "upperLeft")
+    translate = [extent["xmin"], extent["ymax"] if originPosition == "upperLeft" else extent["ymin"]]
+    ySign = -1 if originPosition == "upperLeft" else 1
+    for feature in features:
+        geometry = feature["geometry"]
+        feature["geometry"] = {"x": round((geometry["x"] - translate[0]) / tolerance),
+                               "y": round(ySign * (geometry["y"] - translate[1]) / tolerance)}
+    return {"originPosition": originPosition, "scale": [tolerance, tolerance], "translate": translate}
+
+
+def _varint(value):
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append(value & 0x7F | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _field(number, payload):
+    """
+    Encodes a length delimited field: a string, bytes, an embedded message or a packed repeated field.
+    """
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _varintField(number, value):
+    return _varint(number << 3) + _varint(value)
+
+
+def _doubleField(number, value):
+    return _varint(number << 3 | 1) + struct.pack("<d", value)
+
+
+def _encodeQueryResult(resultField, payload):
+    """
+    Wraps a result in a FeatureCollectionPBuffer message, the body of a query made with `f=pbf`.
+    """
+    return _field(1, b"") + _field(2, _field(resultField, payload))
+
+
+def _encodeValue(value):
+    if value is None:
+        return b""
+    if isinstance(value, str):
+        return _field(1, value.encode("utf-8"))
+    if isinstance(value, float):
+        return _doubleField(3, value)
+    if value < 0:
+        return _varintField(8, _zigzag(value))
+    return _varintField(7, value)
+
+
+def _encodeFeatureResult(document, outFields):
+    """
+    Encodes the JSON document of a feature query as a FeatureResult with quantized point geometries.
+    """
+    fields = _fields
+    if outFields.strip() != "*":
+        requested = {name.strip().upper() for name in outFields.split(",")}
+        fields = [field for field in _fields if field["name"] in requested]
+
+    scale = _doubleField(1, _pbfScale) + _doubleField(2, _pbfScale)
+    translate = _doubleField(1, _pbfOrigin[0]) + _doubleField(2, _pbfOrigin[1])
+    result = [
+        _field(1, document["objectIdFieldName"].encode("utf-8")),
+        _varintField(7, _pbfPointType),
+        _field(8, _varintField(1, 4326) + _varintField(2, 4326)),
+    ]
+    if document.get("exceededTransferLimit"):
+        result.append(_varintField(9, 1))
+    # The origin is the upper left corner (0), the default of quantizeOriginPostion
+    result.append(_field(12, _field(2, scale) + _field(3, translate)))
+    for field in fields:
+        result.append(_field(13, _field(1, field["name"].encode("utf-8")) +
+                             _varintField(2, _pbfFieldTypes[field["type"]]) +
+                             _field(3, field["alias"].encode("utf-8"))))
+    for feature in document["features"]:
+        encoded = [_field(1, _encodeValue(feature["attributes"].get(field["name"]))) for field in fields]
+        geometry = feature.get("geometry")
+        if geometry:
+            x = round((geometry["x"] - _pbfOrigin[0]) / _pbfScale)
+            y = round((_pbfOrigin[1] - geometry["y"]) / _pbfScale)
+            encoded.append(_field(2, _field(3, _varint(_zigzag(x)) + _varint(_zigzag(y)))))
+        result.append(_field(15, b"".join(encoded)))
+    return _encodeQueryResult(1, b"".join(result))
@@ -0,0 +1,134 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from ArcGISPyGnu import cache
+from ArcGISPyGnu.query import QueryOptions
+from tests.mockserver import MockArcGISServer
+
+try:
+    from ArcGISPyGnu import aio
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+BASE_URL = "https://sampleserver6.arcgisonline.com/arcgis/rest"
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class TestAio(unittest.TestCase):
+    def setUp(self):
+        cache.catalogCache.invalidate()
+        cache.layerDetailsCache.invalidate()
+        self.client = aio.AsyncArcGISClient()
+        self.previousClient = aio.setDefaultClient(self.client)
+
+    def tearDown(self):
+        aio.setDefaultClient(self.previousClient)
+        cache.catalogCache.invalidate()
+        cache.layerDetailsCache.invalidate()
+
+    def test_tree_structure_keeps_folder_order(self):
+        folders = {
+            "": {"folders": ["B", "A"], "services": [{"name": "Root", "type": "MapServer"}]},
+            "B": {"folders": ["C"], "services": []},
+            "A": {"folders": [], "services": [{"name": "A/One", "type": "FeatureServer"}]},
+            "B/C": {"folders": [], "services": [{"name": "B/C/Two", "type": "MapServer"}]},
+        }
+
+        async def getJson(url, params=None):
+            await asyncio.sleep(0.01 if "/services/B" in url else 0)
+            folderName = url.split("/services")[1].lstrip("/").split("?")[0]
+            return folders[folderName]
+
+        with mock.patch.object(self.client, "getJson", side_effect=getJson):
+            tree = asyncio.run(aio.restGetTreeStructure(BASE_URL, maxConcurrency=4))
+            serviceTypes = asyncio.run(aio.restGetServiceTypes(BASE_URL))
+
+        self.assertEqual([folder["name"] for folder in tree["folders"]], ["/B", "/A"])
+        self.assertEqual(tree["folders"][0]["folders"][0]["name"], "/B/C")
+        self.assertEqual(sorted(serviceTypes), ["FeatureServer", "MapServer"])
+
+    def test_layer_data_pages_are_ordered(self):
+        objectIds = list(range(1, 11))
+
+        async def getJson(url, params=None):
+            if url.endswith("/0") or url.endswith("/0/"):
+                return {"maxRecordCount": 3, "advancedQueryCapabilities": {"supportsPagination": True}}
+            if params.get("returnIdsOnly") == "true":
+                return {"objectIdFieldName": "OBJECTID", "objectIds": list(reversed(objectIds))}
+            low, high = [int(part.split()[-1]) for part in params["where"].split(" AND ")[1:]]
+            # Later ranges answer first to check the ordered yield
+            await asyncio.sleep(0.001 * (10 - low))
+            return {"features": [{"attributes": {"OBJECTID": objectId}} for objectId in range(low, high + 1)]}
+
+        async def collect():
+            return [page async for page in aio.iterMapLayerData(BASE_URL, "Wildfire", 0, pages=True,
+                                                               maxConcurrency=3)]
+
+        with mock.patch.object(aio, "restGetServiceType", mock.AsyncMock(return_value="MapServer")), \
+                mock.patch.object(self.client, "getJson", side_effect=getJson):
+            pages = asyncio.run(collect())
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 1])
+        self.assertEqual([feature["attributes"]["OBJECTID"] for page in pages for feature in page], objectIds)
+
+    def test_offset_paging(self):
+        async def getJson(url, params=None):
+            if "/query" not in url:
+                return {"maxRecordCount": 2, "advancedQueryCapabilities": {"supportsPagination": True}}
+            offset = params["resultOffset"]
+            features = [{"attributes": {"OBJECTID": objectId}} for objectId in range(offset, min(offset + 2, 5))]
+            return {"features": features, "exceededTransferLimit": offset + 2 < 5}
+
+        with mock.patch.object(aio, "restGetServiceType", mock.AsyncMock(return_value="MapServer")), \
+                mock.patch.object(self.client, "getJson", side_effect=getJson):
+            features = asyncio.run(aio.restGetMapLayerAllData(BASE_URL, "Wildfire", 0))
+
+        self.assertEqual([feature["attributes"]["OBJECTID"] for feature in features], [0, 1, 2, 3, 4])
+
+    def test_all_data_query_options(self):
+        queries = []
+
+        async def getJson(url, params=None):
+            if "/query" not in url:
+                return {"maxRecordCount": 10, "advancedQueryCapabilities": {"supportsPagination": True}}
+            queries.append(params)
+            return {"features": [{"attributes": {"OBJECTID": 1}}]}
+
+        with mock.patch.object(aio, "restGetServiceType", mock.AsyncMock(return_value="MapServer")), \
+                mock.patch.object(self.client, "getJson", side_effect=getJson):
+            features = asyncio.run(aio.getMapLayerAllData(BASE_URL, "Wildfire", 0,
+                                                          queryOptions=QueryOptions(outSR=3857)))
+
+        self.assertEqual(len(features), 1)
+        self.assertEqual(queries[0]["outSR"], "3857")
+
+    def test_cancelled_requests_release_their_slot(self):
+        client = aio.AsyncArcGISClient(limitPerHost=2, coalesce=False)
+        aio.setDefaultClient(client)
+
+        async def cancelAndQuery(baseUrl):
+            # Stopping early cancels the pages in flight, twice as many as the host allows
+            for _ in range(2):
+                pages = aio.iterMapLayerData(baseUrl, "Service0", 0, pages=True, maxConcurrency=4)
+                await pages.__anext__()
+                await pages.aclose()
+            return await aio.restGetMapLayerData(baseUrl, "Service0", 0, "OBJECTID <= 10", "*")
+
+        async def run(baseUrl):
+            try:
+                # A leaked slot makes the requests wait forever
+                features = await asyncio.wait_for(cancelAndQuery(baseUrl), 10)
+                return features, client.limiter(baseUrl).inFlight
+            finally:
+                await client.close()
+
+        with MockArcGISServer(featuresPerLayer=1000, maxRecordCount=100, latency=0.05) as server:
+            features, inFlight = asyncio.run(run(server.baseUrl))
+        self.assertEqual(len(features), 10)
+        self.assertEqual(inFlight, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
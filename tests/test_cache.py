@@ -0,0 +1,56 @@
+import unittest
+from unittest import mock
+
+from ArcGISPyGnu import core
+from ArcGISPyGnu.cache import CatalogCache
+
+
+class TestCatalogCache(unittest.TestCase):
+    def test_lru_eviction_and_counters(self):
+        cache = CatalogCache(maxEntries=2, ttl=None)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "evictions": 1, "entries": 2})
+
+    def test_failed_loads_release_their_lock(self):
+        cache = CatalogCache()
+        for key in range(3):
+            with self.assertRaises(ValueError):
+                cache.getOrLoad(key, mock.Mock(side_effect=ValueError("failed")))
+        self.assertEqual(cache._loadLocks, {})
+        self.assertEqual(cache.getOrLoad(0, lambda: "loaded"), "loaded")
+        self.assertEqual(cache._loadLocks, {})
+
+    def test_ttl_expiry(self):
+        cache = CatalogCache(ttl=10)
+        with mock.patch("ArcGISPyGnu.cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with mock.patch("ArcGISPyGnu.cache.time.monotonic", return_value=111.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_service_type_lookup_crawls_once(self):
+        baseUrl = "https://example.com/arcgis/rest"
+        tree = {"name": "/", "services": [{"name": "World", "type": "MapServer"}],
+                "folders": [{"name": "/A", "services": [{"name": "A/Roads", "type": "FeatureServer"}], "folders": []}]}
+        core.invalidateCatalogCache()
+        try:
+            with mock.patch.object(core, "restGetTreeStructure", return_value=tree) as crawl:
+                self.assertEqual(core.restGetServiceType(baseUrl, "World"), "MapServer")
+                self.assertEqual(core.restGetServiceType(baseUrl, "A/Roads"), "FeatureServer")
+                self.assertEqual(core.restGetServiceByType(baseUrl, "MapServer"), ["World"])
+                self.assertEqual(core.restGetFolders(baseUrl), ["/A"])
+                self.assertEqual(crawl.call_count, 1)
+
+                core.invalidateCatalogCache(baseUrl)
+                core.restGetServiceType(baseUrl, "World")
+                self.assertEqual(crawl.call_count, 2)
+        finally:
+            core.invalidateCatalogCache()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+from ArcGISPyGnu import core
+from ArcGISPyGnu.catalog import CatalogStore
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient
+from tests.mockserver import MockArcGISServer
+
+
+class TestCatalogStore(unittest.TestCase):
+    def setUp(self):
+        core.invalidateCatalogCache()
+        self.client = ArcGISClient()
+        self.previousClient = setDefaultClient(self.client)
+
+    def tearDown(self):
+        setDefaultClient(self.previousClient)
+        self.client.close()
+        core.invalidateCatalogCache()
+
+    def test_queries(self):
+        with MockArcGISServer(folderDepth=1, foldersPerFolder=2, servicesPerFolder=2, layersPerService=2) as server, \
+                CatalogStore() as store:
+            self.assertEqual(store.refresh(server.baseUrl),
+                             {"services": 6, "updated": 6, "removed": 0, "errors": 0})
+            baseUrl = f"{server.baseUrl}/"
+
+            self.assertEqual([service["name"] for service in store.findServices("MapServer")],
+                             sorted(server.serviceNames()))
+            self.assertEqual(store.findServices(name="folder0/service0")[0]["name"], "Folder0/Service0")
+            self.assertEqual(len(store.findLayers(geometryType="esriGeometryPoint")), 12)
+            self.assertEqual(store.findLayers(geometryType="esriGeometryPolygon"), [])
+
+            layers = store.findLayersByField("edited", baseUrl=server.baseUrl)
+            self.assertEqual(len(layers), 12)
+            self.assertEqual(layers[0]["fieldName"], "EDITED")
+            self.assertEqual(layers[0]["fieldType"], "esriFieldTypeDate")
+            self.assertEqual(layers[0]["baseUrl"], baseUrl)
+            self.assertEqual(store.findLayersByField("EDITED", "esriFieldTypeString"), [])
+
+            results = store.search("synthetic folder1")
+            self.assertEqual({result["name"] for result in results}, {"Folder1/Service0", "Folder1/Service1"})
+            self.assertEqual({result["kind"] for result in results}, {"service"})
+            self.assertEqual(len(store.search("layer1")), 6)
+            self.assertEqual(store.search('"'), [])
+            self.assertEqual(store.servers()[0]["version"], 11.1)
+
+    def test_incremental_refresh(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "catalog.sqlite")
+            with MockArcGISServer(folderDepth=1, foldersPerFolder=2, servicesPerFolder=2) as server:
+                with CatalogStore(path) as store:
+                    store.refresh(server.baseUrl)
+
+                server.resetStats()
+                with CatalogStore(path) as store:
+                    self.assertEqual(store.refresh(server.baseUrl)["updated"], 0)
+                    self.assertEqual(server.stats()["details"], 0)
+
+                    server.servicesPerFolder = 1
+                    self.assertEqual(store.refresh(server.baseUrl),
+                                     {"services": 3, "updated": 0, "removed": 3, "errors": 0})
+                    self.assertEqual(len(store.findLayers()), 6)
+                    self.assertEqual(len(store.search("service1")), 0)
+
+                    self.assertEqual(store.refresh(server.baseUrl, maxAge=0)["updated"], 3)
+                    store.removeServer(server.baseUrl)
+                    self.assertEqual(store.findServices(), [])
+                    self.assertEqual(store.servers(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
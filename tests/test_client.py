@@ -0,0 +1,31 @@
+import unittest
+from unittest import mock
+
+from ArcGISPyGnu import core
+from ArcGISPyGnu.client import ArcGISClient, getDefaultClient, setDefaultClient
+
+
+class TestClient(unittest.TestCase):
+    def test_pool_configuration(self):
+        with ArcGISClient(poolMaxSize=25, timeout=5) as client:
+            adapter = client.session.get_adapter("https://sampleserver6.arcgisonline.com/")
+            self.assertEqual(adapter._pool_maxsize, 25)
+            self.assertEqual(client.timeout, 5)
+
+    def test_rest_functions_use_default_client(self):
+        client = ArcGISClient()
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"currentVersion": 10.91}
+        previousClient = setDefaultClient(client)
+        try:
+            with mock.patch.object(client.session, "get", return_value=response) as sessionGet:
+                self.assertEqual(core.restGetVersion("https://sampleserver6.arcgisonline.com/arcgis/rest"), 10.91)
+                self.assertEqual(core.restGetVersion("https://sampleserver6.arcgisonline.com/arcgis/rest"), 10.91)
+            self.assertEqual(sessionGet.call_count, 2)
+            self.assertIs(getDefaultClient(), client)
+        finally:
+            setDefaultClient(previousClient)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,166 @@
 import unittest
+from unittest import mock
+
+import requests
+
+from ArcGISPyGnu import core
 from ArcGISPyGnu.core import restGetVersion
+from ArcGISPyGnu.exceptions import ArcGISHttpError, ArcGISServerError
+from tests.mockserver import MockArcGISServer
+
 
 class TestCore(unittest.TestCase):
     def test_rest_get_version(self):
-        # Replace 'http://example.com/arcgis/rest/services' with a mock or a real endpoint for testing
-        url = 'http://example.com/arcgis/rest/services'
-        version = restGetVersion(url)
-        self.assertIsInstance(version, str)
+        with MockArcGISServer() as server:
+            self.assertEqual(restGetVersion(server.baseUrl), 11.1)
+            self.assertEqual(server.stats()["requests"], 1)
+
+    def test_rest_get_tree_structure_concurrent_matches_sequential(self):
+        folders = {
+            "": {"folders": ["A", "B", "C"], "services": [{"name": "Root", "type": "MapServer"}]},
+            "A": {"folders": ["A1", "A2"], "services": [{"name": "A/One", "type": "MapServer"}]},
+            "A/A1": {"folders": [], "services": [{"name": "A/A1/Two", "type": "FeatureServer"}]},
+            "A/A2": {"folders": [], "services": []},
+            "B": {"folders": [], "services": [{"name": "B/Three", "type": "GPServer"}]},
+            "C": {"folders": ["C1"], "services": []},
+            "C/C1": {"folders": [], "services": [{"name": "C/C1/Four", "type": "MapServer"}]},
+        }
+
+        def fakeGet(url, params=None, **kwargs):
+            path = url.split("/services", 1)[1].split("?")[0].strip("/")
+            response = mock.Mock(status_code=200)
+            response.json.return_value = folders[path]
+            return response
+
+        with mock.patch.object(core.getDefaultClient(), "get", side_effect=fakeGet):
+            sequentialTree = core.restGetTreeStructure("https://example.com/arcgis/rest", maxWorkers=1)
+            concurrentTree = core.restGetTreeStructure("https://example.com/arcgis/rest", maxWorkers=8)
+
+        self.assertEqual(sequentialTree, concurrentTree)
+        self.assertEqual([folder["name"] for folder in concurrentTree["folders"]], ["/A", "/B", "/C"])
+        self.assertEqual([folder["name"] for folder in concurrentTree["folders"][0]["folders"]], ["/A/A1", "/A/A2"])
+
+    def test_iter_map_layer_data_streams_pages(self):
+        requestedOffsets = []
+
+        def fakeGet(url, params=None, **kwargs):
+            requestedOffsets.append(params["resultOffset"])
+            count = min(params["resultRecordCount"], 2500 - params["resultOffset"])
+            response = mock.Mock(status_code=200)
+            response.json.return_value = {"features": [
+                {"attributes": {"OBJECTID": params["resultOffset"] + index + 1}} for index in range(count)
+            ]}
+            return response
+
+        layerDetails = {"maxRecordCount": 1000, "advancedQueryCapabilities": {"supportsPagination": True}}
+        core.invalidateCatalogCache()
+        with mock.patch.object(core, "restGetServiceType", return_value="MapServer"), \
+                mock.patch.object(core, "restGetMapLayerDetails", return_value=layerDetails), \
+                mock.patch.object(core.getDefaultClient(), "get", side_effect=fakeGet):
+            pages = core.iterMapLayerData("https://example.com/arcgis/rest", "Parcels", 0, pages=True)
+            self.assertEqual(requestedOffsets, [])
+            self.assertEqual(len(next(pages)), 1000)
+            self.assertEqual(requestedOffsets, [0])
+            self.assertEqual([len(page) for page in pages], [1000, 500])
+
+            features = core.restGetMapLayerAllData("https://example.com/arcgis/rest", "Parcels", 0)
+            self.assertEqual([feature["attributes"]["OBJECTID"] for feature in features], list(range(1, 2501)))
+
+    def test_iter_map_layer_data_parallel_is_ordered(self):
+        objectIds = [objectId for objectId in range(1, 4000) if objectId % 3]
+
+        def fakeGet(url, params=None, **kwargs):
+            response = mock.Mock(status_code=200)
+            if params.get("returnIdsOnly") == "true":
+                response.json.return_value = {"objectIdFieldName": "OBJECTID", "objectIds": list(reversed(objectIds))}
+                return response
+            lower, upper = [int(part.split("=")[-1].strip()) for part in params["where"].split("AND")[1:]]
+            matching = [objectId for objectId in objectIds if lower <= objectId <= upper]
+            response.json.return_value = {"features": [{"attributes": {"OBJECTID": objectId}} for objectId in matching]}
+            return response
+
+        layerDetails = {"maxRecordCount": 1000, "advancedQueryCapabilities": {"supportsPagination": True}}
+        core.invalidateCatalogCache()
+        with mock.patch.object(core, "restGetServiceType", return_value="MapServer"), \
+                mock.patch.object(core, "restGetMapLayerDetails", return_value=layerDetails), \
+                mock.patch.object(core.getDefaultClient(), "get", side_effect=fakeGet):
+            features = core.restGetMapLayerAllData("https://example.com/arcgis/rest", "Parcels", 0, maxWorkers=4)
+            pages = list(core.iterMapLayerData("https://example.com/arcgis/rest", "Parcels", 0, pages=True,
+                                               maxWorkers=4))
+
+        self.assertEqual([feature["attributes"]["OBJECTID"] for feature in features], objectIds)
+        self.assertEqual([len(page) for page in pages], [1000, 1000, 666])
+
+    def test_iter_map_layer_data_honors_layer_limits(self):
+        objectIds = list(range(1, 5001))
+        sentParams = []
+
+        def fakeGet(url, params=None, **kwargs):
+            sentParams.append(dict(params))
+            response = mock.Mock(status_code=200)
+            if params.get("returnIdsOnly") == "true":
+                response.json.return_value = {"objectIdFieldName": "FID", "objectIds": objectIds}
+                return response
+            self.assertNotIn("resultOffset", params)
+            lower, upper = [int(part.split("=")[-1].strip()) for part in params["where"].split("AND")[1:]]
+            matching = [objectId for objectId in objectIds if lower <= objectId <= upper]
+            response.json.return_value = {"features": [{"attributes": {"FID": objectId}} for objectId in matching]}
+            return response
+
+        # A layer without pagination support is read by object ID ranges of maxRecordCount features
+        layerDetails = {"maxRecordCount": 2000, "advancedQueryCapabilities": {"supportsPagination": False}}
+        core.invalidateCatalogCache()
+        with mock.patch.object(core, "restGetServiceType", return_value="MapServer"), \
+                mock.patch.object(core, "restGetMapLayerDetails", return_value=layerDetails) as details, \
+                mock.patch.object(core.getDefaultClient(), "get", side_effect=fakeGet):
+            pages = list(core.iterMapLayerData("https://example.com/arcgis/rest", "Parcels", 0, pages=True))
+            self.assertEqual([len(page) for page in pages], [2000, 2000, 1000])
+            self.assertEqual(len(sentParams), 4)
+
+            # The caller may ask for smaller pages, and the layer details are not fetched again
+            pages = list(core.iterMapLayerData("https://example.com/arcgis/rest", "Parcels", 0, pages=True,
+                                               pageSize=2500))
+            self.assertEqual([len(page) for page in pages], [2000, 2000, 1000])
+            pages = list(core.iterMapLayerData("https://example.com/arcgis/rest", "Parcels", 0, pages=True,
+                                               pageSize=1500))
+            self.assertEqual([len(page) for page in pages], [1500, 1500, 1500, 500])
+            self.assertEqual(details.call_count, 1)
+        core.invalidateCatalogCache()
+
+    def test_errors_are_raised(self):
+        errorDocument = mock.Mock(status_code=200)
+        errorDocument.json.return_value = {"error": {"code": 400, "message": "Invalid query", "details": ["where"]}}
+        with mock.patch.object(core.getDefaultClient(), "get", return_value=errorDocument):
+            with self.assertRaises(ArcGISServerError) as context:
+                core.restGetMapLayerDetails("https://example.com/arcgis/rest", "Parcels", 0)
+        self.assertEqual(context.exception.code, 400)
+        self.assertEqual(context.exception.details, ["where"])
+
+        notFound = requests.Response()
+        notFound.status_code = 404
+        with mock.patch.object(core.getDefaultClient(), "get", return_value=notFound):
+            with self.assertRaises(ArcGISHttpError) as context:
+                core.restGetTreeStructure("https://example.com/arcgis/rest")
+        self.assertEqual(context.exception.statusCode, 404)
+
+    def test_map_server_layer_details(self):
+        core.invalidateCatalogCache()
+        for supportsLayersResource in (True, False):
+            with MockArcGISServer(layersPerService=5, maxRecordCount=250,
+                                  supportsLayersResource=supportsLayersResource) as server:
+                details = core.restGetMapServerLayerDetails(server.baseUrl, "Service0")
+                self.assertEqual([layer["id"] for layer in details["layers"]], [0, 1, 2, 3, 4])
+                self.assertEqual(details["tables"], [])
+                self.assertEqual(details["layers"][3]["maxRecordCount"], 250)
+                self.assertEqual(server.stats()["details"], 1 if supportsLayersResource else 7)
+
+                # The details are cached, querying a layer does not fetch them again
+                server.resetStats()
+                self.assertEqual(core._getLayerDetails(f"{server.baseUrl}/", "Service0", 3), details["layers"][3])
+                self.assertEqual(len(core.restGetMapLayerAllData(server.baseUrl, "Service1", 0)), 1000)
+                self.assertEqual(server.stats()["details"], 1)
+            core.invalidateCatalogCache()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,114 @@
+import json
+import random
+import unittest
+
+from ArcGISPyGnu import core, decoding
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient
+from ArcGISPyGnu.decoding import FeatureStreamParser, loads, setJsonDecoder
+from ArcGISPyGnu.exceptions import ArcGISServerError
+from tests.mockserver import MockArcGISServer
+
+
+def feedInChunks(parser, body, seed):
+    generator = random.Random(seed)
+    features = []
+    position = 0
+    while position < len(body):
+        size = generator.randint(1, 200)
+        features.extend(parser.feed(body[position:position + size]))
+        position += size
+    return features
+
+
+class TestDecoders(unittest.TestCase):
+    def test_set_decoder(self):
+        calls = []
+
+        def decoder(data):
+            calls.append(data)
+            return json.loads(data)
+
+        previousDecoder = setJsonDecoder(decoder)
+        try:
+            self.assertEqual(loads(b'{"currentVersion": 11.1}'), {"currentVersion": 11.1})
+            self.assertEqual(calls, [b'{"currentVersion": 11.1}'])
+        finally:
+            setJsonDecoder(previousDecoder)
+        self.assertIs(decoding.getJsonDecoder(), previousDecoder)
+
+    def test_falls_back_to_the_json_module(self):
+        def strictDecoder(data):
+            if b"NaN" in data:
+                raise ValueError("NaN is not valid JSON")
+            return json.loads(data)
+
+        previousDecoder = setJsonDecoder(strictDecoder)
+        try:
+            self.assertEqual(loads(b'{"extent": {"xmin": 1}}'), {"extent": {"xmin": 1}})
+            self.assertNotEqual(loads(b'{"xmin": NaN}')["xmin"], 0)
+        finally:
+            setJsonDecoder(previousDecoder)
+
+
+class TestFeatureStreamParser(unittest.TestCase):
+    def test_features_are_decoded_while_feeding(self):
+        document = {
+            "objectIdFieldName": "OBJECTID",
+            "fields": [{"name": "NAME", "alias": "features [\"x\"]"}],
+            "features": [{"attributes": {"OBJECTID": index, "NAME": 'a "quoted" \\ {value} [%d]' % index},
+                          "geometry": {"paths": [[[index, 1.5], [2, 3]]]}} for index in range(300)],
+            "exceededTransferLimit": True,
+        }
+        body = json.dumps(document, indent=1).encode("utf-8")
+
+        for seed in range(20):
+            parser = FeatureStreamParser()
+            self.assertEqual(feedInChunks(parser, body, seed), document["features"])
+            self.assertEqual(parser.close(), dict(document, features=[]))
+            self.assertEqual(parser.featureCount, 300)
+            # Only the unfinished feature is buffered
+            self.assertLess(len(parser._buffer), 200)
+
+    def test_documents_without_features(self):
+        parser = FeatureStreamParser()
+        self.assertEqual(parser.feed(b'{"error": {"code": 400, "message": "Invalid query"}}'), [])
+        self.assertEqual(parser.close()["error"]["code"], 400)
+
+        parser = FeatureStreamParser()
+        parser.feed(b'{"features": [{"attributes": {}}')
+        with self.assertRaises(ValueError):
+            parser.close()
+
+
+class TestStreamedQueries(unittest.TestCase):
+    def setUp(self):
+        core.invalidateCatalogCache()
+        self.client = ArcGISClient()
+        self.previousClient = setDefaultClient(self.client)
+
+    def tearDown(self):
+        setDefaultClient(self.previousClient)
+        self.client.close()
+        core.invalidateCatalogCache()
+
+    def test_streamed_extraction(self):
+        with MockArcGISServer(featuresPerLayer=2500, maxRecordCount=1000) as server:
+            expected = list(core.iterMapLayerData(server.baseUrl, "Service0", 0, queryFormat="json"))
+            server.resetStats()
+            pages = list(core.iterMapLayerData(server.baseUrl, "Service0", 0, pages=True, stream=True))
+            self.assertEqual(server.stats()["query"], 3)
+            self.assertEqual(server.stats()["pbf"], 0)
+
+        self.assertEqual([feature for page in pages for feature in page], expected)
+        with self.assertRaises(ValueError):
+            core.iterMapLayerData("https://example.com/arcgis/rest", "Service0", 0, queryFormat="pbf", stream=True)
+
+    def test_streamed_error_document(self):
+        with MockArcGISServer(supportsPagination=False) as server:
+            with self.assertRaises(ArcGISServerError):
+                list(core._iterStreamedQueryPages(f"{server.baseUrl}/services/Service0/MapServer/0/query",
+                                                  core._buildQueryParams("1=1", "*", 100)))
+
+
+if __name__ == '__main__':
+    unittest.main()
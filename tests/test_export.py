@@ -0,0 +1,146 @@
+import gzip
+import json
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+from ArcGISPyGnu import export
+from ArcGISPyGnu.geometry import esriToGeoJson, geoJsonToWkb
+from ArcGISPyGnu.query import QueryOptions
+
+layerDetails = {
+    "geometryType": "esriGeometryPoint",
+    "fields": [
+        {"name": "OBJECTID", "type": "esriFieldTypeOID"},
+        {"name": "NAME", "type": "esriFieldTypeString"},
+        {"name": "Shape", "type": "esriFieldTypeGeometry"},
+    ],
+}
+pages = [
+    [{"attributes": {"OBJECTID": 1, "NAME": "A"}, "geometry": {"x": 4.9, "y": 52.4}},
+     {"attributes": {"OBJECTID": 2, "NAME": None}, "geometry": None}],
+    [{"attributes": {"OBJECTID": 3, "NAME": "C"}, "geometry": {"x": 5.1, "y": 52.1}}],
+]
+
+
+class TestGeometry(unittest.TestCase):
+    def test_polygon_rings_are_grouped_by_orientation(self):
+        outer = [[0, 0], [0, 10], [10, 10], [10, 0], [0, 0]]
+        hole = [[2, 2], [4, 2], [4, 4], [2, 4], [2, 2]]
+        secondOuter = [[20, 0], [20, 5], [25, 5], [25, 0], [20, 0]]
+        self.assertEqual(esriToGeoJson({"rings": [outer, hole]})["type"], "Polygon")
+        multiPolygon = esriToGeoJson({"rings": [outer, hole, secondOuter]})
+        self.assertEqual(multiPolygon["type"], "MultiPolygon")
+        self.assertEqual([len(polygon) for polygon in multiPolygon["coordinates"]], [2, 1])
+
+    def test_point_wkb(self):
+        self.assertEqual(geoJsonToWkb({"type": "Point", "coordinates": [1.0, 2.0]}), struct.pack("<BI2d", 1, 1, 1, 2))
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def export(self, fileName, **kwargs):
+        path = os.path.join(self.directory, fileName)
+        with mock.patch.object(export, "_getLayerDetails", return_value=layerDetails), \
+                mock.patch.object(export, "iterMapLayerData", return_value=iter(pages)) as iterMapLayerData:
+            result = export.exportMapLayer("https://example.com/arcgis/rest", "Places", 0, path, **kwargs)
+        self.queryArguments = iterMapLayerData.call_args
+        return result
+
+    def test_geojsonseq(self):
+        result = self.export("places.geojsonl.gz", format="ndjson", compression="gzip")
+        self.assertEqual(result["rows"], 3)
+        self.assertEqual(result["bytes"], os.path.getsize(result["path"]))
+        with gzip.open(result["path"], "rt") as lines:
+            features = [json.loads(line) for line in lines]
+        self.assertEqual(features[0]["geometry"], {"type": "Point", "coordinates": [4.9, 52.4]})
+        self.assertIsNone(features[1]["geometry"])
+
+    def test_geoparquet_and_arrow(self):
+        try:
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+
+        result = self.export("places.parquet", format="geoparquet", compression="zstd")
+        table = pyarrow.parquet.read_table(result["path"])
+        self.assertEqual(table.column("OBJECTID").to_pylist(), [1, 2, 3])
+        self.assertEqual(json.loads(table.schema.metadata[b"geo"])["primary_column"], "geometry")
+        self.assertIsNone(table.column("geometry")[1].as_py())
+
+        result = self.export("places.arrow", format="arrow")
+        with pyarrow.ipc.open_file(result["path"]) as reader:
+            self.assertEqual(reader.num_record_batches, 2)
+            self.assertEqual(reader.read_all().column("NAME").to_pylist(), ["A", None, "C"])
+
+    def test_values_out_of_the_field_type_widen_the_columns(self):
+        try:
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+
+        details = {"fields": [
+            {"name": "SMALL", "type": "esriFieldTypeSmallInteger"},
+            {"name": "COUNT", "type": "esriFieldTypeInteger"},
+        ]}
+        widePages = [
+            [{"attributes": {"SMALL": 1, "COUNT": 1}}],
+            [{"attributes": {"SMALL": 40000, "COUNT": 2}}],
+            [{"attributes": {"SMALL": 3, "COUNT": 1.5}}],
+        ]
+        for fileName, format, rowGroupSize in (("wide.parquet", "geoparquet", 1), ("grouped.parquet", "geoparquet",
+                                                                                   65536), ("wide.arrow", "arrow", 1)):
+            path = os.path.join(self.directory, fileName)
+            with mock.patch.object(export, "_getLayerDetails", return_value=details), \
+                    mock.patch.object(export, "iterMapLayerData", return_value=iter(widePages)):
+                result = export.exportMapLayer("https://example.com/arcgis/rest", "Places", 0, path, format=format,
+                                               rowGroupSize=rowGroupSize)
+
+            self.assertEqual(result["rows"], 3)
+            if format == "geoparquet":
+                table = pyarrow.parquet.read_table(path)
+            else:
+                with pyarrow.ipc.open_file(path) as reader:
+                    table = reader.read_all()
+            self.assertEqual(str(table.schema.field("SMALL").type), "int32")
+            self.assertEqual(str(table.schema.field("COUNT").type), "double")
+            self.assertEqual(table.column("SMALL").to_pylist(), [1, 40000, 3])
+            self.assertEqual(table.column("COUNT").to_pylist(), [1.0, 2.0, 1.5])
+            self.assertFalse(os.path.exists(f"{path}.previous"))
+
+    def test_out_fields_and_query_options(self):
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+
+        queryOptions = QueryOptions(outSR=3857)
+        result = self.export("places.parquet", outFields=["OBJECTID", " name"], queryOptions=queryOptions)
+        self.assertEqual(self.queryArguments.args[4], "OBJECTID,name")
+        self.assertIs(self.queryArguments.kwargs["queryOptions"], queryOptions)
+        table = pyarrow.parquet.read_table(result["path"])
+        self.assertEqual(table.column_names, ["OBJECTID", "NAME", "geometry"])
+        geo = json.loads(table.schema.metadata[b"geo"])
+        self.assertEqual(geo["columns"]["geometry"]["crs"], {"id": {"authority": "EPSG", "code": 3857}})
+
+        result = self.export("names.parquet", outFields="NAME", queryOptions=QueryOptions(returnGeometry=False))
+        table = pyarrow.parquet.read_table(result["path"])
+        self.assertEqual(table.column_names, ["NAME"])
+        self.assertNotIn(b"geo", table.schema.metadata or {})
+
+        with self.assertRaises(ValueError):
+            self.export("missing.parquet", outFields=["NAME", "MISSING"])
+
+
+if __name__ == '__main__':
+    unittest.main()
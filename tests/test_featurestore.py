@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+from ArcGISPyGnu import core
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient
+from ArcGISPyGnu.featurestore import FeatureStore
+from tests.mockserver import MockArcGISServer
+
+
+def feature(objectId, **attributes):
+    return {"attributes": {"OBJECTID": objectId, "NAME": f"Feature {objectId}", **attributes},
+            "geometry": {"x": objectId, "y": -objectId}}
+
+
+class TestFeatureStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "features.dat")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_write_and_read(self):
+        with FeatureStore(self.path) as store:
+            self.assertEqual(store.write([feature(objectId) for objectId in range(10, 0, -1)]), 10)
+            store.write([feature(3, VALUE=1.5), {"attributes": {"OBJECTID": 11, "VALUE": None}}])
+
+            self.assertEqual(len(store), 11)
+            self.assertEqual(store.fields, ["OBJECTID", "NAME", "VALUE"])
+            self.assertEqual(store.get(5), feature(5))
+            self.assertEqual(store.get(3), feature(3, VALUE=1.5))
+            self.assertEqual(store.get(11), {"attributes": {"OBJECTID": 11, "VALUE": None}})
+            self.assertIsNone(store.get(12))
+            self.assertEqual(store.get(3, "value", returnGeometry=False), {"attributes": {"VALUE": 1.5}})
+            with self.assertRaises(ValueError):
+                store.get(3, ["LENGTH"])
+
+            self.assertEqual([item["attributes"]["OBJECTID"] for item in store.scan(4, 7, ["OBJECTID"])],
+                             [4, 5, 6, 7])
+            self.assertEqual(len(list(store.scan(maxObjectId=2))), 2)
+            self.assertEqual(store.delete([1, 2, 99]), 2)
+            self.assertEqual(store.objectIds(), list(range(3, 12)))
+
+        with FeatureStore(self.path) as store:
+            self.assertEqual(store.objectIds(), list(range(3, 12)))
+            self.assertEqual(store.get(3), feature(3, VALUE=1.5))
+            garbageBytes = store.stats()["garbageBytes"]
+            self.assertGreater(garbageBytes, 0)
+            self.assertEqual(store.compact(), garbageBytes)
+            self.assertEqual(store.stats()["garbageBytes"], 0)
+            self.assertEqual(list(store.scan()), [store.get(objectId) for objectId in range(3, 12)])
+
+    def test_interrupted_write(self):
+        with FeatureStore(self.path) as store:
+            store.write([feature(objectId) for objectId in range(1, 6)])
+        # A write interrupted after the index was updated, but before the data was written completely
+        with open(self.path, "r+b") as dataFile:
+            dataFile.truncate(os.path.getsize(self.path) - 10)
+        with FeatureStore(self.path) as store:
+            self.assertEqual(store.objectIds(), [1, 2, 3, 4])
+            store.write([feature(5)])
+            self.assertEqual(store.get(5), feature(5))
+
+
+class TestReadThroughFeatureStore(unittest.TestCase):
+    def setUp(self):
+        core.invalidateCatalogCache()
+        self.client = ArcGISClient()
+        self.previousClient = setDefaultClient(self.client)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "features.dat")
+
+    def tearDown(self):
+        setDefaultClient(self.previousClient)
+        self.client.close()
+        core.invalidateCatalogCache()
+        self.directory.cleanup()
+
+    def test_extract_and_fetch(self):
+        with MockArcGISServer(featuresPerLayer=1200, maxRecordCount=500, supportsPbf=False) as server:
+            with FeatureStore(self.path, server.baseUrl, "Service0", 0) as store:
+                self.assertEqual(store.extract("OBJECTID <= 1000"), 1000)
+                self.assertEqual(store.objectIdField, "OBJECTID")
+                self.assertEqual(store.get(7)["attributes"], server.feature(7)["attributes"])
+
+                server.resetStats()
+                features = store.fetch([1100, 5, 1001, 5000], outFields="NAME", returnGeometry=False)
+                self.assertEqual(features, [{"attributes": {"NAME": "Feature 1100"}},
+                                            {"attributes": {"NAME": "Feature 5"}},
+                                            {"attributes": {"NAME": "Feature 1001"}}])
+                self.assertEqual(server.stats()["query"], 1)
+                self.assertEqual(len(store), 1002)
+
+                # Stored and absent features are not queried again
+                store.fetch([1100, 5000])
+                self.assertEqual(server.stats()["query"], 1)
+
+            with self.assertRaises(ValueError):
+                FeatureStore(self.path, server.baseUrl, "Service1", 0)
+            with FeatureStore(self.path) as store:
+                self.assertEqual(len(store), 1002)
+                with self.assertRaises(ValueError):
+                    store.fetch([1])
+
+
+if __name__ == '__main__':
+    unittest.main()
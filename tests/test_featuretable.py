@@ -0,0 +1,85 @@
+import unittest
+
+from ArcGISPyGnu.featuretable import FeatureTable, np
+
+fields = [
+    {"name": "OBJECTID", "type": "esriFieldTypeOID"},
+    {"name": "NAME", "type": "esriFieldTypeString"},
+    {"name": "POPULATION", "type": "esriFieldTypeInteger"},
+    {"name": "UPDATED", "type": "esriFieldTypeDate"},
+    {"name": "Shape", "type": "esriFieldTypeGeometry"},
+]
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestFeatureTable(unittest.TestCase):
+    def test_columns_are_typed_and_appended_per_page(self):
+        table = FeatureTable(fields, "esriGeometryPolyline")
+        table.appendFeatures([
+            {"attributes": {"OBJECTID": 1, "NAME": "A", "POPULATION": 10, "UPDATED": 86400000},
+             "geometry": {"paths": [[[0, 0], [1, 1]], [[2, 2], [3, 3], [4, 4]]]}},
+        ])
+        table.appendFeatures([
+            {"attributes": {"OBJECTID": 2, "NAME": None, "POPULATION": None, "UPDATED": None}, "geometry": None},
+            {"attributes": {"OBJECTID": 3, "NAME": "C", "POPULATION": 30, "UPDATED": 0},
+             "geometry": {"paths": [[[5, 5], [6, 6]]]}},
+        ])
+
+        self.assertEqual(len(table), 3)
+        self.assertEqual(list(table.columns), ["OBJECTID", "NAME", "POPULATION", "UPDATED"])
+        self.assertEqual(table.columns["POPULATION"].dtype, np.int32)
+        self.assertEqual(table.columns["UPDATED"].dtype, np.dtype("datetime64[ms]"))
+        self.assertTrue(np.isnat(table.columns["UPDATED"][1]))
+        self.assertEqual(table.validity("POPULATION").tolist(), [True, False, True])
+        self.assertEqual(table.coordinates.shape, (7, 2))
+        self.assertEqual(table.partOffsets.tolist(), [0, 2, 5, 7])
+        self.assertEqual(table.geometryOffsets.tolist(), [0, 2, 2, 3])
+
+    def test_values_out_of_the_field_type_widen_the_column(self):
+        table = FeatureTable([
+            {"name": "SMALL", "type": "esriFieldTypeSmallInteger"},
+            {"name": "COUNT", "type": "esriFieldTypeInteger"},
+            {"name": "RATIO", "type": "esriFieldTypeSingle"},
+            {"name": "BIG", "type": "esriFieldTypeBigInteger"},
+            {"name": "UPDATED", "type": "esriFieldTypeDate"},
+        ])
+        table.appendFeatures([{"attributes": {"SMALL": 1, "COUNT": 1, "RATIO": 0.5, "BIG": 1, "UPDATED": 0}}])
+        table.appendFeatures([
+            {"attributes": {"SMALL": 40000, "COUNT": 2.5, "RATIO": 1e300, "BIG": 2 ** 70, "UPDATED": "2024-01-01"}},
+            {"attributes": {"SMALL": None, "COUNT": 3, "RATIO": None, "BIG": None, "UPDATED": None}},
+        ])
+
+        columns = table.columns
+        self.assertEqual(columns["SMALL"].dtype, np.int32)
+        self.assertEqual(columns["SMALL"].tolist(), [1, 40000, 0])
+        self.assertEqual(columns["COUNT"].dtype, np.float64)
+        self.assertEqual(columns["COUNT"].tolist(), [1.0, 2.5, 3.0])
+        self.assertEqual(columns["RATIO"].dtype, np.float64)
+        self.assertEqual(columns["RATIO"][1], 1e300)
+        self.assertEqual(columns["BIG"].dtype, object)
+        self.assertEqual(columns["BIG"].tolist(), [1, 2 ** 70, None])
+        self.assertEqual(columns["UPDATED"].tolist(), [0, "2024-01-01", None])
+        self.assertEqual(table.validity("SMALL").tolist(), [True, True, False])
+
+    def test_conversions(self):
+        try:
+            import pandas
+            import pyarrow
+        except ImportError:
+            self.skipTest("pandas and pyarrow are not installed")
+
+        table = FeatureTable(fields, "esriGeometryPoint")
+        table.appendFeatures([
+            {"attributes": {"OBJECTID": 1, "NAME": "A", "POPULATION": None}, "geometry": {"x": 5.0, "y": 52.0}},
+            {"attributes": {"OBJECTID": 2, "NAME": "B", "POPULATION": 20}, "geometry": None},
+        ])
+
+        dataFrame = table.toPandas()
+        self.assertEqual(dataFrame["POPULATION"].isna().tolist(), [True, False])
+        arrowTable = table.toArrow()
+        self.assertEqual(arrowTable.column("geometry").to_pylist(), [[5.0, 52.0], None])
+        self.assertEqual(arrowTable.column("NAME").to_pylist(), ["A", "B"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from ArcGISPyGnu import core
+from ArcGISPyGnu.client import ArcGISClient
+from ArcGISPyGnu.fleet import iterFleetCatalog, restGetFleetCatalog
+from ArcGISPyGnu.scheduler import RetryPolicy
+from tests.mockserver import MockArcGISServer
+
+
+class TestFleetCatalog(unittest.TestCase):
+    def setUp(self):
+        core.invalidateCatalogCache()
+        self.client = ArcGISClient(retryPolicy=RetryPolicy(maxRetries=0))
+
+    def tearDown(self):
+        self.client.close()
+        core.invalidateCatalogCache()
+
+    def test_unified_catalog(self):
+        with MockArcGISServer(folderDepth=2, foldersPerFolder=2, layersPerService=3) as first, \
+                MockArcGISServer(folderDepth=1, foldersPerFolder=4) as second:
+            catalogs = restGetFleetCatalog([second.baseUrl, first.baseUrl], maxWorkers=4, maxWorkersPerHost=2,
+                                           client=self.client)
+            expectedTree = core.restGetTreeStructure(first.baseUrl)
+
+            self.assertEqual(list(catalogs), [f"{second.baseUrl}/", f"{first.baseUrl}/"])
+            catalog = catalogs[f"{first.baseUrl}/"]
+            self.assertIsNone(catalog["error"])
+            self.assertEqual(catalog["version"], 11.1)
+            self.assertEqual(catalog["tree"], expectedTree)
+            self.assertEqual(catalog["folders"], [f"/{path}" for path in first.folderPaths()])
+            self.assertEqual([service["name"] for service in catalog["services"]], first.serviceNames())
+            self.assertEqual([layer["id"] for layer in catalog["services"][0]["layers"]], [0, 1, 2])
+            self.assertEqual(len(catalogs[f"{second.baseUrl}/"]["services"]), len(second.serviceNames()))
+
+            # The catalogs are cached, the catalog functions do not crawl the servers again
+            second.resetStats()
+            self.assertEqual(len(core.restGetServices(second.baseUrl)), len(second.serviceNames()))
+            self.assertEqual(second.stats()["requests"], 0)
+
+    def test_failing_and_slow_hosts(self):
+        with MockArcGISServer() as stopped:
+            unreachableUrl = stopped.baseUrl
+        with MockArcGISServer(folderDepth=1) as fast, MockArcGISServer(folderDepth=1, latency=0.5) as slow:
+            results = list(iterFleetCatalog([slow.baseUrl, unreachableUrl, fast.baseUrl],
+                                            maxWorkers=4, hostTimeout=0.3, requestTimeout=2, includeLayers=False,
+                                            client=self.client))
+            slowUrl, fastUrl = f"{slow.baseUrl}/", f"{fast.baseUrl}/"
+
+        byUrl = {result["baseUrl"]: result for result in results}
+        self.assertIn("within 0.3s", byUrl[slowUrl]["error"])
+        self.assertIsNotNone(byUrl[f"{unreachableUrl}/"]["error"])
+        self.assertIsNone(byUrl[fastUrl]["error"])
+        self.assertNotIn("layers", byUrl[fastUrl]["services"][0])
+        # The slow host does not hold back the others
+        self.assertEqual(results[-1]["baseUrl"], slowUrl)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import requests
+
+from ArcGISPyGnu.client import ArcGISClient
+from ArcGISPyGnu.httpcache import CacheMissError, HttpCache
+
+
+def makeResponse(status, body=b"", headers=None, url="https://example.com/arcgis/rest/services?f=json"):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.headers.update(headers or {})
+    response.url = url
+    return response
+
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key_normalization(self):
+        self.assertEqual(
+            HttpCache.makeKey("HTTPS://Example.com/arcgis/rest//services?f=json", {"b": 2, "a": "x"}),
+            HttpCache.makeKey("https://example.com/arcgis/rest/services", {"a": "x", "f": "json", "b": "2"}),
+        )
+
+    def test_fresh_hit_and_revalidation(self):
+        cache = HttpCache(self.path, ttl=60)
+        client = ArcGISClient(cache=cache)
+        url = "https://example.com/arcgis/rest/services?f=json"
+        responses = [makeResponse(200, b'{"folders": []}', {"ETag": '"v1"'}), makeResponse(304)]
+        with mock.patch.object(client.session, "get", side_effect=responses) as sessionGet:
+            self.assertEqual(client.get(url).json(), {"folders": []})
+            self.assertTrue(client.get(url).fromCache)
+            self.assertEqual(sessionGet.call_count, 1)
+
+            with mock.patch("ArcGISPyGnu.httpcache.time.time", return_value=10 ** 10):
+                self.assertEqual(client.get(url).json(), {"folders": []})
+            self.assertEqual(sessionGet.call_args[1]["headers"], {"If-None-Match": '"v1"'})
+        self.assertEqual(cache.stats()["revalidations"], 1)
+        cache.close()
+
+        # A new process can replay the cached responses without network access
+        offlineCache = HttpCache(self.path, offline=True)
+        offlineClient = ArcGISClient(cache=offlineCache)
+        with mock.patch.object(offlineClient.session, "get") as sessionGet:
+            self.assertEqual(offlineClient.get(url).json(), {"folders": []})
+            with self.assertRaises(CacheMissError):
+                offlineClient.get("https://example.com/arcgis/rest/services/Other?f=json")
+            sessionGet.assert_not_called()
+        offlineCache.close()
+
+    def test_queries_are_not_cached_by_default(self):
+        queryUrl = "https://example.com/arcgis/rest/services/Places/MapServer/0/query"
+        detailsUrl = "https://example.com/arcgis/rest/services/Places/MapServer/0"
+        for cacheQueries, expectedRequests in ((False, 3), (True, 2)):
+            cache = HttpCache(os.path.join(self.directory, f"{cacheQueries}.sqlite"), cacheQueries=cacheQueries)
+            client = ArcGISClient(cache=cache)
+            with mock.patch.object(client.session, "get",
+                                   side_effect=lambda *args, **kwargs: makeResponse(200, b'{"features": []}')) as get:
+                for url in (queryUrl, queryUrl, detailsUrl, detailsUrl):
+                    client.get(url, {"f": "json"})
+            self.assertEqual(get.call_count, expectedRequests)
+            self.assertEqual(cache.stats()["entries"], 1 + cacheQueries)
+            cache.close()
+
+        offlineCache = HttpCache(os.path.join(self.directory, "False.sqlite"), offline=True)
+        with self.assertRaises(CacheMissError):
+            offlineCache.send(queryUrl, {"f": "json"}, None)
+        self.assertEqual(offlineCache.send(detailsUrl, {"f": "json"}, None).json(), {"features": []})
+        offlineCache.close()
+
+    def test_size_bounded_eviction(self):
+        cache = HttpCache(self.path, maxBytes=250)
+        for index in range(3):
+            cache.store(f"key{index}", makeResponse(200, b"x" * 100))
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertIsNone(cache.get("key0"))
+        cache.close()
+
+    def test_error_documents_are_not_stored(self):
+        cache = HttpCache(self.path)
+        for index, body in enumerate((b'{"error":{"code":500}}', b'{ "error" : {"code": 400}}',
+                                      b'\r\n\t{\n  "error": {"code": 498}}')):
+            cache.store(f"key{index}", makeResponse(200, body))
+        cache.store("valid", makeResponse(200, b'{"errors": []}'))
+        self.assertEqual(cache.stats()["entries"], 1)
+        cache.close()
+
+    def test_concurrent_counters(self):
+        cache = HttpCache(self.path)
+        cache.store(HttpCache.makeKey("https://example.com/arcgis/rest/services?f=json"), makeResponse(200, b"{}"))
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: cache.send("https://example.com/arcgis/rest/services", {"f": "json"}, None),
+                              range(400)))
+        self.assertEqual(cache.stats()["hits"], 400)
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from ArcGISPyGnu import aio, core
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient
+from ArcGISPyGnu.exceptions import ArcGISHttpError
+from ArcGISPyGnu.instrumentation import (Histogram, Instrumentation, MetricsCollector, OpenTelemetryListener,
+                                         RequestListener, urlTemplate)
+from tests.mockserver import MockArcGISServer
+
+
+class TestUrlTemplate(unittest.TestCase):
+    def test_templates(self):
+        base = "https://example.com/arcgis/rest//services"
+        self.assertEqual(urlTemplate(base + "?f=json"), ("catalog", "/arcgis/rest/services"))
+        self.assertEqual(urlTemplate(base + "/Folder/Sub"), ("catalog", "/arcgis/rest/services/{folder}"))
+        self.assertEqual(urlTemplate(base + "/Folder/Roads/MapServer"),
+                         ("details", "/arcgis/rest/services/{service}/MapServer"))
+        self.assertEqual(urlTemplate(base + "/Roads/MapServer/12"),
+                         ("details", "/arcgis/rest/services/{service}/MapServer/{layerId}"))
+        self.assertEqual(urlTemplate(base + "/Folder/Roads/MapServer/3/query"),
+                         ("query", "/arcgis/rest/services/{service}/MapServer/{layerId}/query"))
+        self.assertEqual(urlTemplate("https://example.com/arcgis/rest/info"), ("other", "/arcgis/rest/info"))
+
+
+class TestHistogram(unittest.TestCase):
+    def test_quantiles(self):
+        histogram = Histogram((0.1, 1.0, 10.0))
+        for value in (0.05, 0.05, 0.5, 5.0, 50.0):
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["count"], 5)
+        self.assertEqual(snapshot["buckets"], [(0.1, 2), (1.0, 1), (10.0, 1), (None, 1)])
+        self.assertLessEqual(histogram.quantile(0.5), 1.0)
+        self.assertEqual(histogram.quantile(1.0), 50.0)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        core.invalidateCatalogCache()
+        self.instrumentation = Instrumentation()
+        self.client = ArcGISClient(instrumentation=self.instrumentation)
+        self.previousClient = setDefaultClient(self.client)
+
+    def tearDown(self):
+        setDefaultClient(self.previousClient)
+        self.client.close()
+        core.invalidateCatalogCache()
+
+    def test_metrics_per_endpoint_kind(self):
+        metrics = self.instrumentation.addListener(MetricsCollector())
+        with MockArcGISServer(folderDepth=1, foldersPerFolder=2, featuresPerLayer=1500, maxRecordCount=500) as server:
+            core.restGetTreeStructure(server.baseUrl)
+            core.restGetMapLayerAllData(server.baseUrl, "Folder0/Service0", 0)
+            stats = server.stats()
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(sum(kind["requests"] for kind in snapshot.values()), stats["requests"])
+        self.assertEqual(snapshot["catalog"]["requests"], stats["catalog"])
+        self.assertEqual(snapshot["query"]["requests"], stats["query"])
+        self.assertEqual(snapshot["query"]["statuses"], {200: stats["query"]})
+        self.assertEqual(snapshot["query"]["errors"], 0)
+        self.assertGreater(snapshot["query"]["bytes"], 0)
+        self.assertEqual(snapshot["query"]["latency"]["count"], stats["query"])
+        self.assertEqual(snapshot["query"]["parse"]["count"], stats["query"])
+        self.assertEqual(snapshot["details"]["firstByte"]["count"], snapshot["details"]["requests"])
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {})
+
+    def test_errors_and_retries_are_counted(self):
+        metrics = self.instrumentation.addListener(MetricsCollector())
+        with MockArcGISServer(errorRate=1.0, retryAfter=0) as server:
+            self.client.scheduler.retryPolicy.maxRetries = 2
+            with self.assertRaises(ArcGISHttpError):
+                core.restGetMapLayerDetails(server.baseUrl, "Service0", 0)
+
+        snapshot = metrics.snapshot()["details"]
+        self.assertEqual(snapshot["errors"], 1)
+        self.assertEqual(snapshot["retries"], 2)
+        self.assertEqual(snapshot["statuses"], {503: 1})
+
+    def test_coalesced_requests_are_counted_once(self):
+        metrics = self.instrumentation.addListener(MetricsCollector())
+        with MockArcGISServer(latency=0.2) as server, ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: core.restGetMapServerDetails(server.baseUrl, "Service0"), range(8)))
+            self.assertEqual(server.stats()["details"], 1)
+
+        snapshot = metrics.snapshot()["details"]
+        self.assertEqual(snapshot["requests"], 1)
+        self.assertEqual(snapshot["parse"]["count"], 1)
+
+    def test_disabled_instrumentation_measures_nothing(self):
+        with MockArcGISServer() as server:
+            response = self.client.get(server.baseUrl + "/services", params={"f": "json"})
+        self.assertFalse(hasattr(response, "requestEvent"))
+
+    def test_failing_listener_does_not_fail_the_request(self):
+        listener = mock.Mock(spec=RequestListener)
+        listener.onRequestEnd.side_effect = RuntimeError("broken listener")
+        self.instrumentation.addListener(listener)
+        with MockArcGISServer() as server:
+            with self.assertWarns(RuntimeWarning):
+                self.assertTrue(core.restGetFolders(server.baseUrl))
+        listener.onRequestStart.assert_called()
+        self.instrumentation.removeListener(listener)
+        self.assertEqual(self.instrumentation.listeners, ())
+
+    def test_open_telemetry_spans(self):
+        tracer = mock.Mock()
+        self.instrumentation.addListener(OpenTelemetryListener(tracer))
+        with MockArcGISServer() as server:
+            core.restGetMapLayerDetails(server.baseUrl, "Folder1/Service0", 1)
+
+        name = tracer.start_span.call_args.args[0]
+        attributes = tracer.start_span.call_args.kwargs["attributes"]
+        self.assertEqual(name, "GET /arcgis/rest/services/{service}/MapServer/{layerId}")
+        self.assertEqual(attributes["arcgis.endpoint.kind"], "details")
+        span = tracer.start_span.return_value
+        span.set_attribute.assert_any_call("http.response.status_code", 200)
+        span.end.assert_called_once()
+
+    def test_async_client_is_instrumented(self):
+        metrics = self.instrumentation.addListener(MetricsCollector())
+
+        async def run(baseUrl):
+            async with aio.AsyncArcGISClient(instrumentation=self.instrumentation) as client:
+                previousClient = aio.setDefaultClient(client)
+                try:
+                    return await aio.restGetMapLayerAllData(baseUrl, "Service0", 0)
+                finally:
+                    aio.setDefaultClient(previousClient)
+
+        with MockArcGISServer(featuresPerLayer=1200, maxRecordCount=500) as server:
+            self.assertEqual(len(asyncio.run(run(server.baseUrl))), 1200)
+            queries = server.stats()["query"]
+
+        snapshot = metrics.snapshot()["query"]
+        self.assertEqual(snapshot["requests"], queries)
+        self.assertEqual(snapshot["parse"]["count"], queries)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+from ArcGISPyGnu import core
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient
+from ArcGISPyGnu.exceptions import ArcGISHttpError
+from ArcGISPyGnu.scheduler import RetryPolicy
+from tests.mockserver import MockArcGISServer
+
+
+class TestIntegration(unittest.TestCase):
+    def setUp(self):
+        core.invalidateCatalogCache()
+        self.client = ArcGISClient(retryPolicy=RetryPolicy(maxRetries=8, backoffFactor=0.001))
+        self.previousClient = setDefaultClient(self.client)
+
+    def tearDown(self):
+        setDefaultClient(self.previousClient)
+        self.client.close()
+        core.invalidateCatalogCache()
+
+    def test_catalog(self):
+        with MockArcGISServer(folderDepth=2, foldersPerFolder=3, servicesPerFolder=2) as server:
+            tree = core.restGetTreeStructure(server.baseUrl, maxWorkers=4)
+            self.assertEqual([folder["name"] for folder in tree["folders"]], ["/Folder0", "/Folder1", "/Folder2"])
+            self.assertEqual(core.restGetFolders(server.baseUrl), [f"/{path}" for path in server.folderPaths()])
+            services = core.restGetServices(server.baseUrl)
+            self.assertEqual(sorted(service["name"] for service in services), sorted(server.serviceNames()))
+            self.assertEqual(core.restGetServiceType(server.baseUrl, "Folder2/Folder1/Service1"), "MapServer")
+            # The services come from the catalog cache, the tree is crawled only once
+            self.assertEqual(server.stats()["catalog"], 1 + 3 + 9 + 1 + 3 + 9)
+
+    def test_layer_extraction_modes_agree(self):
+        with MockArcGISServer(featuresPerLayer=2345, maxRecordCount=500) as server:
+            sequential = core.restGetMapLayerAllData(server.baseUrl, "Folder0/Service1", 0)
+            parallel = core.restGetMapLayerAllData(server.baseUrl, "Folder0/Service1", 0, maxWorkers=4)
+            self.assertEqual(len(sequential), 2345)
+            self.assertEqual(sequential, parallel)
+
+            table = core.restGetMapLayerTable(server.baseUrl, "Folder0/Service1", 0, outFields="OBJECTID,VALUE")
+            self.assertEqual(len(table), 2345)
+            self.assertEqual(table.columns["VALUE"][-1], 2345 * 0.5)
+
+        with MockArcGISServer(featuresPerLayer=1200, maxRecordCount=500, supportsPagination=False) as server:
+            features = core.restGetMapLayerAllData(server.baseUrl, "Service0", 1)
+            self.assertEqual([feature["attributes"]["OBJECTID"] for feature in features], list(range(1, 1201)))
+
+    def test_injected_errors_are_retried(self):
+        with MockArcGISServer(featuresPerLayer=3000, maxRecordCount=200, errorRate=0.3, retryAfter=0) as server:
+            features = core.restGetMapLayerAllData(server.baseUrl, "Service0", 0, maxWorkers=4)
+            self.assertEqual(len(features), 3000)
+            self.assertGreater(server.stats()["errors"], 0)
+            self.assertEqual(self.client.scheduler.stats()["retries"], server.stats()["errors"])
+
+        with MockArcGISServer(errorRate=0.3, errorDocument=True, errorStatus=429) as server:
+            self.assertEqual(len(core.restGetMapLayerAllData(server.baseUrl, "Service1", 1)), 1000)
+
+    def test_missing_layer_raises(self):
+        with MockArcGISServer() as server:
+            with self.assertRaises(ArcGISHttpError) as context:
+                core.restGetMapLayerDetails(server.baseUrl, "Service0", 9)
+            self.assertEqual(context.exception.statusCode, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
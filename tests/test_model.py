@@ -0,0 +1,67 @@
+import unittest
+
+from ArcGISPyGnu import core
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient
+from ArcGISPyGnu.exceptions import ArcGISHttpError
+from ArcGISPyGnu.model import Server
+from tests.mockserver import MockArcGISServer
+
+
+class TestObjectModel(unittest.TestCase):
+    def setUp(self):
+        core.invalidateCatalogCache()
+        self.client = ArcGISClient()
+        self.previousClient = setDefaultClient(self.client)
+
+    def tearDown(self):
+        setDefaultClient(self.previousClient)
+        self.client.close()
+        core.invalidateCatalogCache()
+
+    def test_targeted_lookup(self):
+        with MockArcGISServer(folderDepth=2, foldersPerFolder=3, servicesPerFolder=3, layersPerService=3,
+                              featuresPerLayer=50) as mock:
+            server = Server(mock.baseUrl)
+            layer = server.folder("Folder1").folder("Folder2").service("Service0").layer(1)
+            self.assertEqual(mock.stats()["requests"], 0)
+
+            self.assertEqual(layer.name, "Layer1")
+            self.assertIn("EDITED", [field["name"] for field in layer.fields])
+            self.assertEqual(len(list(layer.query("OBJECTID <= 10", "NAME"))), 10)
+            # The layer details and one query, without crawling the server
+            self.assertEqual(mock.stats()["catalog"], 0)
+            self.assertEqual(mock.stats()["requests"], 2)
+
+            self.assertIs(server.service("Folder1/Folder2/Service0").layer(1), layer)
+            self.assertEqual(server.folder("Folder1").service("Service2").name, "Folder1/Service2")
+            self.assertEqual([service.name for service in server.folder("Folder0").services],
+                             ["Folder0/Service0", "Folder0/Service1", "Folder0/Service2"])
+            self.assertEqual(server.version, 11.1)
+
+            with self.assertRaises(ArcGISHttpError):
+                server.folder("Missing").json
+            with self.assertRaises(ValueError):
+                next(server.service("Service0", "FeatureServer").layer(0).query())
+
+    def test_prefetch(self):
+        with MockArcGISServer(folderDepth=2, foldersPerFolder=2, servicesPerFolder=2, layersPerService=3) as mock:
+            server = Server(mock.baseUrl).prefetch(depth=1)
+            self.assertEqual(mock.stats()["catalog"], 3)
+            self.assertTrue(all(node.loaded for node in server.folders + server.services))
+            self.assertFalse(server.folder("Folder0/Folder1").loaded)
+
+            mock.resetStats()
+            server.prefetch(depth=None)
+            # The remaining folders, one request for each service not fetched yet and one for the layers of each service
+            self.assertEqual(mock.stats()["catalog"], 4)
+            self.assertEqual(mock.stats()["details"], 2 * len(mock.serviceNames()) - 2)
+            self.assertTrue(server.folder("Folder1/Folder0").service("Service1").layer(2).loaded)
+
+            mock.resetStats()
+            self.assertEqual(server.service("Folder0/Service1").layer(2).json["name"], "Layer2")
+            self.assertEqual(len(server.folder("Folder1").folder("Folder1").services[0].layers), 3)
+            self.assertEqual(mock.stats()["requests"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
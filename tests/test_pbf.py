@@ -0,0 +1,125 @@
+import struct
+import unittest
+
+from ArcGISPyGnu import core
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient
+from ArcGISPyGnu.exceptions import PbfDecodeError
+from ArcGISPyGnu.pbf import decodeQueryResponse
+from tests.mockserver import (MockArcGISServer, _doubleField, _encodeQueryResult, _field, _varint, _varintField,
+                              _zigzag)
+
+QUERY_PATH = "/arcgis/rest/services/Service0/MapServer/0/query"
+
+
+def encodeGeometry(points, lengths, quantize):
+    coordinates = []
+    previous = [0] * len(points[0])
+    for point in points:
+        quantized = quantize(point)
+        coordinates.extend(_varint(_zigzag(value - last)) for value, last in zip(quantized, previous))
+        previous = quantized
+    return _field(2, b"".join(_varint(length) for length in lengths)) + _field(3, b"".join(coordinates))
+
+
+class TestDecodeQueryResponse(unittest.TestCase):
+    def test_matches_json_response(self):
+        server = MockArcGISServer(featuresPerLayer=30, maxRecordCount=10)
+        params = {"where": "1=1", "outFields": "*", "resultOffset": "0", "resultRecordCount": "10"}
+        _, _, document = server.handle(QUERY_PATH, dict(params, f="json"))
+        _, _, body = server.handle(QUERY_PATH, dict(params, f="pbf"))
+
+        decoded = decodeQueryResponse(body)
+        self.assertLess(len(body), len(str(document)) / 2)
+        self.assertTrue(decoded["exceededTransferLimit"])
+        self.assertEqual(decoded["geometryType"], "esriGeometryPoint")
+        self.assertEqual(decoded["spatialReference"]["wkid"], 4326)
+        self.assertEqual([(field["name"], field["type"]) for field in decoded["fields"]],
+                         [(field["name"], field["type"]) for field in document["fields"]])
+        for expected, feature in zip(document["features"], decoded["features"]):
+            self.assertEqual(feature["attributes"], expected["attributes"])
+            self.assertAlmostEqual(feature["geometry"]["x"], expected["geometry"]["x"], places=7)
+            self.assertAlmostEqual(feature["geometry"]["y"], expected["geometry"]["y"], places=7)
+
+        _, _, body = server.handle(QUERY_PATH, {"where": "OBJECTID <= 5", "returnIdsOnly": "true", "f": "pbf"})
+        self.assertEqual(decodeQueryResponse(body), {"objectIdFieldName": "OBJECTID", "objectIds": [1, 2, 3, 4, 5]})
+        _, _, body = server.handle(QUERY_PATH, {"where": "1=1", "returnCountOnly": "true", "f": "pbf"})
+        self.assertEqual(decodeQueryResponse(body), {"count": 30})
+
+    def test_multipart_geometries(self):
+        # Lower left origin at (100, 10) with a scale of 0.5, with z values
+        def quantize(point):
+            return [round((point[0] - 100) / 0.5), round((point[1] - 10) / 0.5), round(point[2])]
+
+        rings = [[[100, 10, 1], [100, 20, 2], [110, 20, 3], [100, 10, 1]], [[102, 12, 0], [104, 12, 0], [102, 12, 0]]]
+        transform = _field(12, _varintField(1, 1) +
+                           _field(2, _doubleField(1, 0.5) + _doubleField(2, 0.5)) +
+                           _field(3, _doubleField(1, 100.0) + _doubleField(2, 10.0)))
+        feature = (_field(1, _varintField(5, 7)) + _field(1, b"") +
+                   _field(2, encodeGeometry([point for ring in rings for point in ring], [4, 3], quantize)))
+        body = _encodeQueryResult(1, _varintField(7, 3) + _varintField(10, 1) + transform +
+                                  _field(13, _field(1, b"ID") + _varintField(2, 1)) +
+                                  _field(13, _field(1, b"LABEL") + _varintField(2, 4)) +
+                                  _field(15, feature))
+
+        decoded = decodeQueryResponse(body)
+        self.assertEqual(decoded["geometryType"], "esriGeometryPolygon")
+        self.assertTrue(decoded["hasZ"])
+        self.assertFalse(decoded["exceededTransferLimit"])
+        self.assertEqual(decoded["features"], [{"attributes": {"ID": 7, "LABEL": None}, "geometry": {"rings": rings}}])
+
+    def test_values(self):
+        values = [_field(1, "Zoë".encode("utf-8")), _varint(2 << 3 | 5) + struct.pack("<f", 1.5),
+                  _varintField(4, _zigzag(-3)), _varintField(6, (1 << 64) - 5), _varintField(9, 1)]
+        fields = b"".join(_field(13, _field(1, name.encode()) + _varintField(2, 1)) for name in "ABCDE")
+        body = _encodeQueryResult(1, _varintField(7, 127) + fields +
+                                  _field(15, b"".join(_field(1, value) for value in values)))
+
+        decoded = decodeQueryResponse(body)
+        self.assertNotIn("geometryType", decoded)
+        self.assertEqual(decoded["features"], [{"attributes": {"A": "Zoë", "B": 1.5, "C": -3, "D": -5, "E": True}}])
+
+    def test_json_and_invalid_bodies(self):
+        self.assertEqual(decodeQueryResponse(b' {"error": {"code": 400}}'), {"error": {"code": 400}})
+        with self.assertRaises(PbfDecodeError):
+            decodeQueryResponse(b"\x12\x05\x0a\x09")
+
+
+class TestPbfQueries(unittest.TestCase):
+    def setUp(self):
+        core.invalidateCatalogCache()
+        self.client = ArcGISClient()
+        self.previousClient = setDefaultClient(self.client)
+
+    def tearDown(self):
+        setDefaultClient(self.previousClient)
+        self.client.close()
+        core.invalidateCatalogCache()
+
+    def test_pbf_is_used_when_supported(self):
+        with MockArcGISServer(featuresPerLayer=1200, maxRecordCount=500) as server:
+            features = core.restGetMapLayerAllData(server.baseUrl, "Service0", 0)
+            self.assertEqual(server.stats()["pbf"], 3)
+            server.resetStats()
+            expected = list(core.iterMapLayerData(server.baseUrl, "Service0", 0, queryFormat="json"))
+            self.assertEqual(server.stats()["pbf"], 0)
+
+        self.assertEqual([feature["attributes"] for feature in features],
+                         [feature["attributes"] for feature in expected])
+
+    def test_falls_back_to_json(self):
+        with MockArcGISServer(featuresPerLayer=700, maxRecordCount=500, supportsPbf=False) as server:
+            self.assertEqual(len(core.restGetMapLayerAllData(server.baseUrl, "Service0", 0)), 700)
+            self.assertEqual(server.stats()["query"], 2)
+
+            # A server rejecting a PBF query that was requested anyway is asked again for JSON
+            server.resetStats()
+            features = list(core.iterMapLayerData(server.baseUrl, "Service0", 0, queryFormat="pbf", maxWorkers=2))
+            self.assertEqual(len(features), 700)
+            self.assertEqual(server.stats()["pbf"], 0)
+
+        with self.assertRaises(ValueError):
+            list(core.iterMapLayerData("https://example.com/arcgis/rest", "Service0", 0, queryFormat="xml"))
+
+
+if __name__ == '__main__':
+    unittest.main()
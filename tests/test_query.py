@@ -0,0 +1,132 @@
+import json
+import unittest
+
+from ArcGISPyGnu import core
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient
+from ArcGISPyGnu.query import (QueryOptions, dequantizeGeometry, dequantizeResponse, outFieldsParameter,
+                               validateOutFields)
+from tests.mockserver import MockArcGISServer
+
+LAYER = {"name": "Roads", "geometryType": "esriGeometryPolyline", "supportsCoordinatesQuantization": True,
+         "fields": [{"name": "OBJECTID"}, {"name": "NAME"}]}
+
+
+class TestQueryOptions(unittest.TestCase):
+    def test_invalid_values(self):
+        for options in [{"maxAllowableOffset": 0}, {"geometryPrecision": -1}, {"geometryPrecision": 1.5},
+                        {"outSR": "4326"}, {"quantizationParameters": {"mode": "fast"}},
+                        {"quantizationParameters": {"originPosition": "center"}},
+                        {"quantizationParameters": {"tolerance": 0}},
+                        {"returnGeometry": False, "geometryPrecision": 3}]:
+            with self.assertRaises(ValueError, msg=options):
+                QueryOptions(**options)
+
+    def test_validate_against_layer(self):
+        QueryOptions(maxAllowableOffset=10, quantizationParameters={"mode": "view", "tolerance": 1}).validate(LAYER)
+        QueryOptions(returnGeometry=False).validate({"name": "Table"})
+
+        with self.assertRaises(ValueError):
+            QueryOptions(maxAllowableOffset=10).validate(dict(LAYER, geometryType="esriGeometryPoint"))
+        with self.assertRaises(ValueError):
+            QueryOptions(geometryPrecision=2).validate({"name": "Table"})
+        with self.assertRaises(ValueError):
+            QueryOptions(quantizationParameters={"tolerance": 1}).validate(
+                dict(LAYER, supportsCoordinatesQuantization=False))
+
+    def test_to_params(self):
+        self.assertEqual(QueryOptions().toParams(), {"returnGeometry": "true", "outSR": "4326"})
+        self.assertEqual(QueryOptions(returnGeometry=False).toParams(), {"returnGeometry": "false"})
+        params = QueryOptions(outSR={"wkid": 28992}, maxAllowableOffset=5, geometryPrecision=1,
+                              quantizationParameters={"mode": "view", "tolerance": 5}).toParams()
+        self.assertEqual(json.loads(params["outSR"]), {"wkid": 28992})
+        self.assertEqual(params["maxAllowableOffset"], 5)
+        self.assertEqual(params["geometryPrecision"], 1)
+        self.assertEqual(json.loads(params["quantizationParameters"]), {"mode": "view", "tolerance": 5})
+
+    def test_out_fields(self):
+        self.assertEqual(outFieldsParameter(["OBJECTID", " NAME"]), "OBJECTID,NAME")
+        self.assertEqual(outFieldsParameter("*"), "*")
+        with self.assertRaises(ValueError):
+            outFieldsParameter([])
+
+        validateOutFields("objectid,Name", LAYER)
+        validateOutFields("*", LAYER)
+        validateOutFields("ANYTHING", {"name": "Unknown fields"})
+        with self.assertRaises(ValueError):
+            validateOutFields("OBJECTID,LENGTH", LAYER)
+
+
+class TestDequantize(unittest.TestCase):
+    def test_paths_and_points(self):
+        transform = {"originPosition": "upperLeft", "scale": [0.5, 0.5], "translate": [100, 50]}
+        self.assertEqual(dequantizeGeometry({"paths": [[[0, 0], [2, 4], [2, -2]], [[10, 10], [1, 1]]]}, transform),
+                         {"paths": [[[100, 50], [101, 48], [102, 49]], [[105, 45], [105.5, 44.5]]]})
+        self.assertEqual(dequantizeGeometry({"x": 4, "y": 6}, dict(transform, originPosition="lowerLeft")),
+                         {"x": 102, "y": 53})
+        self.assertEqual(dequantizeGeometry({"points": [[2, 2], [2, 2]]}, transform),
+                         {"points": [[101, 49], [102, 48]]})
+
+        data = {"transform": transform, "features": [{"attributes": {}, "geometry": {"rings": [[[0, 0], [2, 0]]]}},
+                                                     {"attributes": {}}]}
+        self.assertEqual(dequantizeResponse(data)["features"][0]["geometry"], {"rings": [[[100, 50], [101, 50]]]})
+        self.assertNotIn("transform", data)
+
+
+class TestQueriesWithOptions(unittest.TestCase):
+    def setUp(self):
+        core.invalidateCatalogCache()
+        self.client = ArcGISClient()
+        self.previousClient = setDefaultClient(self.client)
+
+    def tearDown(self):
+        setDefaultClient(self.previousClient)
+        self.client.close()
+        core.invalidateCatalogCache()
+
+    def test_without_geometry(self):
+        with MockArcGISServer(featuresPerLayer=500, maxRecordCount=250, supportsPbf=False) as server:
+            full = core.restGetMapLayerData(server.baseUrl, "Service0", 0, "1=1", ["OBJECTID", "NAME"])
+            fullBytes = server.stats()["bytes"]
+            server.resetStats()
+            reduced = core.restGetMapLayerData(server.baseUrl, "Service0", 0, "1=1", ["OBJECTID", "NAME"],
+                                               queryOptions=QueryOptions(returnGeometry=False))
+            reducedBytes = server.stats()["bytes"]
+
+            table = core.restGetMapLayerTable(server.baseUrl, "Service0", 0, outFields=["NAME"],
+                                              queryOptions=QueryOptions(returnGeometry=False))
+
+        self.assertEqual([feature["attributes"] for feature in reduced], [feature["attributes"] for feature in full])
+        self.assertTrue(all("geometry" not in feature for feature in reduced))
+        self.assertEqual(set(full[0]["attributes"]), {"OBJECTID", "NAME"})
+        self.assertLess(reducedBytes, fullBytes * 0.8)
+        self.assertEqual(len(table), 500)
+        self.assertIsNone(table.geometryType)
+
+    def test_quantized_geometry(self):
+        with MockArcGISServer(featuresPerLayer=300, maxRecordCount=100, supportsPbf=False) as server:
+            full = core.restGetMapLayerAllData(server.baseUrl, "Service0", 0)
+            for originPosition in ("upperLeft", "lowerLeft"):
+                options = QueryOptions(quantizationParameters={"mode": "view", "tolerance": 1e-4,
+                                                               "originPosition": originPosition})
+                quantized = core.restGetMapLayerAllData(server.baseUrl, "Service0", 0, queryOptions=options)
+                self.assertEqual(len(quantized), 300)
+                for expected, feature in zip(full, quantized):
+                    self.assertAlmostEqual(feature["geometry"]["x"], expected["geometry"]["x"], places=4)
+                    self.assertAlmostEqual(feature["geometry"]["y"], expected["geometry"]["y"], places=4)
+
+            rounded = core.restGetMapLayerAllData(server.baseUrl, "Service0", 0,
+                                                  queryOptions=QueryOptions(geometryPrecision=1))
+            self.assertEqual(rounded[0]["geometry"]["x"], round(full[0]["geometry"]["x"], 1))
+
+    def test_rejected_before_querying(self):
+        with MockArcGISServer(featuresPerLayer=100) as server:
+            with self.assertRaises(ValueError):
+                core.restGetMapLayerData(server.baseUrl, "Service0", 0, "1=1", "OBJECTID,LENGTH")
+            with self.assertRaises(ValueError):
+                core.restGetMapLayerAllData(server.baseUrl, "Service0", 0,
+                                            queryOptions=QueryOptions(maxAllowableOffset=10))
+            self.assertEqual(server.stats()["query"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from ArcGISPyGnu import core
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient
+from ArcGISPyGnu.exceptions import ArcGISHttpError, InvalidUrlError
+from ArcGISPyGnu.scheduler import AdaptiveLimiter, RequestScheduler, RetryPolicy, requestEndpoint
+from ArcGISPyGnu.utils import checkBaseUrl, printError
+
+URL = "https://sampleserver6.arcgisonline.com/arcgis/rest//services/Wildfire/MapServer/0/query"
+
+
+def makeResponse(status, body=b'{"features": []}', headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response._content_consumed = True
+    response.headers.update(headers or {})
+    response.url = URL
+    return response
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_delay_is_jittered_and_bounded(self):
+        policy = RetryPolicy(backoffFactor=0.5, maxBackoff=4.0)
+        for attempt in range(10):
+            delay = policy.delay(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(4.0, 0.5 * 2 ** attempt))
+
+    def test_retry_after_takes_precedence(self):
+        policy = RetryPolicy(maxRetryAfter=60)
+        self.assertEqual(policy.delay(0, RetryPolicy.parseRetryAfter("7")), 7)
+        self.assertEqual(policy.delay(0, RetryPolicy.parseRetryAfter("3600")), 60)
+        self.assertIsNone(RetryPolicy.parseRetryAfter("soon"))
+        self.assertLess(RetryPolicy.parseRetryAfter("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def test_additive_increase_multiplicative_decrease(self):
+        limiter = AdaptiveLimiter(maxLimit=8, initialLimit=4, latencyTolerance=None)
+        self.assertTrue(all(limiter.tryAcquire() for _ in range(4)))
+        self.assertFalse(limiter.tryAcquire())
+
+        limiter.release(0.1, congested=True)
+        self.assertEqual(limiter.limit, 2)
+        # Failures of the same round trip only decrease the limit once
+        limiter.release(0.1, congested=True)
+        self.assertEqual(limiter.limit, 2)
+        limiter.release(0.1)
+        limiter.release(0.1)
+
+        for _ in range(100):
+            limiter.tryAcquire()
+            limiter.release(0.1)
+        self.assertEqual(limiter.limit, 8)
+        self.assertEqual(limiter.stats()["inFlight"], 0)
+
+    def test_rising_latency_is_congestion(self):
+        limiter = AdaptiveLimiter(maxLimit=8, latencyTolerance=2.0)
+        for _ in range(5):
+            limiter.tryAcquire()
+            limiter.release(0.01, endpoint="/query")
+        # A slower endpoint has its own baseline and does not count as congestion
+        limiter.tryAcquire()
+        limiter.release(1.0, endpoint="/layers")
+        self.assertEqual(limiter.decreases, 0)
+
+        for _ in range(10):
+            limiter.tryAcquire()
+            limiter.release(0.5, endpoint="/query")
+        self.assertGreater(limiter.decreases, 0)
+        self.assertLess(limiter.limit, 8)
+
+
+class TestRequestScheduler(unittest.TestCase):
+    def test_probes_do_not_set_the_baseline_of_pages(self):
+        scheduler = RequestScheduler(maxConcurrency=8, sleep=mock.Mock())
+        queryUrl = "https://example.com/arcgis/rest/services/Parcels/MapServer/0/query"
+
+        def sendRequest(duration):
+            time.sleep(duration)
+            return makeResponse(200)
+
+        for _ in range(10):
+            scheduler.send(queryUrl, lambda: sendRequest(0.001), params={"where": "1=1", "returnIdsOnly": "true"})
+            scheduler.send(queryUrl, lambda: sendRequest(0.001), params={"where": "1=1", "returnCountOnly": True})
+            scheduler.send(queryUrl, lambda: sendRequest(0.03),
+                           params={"where": "OBJECTID > 0", "resultRecordCount": 1000, "f": "json"})
+
+        limiter = scheduler.limiter(queryUrl)
+        self.assertEqual(limiter.decreases, 0)
+        self.assertEqual(limiter.limit, 8)
+        self.assertEqual(len(limiter.stats()["latencies"]), 3)
+        self.assertEqual(requestEndpoint(f"{queryUrl}?f=PBF", {"resultRecordCount": 1000}),
+                         "/arcgis/rest/services/Parcels/MapServer/0/query?f=pbf&resultRecordCount=1000")
+
+    def test_retries_throttled_requests(self):
+        sleep = mock.Mock()
+        scheduler = RequestScheduler(maxConcurrency=4, sleep=sleep)
+        responses = [makeResponse(503, headers={"Retry-After": "2"}), makeResponse(200)]
+
+        response = scheduler.send(URL, lambda: responses.pop(0))
+
+        self.assertEqual(response.status_code, 200)
+        sleep.assert_called_once_with(2.0)
+        self.assertEqual(scheduler.retries, 1)
+        self.assertEqual(scheduler.limiter(URL).decreases, 1)
+
+    def test_retries_error_documents(self):
+        scheduler = RequestScheduler(sleep=mock.Mock())
+        responses = [makeResponse(200, b'{\n  "error": {"code": 429, "message": "Too many requests"}\n}'),
+                     makeResponse(200)]
+
+        response = scheduler.send(URL, lambda: responses.pop(0))
+
+        self.assertEqual(response.json(), {"features": []})
+
+    def test_gives_up_after_max_retries(self):
+        sleep = mock.Mock()
+        scheduler = RequestScheduler(RetryPolicy(maxRetries=2), sleep=sleep)
+        sendRequest = mock.Mock(side_effect=requests.ConnectionError("connection reset"))
+
+        with self.assertRaises(requests.ConnectionError):
+            scheduler.send(URL, sendRequest)
+        self.assertEqual(sendRequest.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+        sendRequest = mock.Mock(return_value=makeResponse(502))
+        self.assertEqual(scheduler.send(URL, sendRequest).status_code, 502)
+        self.assertEqual(sendRequest.call_count, 3)
+
+    def test_does_not_retry_client_errors(self):
+        scheduler = RequestScheduler(sleep=mock.Mock())
+        sendRequest = mock.Mock(return_value=makeResponse(404))
+        self.assertEqual(scheduler.send(URL, sendRequest).status_code, 404)
+        self.assertEqual(sendRequest.call_count, 1)
+
+    def test_other_errors_release_the_slot(self):
+        scheduler = RequestScheduler(maxConcurrency=2, sleep=mock.Mock())
+        errors = [requests.exceptions.ChunkedEncodingError("truncated"), requests.TooManyRedirects("loop"),
+                  KeyboardInterrupt()]
+        for error in errors:
+            with self.assertRaises(type(error)):
+                scheduler.send(URL, mock.Mock(side_effect=error))
+        with mock.patch("ArcGISPyGnu.scheduler.responseStatus",
+                        side_effect=requests.exceptions.ContentDecodingError("corrupt")):
+            with self.assertRaises(requests.exceptions.ContentDecodingError):
+                scheduler.send(URL, lambda: makeResponse(200))
+
+        self.assertEqual(scheduler.limiter(URL).inFlight, 0)
+        self.assertEqual(scheduler.send(URL, lambda: makeResponse(200)).status_code, 200)
+
+    def test_client_sends_through_scheduler(self):
+        client = ArcGISClient(scheduler=RequestScheduler(sleep=mock.Mock()))
+        responses = [makeResponse(504), makeResponse(200)]
+        with mock.patch.object(client.session, "get", side_effect=lambda *args, **kwargs: responses.pop(0)):
+            self.assertEqual(client.get(URL).status_code, 200)
+        self.assertEqual(client.scheduler.stats()["retries"], 1)
+
+
+class TestErrors(unittest.TestCase):
+    def test_errors_raise_instead_of_exiting(self):
+        with self.assertRaises(InvalidUrlError):
+            checkBaseUrl("not a url")
+        with self.assertRaises(ArcGISHttpError) as context:
+            printError("httpError503", URL)
+        self.assertEqual(context.exception.statusCode, 503)
+        self.assertEqual(context.exception.url, URL)
+
+    def test_throttled_requests_raise_http_errors(self):
+        client = ArcGISClient(scheduler=RequestScheduler(RetryPolicy(maxRetries=1), sleep=mock.Mock()))
+        previousClient = setDefaultClient(client)
+        try:
+            with mock.patch.object(client.session, "get", return_value=makeResponse(429)):
+                with self.assertRaises(ArcGISHttpError) as context:
+                    core.restGetMapServerDetails("https://sampleserver6.arcgisonline.com/arcgis/rest", "Wildfire")
+        finally:
+            setDefaultClient(previousClient)
+            client.close()
+        self.assertEqual(context.exception.statusCode, 429)
+
+
+if __name__ == '__main__':
+    unittest.main()
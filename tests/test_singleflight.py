@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from ArcGISPyGnu import core
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient
+from ArcGISPyGnu.singleflight import AsyncSingleFlight, SingleFlight
+from tests.mockserver import MockArcGISServer
+
+try:
+    from ArcGISPyGnu import aio
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_are_shared(self):
+        singleFlight = SingleFlight()
+        release = threading.Event()
+        executions = []
+
+        def function():
+            executions.append(1)
+            release.wait(5)
+            return {"value": 42}
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(singleFlight.do, "key", function) for _ in range(8)]
+            while singleFlight.stats()["calls"] < 8:
+                release.wait(0.001)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(len(executions), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False] + [True] * 7)
+        self.assertTrue(all(result is results[0][0] for result, _ in results))
+        self.assertEqual(singleFlight.stats(), {"calls": 8, "deduplicated": 7, "inFlight": 0})
+
+        # Finished calls are not cached
+        self.assertEqual(singleFlight.do("key", lambda: 1), (1, False))
+
+    def test_errors_are_shared(self):
+        singleFlight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def function():
+            started.set()
+            release.wait(5)
+            raise ValueError("failed")
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(singleFlight.do, "key", function)
+            started.wait(5)
+            second = executor.submit(singleFlight.do, "key", function)
+            while singleFlight.stats()["calls"] < 2:
+                release.wait(0.001)
+            release.set()
+            for future in (first, second):
+                with self.assertRaises(ValueError):
+                    future.result()
+        self.assertEqual(singleFlight.stats()["inFlight"], 0)
+
+    def test_async_calls_are_shared(self):
+        singleFlight = AsyncSingleFlight()
+        executions = []
+
+        async def function():
+            executions.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        async def run():
+            first = asyncio.ensure_future(singleFlight.do("key", function))
+            await asyncio.sleep(0)
+            others = asyncio.ensure_future(asyncio.gather(*(singleFlight.do("key", function) for _ in range(4))))
+            await asyncio.sleep(0)
+            # A cancelled caller does not cancel the call of the others
+            first.cancel()
+            results = await others
+            self.assertTrue(first.cancelled())
+            return results + [await singleFlight.do("other", function)]
+
+        results = asyncio.run(run())
+        self.assertEqual(results, [("result", True)] * 4 + [("result", False)])
+        self.assertEqual(len(executions), 2)
+        self.assertEqual(singleFlight.stats(), {"calls": 6, "deduplicated": 4, "inFlight": 0})
+
+
+class TestRequestCoalescing(unittest.TestCase):
+    def setUp(self):
+        core.invalidateCatalogCache()
+
+    def tearDown(self):
+        core.invalidateCatalogCache()
+
+    def test_client_coalesces_identical_requests(self):
+        for coalesce, expectedRequests in ((True, 1), (False, 16)):
+            client = ArcGISClient(poolMaxSize=16, coalesce=coalesce)
+            previousClient = setDefaultClient(client)
+            try:
+                with MockArcGISServer(latency=0.2) as server, ThreadPoolExecutor(max_workers=16) as executor:
+                    results = list(executor.map(lambda _: core.restGetMapServerDetails(server.baseUrl, "Service0"),
+                                                range(16)))
+                    self.assertEqual(server.stats()["details"], expectedRequests)
+            finally:
+                setDefaultClient(previousClient)
+                client.close()
+
+            self.assertTrue(all(result == results[0] for result in results))
+            # Every caller decodes its own document
+            self.assertEqual(len({id(result) for result in results}), 16)
+            if coalesce:
+                self.assertEqual(client.singleFlight.stats()["deduplicated"], 15)
+
+    @unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+    def test_async_client_coalesces_identical_requests(self):
+        client = aio.AsyncArcGISClient()
+        previousClient = aio.setDefaultClient(client)
+
+        async def run(baseUrl):
+            try:
+                return await asyncio.gather(*(aio.restGetMapServerDetails(baseUrl, "Service0") for _ in range(10)))
+            finally:
+                await client.close()
+
+        try:
+            with MockArcGISServer(latency=0.1) as server:
+                results = asyncio.run(run(server.baseUrl))
+                self.assertEqual(server.stats()["details"], 1)
+        finally:
+            aio.setDefaultClient(previousClient)
+        self.assertTrue(all(result == results[0] and result is not results[0] for result in results[1:]))
+        self.assertEqual(client.singleFlight.stats()["deduplicated"], 9)
+
+    @unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+    def test_async_catalog_crawls_are_shared(self):
+        # Without request coalescing, so only the crawls of the catalog are shared
+        client = aio.AsyncArcGISClient(coalesce=False)
+        previousClient = aio.setDefaultClient(client)
+
+        async def run(baseUrl):
+            try:
+                return await asyncio.gather(*(aio.restGetServiceType(baseUrl, "Folder1/Service0") for _ in range(8)))
+            finally:
+                await client.close()
+
+        try:
+            with MockArcGISServer(folderDepth=1, foldersPerFolder=2, latency=0.05) as server:
+                self.assertEqual(asyncio.run(run(server.baseUrl)), ["MapServer"] * 8)
+                self.assertEqual(server.stats()["catalog"], 3)
+        finally:
+            aio.setDefaultClient(previousClient)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import statistics as pystatistics
+import unittest
+from datetime import datetime
+
+from ArcGISPyGnu import core
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient
+from ArcGISPyGnu.stats import (_Accumulator, restGetMapLayerCount, restGetMapLayerDistinctValues,
+                               restGetMapLayerExtent, restGetMapLayerStatistics)
+from tests.mockserver import MockArcGISServer
+
+STATISTICS = [
+    {"statisticType": "count", "onStatisticField": "OBJECTID", "outStatisticFieldName": "features"},
+    {"statisticType": "sum", "onStatisticField": "VALUE", "outStatisticFieldName": "totalValue"},
+    {"statisticType": "avg", "onStatisticField": "VALUE"},
+    {"statisticType": "stddev", "onStatisticField": "VALUE"},
+    {"statisticType": "max", "onStatisticField": "EDITED", "outStatisticFieldName": "lastEdit"},
+]
+
+
+class TestAccumulator(unittest.TestCase):
+    def test_statistics(self):
+        values = [4, None, 1, 7, 2.5, 10]
+        present = [value for value in values if value is not None]
+        expected = {"count": 5, "sum": sum(present), "min": 1, "max": 10, "avg": pystatistics.mean(present),
+                    "var": pystatistics.variance(present), "stddev": pystatistics.stdev(present)}
+        for statisticType, result in expected.items():
+            accumulator = _Accumulator({"statisticType": statisticType, "onStatisticField": "A",
+                                        "outStatisticFieldName": "a"})
+            for value in values:
+                accumulator.add(value)
+            self.assertAlmostEqual(accumulator.result(), result, msg=statisticType)
+
+    def test_percentiles(self):
+        def percentile(statisticType, value, values):
+            accumulator = _Accumulator({"statisticType": statisticType, "onStatisticField": "A",
+                                        "outStatisticFieldName": "a", "statisticParameters": {"value": value}})
+            for item in values:
+                accumulator.add(item)
+            return accumulator.result()
+
+        self.assertEqual(percentile("percentile_cont", 0.5, [1, 2, 3, 4]), 2.5)
+        self.assertEqual(percentile("percentile_disc", 0.5, [1, 2, 3, 4]), 2)
+        self.assertEqual(percentile("percentile_cont", 0.9, [10]), 10)
+        self.assertIsNone(percentile("percentile_disc", 0.5, []))
+
+
+class TestLayerStatistics(unittest.TestCase):
+    def setUp(self):
+        core.invalidateCatalogCache()
+        self.client = ArcGISClient()
+        self.previousClient = setDefaultClient(self.client)
+
+    def tearDown(self):
+        setDefaultClient(self.previousClient)
+        self.client.close()
+        core.invalidateCatalogCache()
+
+    def run_queries(self, supportsStatistics):
+        core.invalidateCatalogCache()
+        with MockArcGISServer(featuresPerLayer=1500, maxRecordCount=500,
+                              supportsStatistics=supportsStatistics) as server:
+            results = {
+                "count": restGetMapLayerCount(server.baseUrl, "Service0", 0, "OBJECTID <= 700"),
+                "extent": restGetMapLayerExtent(server.baseUrl, "Service0", 0, "OBJECTID <= 700"),
+                "empty": restGetMapLayerExtent(server.baseUrl, "Service0", 0, "OBJECTID <= 0"),
+                "distinct": restGetMapLayerDistinctValues(server.baseUrl, "Service0", 0, ["CATEGORY"]),
+                "grouped": restGetMapLayerStatistics(server.baseUrl, "Service0", 0, STATISTICS, "CATEGORY"),
+                "total": restGetMapLayerStatistics(server.baseUrl, "Service0", 0, STATISTICS[:2]),
+                "percentile": restGetMapLayerStatistics(
+                    server.baseUrl, "Service0", 0, [{"statisticType": "percentile_cont", "onStatisticField": "VALUE",
+                                                     "statisticParameters": {"value": 0.5}}], "CATEGORY"),
+            }
+            return results, server.stats()
+
+    def test_server_and_client_side_agree(self):
+        serverResults, serverStats = self.run_queries(True)
+        clientResults, clientStats = self.run_queries(False)
+
+        self.assertEqual(serverResults["count"], 700)
+        self.assertEqual(serverResults["extent"]["count"], 700)
+        self.assertEqual(serverResults["empty"], {"extent": None, "count": 0})
+        self.assertEqual(clientResults["empty"], {"extent": None, "count": 0})
+        for key in ("xmin", "ymin", "xmax", "ymax"):
+            self.assertAlmostEqual(serverResults["extent"]["extent"][key], clientResults["extent"]["extent"][key])
+
+        self.assertEqual(serverResults["distinct"], clientResults["distinct"])
+        self.assertEqual([row["CATEGORY"] for row in serverResults["distinct"]], [None, 0, 1, 2, 3, 4, 5, 6])
+        self.assertEqual(len(serverResults["grouped"]), 8)
+        for serverRow, clientRow in zip(serverResults["grouped"], clientResults["grouped"]):
+            self.assertEqual(set(serverRow), {"CATEGORY", "features", "totalValue", "avg_VALUE", "stddev_VALUE",
+                                              "lastEdit"})
+            for name, value in serverRow.items():
+                if isinstance(value, float):
+                    self.assertAlmostEqual(value, clientRow[name])
+                else:
+                    self.assertEqual(value, clientRow[name])
+        self.assertIsInstance(serverResults["grouped"][0]["features"], int)
+        self.assertIsInstance(serverResults["grouped"][0]["lastEdit"], datetime)
+        self.assertEqual(serverResults["total"], [{"features": 1500, "totalValue": 0.5 * 1500 * 1501 / 2}])
+        self.assertEqual(serverResults["total"], clientResults["total"])
+        self.assertEqual(serverResults["percentile"], clientResults["percentile"])
+
+        # Pushed down, the statistics need fewer requests and bytes than the client side aggregation
+        self.assertLess(serverStats["query"], clientStats["query"])
+        self.assertLess(serverStats["bytes"] * 3, clientStats["bytes"])
+
+    def test_invalid_statistics(self):
+        with MockArcGISServer(featuresPerLayer=10) as server:
+            for statistic in [{"statisticType": "median", "onStatisticField": "VALUE"},
+                              {"statisticType": "sum"},
+                              {"statisticType": "percentile_cont", "onStatisticField": "VALUE"},
+                              {"statisticType": "sum", "onStatisticField": "LENGTH"}]:
+                with self.assertRaises(ValueError, msg=statistic):
+                    restGetMapLayerStatistics(server.baseUrl, "Service0", 0, [statistic])
+            self.assertEqual(server.stats()["query"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from ArcGISPyGnu import core, sync
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient
+from tests.mockserver import MockArcGISServer
+
+layerDetails = {
+    "editFieldsInfo": {"editDateField": "EDITED"},
+    "fields": [
+        {"name": "OBJECTID", "type": "esriFieldTypeOID"},
+        {"name": "EDITED", "type": "esriFieldTypeDate"},
+    ],
+}
+
+
+class FakeLayer:
+    def __init__(self, rows):
+        self.rows = dict(rows)
+        self.queries = []
+
+    def objectIds(self, baseUrl, serviceName, layerId, where="1=1"):
+        return {"objectIdFieldName": "OBJECTID", "objectIds": sorted(self.rows)}
+
+    def query(self, baseUrl, serviceName, layerId, where="1=1", outFields="*", maxWorkers=1):
+        self.queries.append(where)
+        since = re.search(r"EDITED >= TIMESTAMP '([^']+)'", where)
+        ids = re.search(r"IN \(([\d,]+)\)", where)
+        for objectId, edited in sorted(self.rows.items()):
+            if since and (edited is None or sync._formatTimestamp(edited) < since.group(1)):
+                continue
+            if ids and str(objectId) not in ids.group(1).split(","):
+                continue
+            yield {"attributes": {"OBJECTID": objectId, "EDITED": edited}}
+
+
+class TestSync(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.statePath = os.path.join(self.directory, "state.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def sync(self, layer):
+        with mock.patch.object(sync, "_getLayerDetails", return_value=layerDetails), \
+                mock.patch.object(sync, "restGetMapLayerObjectIds", side_effect=layer.objectIds), \
+                mock.patch.object(sync, "iterMapLayerData", side_effect=layer.query):
+            return sync.syncMapLayer("https://example.com/arcgis/rest", "Parcels", 0, self.statePath)
+
+    def test_incremental_changeset(self):
+        layer = FakeLayer({1: 1000000, 2: 2000000, 3: 3000000})
+        changeset = self.sync(layer)
+        self.assertEqual(len(changeset["inserts"]), 3)
+        localCopy = sync.applyChangeset({}, changeset)
+
+        # Feature 2 is edited, 3 is deleted, 4 is added and 5 is added without an edit date
+        layer.rows.update({2: 5000000, 4: 6000000, 5: None})
+        del layer.rows[3]
+        changeset = self.sync(layer)
+        self.assertEqual([feature["attributes"]["OBJECTID"] for feature in changeset["inserts"]], [4, 5])
+        self.assertEqual([feature["attributes"]["OBJECTID"] for feature in changeset["updates"]], [2])
+        self.assertEqual(changeset["deletes"], [3])
+        self.assertEqual(changeset["state"]["watermark"], 6000000)
+        self.assertIn("EDITED >= TIMESTAMP '1970-01-01 00:50:00'", layer.queries[-2])
+
+        sync.applyChangeset(localCopy, changeset)
+        self.assertEqual(sorted(localCopy), [1, 2, 4, 5])
+        self.assertEqual(localCopy[2]["attributes"]["EDITED"], 5000000)
+
+    def test_state_of_other_layer_is_rejected(self):
+        self.sync(FakeLayer({1: 1000}))
+        with mock.patch.object(sync, "_getLayerDetails", return_value=layerDetails), \
+                self.assertRaises(ValueError):
+            sync.syncMapLayer("https://example.com/arcgis/rest", "Roads", 0, self.statePath)
+
+
+class TestSyncMockServer(unittest.TestCase):
+    def setUp(self):
+        core.invalidateCatalogCache()
+        self.client = ArcGISClient()
+        self.previousClient = setDefaultClient(self.client)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        setDefaultClient(self.previousClient)
+        self.client.close()
+        core.invalidateCatalogCache()
+        shutil.rmtree(self.directory)
+
+    def test_restricted_out_fields(self):
+        with MockArcGISServer(featuresPerLayer=20) as server:
+            for outFields in ("NAME", ["NAME", "VALUE"]):
+                statePath = os.path.join(self.directory, f"{len(outFields)}.json")
+                changeset = sync.syncMapLayer(server.baseUrl, "Service0", 0, statePath, outFields=outFields,
+                                              editDateField="EDITED")
+                self.assertEqual(len(changeset["inserts"]), 20)
+                attributes = changeset["inserts"][0]["attributes"]
+                self.assertTrue({"OBJECTID", "NAME", "EDITED"} <= set(attributes))
+                self.assertIsNotNone(changeset["state"]["watermark"])
+
+
+if __name__ == '__main__':
+    unittest.main()
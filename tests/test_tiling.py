@@ -0,0 +1,66 @@
+import unittest
+
+from ArcGISPyGnu import core
+from ArcGISPyGnu.client import ArcGISClient, setDefaultClient
+from ArcGISPyGnu.tiling import _isValidExtent, _quadrants, iterMapLayerTiles, restGetMapLayerDataTiled
+from tests.mockserver import MockArcGISServer
+
+
+class TestQuadtree(unittest.TestCase):
+    def test_quadrants(self):
+        self.assertEqual(_quadrants((0, 0, 4, 2)), [(0, 0, 2, 1), (2, 0, 4, 1), (0, 1, 2, 2), (2, 1, 4, 2)])
+
+    def test_valid_extent(self):
+        self.assertTrue(_isValidExtent({"xmin": 0, "ymin": 0, "xmax": 1, "ymax": 1}))
+        self.assertFalse(_isValidExtent({"xmin": "NaN", "ymin": "NaN", "xmax": "NaN", "ymax": "NaN"}))
+        self.assertFalse(_isValidExtent({"xmin": None, "ymin": 0, "xmax": 1, "ymax": 1}))
+        self.assertFalse(_isValidExtent(None))
+
+
+class TestTiledExtraction(unittest.TestCase):
+    def setUp(self):
+        core.invalidateCatalogCache()
+        self.client = ArcGISClient()
+        self.previousClient = setDefaultClient(self.client)
+
+    def tearDown(self):
+        setDefaultClient(self.previousClient)
+        self.client.close()
+        core.invalidateCatalogCache()
+
+    def test_complete_extraction_without_pagination(self):
+        with MockArcGISServer(featuresPerLayer=2000, maxRecordCount=50, supportsPagination=False) as server:
+            features = restGetMapLayerDataTiled(server.baseUrl, "Service0", 0, maxWorkers=4)
+            queries = server.stats()["query"]
+
+        objectIds = [feature["attributes"]["OBJECTID"] for feature in features]
+        self.assertEqual(sorted(objectIds), list(range(1, 2001)))
+        # The features are clustered, empty quadrants stop splitting right away
+        self.assertLess(queries, 2000)
+
+    def test_duplicates_and_object_id_field(self):
+        with MockArcGISServer(featuresPerLayer=500, maxRecordCount=40, supportsPagination=False) as server:
+            pages = list(iterMapLayerTiles(server.baseUrl, "Service0", 0, where="OBJECTID <= 300", outFields=["NAME"],
+                                           pages=True, queryFormat="json"))
+
+        features = [feature for page in pages for feature in page]
+        self.assertEqual(len(features), 300)
+        self.assertTrue(all(list(feature["attributes"]) == ["NAME"] for feature in features))
+        self.assertEqual(len({feature["attributes"]["NAME"] for feature in features}), 300)
+
+    def test_max_depth_falls_back_to_object_ids(self):
+        with MockArcGISServer(featuresPerLayer=600, maxRecordCount=100, supportsPagination=False) as server:
+            features = list(iterMapLayerTiles(server.baseUrl, "Service0", 0, maxDepth=1))
+        self.assertEqual(sorted(feature["attributes"]["OBJECTID"] for feature in features), list(range(1, 601)))
+
+    def test_invalid_arguments(self):
+        with MockArcGISServer(featuresPerLayer=10) as server:
+            with self.assertRaises(ValueError):
+                iterMapLayerTiles(server.baseUrl, "Service0", 0, extent={"xmin": "NaN"})
+            with self.assertRaises(ValueError):
+                iterMapLayerTiles(server.baseUrl, "Service0", 0, maxWorkers=0)
+            self.assertEqual(server.stats()["query"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()